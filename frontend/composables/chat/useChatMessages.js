@@ -402,6 +402,14 @@ export const useChatMessages = ({
       }
       if (realtimeEnabled.value) {
         params.source = 'realtime'
+      } else {
+        // Keyset paging: deep history costs the same as the first page.
+        const nextCursor = messagesMeta.value[username]?.nextCursor
+        if (reset) {
+          params.cursor = ''
+        } else if (typeof nextCursor === 'string' && nextCursor) {
+          params.cursor = nextCursor
+        }
       }
       logMessagePhase('loadMessages:request:start', {
         username,
@@ -470,7 +478,8 @@ export const useChatMessages = ({
         ...messagesMeta.value,
         [username]: {
           total: Number(response?.total || 0),
-          hasMore: response?.hasMore
+          hasMore: response?.hasMore,
+          nextCursor: typeof response?.nextCursor === 'string' ? response.nextCursor : null
         }
       }
       logMessagePhase('loadMessages:meta-commit:end', {
@@ -479,6 +488,14 @@ export const useChatMessages = ({
         hasMore: response?.hasMore
       })
 
+      const voiceServerIds = mapped
+        .filter((message) => message?.renderType === 'voice' && message?.serverIdStr)
+        .map((message) => message.serverIdStr)
+      if (voiceServerIds.length) {
+        // Fire-and-forget: warm the server-side transcode cache for the visible window.
+        api.prefetchChatVoices({ account: selectedAccount.value, server_ids: voiceServerIds }).catch(() => {})
+      }
+
       logMessagePhase('loadMessages:nextTick:start', {
         username
       })
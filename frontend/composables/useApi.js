@@ -104,6 +104,7 @@ export const useApi = () => {
     if (params && params.username) query.set('username', params.username)
     if (params && params.limit != null) query.set('limit', String(params.limit))
     if (params && params.offset != null) query.set('offset', String(params.offset))
+    if (params && params.cursor != null) query.set('cursor', String(params.cursor))
     if (params && params.order) query.set('order', params.order)
     if (params && params.render_types) query.set('render_types', params.render_types)
     if (params && params.source) query.set('source', params.source)
@@ -295,6 +296,14 @@ export const useApi = () => {
     return await request(url)
   }
 
+  // 后台预转码语音（当前窗口内的语音消息，播放时直接命中缓存）
+  const prefetchChatVoices = async (payload = {}) => {
+    return await request('/chat/media/voice/prefetch', {
+      method: 'POST',
+      body: payload
+    })
+  }
+
   // 解析嵌套合并转发聊天记录（通过 server_id）
   const resolveNestedChatHistory = async (params = {}) => {
     const query = new URLSearchParams()
@@ -590,6 +599,7 @@ export const useApi = () => {
     getChatMessagesAround,
     getChatMessageDailyCounts,
     getChatMessageAnchor,
+    prefetchChatVoices,
     resolveNestedChatHistory,
     resolveAppMsg,
     listSnsTimeline,
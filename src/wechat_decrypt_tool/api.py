@@ -19,6 +19,7 @@ request_logger = get_logger("wechat_decrypt_tool.request")
 
 from . import __version__ as APP_VERSION
 from .path_fix import PathFixRoute
+from . import http_client
 from .chat_realtime_autosync import CHAT_REALTIME_AUTOSYNC
 from .routers.chat import router as _chat_router
 from .routers.chat_contacts import router as _chat_contacts_router
@@ -203,6 +204,10 @@ async def _shutdown_wcdb_realtime() -> None:
         CHAT_REALTIME_AUTOSYNC.stop()
     except Exception:
         pass
+    try:
+        await http_client.aclose_async_client()
+    except Exception:
+        pass
     close_ok = False
     lock_timeout_s: float | None = 0.2
     try:
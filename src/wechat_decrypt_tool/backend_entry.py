@@ -4,6 +4,7 @@ This avoids dynamic import strings like "pkg.module:app" which some bundlers
 cannot detect reliably.
 """
 
+import multiprocessing
 import os
 
 import uvicorn
@@ -19,4 +20,6 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # Required for frozen builds: worker processes (e.g. search index build) re-enter this entry point.
+    multiprocessing.freeze_support()
     main()
@@ -9,6 +9,7 @@ import ipaddress
 import json
 import os
 import re
+import shutil
 import sqlite3
 import socket
 import tempfile
@@ -16,6 +17,7 @@ import threading
 import time
 import uuid
 import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
@@ -24,6 +26,7 @@ from urllib.parse import urljoin, urlparse
 
 import requests
 
+from .app_paths import get_output_dir
 from .chat_helpers import (
     _decode_message_content,
     _decode_sqlite_text,
@@ -46,11 +49,11 @@ from .chat_helpers import (
     _pick_display_name,
     _quote_ident,
     _resolve_account_dir,
-    _resolve_msg_table_name,
     _resource_lookup_chat_id,
     _should_keep_session,
     _split_group_sender_prefix,
 )
+from .export_zip import ExportZip, default_zip_profile, normalize_zip_profile
 from .logging_config import get_logger
 from .media_helpers import (
     _convert_silk_to_browser_audio,
@@ -62,6 +65,8 @@ from .media_helpers import (
     _resolve_media_path_for_kind,
     _try_find_decrypted_resource,
 )
+from .message_route_index import get_message_routes, resolve_conversation_tables
+from .voice_cache import load_voice_data, transcode_voice_cached
 
 logger = get_logger(__name__)
 
@@ -2427,6 +2432,7 @@ class ExportJob:
     options: dict[str, Any] = field(default_factory=dict)
     progress: ExportProgress = field(default_factory=ExportProgress)
     cancel_requested: bool = False
+    zip_stats: dict[str, Any] = field(default_factory=dict)
 
     def to_public_dict(self) -> dict[str, Any]:
         return {
@@ -2452,6 +2458,7 @@ class ExportJob:
                 "mediaCopied": self.progress.media_copied,
                 "mediaMissing": self.progress.media_missing,
             },
+            "zipStats": self.zip_stats,
         }
 
 
@@ -2459,6 +2466,163 @@ class _JobCancelled(Exception):
     pass
 
 
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+def _export_workers() -> int:
+    default = max(1, min(4, (os.cpu_count() or 2) - 1))
+    return _env_int("WECHAT_TOOL_EXPORT_WORKERS", default, min_v=1, max_v=16)
+
+
+# Staged `writestr` payloads up to this size stay in memory; larger ones are spooled to the stage directory.
+_STAGE_INLINE_MAX_BYTES = 256 * 1024
+
+
+class _StagedZip:
+    """Per-conversation stand-in for the export ZipFile (`write` / `writestr` only).
+
+    Render workers write into one of these; the job thread later replays the entries into the real zip in
+    conversation order. Arcnames are claimed job-wide, so shared media/avatars are staged (and zipped) once.
+    Temp files created under `tmp_dir` are moved into the stage on `write`, everything else is referenced
+    by path and read when replayed.
+    """
+
+    def __init__(self, root: Path, *, claimed: set[str], claim_lock: threading.Lock) -> None:
+        self.root = root
+        self.tmp_dir = root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self._claimed = claimed
+        self._claim_lock = claim_lock
+        self._entries: list[tuple[str, Optional[bytes], Optional[str]]] = []
+
+    def _claim(self, arcname: str) -> bool:
+        with self._claim_lock:
+            if arcname in self._claimed:
+                return False
+            self._claimed.add(arcname)
+            return True
+
+    def _spool_path(self) -> Path:
+        return self.root / f"{len(self._entries):06d}.part"
+
+    def writestr(self, arcname: str, data: Any) -> None:
+        if not self._claim(arcname):
+            return
+        payload = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        if len(payload) <= _STAGE_INLINE_MAX_BYTES:
+            self._entries.append((arcname, payload, None))
+            return
+        spool = self._spool_path()
+        spool.write_bytes(payload)
+        self._entries.append((arcname, None, str(spool)))
+
+    def write(self, filename: Any, arcname: Optional[str] = None) -> None:
+        src = Path(filename)
+        arc = str(arcname or src.name)
+        if not self._claim(arc):
+            return
+        if self.tmp_dir in src.parents:
+            # Render temp file: its TemporaryDirectory is about to be cleaned up, keep the data.
+            kept = self._spool_path()
+            os.replace(src, kept)
+            src = kept
+        self._entries.append((arc, None, str(src)))
+
+    def replay_into(self, zf: zipfile.ZipFile) -> None:
+        for arcname, payload, path in self._entries:
+            if payload is not None:
+                zf.writestr(arcname, payload)
+            else:
+                zf.write(str(path), arcname)
+
+    def discard(self) -> None:
+        self._entries = []
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+# Sidecar checkpoints of running/interrupted exports (survive a backend restart).
+_CHECKPOINT_INTERVAL_SEC = 5.0
+
+
+def _export_checkpoint_dir() -> Path:
+    return get_output_dir() / "export_jobs"
+
+
+def _export_checkpoint_path(export_id: str) -> Optional[Path]:
+    eid = str(export_id or "").strip()
+    if not eid or not re.fullmatch(r"[0-9a-fA-F]{1,64}", eid):
+        return None
+    return _export_checkpoint_dir() / f"chat_{eid}.json"
+
+
+def _write_export_checkpoint(export_id: str, data: dict[str, Any]) -> None:
+    path = _export_checkpoint_path(export_id)
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _read_export_checkpoint(export_id: str) -> Optional[dict[str, Any]]:
+    path = _export_checkpoint_path(export_id)
+    if path is None or not path.is_file():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _iter_export_checkpoints() -> Iterable[dict[str, Any]]:
+    try:
+        paths = sorted(_export_checkpoint_dir().glob("chat_*.json"))
+    except Exception:
+        return []
+    out: list[dict[str, Any]] = []
+    for p in paths:
+        data = _read_export_checkpoint(p.stem[len("chat_") :])
+        if data:
+            out.append(data)
+    return out
+
+
+def _discard_export_checkpoint(export_id: str, *, delete_part: bool = True) -> None:
+    path = _export_checkpoint_path(export_id)
+    if path is None:
+        return
+    if delete_part:
+        data = _read_export_checkpoint(export_id) or {}
+        part = str(data.get("partPath") or "").strip()
+        if part:
+            try:
+                Path(part).unlink(missing_ok=True)
+            except Exception:
+                pass
+    try:
+        path.unlink(missing_ok=True)
+    except Exception:
+        pass
+
+
+def _zip_tmp_dir(zf: Any) -> Optional[str]:
+    """Where conversation writers put temp files (inside the stage when rendering into a `_StagedZip`)."""
+    d = getattr(zf, "tmp_dir", None)
+    return str(d) if d else None
+
+
 class ChatExportManager:
     def __init__(self) -> None:
         self._lock = threading.Lock()
@@ -2503,7 +2667,13 @@ class ChatExportManager:
         html_page_size: int = 1000,
         privacy_mode: bool,
         file_name: Optional[str],
+        zip_profile: Optional[str] = None,
+        resume_from: Optional[str] = None,
     ) -> ExportJob:
+        resume_id = str(resume_from or "").strip()
+        if resume_id:
+            return self._create_resumed_job(resume_id)
+
         account_dir = _resolve_account_dir(account)
         export_id = uuid.uuid4().hex[:12]
 
@@ -2528,6 +2698,7 @@ class ChatExportManager:
                 "htmlPageSize": int(html_page_size) if int(html_page_size or 0) > 0 else int(html_page_size or 0),
                 "privacyMode": bool(privacy_mode),
                 "fileName": str(file_name or "").strip(),
+                "zipProfile": normalize_zip_profile(zip_profile) if zip_profile else default_zip_profile(),
             },
         )
 
@@ -2543,6 +2714,63 @@ class ChatExportManager:
         t.start()
         return job
 
+    def _create_resumed_job(self, resume_from: str) -> ExportJob:
+        ckpt = _read_export_checkpoint(resume_from)
+        if not ckpt:
+            raise ValueError(f"No resumable export found: {resume_from}")
+        with self._lock:
+            for other in self._jobs.values():
+                busy = other.status in {"queued", "running"}
+                if busy and (other.export_id == resume_from or other.options.get("resumeFrom") == resume_from):
+                    raise ValueError(f"Export {resume_from} is still running.")
+
+        account_dir = _resolve_account_dir(str(ckpt.get("account") or "") or None)
+        export_id = uuid.uuid4().hex[:12]
+        job = ExportJob(
+            export_id=export_id,
+            account=account_dir.name,
+            status="queued",
+            options={**dict(ckpt.get("options") or {}), "resumeFrom": resume_from},
+        )
+        with self._lock:
+            self._jobs[export_id] = job
+
+        t = threading.Thread(
+            target=self._run_job_safe,
+            args=(job, account_dir),
+            name=f"chat-export-{export_id}",
+            daemon=True,
+        )
+        t.start()
+        return job
+
+    def list_resumable_jobs(self) -> list[dict[str, Any]]:
+        """Interrupted exports (cancelled / failed / killed with the backend) that can be continued."""
+        with self._lock:
+            busy = {j.export_id for j in self._jobs.values() if j.status in {"queued", "running"}}
+        out: list[dict[str, Any]] = []
+        for ckpt in _iter_export_checkpoints():
+            export_id = str(ckpt.get("exportId") or "")
+            if not export_id or export_id in busy:
+                continue
+            if not Path(str(ckpt.get("partPath") or "")).is_file():
+                continue
+            out.append(
+                {
+                    "exportId": export_id,
+                    "account": str(ckpt.get("account") or ""),
+                    "status": str(ckpt.get("status") or ""),
+                    "createdAt": int(ckpt.get("createdAt") or 0),
+                    "updatedAt": int(ckpt.get("updatedAt") or 0),
+                    "options": ckpt.get("options") or {},
+                    "conversationsDone": int(ckpt.get("conversationsDone") or 0),
+                    "conversationsTotal": len(ckpt.get("targetUsernames") or []),
+                    "messagesExported": int(ckpt.get("messagesExported") or 0),
+                }
+            )
+        out.sort(key=lambda x: x["updatedAt"], reverse=True)
+        return out
+
     def _run_job_safe(self, job: ExportJob, account_dir: Path) -> None:
         try:
             self._run_job(job, account_dir)
@@ -2612,13 +2840,22 @@ class ChatExportManager:
         local_types = None
         estimate_local_types = None
 
-        target_usernames = _resolve_export_targets(
-            account_dir=account_dir,
-            scope=scope,
-            usernames=list(opts.get("usernames") or []),
-            include_hidden=include_hidden,
-            include_official=include_official,
-        )
+        resume_from = str(opts.get("resumeFrom") or "").strip()
+        resume = _read_export_checkpoint(resume_from) if resume_from else None
+        if resume_from and resume is None:
+            raise ValueError(f"No resumable export found: {resume_from}")
+
+        if resume is not None:
+            # Same conversation list (and therefore the same conversation dir indexes) as the interrupted run.
+            target_usernames = [str(u or "") for u in (resume.get("targetUsernames") or [])]
+        else:
+            target_usernames = _resolve_export_targets(
+                account_dir=account_dir,
+                scope=scope,
+                usernames=list(opts.get("usernames") or []),
+                include_hidden=include_hidden,
+                include_official=include_official,
+            )
         if not target_usernames:
             raise ValueError("No target conversations to export.")
 
@@ -2635,6 +2872,8 @@ class ChatExportManager:
             base_name = _safe_name(base_name, max_len=120) or f"wechat_chat_export_{account_dir.name}_{ts}_{job.export_id}.zip"
             if not base_name.lower().endswith(".zip"):
                 base_name += ".zip"
+        if resume is not None and str(resume.get("finalName") or "").strip():
+            base_name = str(resume.get("finalName")).strip()
 
         final_zip = (exports_root / base_name).resolve()
         tmp_zip = (exports_root / f".{base_name}.{job.export_id}.part").resolve()
@@ -2716,11 +2955,46 @@ class ChatExportManager:
                 except Exception:
                     pass
 
-            with zipfile.ZipFile(tmp_zip, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            with zipfile.ZipFile(tmp_zip, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as raw_zf:
+                # Media members are stored, text deflated; see export_zip for the profiles.
+                zf = ExportZip(raw_zf, profile=opts.get("zipProfile"))
                 html_index_items: list[dict[str, Any]] = []
                 self_avatar_path = ""
                 session_items: list[dict[str, Any]] = []
                 remote_written: dict[str, str] = {}
+                done_before = 0
+                committed_messages = 0
+                if resume is not None:
+                    old_part = Path(str(resume.get("partPath") or ""))
+                    copied = None
+                    if old_part.is_file():
+                        copied = zf.copy_entries_from(old_part, int(resume.get("entriesCommitted") or 0))
+                    if copied is None:
+                        logger.warning(f"export resume: {resume_from} part zip unusable, starting over")
+                    else:
+                        kept = set(copied)
+                        done_before = int(resume.get("conversationsDone") or 0)
+                        committed_messages = int(resume.get("messagesExported") or 0)
+                        media_written.update({k: v for k, v in (resume.get("mediaWritten") or {}).items() if v in kept})
+                        avatar_written.update(
+                            {k: v for k, v in (resume.get("avatarWritten") or {}).items() if (not v) or v in kept}
+                        )
+                        remote_written.update(
+                            {k: v for k, v in (resume.get("remoteWritten") or {}).items() if (not v) or v in kept}
+                        )
+                        html_index_items.extend(resume.get("htmlIndexItems") or [])
+                        report["missingMedia"].extend(resume.get("missingMedia") or [])
+                        report["errors"].extend(resume.get("errors") or [])
+                        report["resumedFrom"] = resume_from
+                        with self._lock:
+                            job.progress.conversations_done = done_before
+                            job.progress.messages_exported = committed_messages
+                            job.progress.media_copied = len([v for v in media_written.values() if v])
+                            job.progress.media_missing = len(report["missingMedia"])
+                        logger.info(
+                            f"export resume: {job.export_id} continues {resume_from} after {done_before} conversations "
+                            f"({len(copied)} zip members reused)"
+                        )
                 remote_download_enabled = bool(download_remote_media) and (export_format == "html") and include_media and (not privacy_mode)
                 if export_format == "html":
                     ui_public_dir = _resolve_ui_public_dir()
@@ -2849,22 +3123,63 @@ class ChatExportManager:
                             }
                         )
 
-                for idx, conv_username in enumerate(target_usernames, start=1):
-                    if self._should_cancel(job):
+                # Conversations render on a small thread pool into per-conversation staging areas; this thread is
+                # the only zip writer and appends the staged entries strictly in conversation order.
+                stage_root = Path(tempfile.mkdtemp(prefix=f"wechat_chat_export_{job.export_id}_"))
+                stage_claimed: set[str] = set()
+                stage_claim_lock = threading.Lock()
+                conn_local = threading.local()
+                worker_conns: list[sqlite3.Connection] = []
+
+                def thread_conns() -> tuple[Optional[sqlite3.Connection], Optional[sqlite3.Connection]]:
+                    # sqlite3 connections belong to the thread that opened them: each render worker opens its own.
+                    conns = getattr(conn_local, "conns", None)
+                    if conns is not None:
+                        return conns
+                    w_res: Optional[sqlite3.Connection] = None
+                    w_head: Optional[sqlite3.Connection] = None
+                    try:
+                        if resource_conn is not None:
+                            w_res = sqlite3.connect(str(message_resource_db_path), check_same_thread=False)
+                            w_res.row_factory = sqlite3.Row
+                    except Exception:
+                        w_res = None
+                    try:
+                        if head_image_conn is not None:
+                            w_head = sqlite3.connect(str(head_image_db_path), check_same_thread=False)
+                    except Exception:
+                        w_head = None
+                    with stage_claim_lock:
+                        worker_conns.extend([c for c in (w_res, w_head) if c is not None])
+                    conns = (w_res, w_head)
+                    conn_local.conns = conns
+                    return conns
+
+                # "Current conversation" progress follows the ordered writer, not whichever render thread ran
+                # last; render threads only report into it while their conversation is the one being waited on.
+                estimated_totals: dict[int, int] = {}
+
+                def show_current_conversation(idx: int, conv_username: str) -> None:
+                    with self._lock:
+                        job.progress.current_conversation_index = idx
+                        job.progress.current_conversation_username = conv_username
+                        job.progress.current_conversation_name = _pick_display_name(
+                            contact_row_cache.get(conv_username), conv_username
+                        )
+                        job.progress.current_conversation_messages_exported = 0
+                        job.progress.current_conversation_messages_total = estimated_totals.pop(idx, 0)
+
+                def render_conversation(idx: int, conv_username: str) -> dict[str, Any]:
+                    if job.cancel_requested:
                         raise _JobCancelled()
+                    w_resource_conn, w_head_image_conn = thread_conns()
 
                     conv_row = contact_row_cache.get(conv_username)
                     conv_name = _pick_display_name(conv_row, conv_username)
                     conv_is_group = bool(conv_username.endswith("@chatroom"))
 
                     conv_dir = f"conversations/{_conversation_dir_name(idx, conv_name, conv_username, conv_is_group, privacy_mode)}"
-
-                    with self._lock:
-                        job.progress.current_conversation_index = idx
-                        job.progress.current_conversation_username = conv_username
-                        job.progress.current_conversation_name = conv_name
-                        job.progress.current_conversation_messages_exported = 0
-                        job.progress.current_conversation_messages_total = 0
+                    stage = _StagedZip(stage_root / f"{idx:06d}", claimed=stage_claimed, claim_lock=stage_claim_lock)
 
                     try:
                         estimated_total = _estimate_conversation_message_count(
@@ -2878,27 +3193,30 @@ class ChatExportManager:
                         estimated_total = 0
 
                     with self._lock:
-                        job.progress.current_conversation_messages_total = int(estimated_total)
+                        if job.progress.current_conversation_index == idx:
+                            job.progress.current_conversation_messages_total = int(estimated_total)
+                        else:
+                            estimated_totals[idx] = int(estimated_total)
 
                     chat_id = None
                     try:
-                        if resource_conn is not None:
-                            chat_id = _resource_lookup_chat_id(resource_conn, conv_username)
+                        if w_resource_conn is not None:
+                            chat_id = _resource_lookup_chat_id(w_resource_conn, conv_username)
                     except Exception:
                         chat_id = None
 
                     conv_avatar_path = ""
                     if not privacy_mode:
                         conv_avatar_path = _materialize_avatar(
-                            zf=zf,
-                            head_image_conn=head_image_conn,
+                            zf=stage,
+                            head_image_conn=w_head_image_conn,
                             username=conv_username,
                             avatar_written=avatar_written,
                         )
 
                     if export_format == "txt":
                         exported_count = _write_conversation_txt(
-                            zf=zf,
+                            zf=stage,
                             conv_dir=conv_dir,
                             account_dir=account_dir,
                             conv_username=conv_username,
@@ -2909,9 +3227,9 @@ class ChatExportManager:
                             end_time=et,
                             want_types=want_types,
                             local_types=local_types,
-                            resource_conn=resource_conn,
+                            resource_conn=w_resource_conn,
                             resource_chat_id=chat_id,
-                            head_image_conn=head_image_conn,
+                            head_image_conn=w_head_image_conn,
                             resolve_display_name=resolve_display_name,
                             privacy_mode=privacy_mode,
                             include_media=include_media,
@@ -2926,7 +3244,7 @@ class ChatExportManager:
                         )
                     elif export_format == "html":
                         exported_count = _write_conversation_html(
-                            zf=zf,
+                            zf=stage,
                             conv_dir=conv_dir,
                             account_dir=account_dir,
                             conv_username=conv_username,
@@ -2942,9 +3260,9 @@ class ChatExportManager:
                             end_time=et,
                             want_types=want_types,
                             local_types=local_types,
-                            resource_conn=resource_conn,
+                            resource_conn=w_resource_conn,
                             resource_chat_id=chat_id,
-                            head_image_conn=head_image_conn,
+                            head_image_conn=w_head_image_conn,
                             resolve_display_name=resolve_display_name,
                             privacy_mode=privacy_mode,
                             include_media=include_media,
@@ -2959,7 +3277,7 @@ class ChatExportManager:
                         )
                     else:
                         exported_count = _write_conversation_json(
-                            zf=zf,
+                            zf=stage,
                             conv_dir=conv_dir,
                             account_dir=account_dir,
                             conv_username=conv_username,
@@ -2970,9 +3288,9 @@ class ChatExportManager:
                             end_time=et,
                             want_types=want_types,
                             local_types=local_types,
-                            resource_conn=resource_conn,
+                            resource_conn=w_resource_conn,
                             resource_chat_id=chat_id,
-                            head_image_conn=head_image_conn,
+                            head_image_conn=w_head_image_conn,
                             resolve_display_name=resolve_display_name,
                             privacy_mode=privacy_mode,
                             include_media=include_media,
@@ -2995,14 +3313,112 @@ class ChatExportManager:
                         "exportedAt": _now_iso(),
                         "messageCount": int(exported_count),
                     }
-                    zf.writestr(f"{conv_dir}/meta.json", json.dumps(meta, ensure_ascii=False, indent=2))
-                    if export_format == "html":
-                        html_index_items.append({"convDir": conv_dir, "meta": meta})
+                    return {"stage": stage, "convDir": conv_dir, "meta": meta}
+
+                # Checkpoint = conversations fully replayed into the zip (always a prefix, the writer is ordered)
+                # plus the number of zip members they account for; a later job copies exactly those members.
+                stage_claimed.update(zf.names())
+                committed = {"done": done_before, "entries": zf.entry_count, "messages": committed_messages}
+                last_checkpoint_at = [0.0]
+
+                def save_checkpoint(status: str, *, force: bool = False) -> None:
+                    now = time.time()
+                    if not force and now - last_checkpoint_at[0] < _CHECKPOINT_INTERVAL_SEC:
+                        return
+                    last_checkpoint_at[0] = now
+                    try:
+                        zf.flush()
+                        kept = set(zf.names(committed["entries"]))
+                        done_users = set(target_usernames[: committed["done"]])
+                        _write_export_checkpoint(
+                            job.export_id,
+                            {
+                                "schemaVersion": 1,
+                                "exportId": job.export_id,
+                                "account": account_dir.name,
+                                "status": status,
+                                "createdAt": int(job.created_at),
+                                "updatedAt": int(now),
+                                "options": {k: v for k, v in opts.items() if k != "resumeFrom"},
+                                "partPath": str(tmp_zip),
+                                "finalName": base_name,
+                                "targetUsernames": list(target_usernames),
+                                "conversationsDone": committed["done"],
+                                "entriesCommitted": committed["entries"],
+                                "messagesExported": committed["messages"],
+                                "mediaWritten": {k: v for k, v in list(media_written.items()) if v in kept},
+                                "avatarWritten": {
+                                    k: v for k, v in list(avatar_written.items()) if (not v) or v in kept
+                                },
+                                "remoteWritten": {
+                                    k: v for k, v in list(remote_written.items()) if (not v) or v in kept
+                                },
+                                "htmlIndexItems": list(html_index_items),
+                                "missingMedia": [
+                                    m for m in list(report["missingMedia"]) if m.get("conversation") in done_users
+                                ],
+                                "errors": list(report["errors"]),
+                            },
+                        )
+                    except Exception as e:
+                        logger.warning(f"export checkpoint failed: {job.export_id}: {e}")
+
+                save_checkpoint("running", force=True)
+                if resume_from:
+                    # Everything worth keeping from the interrupted run now lives in this job's part zip.
+                    _discard_export_checkpoint(resume_from)
+
+                workers = max(1, min(_export_workers(), len(target_usernames)))
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"chat-export-{job.export_id}")
+                pending: dict[int, Future] = {}
+                next_submit = done_before
+                try:
+                    for i in range(done_before, len(target_usernames)):
+                        while next_submit < len(target_usernames) and len(pending) < workers * 2:
+                            pending[next_submit] = pool.submit(
+                                render_conversation, next_submit + 1, target_usernames[next_submit]
+                            )
+                            next_submit += 1
+                        if self._should_cancel(job):
+                            raise _JobCancelled()
 
-                    with self._lock:
-                        job.progress.current_conversation_messages_exported = int(exported_count)
-                        job.progress.current_conversation_messages_total = int(exported_count)
-                        job.progress.conversations_done += 1
+                        show_current_conversation(i + 1, target_usernames[i])
+                        rendered = pending.pop(i).result()
+                        stage = rendered["stage"]
+                        try:
+                            stage.replay_into(zf)
+                        finally:
+                            stage.discard()
+
+                        conv_dir = rendered["convDir"]
+                        meta = rendered["meta"]
+                        zf.writestr(f"{conv_dir}/meta.json", json.dumps(meta, ensure_ascii=False, indent=2))
+                        if export_format == "html":
+                            html_index_items.append({"convDir": conv_dir, "meta": meta})
+
+                        with self._lock:
+                            job.progress.current_conversation_messages_exported = int(meta["messageCount"])
+                            job.progress.current_conversation_messages_total = int(meta["messageCount"])
+                            job.progress.conversations_done += 1
+
+                        committed["done"] = i + 1
+                        committed["entries"] = zf.entry_count
+                        committed["messages"] += int(meta["messageCount"])
+                        save_checkpoint("running")
+                except _JobCancelled:
+                    save_checkpoint("cancelled", force=True)
+                    raise
+                except Exception:
+                    save_checkpoint("error", force=True)
+                    raise
+                finally:
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    for c in worker_conns:
+                        try:
+                            c.close()
+                        except Exception:
+                            pass
+                    shutil.rmtree(stage_root, ignore_errors=True)
 
                 if export_format == "html":
                     def esc_text(v: Any) -> str:
@@ -3091,32 +3507,50 @@ class ChatExportManager:
                         "downloadRemoteMedia": bool(download_remote_media),
                         "htmlPageSize": int(html_page_size) if export_format == "html" else None,
                         "privacyMode": privacy_mode,
+                        "zipProfile": zf.profile,
                     },
                     "stats": {
                         "conversations": len(target_usernames),
                         "messagesExported": job.progress.messages_exported,
                         "mediaCopied": job.progress.media_copied,
                         "mediaMissing": job.progress.media_missing,
+                        "zip": zf.stats(),
                     },
                     "accountsAvailable": _list_decrypted_accounts(),
                 }
                 zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
                 zf.writestr("report.json", json.dumps(report, ensure_ascii=False, indent=2))
+                zip_stats = zf.stats()
+                logger.info(
+                    "[chat_export] zip %s profile=%s bytesIn=%s bytesOut=%s seconds=%s",
+                    job.export_id,
+                    zip_stats["profile"],
+                    zip_stats["bytesIn"],
+                    zip_stats["bytesOut"],
+                    zip_stats["seconds"],
+                )
 
             if final_zip.exists():
                 final_zip = (exports_root / f"{final_zip.stem}_{job.export_id}{final_zip.suffix}").resolve()
             tmp_zip.replace(final_zip)
 
+            _discard_export_checkpoint(job.export_id, delete_part=False)
+
             with self._lock:
                 job.status = "done"
                 job.zip_path = final_zip
+                job.zip_stats = zip_stats
                 job.finished_at = time.time()
         except _JobCancelled:
-            try:
-                if tmp_zip.exists():
-                    tmp_zip.unlink()
-            except Exception:
-                pass
+            ckpt = _read_export_checkpoint(job.export_id)
+            if not ckpt or int(ckpt.get("conversationsDone") or 0) <= 0:
+                # Nothing worth resuming.
+                _discard_export_checkpoint(job.export_id)
+                try:
+                    if tmp_zip.exists():
+                        tmp_zip.unlink()
+                except Exception:
+                    pass
             with self._lock:
                 job.status = "cancelled"
                 job.finished_at = time.time()
@@ -3201,13 +3635,17 @@ def _estimate_conversation_message_count(
     end_time: Optional[int],
     local_types: Optional[set[int]] = None,
 ) -> int:
+    if not local_types and start_time is None and end_time is None:
+        # Whole-conversation exports: the routing index already carries per-table row counts.
+        try:
+            return sum(int(r.row_count) for r in get_message_routes(account_dir, conv_username))
+        except Exception:
+            pass
+
     total = 0
-    for db_path in _iter_message_db_paths(account_dir):
+    for db_path, table in resolve_conversation_tables(account_dir, conv_username):
         conn = sqlite3.connect(str(db_path))
         try:
-            table = _resolve_msg_table_name(conn, conv_username)
-            if not table:
-                continue
             quoted = _quote_ident(table)
             where = []
             params: list[Any] = []
@@ -3260,14 +3698,10 @@ def _iter_rows_for_conversation(
 
     account_wxid = account_dir.name
 
-    def iter_db(db_path: Path) -> Iterable[_Row]:
+    def iter_db(db_path: Path, table_name: str) -> Iterable[_Row]:
         conn = sqlite3.connect(str(db_path))
         conn.row_factory = sqlite3.Row
         try:
-            table_name = _resolve_msg_table_name(conn, conv_username)
-            if not table_name:
-                return
-
             # Force sqlite3 to return TEXT as raw bytes for this query, so we can zstd-decompress
             # compress_content reliably (and avoid losing binary payloads).
             conn.text_factory = bytes
@@ -3370,7 +3804,7 @@ def _iter_rows_for_conversation(
             except Exception:
                 pass
 
-    streams = [iter_db(p) for p in db_paths]
+    streams = [iter_db(p, t) for p, t in resolve_conversation_tables(account_dir, conv_username, db_paths=db_paths)]
 
     def sort_key(r: _Row) -> tuple[int, int, int]:
         return (int(r.create_time or 0), int(r.sort_seq or 0), int(r.local_id or 0))
@@ -3856,7 +4290,7 @@ def _write_conversation_json(
 
     # NOTE: Do not keep an entry handle opened while also writing other entries (avatars/media).
     # zipfile forbids interleaving writes; stream to a temp file then add it to zip at the end.
-    with tempfile.TemporaryDirectory(prefix="wechat_chat_export_") as tmp_dir:
+    with tempfile.TemporaryDirectory(prefix="wechat_chat_export_", dir=_zip_tmp_dir(zf)) as tmp_dir:
         tmp_path = Path(tmp_dir) / "messages.json"
         with open(tmp_path, "w", encoding="utf-8", newline="\n") as tw:
             tw.write("{\n")
@@ -3966,7 +4400,8 @@ def _write_conversation_json(
                 exported += 1
                 with lock:
                     job.progress.messages_exported += 1
-                    job.progress.current_conversation_messages_exported = exported
+                    if job.progress.current_conversation_username == conv_username:
+                        job.progress.current_conversation_messages_exported = exported
 
                 if scanned % 500 == 0 and job.cancel_requested:
                     raise _JobCancelled()
@@ -4049,7 +4484,7 @@ def _write_conversation_txt(
         return alias
 
     # Same as JSON: write to temp file first to avoid zip interleaving writes.
-    with tempfile.TemporaryDirectory(prefix="wechat_chat_export_") as tmp_dir:
+    with tempfile.TemporaryDirectory(prefix="wechat_chat_export_", dir=_zip_tmp_dir(zf)) as tmp_dir:
         tmp_path = Path(tmp_dir) / "messages.txt"
         with open(tmp_path, "w", encoding="utf-8", newline="\n") as tw:
             if privacy_mode:
@@ -4141,7 +4576,8 @@ def _write_conversation_txt(
                 exported += 1
                 with lock:
                     job.progress.messages_exported += 1
-                    job.progress.current_conversation_messages_exported = exported
+                    if job.progress.current_conversation_username == conv_username:
+                        job.progress.current_conversation_messages_exported = exported
 
                 if scanned % 500 == 0 and job.cancel_requested:
                     raise _JobCancelled()
@@ -4580,7 +5016,7 @@ def _write_conversation_html(
         page_size = 0
 
     # NOTE: write to a temp file first to avoid zip interleaving writes.
-    with tempfile.TemporaryDirectory(prefix="wechat_chat_export_") as tmp_dir:
+    with tempfile.TemporaryDirectory(prefix="wechat_chat_export_", dir=_zip_tmp_dir(zf)) as tmp_dir:
         tmp_path = Path(tmp_dir) / "messages.html"
         pages_frag_dir = Path(tmp_dir) / "pages_fragments"
         page_frag_paths: list[Path] = []
@@ -4832,7 +5268,8 @@ def _write_conversation_html(
                 exported += 1
                 with lock:
                     job.progress.messages_exported += 1
-                    job.progress.current_conversation_messages_exported = exported
+                    if job.progress.current_conversation_username == conv_username:
+                        job.progress.current_conversation_messages_exported = exported
                 if page_size > 0:
                     page_msg_count += 1
                     if page_msg_count >= page_size:
@@ -6025,30 +6462,22 @@ def _materialize_voice(
     if not media_db_path.exists():
         return "", False
 
-    conn = sqlite3.connect(str(media_db_path))
-    try:
-        row = conn.execute(
-            "SELECT voice_data FROM VoiceInfo WHERE svr_id = ? ORDER BY create_time DESC LIMIT 1",
-            (int(server_id),),
-        ).fetchone()
-    except Exception:
-        row = None
-    finally:
-        conn.close()
-
-    if not row or row[0] is None:
+    data = load_voice_data(media_db_path, int(server_id))
+    if not data:
         return "", False
 
-    data = bytes(row[0]) if isinstance(row[0], (memoryview, bytearray)) else row[0]
-    if not isinstance(data, (bytes, bytearray)):
-        data = bytes(data)
-
-    payload, ext, _media_type = _convert_silk_to_browser_audio(data, preferred_format="mp3")
-    if not payload:
+    # Shares the on-disk transcode cache with the voice endpoint, so re-exports skip ffmpeg/pilk.
+    voice = transcode_voice_cached(
+        media_db_path.parent.name, int(server_id), data, converter=_convert_silk_to_browser_audio
+    )
+    if voice.path is None and not voice.payload:
         return "", False
 
-    arc = f"media/voices/voice_{int(server_id)}.{ext}"
-    zf.writestr(arc, payload)
+    arc = f"media/voices/voice_{int(server_id)}.{voice.ext}"
+    if voice.path is not None:
+        zf.write(str(voice.path), arc)
+    else:
+        zf.writestr(arc, voice.payload)
     media_written[key] = arc
     return arc, True
 
@@ -14,6 +14,7 @@ from fastapi import HTTPException
 
 from .app_paths import get_output_databases_dir
 from .logging_config import get_logger
+from .sqlite_pool import connect_readonly
 
 try:
     import zstandard as zstd  # type: ignore
@@ -282,7 +283,7 @@ def _query_head_image_usernames(head_image_db_path: Path, usernames: list[str])
     if not head_image_db_path.exists():
         return set()
 
-    conn = sqlite3.connect(str(head_image_db_path))
+    conn = connect_readonly(head_image_db_path)
     try:
         placeholders = ",".join(["?"] * len(uniq))
         rows = conn.execute(
@@ -1581,7 +1582,7 @@ def _load_latest_message_previews(account_dir: Path, usernames: list[str]) -> di
 
     session_db_path = Path(account_dir) / "session.db"
     if session_db_path.exists() and remaining:
-        sconn = sqlite3.connect(str(session_db_path))
+        sconn = connect_readonly(session_db_path)
         sconn.row_factory = sqlite3.Row
         try:
             uniq = list(dict.fromkeys([u for u in remaining if u]))
@@ -1626,7 +1627,7 @@ def _load_latest_message_previews(account_dir: Path, usernames: list[str]) -> di
         )
 
     for db_path in db_paths:
-        conn = sqlite3.connect(str(db_path))
+        conn = connect_readonly(db_path)
         conn.row_factory = sqlite3.Row
         try:
             rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
@@ -1774,7 +1775,7 @@ def _load_contact_rows(contact_db_path: Path, usernames: list[str]) -> dict[str,
 
     result: dict[str, sqlite3.Row] = {}
 
-    conn = sqlite3.connect(str(contact_db_path))
+    conn = connect_readonly(contact_db_path)
     conn.row_factory = sqlite3.Row
     try:
         def query_table(table: str, targets: list[str]) -> None:
@@ -1926,7 +1927,7 @@ def _load_group_nickname_map_from_contact_db(
         return best
 
     try:
-        conn = sqlite3.connect(str(contact_db_path))
+        conn = connect_readonly(contact_db_path)
     except Exception:
         return {}
 
@@ -2015,7 +2016,7 @@ def _load_usernames_by_display_names(contact_db_path: Path, names: list[str]) ->
     placeholders = ",".join(["?"] * len(uniq))
     hits: dict[str, set[str]] = {}
 
-    conn = sqlite3.connect(str(contact_db_path))
+    conn = connect_readonly(contact_db_path)
     conn.row_factory = sqlite3.Row
     try:
         def query_table(table: str) -> None:
@@ -1,12 +1,18 @@
+import multiprocessing
 import os
+import queue
+import re
 import sqlite3
 import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from pathlib import Path
 from typing import Any, Optional
 
 from .chat_helpers import (
+    _build_fts_query,
     _decode_sqlite_text,
+    _make_search_tokens,
     _quote_ident,
     _resolve_msg_table_name_by_map,
     _row_to_search_hit,
@@ -18,7 +24,9 @@ from .logging_config import get_logger
 
 logger = get_logger(__name__)
 
-_SCHEMA_VERSION = 1
+# v2: rowid-linked message keys + per-table high-water marks; v3: pluggable tokenizer (meta "tokenizer");
+# v4: `message_meta` B-tree side table (time/sender/conversation range scans without touching FTS content).
+_SCHEMA_VERSION = 4
 _INDEX_DB_NAME = "chat_search_index.db"
 _INDEX_DB_TMP_NAME = "chat_search_index.tmp.db"
 _LEGACY_INDEX_DB_NAME = "message_fts.db"
@@ -26,11 +34,176 @@ _LEGACY_INDEX_DB_NAME = "message_fts.db"
 _BUILD_LOCK = threading.Lock()
 _BUILD_STATE: dict[str, dict[str, Any]] = {}
 
+# Serializes writers of the *live* index file (incremental appends, targeted re-index, final swap).
+_WRITE_LOCKS: dict[str, threading.Lock] = {}
+_WRITE_LOCKS_GUARD = threading.Lock()
+
+_HWM_META_PREFIX = "hwm:"
+
+# Tokenizer modes. `message_fts.text` always keeps a readable copy (wrapped cards read it):
+# - "bigram": compact text (UNINDEXED) + overlapping 2-char tokens in `grams` (unicode61, phrase match).
+# - "trigram": compact text with FTS5's trigram tokenizer (substring match; SQLite >= 3.34).
+# - "char": legacy single characters joined by spaces with unicode61 (phrase match).
+# "Compact" = lowercased with whitespace removed.
+TOKENIZER_BIGRAM = "bigram"
+TOKENIZER_TRIGRAM = "trigram"
+TOKENIZER_CHAR = "char"
+_TOKENIZERS = (TOKENIZER_BIGRAM, TOKENIZER_TRIGRAM, TOKENIZER_CHAR)
+_FTS5_TOKENIZE = {TOKENIZER_BIGRAM: "unicode61", TOKENIZER_TRIGRAM: "trigram", TOKENIZER_CHAR: "unicode61"}
+_TRIGRAM_SUPPORTED: Optional[bool] = None
+# Runs of characters unicode61 keeps inside a token (letters/digits/CJK); everything else separates grams.
+_WORD_RUN_RE = re.compile(r"[^\W_]+")
+
+# Conversations per process-pool scan task during a full build; tasks are also capped by message rows
+# (large chats are split into local_id windows) so one worker never returns an unbounded row list.
+_INDEX_TASK_CONVERSATIONS = 64
+_INDEX_TASK_ROWS = 20000
+
+_INSERT_FTS_SQL = (
+    "INSERT INTO message_fts("
+    "rowid, text, username, render_type, create_time, sort_seq, local_id, server_id, local_type, "
+    "db_stem, table_name, sender_username, is_hidden, is_official, grams"
+    ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_INSERT_META_SQL = (
+    "INSERT INTO message_meta("
+    "fts_rowid, username, sender_username, create_time, sort_seq, local_id, local_type, render_type, "
+    "db_stem, table_name, is_hidden, is_official"
+    ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Same "seconds even if the source stored ms" normalization the wrapped cards apply to FTS rows.
+_FTS_TS_EXPR = (
+    "CASE "
+    "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
+    "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
+    "ELSE CAST(create_time AS INTEGER) "
+    "END"
+)
+
 
 def _account_key(account_dir: Path) -> str:
     return str(account_dir.name)
 
 
+def _write_lock(account_key: str) -> threading.Lock:
+    with _WRITE_LOCKS_GUARD:
+        lock = _WRITE_LOCKS.get(account_key)
+        if lock is None:
+            lock = threading.Lock()
+            _WRITE_LOCKS[account_key] = lock
+        return lock
+
+
+def _hwm_meta_key(db_stem: str, table_name: str) -> str:
+    return f"{_HWM_META_PREFIX}{db_stem}:{table_name}"
+
+
+def _trigram_supported() -> bool:
+    global _TRIGRAM_SUPPORTED
+    if _TRIGRAM_SUPPORTED is None:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+            _TRIGRAM_SUPPORTED = True
+        except Exception:
+            _TRIGRAM_SUPPORTED = False
+        finally:
+            conn.close()
+    return bool(_TRIGRAM_SUPPORTED)
+
+
+def get_chat_search_tokenizer_mode() -> str:
+    """Tokenizer new index builds use: `WECHAT_TOOL_SEARCH_TOKENIZER` (bigram|trigram|char), default bigram."""
+    want = str(os.environ.get("WECHAT_TOOL_SEARCH_TOKENIZER", "") or "").strip().lower()
+    if want not in _TOKENIZERS:
+        want = TOKENIZER_BIGRAM
+    if want == TOKENIZER_TRIGRAM and not _trigram_supported():
+        return TOKENIZER_CHAR
+    return want
+
+
+def get_chat_search_index_tokenizer(conn: sqlite3.Connection) -> str:
+    """Tokenizer an open index was built with (indexes without the meta key are legacy char-tokenized)."""
+    try:
+        r = conn.execute("SELECT value FROM meta WHERE key='tokenizer' LIMIT 1").fetchone()
+    except Exception:
+        r = None
+    mode = str((r[0] if r else "") or "").strip().lower()
+    return mode if mode in _TOKENIZERS else TOKENIZER_CHAR
+
+
+def _to_index_token_text(s: str, tokenizer: str) -> str:
+    """Normalize text into the `message_fts.text` form for `tokenizer` (lowercased, whitespace dropped)."""
+    if tokenizer == TOKENIZER_CHAR:
+        return _to_char_token_text(s)
+    return "".join(ch for ch in str(s or "").strip().lower() if not ch.isspace())
+
+
+def _iter_bigram_runs(compact: str) -> list[list[str]]:
+    """Per word run: overlapping bigrams followed by the run's last char (so 1-char prefix queries hit every position)."""
+    out: list[list[str]] = []
+    for run in _WORD_RUN_RE.findall(compact):
+        grams = [run[i : i + 2] for i in range(len(run) - 1)]
+        grams.append(run[-1])
+        out.append(grams)
+    return out
+
+
+def _to_index_grams(token_text: str, tokenizer: str) -> str:
+    """`message_fts.grams` for a row whose `text` is `token_text` (only populated in bigram mode)."""
+    if tokenizer != TOKENIZER_BIGRAM:
+        return ""
+    return " ".join(g for grams in _iter_bigram_runs(token_text) for g in grams)
+
+
+def build_chat_search_match(q: str, tokenizer: str) -> tuple[str, list[Any]]:
+    """
+    Build the WHERE fragment (and params) matching every whitespace-separated token of `q` as a substring.
+
+    Bigram mode matches each word run as a phrase of its bigrams (1-char runs as a prefix query). Trigram mode
+    can only use the index for tokens of 3+ characters; shorter tokens fall back to `instr()` over the compact
+    text. Returns ("", []) when `q` has no usable token.
+    """
+
+    if tokenizer == TOKENIZER_CHAR:
+        fts_query = _build_fts_query(q)
+        return ("message_fts MATCH ?", [fts_query]) if fts_query else ("", [])
+
+    if tokenizer == TOKENIZER_BIGRAM:
+        parts: list[str] = []
+        for tok in _make_search_tokens(q):
+            clean = _to_index_token_text(str(tok or "").replace('"', ""), TOKENIZER_BIGRAM)
+            for grams in _iter_bigram_runs(clean):
+                if len(grams) == 1:
+                    parts.append(f"\"{grams[0]}\"*")
+                else:
+                    # The trailing single char is implied by the last bigram.
+                    parts.append("\"" + " ".join(grams[:-1]) + "\"")
+        return ("message_fts MATCH ?", [" AND ".join(parts)]) if parts else ("", [])
+
+    long_parts: list[str] = []
+    short_tokens: list[str] = []
+    for tok in _make_search_tokens(q):
+        clean = _to_index_token_text(str(tok or "").replace('"', ""), TOKENIZER_TRIGRAM)
+        if not clean:
+            continue
+        if len(clean) >= 3:
+            long_parts.append(f"\"{clean}\"")
+        else:
+            short_tokens.append(clean)
+
+    where_parts: list[str] = []
+    params: list[Any] = []
+    if long_parts:
+        where_parts.append("message_fts MATCH ?")
+        params.append(" AND ".join(long_parts))
+    for tok in short_tokens:
+        where_parts.append("instr(\"text\", ?) > 0")
+        params.append(tok)
+    return " AND ".join(where_parts), params
+
+
 def _index_db_path(account_dir: Path) -> Path:
     return account_dir / _INDEX_DB_NAME
 
@@ -100,7 +273,9 @@ def _inspect_index(index_path: Path) -> dict[str, Any]:
         has_fts = "message_fts" in names
 
         schema_version: Optional[int] = None
+        tokenizer = TOKENIZER_CHAR
         if has_meta:
+            tokenizer = get_chat_search_index_tokenizer(conn)
             try:
                 r = conn.execute("SELECT value FROM meta WHERE key='schema_version' LIMIT 1").fetchone()
                 if r and r[0] is not None:
@@ -109,6 +284,9 @@ def _inspect_index(index_path: Path) -> dict[str, Any]:
                 schema_version = None
 
         ready = bool(has_fts and (schema_version is None or schema_version >= _SCHEMA_VERSION))
+        # Switching tokenizer mode migrates the index: the old one stays usable only until rebuilt.
+        if ready and schema_version is not None and tokenizer != get_chat_search_tokenizer_mode():
+            ready = False
 
         return {
             "exists": True,
@@ -116,6 +294,7 @@ def _inspect_index(index_path: Path) -> dict[str, Any]:
             "hasFtsTable": bool(has_fts),
             "hasMetaTable": bool(has_meta),
             "schemaVersion": schema_version,
+            "tokenizer": tokenizer,
         }
     except Exception:
         return {
@@ -146,6 +325,7 @@ def get_chat_search_index_status(account_dir: Path) -> dict[str, Any]:
             "hasFtsTable": bool(inspect.get("hasFtsTable")),
             "hasMetaTable": bool(inspect.get("hasMetaTable")),
             "schemaVersion": inspect.get("schemaVersion"),
+            "tokenizer": inspect.get("tokenizer"),
             "meta": meta,
             "build": state,
         },
@@ -214,7 +394,7 @@ def _load_sessions_for_index(account_dir: Path) -> dict[str, dict[str, Any]]:
     return out
 
 
-def _init_index_db(conn: sqlite3.Connection) -> None:
+def _init_index_db(conn: sqlite3.Connection, tokenizer: str) -> None:
     # NOTE: This index DB is built as a temporary file and then atomically swapped in.
     # Using WAL here would create `-wal/-shm` side files that are *not* swapped together,
     # which can lead to a final DB missing schema/data (e.g. "no such table: message_fts").
@@ -224,9 +404,9 @@ def _init_index_db(conn: sqlite3.Connection) -> None:
 
     conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
     conn.execute(
-        """
+        f"""
         CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
-            text,
+            text{" UNINDEXED" if tokenizer == TOKENIZER_BIGRAM else ""},
             username UNINDEXED,
             render_type UNINDEXED,
             create_time UNINDEXED,
@@ -239,14 +419,160 @@ def _init_index_db(conn: sqlite3.Connection) -> None:
             sender_username UNINDEXED,
             is_hidden UNINDEXED,
             is_official UNINDEXED,
-            tokenize='unicode61'
+            grams,
+            columnsize=0,
+            tokenize='{_FTS5_TOKENIZE[tokenizer]}'
         )
         """
     )
+    # rowid-linked copy of the metadata columns as a normal table: FTS5 UNINDEXED columns can only be
+    # full-scanned, while these B-tree indexes turn edits/deletes, year and sender queries into range scans.
+    # `create_time` is stored as epoch seconds.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS message_meta (
+            fts_rowid INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            sender_username TEXT NOT NULL,
+            create_time INTEGER NOT NULL,
+            sort_seq INTEGER NOT NULL,
+            local_id INTEGER NOT NULL,
+            local_type INTEGER NOT NULL,
+            render_type TEXT NOT NULL,
+            db_stem TEXT NOT NULL,
+            table_name TEXT NOT NULL COLLATE NOCASE,
+            is_hidden INTEGER NOT NULL,
+            is_official INTEGER NOT NULL
+        )
+        """
+    )
+    _set_meta(conn, "schema_version", str(_SCHEMA_VERSION))
+    _set_meta(conn, "tokenizer", tokenizer)
+
+
+def _create_meta_indexes(conn: sqlite3.Connection) -> None:
+    # Created after the bulk load of a full build (cheaper than maintaining them row by row).
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_message_meta_msg ON message_meta(db_stem, table_name, local_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_message_meta_time ON message_meta(create_time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_message_meta_user_time ON message_meta(username, create_time)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_message_meta_sender_time ON message_meta(sender_username, create_time)"
+    )
+    conn.execute("ANALYZE message_meta")
+
+
+def get_chat_search_index_scan_source(conn: sqlite3.Connection, *, with_text: bool = False) -> Optional[tuple[str, str]]:
+    """
+    Pick the FROM source and epoch-seconds expression for time/sender scans over an open index.
+
+    Returns `(from_sql, ts_expr)`; column names (username, sender_username, create_time, local_type, db_stem,
+    table_name, local_id, render_type, ...) resolve the same way in either source. Uses `message_meta` when
+    present (B-tree range scans), else the legacy `message_fts` full scan. `with_text` also exposes `"text"`.
+    Returns None when the index has no message table.
+    """
+
+    try:
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+    except Exception:
+        return None
+    names = {str(r[0]) for r in rows if r and r[0]}
+    if "message_fts" not in names:
+        return None
+    if "message_meta" not in names:
+        return "message_fts", _FTS_TS_EXPR
+    if with_text:
+        return (
+            '(SELECT m.*, f."text" AS "text" FROM message_meta m JOIN message_fts f ON f.rowid = m.fts_rowid)',
+            "create_time",
+        )
+    return "message_meta", "create_time"
+
+
+def build_chat_search_query(
+    conn: sqlite3.Connection,
+    match_sql: str,
+    match_params: list[Any],
+    *,
+    username: Optional[str] = None,
+    session_type: Optional[str] = None,
+    sender: Optional[str] = None,
+    render_types: Optional[list[str]] = None,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    include_hidden: bool = True,
+    include_official: bool = True,
+) -> tuple[str, str, list[Any]]:
+    """
+    Build `(hits_sql, count_sql, params)` for a full-text search over an open index.
+
+    `hits_sql` selects (username, db_stem, table_name, local_id) newest first and ends with `LIMIT ? OFFSET ?`
+    (append both to `params`). With `message_meta` the filters and the (create_time, sort_seq, local_id)
+    ordering use its typed B-tree columns, joined to `message_fts` by rowid. Time- or sender-bounded searches
+    walk the meta indexes and probe FTS per rowid (CROSS JOIN keeps `message_meta` outer); otherwise FTS
+    drives. Legacy indexes filter `message_fts` alone. `session_type` is "group" / "single" / None.
+    """
+
+    if get_chat_search_index_scan_source(conn) == ("message_meta", "create_time"):
+        join = "CROSS JOIN" if (start_ts is not None or end_ts is not None or sender) else "JOIN"
+        from_sql = f"message_meta m {join} message_fts ON message_fts.rowid = m.fts_rowid"
+        col = {
+            c: f"m.{c}"
+            for c in ("username", "sender_username", "render_type", "create_time", "sort_seq", "local_id")
+        }
+        hidden_sql, official_sql = "m.is_hidden = 0", "m.is_official = 0"
+        select_sql = "m.username, m.db_stem, m.table_name, m.local_id"
+        order_sql = "m.create_time DESC, m.sort_seq DESC, m.local_id DESC"
+    else:
+        from_sql = "message_fts"
+        col = {c: c for c in ("username", "sender_username", "render_type")}
+        col.update({c: f"CAST({c} AS INTEGER)" for c in ("create_time", "sort_seq", "local_id")})
+        hidden_sql, official_sql = "CAST(is_hidden AS INTEGER) = 0", "CAST(is_official AS INTEGER) = 0"
+        select_sql = "username, db_stem, table_name, local_id"
+        order_sql = (
+            "CAST(create_time AS INTEGER) DESC, CAST(sort_seq AS INTEGER) DESC, CAST(local_id AS INTEGER) DESC"
+        )
+
+    where_parts: list[str] = [match_sql]
+    params: list[Any] = list(match_params)
+    if username:
+        where_parts.append(f"{col['username']} = ?")
+        params.append(str(username))
+    elif session_type == "group":
+        where_parts.append(f"{col['username']} LIKE ?")
+        params.append("%@chatroom")
+    elif session_type == "single":
+        where_parts.append(f"{col['username']} NOT LIKE ?")
+        params.append("%@chatroom")
+    if sender:
+        where_parts.append(f"{col['sender_username']} = ?")
+        params.append(str(sender))
+    if render_types:
+        types_sorted = sorted(render_types)
+        where_parts.append(f"{col['render_type']} IN ({','.join(['?'] * len(types_sorted))})")
+        params.extend(types_sorted)
+    if start_ts is not None:
+        where_parts.append(f"{col['create_time']} >= ?")
+        params.append(int(start_ts))
+    if end_ts is not None:
+        where_parts.append(f"{col['create_time']} <= ?")
+        params.append(int(end_ts))
+    if not include_hidden:
+        where_parts.append(hidden_sql)
+    if not include_official:
+        where_parts.append(official_sql)
+    from_where = f"{from_sql} WHERE {' AND '.join(where_parts)}"
+    return (
+        f"SELECT {select_sql} FROM {from_where} ORDER BY {order_sql} LIMIT ? OFFSET ?",
+        f"SELECT COUNT(*) FROM {from_where}",
+        params,
+    )
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: str) -> None:
     conn.execute(
         "INSERT INTO meta(key, value) VALUES(?, ?) "
         "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
-        ("schema_version", str(_SCHEMA_VERSION)),
+        (key, value),
     )
 
 
@@ -261,196 +587,482 @@ def _safe_begin(conn: sqlite3.Connection) -> None:
         raise
 
 
-def _build_worker(account_dir: Path, rebuild: bool) -> None:
-    key = _account_key(account_dir)
-    started = time.time()
-    tmp_path = _index_db_tmp_path(account_dir)
-    final_path = _index_db_path(account_dir)
+def _open_message_db(db_path: Path, account_name: str) -> tuple[sqlite3.Connection, dict[str, str], Optional[int]]:
+    """Open a decrypted message shard for indexing; returns (conn, lower->actual table names, my Name2Id rowid)."""
+    msg_conn = sqlite3.connect(str(db_path))
+    msg_conn.row_factory = sqlite3.Row
+    msg_conn.text_factory = bytes
 
     try:
+        trows = msg_conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+        lower_to_actual: dict[str, str] = {}
+        for x in trows:
+            if not x or x[0] is None:
+                continue
+            nm = _decode_sqlite_text(x[0]).strip()
+            if not nm:
+                continue
+            lower_to_actual[nm.lower()] = nm
+    except Exception:
+        lower_to_actual = {}
+
+    my_rowid = None
+    try:
+        r2 = msg_conn.execute(
+            "SELECT rowid FROM Name2Id WHERE user_name = ? LIMIT 1",
+            (account_name,),
+        ).fetchone()
+        if r2 is not None and r2[0] is not None:
+            my_rowid = int(r2[0])
+    except Exception:
+        my_rowid = None
+
+    return msg_conn, lower_to_actual, my_rowid
+
+
+def _iter_conversation_index_rows(
+    msg_conn: sqlite3.Connection,
+    *,
+    db_path: Path,
+    table_name: str,
+    conv_username: str,
+    sess_info: dict[str, Any],
+    account_dir: Path,
+    my_rowid: Optional[int],
+    tokenizer: str,
+    after_local_id: int = 0,
+    until_local_id: int = 0,
+    local_ids: Optional[list[int]] = None,
+):
+    """Yield `(local_id, fts_row_or_None)` for every scanned message of one conversation table.
+
+    `fts_row` is the `message_fts` column tuple (without rowid); `None` means the message has no searchable text.
+    Callers use the scanned `local_id`s to advance the per-table high-water mark.
+    `after_local_id` / `until_local_id` (exclusive / inclusive, 0 = open) restrict the scan to a local_id window.
+    """
+
+    is_group = bool(conv_username.endswith("@chatroom"))
+    quoted_table = _quote_ident(table_name)
+
+    where = ""
+    params: tuple[Any, ...] = ()
+    if local_ids is not None:
+        ids = [int(x) for x in local_ids]
+        if not ids:
+            return
+        where = f" WHERE m.local_id IN ({', '.join(['?'] * len(ids))})"
+        params = tuple(ids)
+    else:
+        conds = []
+        if after_local_id > 0:
+            conds.append("m.local_id > ?")
+            params += (int(after_local_id),)
+        if until_local_id > 0:
+            conds.append("m.local_id <= ?")
+            params += (int(until_local_id),)
+        if conds:
+            where = " WHERE " + " AND ".join(conds)
+
+    sql_with_join = (
+        "SELECT "
+        "m.local_id, m.server_id, m.local_type, m.sort_seq, m.real_sender_id, m.create_time, "
+        "m.message_content, m.compress_content, n.user_name AS sender_username "
+        f"FROM {quoted_table} m "
+        "LEFT JOIN Name2Id n ON m.real_sender_id = n.rowid"
+        f"{where}"
+    )
+    sql_no_join = (
+        "SELECT "
+        "m.local_id, m.server_id, m.local_type, m.sort_seq, m.real_sender_id, m.create_time, "
+        "m.message_content, m.compress_content, '' AS sender_username "
+        f"FROM {quoted_table} m"
+        f"{where}"
+    )
+
+    try:
+        cursor = msg_conn.execute(sql_with_join, params)
+    except Exception:
+        cursor = msg_conn.execute(sql_no_join, params)
+
+    for r in cursor:
         try:
-            if tmp_path.exists():
-                tmp_path.unlink()
+            local_id = int(r["local_id"] or 0)
         except Exception:
-            pass
+            continue
 
-        sessions = _load_sessions_for_index(account_dir)
-        if not sessions:
-            raise RuntimeError("No sessions found (session.db empty or missing).")
+        try:
+            hit = _row_to_search_hit(
+                r,
+                db_path=db_path,
+                table_name=table_name,
+                username=conv_username,
+                account_dir=account_dir,
+                is_group=is_group,
+                my_rowid=my_rowid,
+            )
+        except Exception:
+            yield local_id, None
+            continue
+
+        hay_items = [
+            str(hit.get("content") or ""),
+            str(hit.get("title") or ""),
+            str(hit.get("url") or ""),
+            str(hit.get("quoteTitle") or ""),
+            str(hit.get("quoteContent") or ""),
+            str(hit.get("amount") or ""),
+        ]
+        haystack = "\n".join([x for x in hay_items if x.strip()])
+        if not haystack.strip():
+            yield local_id, None
+            continue
+
+        token_text = _to_index_token_text(haystack, tokenizer)
+        if not token_text:
+            yield local_id, None
+            continue
+
+        yield local_id, (
+            token_text,
+            conv_username,
+            str(hit.get("renderType") or ""),
+            int(hit.get("createTime") or 0),
+            int(hit.get("sortSeq") or 0),
+            int(hit.get("localId") or 0),
+            int(hit.get("serverId") or 0),
+            int(hit.get("type") or 0),
+            str(db_path.stem),
+            str(table_name),
+            str(hit.get("senderUsername") or ""),
+            int(sess_info.get("is_hidden") or 0),
+            int(sess_info.get("is_official") or 0),
+            _to_index_grams(token_text, tokenizer),
+        )
+
+
+def _insert_index_rows(conn: sqlite3.Connection, rows: list[tuple[Any, ...]], next_rowid: int) -> int:
+    """Insert `message_fts` tuples with explicit rowids (mirrored into `message_meta`); returns the next free rowid."""
+    if not rows:
+        return next_rowid
+    fts_rows = []
+    meta_rows = []
+    for row in rows:
+        fts_rows.append((next_rowid, *row))
+        create_time = int(row[3] or 0)
+        if create_time > 1_000_000_000_000:
+            create_time //= 1000
+        meta_rows.append(
+            (next_rowid, row[1], row[10], create_time, row[4], row[5], row[7], row[2], row[8], row[9], row[11], row[12])
+        )
+        next_rowid += 1
+    conn.executemany(_INSERT_FTS_SQL, fts_rows)
+    conn.executemany(_INSERT_META_SQL, meta_rows)
+    return next_rowid
+
+
+def _next_free_rowid(conn: sqlite3.Connection) -> int:
+    r = conn.execute("SELECT COALESCE(MAX(fts_rowid), 0) FROM message_meta").fetchone()
+    return int((r[0] if r else 0) or 0) + 1
+
+
+def _read_high_water_marks(conn: sqlite3.Connection) -> dict[str, int]:
+    out: dict[str, int] = {}
+    for k, v in conn.execute(
+        "SELECT key, value FROM meta WHERE key >= ? AND key < ?",
+        (_HWM_META_PREFIX, _HWM_META_PREFIX[:-1] + chr(ord(_HWM_META_PREFIX[-1]) + 1)),
+    ).fetchall():
+        try:
+            out[str(k)] = int(str(v or "0").strip() or "0")
+        except Exception:
+            continue
+    return out
+
+
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+def _index_build_workers() -> int:
+    # Parsing (`_row_to_search_hit`: zstd/XML decode) dominates build time; scale it across processes.
+    default = max(1, min(8, (os.cpu_count() or 2) - 1))
+    return _env_int("WECHAT_TOOL_SEARCH_INDEX_WORKERS", default, min_v=1, max_v=32)
 
-        db_paths = _iter_message_db_paths(account_dir)
-        if not db_paths:
-            raise RuntimeError("No message databases found for this account.")
 
+def _split_conversation_windows(
+    msg_conn: sqlite3.Connection, table_name: str, max_rows: int
+) -> list[tuple[int, int, int]]:
+    """Cut one message table into `(after_local_id, until_local_id, rows)` windows of at most `max_rows` rows."""
+    try:
+        ids = msg_conn.execute(f"SELECT local_id FROM {_quote_ident(table_name)} ORDER BY local_id")
+    except Exception:
+        return [(0, 0, 0)]
+    windows: list[tuple[int, int, int]] = []
+    after = 0
+    count = 0
+    last = 0
+    for (local_id,) in ids:
+        last = int(local_id or 0)
+        count += 1
+        if count >= max_rows:
+            windows.append((after, last, count))
+            after, count = last, 0
+    if count or not windows:
+        windows.append((after, 0, count))
+    return windows
+
+
+def _plan_index_tasks(
+    account_dir: Path,
+    db_paths: list[Path],
+    sessions: dict[str, dict[str, Any]],
+    tokenizer: str,
+) -> list[tuple[str, str, list[tuple[str, str, dict[str, Any], int, int]], str]]:
+    """Split the build into `(account_dir, db_path, [(username, table_name, sess_info, after, until), ...], tokenizer)`.
+
+    Each task holds at most `_INDEX_TASK_CONVERSATIONS` conversation windows and about `_INDEX_TASK_ROWS` rows.
+    """
+    tasks: list[tuple[str, str, list[tuple[str, str, dict[str, Any], int, int]], str]] = []
+    for db_path in db_paths:
+        msg_conn, lower_to_actual, _my_rowid = _open_message_db(db_path, account_dir.name)
+        try:
+            convs: list[tuple[str, str, dict[str, Any], int, int]] = []
+            rows = 0
+            for conv_username, sess_info in sessions.items():
+                table_name = _resolve_msg_table_name_by_map(lower_to_actual, conv_username)
+                if not table_name:
+                    continue
+                for after, until, n in _split_conversation_windows(msg_conn, table_name, _INDEX_TASK_ROWS):
+                    if convs and (len(convs) >= _INDEX_TASK_CONVERSATIONS or rows + n > _INDEX_TASK_ROWS):
+                        tasks.append((str(account_dir), str(db_path), convs, tokenizer))
+                        convs, rows = [], 0
+                    convs.append((conv_username, table_name, sess_info, after, until))
+                    rows += n
+            if convs:
+                tasks.append((str(account_dir), str(db_path), convs, tokenizer))
+        finally:
+            msg_conn.close()
+    return tasks
+
+
+def _scan_index_task(
+    account_dir_str: str,
+    db_path_str: str,
+    convs: list[tuple[str, str, dict[str, Any], int, int]],
+    tokenizer: str,
+) -> list[tuple[str, str, int, list[tuple[Any, ...]]]]:
+    """Producer: parse one shard slice into `(username, table_name, hwm, fts_rows)` (runs in a worker process)."""
+    account_dir = Path(account_dir_str)
+    db_path = Path(db_path_str)
+    out: list[tuple[str, str, int, list[tuple[Any, ...]]]] = []
+
+    msg_conn, _lower_to_actual, my_rowid = _open_message_db(db_path, account_dir.name)
+    try:
+        for conv_username, table_name, sess_info, after_local_id, until_local_id in convs:
+            hwm = 0
+            rows: list[tuple[Any, ...]] = []
+            for local_id, fts_row in _iter_conversation_index_rows(
+                msg_conn,
+                db_path=db_path,
+                table_name=table_name,
+                conv_username=conv_username,
+                sess_info=sess_info,
+                account_dir=account_dir,
+                my_rowid=my_rowid,
+                tokenizer=tokenizer,
+                after_local_id=after_local_id,
+                until_local_id=until_local_id,
+            ):
+                if local_id > hwm:
+                    hwm = local_id
+                if fts_row is not None:
+                    rows.append(fts_row)
+            out.append((conv_username, table_name, hwm, rows))
+    finally:
+        msg_conn.close()
+    return out
+
+
+def _iter_scanned_tasks(tasks: list, workers: int, stop: threading.Event):
+    """Yield `(db_path, results)` per task; parallel across processes when `workers > 1`."""
+    pool = None
+    if workers > 1 and len(tasks) > 1:
+        try:
+            # "spawn" everywhere: forking a server process that already runs threads (logging, uvicorn) can deadlock.
+            pool = ProcessPoolExecutor(
+                max_workers=min(workers, len(tasks)),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        except Exception as e:
+            logger.warning("Search index process pool unavailable, scanning inline: %s", e)
+            pool = None
+
+    if pool is None:
+        for task in tasks:
+            if stop.is_set():
+                return
+            yield task[1], _scan_index_task(*task)
+        return
+
+    try:
+        pending: dict[Future, str] = {}
+        it = iter(tasks)
+        # Keep a bounded number of parsed slices in flight so memory does not grow with the account size.
+        max_in_flight = workers * 2
+        while True:
+            while len(pending) < max_in_flight and not stop.is_set():
+                task = next(it, None)
+                if task is None:
+                    break
+                pending[pool.submit(_scan_index_task, *task)] = task[1]
+            if not pending:
+                return
+            done, _ = wait(list(pending.keys()), return_when=FIRST_COMPLETED)
+            for fut in done:
+                db_path_str = pending.pop(fut)
+                yield db_path_str, fut.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _index_writer(
+    key: str,
+    tmp_path: Path,
+    tokenizer: str,
+    results: "queue.Queue[Any]",
+    outcome: dict[str, Any],
+) -> None:
+    """Consumer: the only thread that touches the temp index DB; batches inserts and reports progress."""
+    drained = False
+    try:
         conn_fts = sqlite3.connect(str(tmp_path))
         conn_fts.isolation_level = None  # manual transaction control (prevents implicit BEGIN)
         try:
-            _init_index_db(conn_fts)
+            _init_index_db(conn_fts, tokenizer)
             try:
                 conn_fts.commit()
             except Exception:
                 pass
-            insert_sql = (
-                "INSERT INTO message_fts("
-                "text, username, render_type, create_time, sort_seq, local_id, server_id, local_type, "
-                "db_stem, table_name, sender_username, is_hidden, is_official"
-                ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-            )
 
             batch: list[tuple[Any, ...]] = []
+            # Windows of one table finish in any order; the stored high-water mark is the max seen.
+            hwms: dict[str, int] = {}
             indexed = 0
+            since_commit = 0
+            next_rowid = 1
 
             _safe_begin(conn_fts)
 
-            for db_path in db_paths:
+            while True:
+                item = results.get()
+                if item is None:
+                    drained = True
+                    break
+                db_path_str, scanned = item
+                db_path = Path(db_path_str)
                 _update_build_state(key, currentDb=str(db_path.name))
-                msg_conn = sqlite3.connect(str(db_path))
-                msg_conn.row_factory = sqlite3.Row
-                msg_conn.text_factory = bytes
-                try:
-                    try:
-                        trows = msg_conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
-                        lower_to_actual: dict[str, str] = {}
-                        for x in trows:
-                            if not x or x[0] is None:
-                                continue
-                            nm = _decode_sqlite_text(x[0]).strip()
-                            if not nm:
-                                continue
-                            lower_to_actual[nm.lower()] = nm
-                    except Exception:
-                        lower_to_actual = {}
-
-                    my_rowid = None
-                    try:
-                        r2 = msg_conn.execute(
-                            "SELECT rowid FROM Name2Id WHERE user_name = ? LIMIT 1",
-                            (account_dir.name,),
-                        ).fetchone()
-                        if r2 is not None and r2[0] is not None:
-                            my_rowid = int(r2[0])
-                    except Exception:
-                        my_rowid = None
-
-                    for conv_username, sess_info in sessions.items():
-                        _update_build_state(key, currentConversation=str(conv_username))
-                        table_name = _resolve_msg_table_name_by_map(lower_to_actual, conv_username)
-                        if not table_name:
-                            continue
-
-                        is_group = bool(conv_username.endswith("@chatroom"))
-                        quoted_table = _quote_ident(table_name)
-
-                        sql_with_join = (
-                            "SELECT "
-                            "m.local_id, m.server_id, m.local_type, m.sort_seq, m.real_sender_id, m.create_time, "
-                            "m.message_content, m.compress_content, n.user_name AS sender_username "
-                            f"FROM {quoted_table} m "
-                            "LEFT JOIN Name2Id n ON m.real_sender_id = n.rowid"
-                        )
-                        sql_no_join = (
-                            "SELECT "
-                            "m.local_id, m.server_id, m.local_type, m.sort_seq, m.real_sender_id, m.create_time, "
-                            "m.message_content, m.compress_content, '' AS sender_username "
-                            f"FROM {quoted_table} m "
-                        )
-
-                        try:
-                            cursor = msg_conn.execute(sql_with_join)
-                        except Exception:
-                            cursor = msg_conn.execute(sql_no_join)
-
-                        for r in cursor:
-                            try:
-                                hit = _row_to_search_hit(
-                                    r,
-                                    db_path=db_path,
-                                    table_name=table_name,
-                                    username=conv_username,
-                                    account_dir=account_dir,
-                                    is_group=is_group,
-                                    my_rowid=my_rowid,
-                                )
-                            except Exception:
-                                continue
-
-                            hay_items = [
-                                str(hit.get("content") or ""),
-                                str(hit.get("title") or ""),
-                                str(hit.get("url") or ""),
-                                str(hit.get("quoteTitle") or ""),
-                                str(hit.get("quoteContent") or ""),
-                                str(hit.get("amount") or ""),
-                            ]
-                            haystack = "\n".join([x for x in hay_items if x.strip()])
-                            if not haystack.strip():
-                                continue
-
-                            token_text = _to_char_token_text(haystack)
-                            if not token_text:
-                                continue
-
-                            batch.append(
-                                (
-                                    token_text,
-                                    conv_username,
-                                    str(hit.get("renderType") or ""),
-                                    int(hit.get("createTime") or 0),
-                                    int(hit.get("sortSeq") or 0),
-                                    int(hit.get("localId") or 0),
-                                    int(hit.get("serverId") or 0),
-                                    int(hit.get("type") or 0),
-                                    str(db_path.stem),
-                                    str(table_name),
-                                    str(hit.get("senderUsername") or ""),
-                                    int(sess_info.get("is_hidden") or 0),
-                                    int(sess_info.get("is_official") or 0),
-                                )
-                            )
-
-                            if len(batch) >= 1000:
-                                conn_fts.executemany(insert_sql, batch)
-                                indexed += len(batch)
-                                batch.clear()
-                                _update_build_state(key, indexedMessages=int(indexed))
-
-                                if indexed % 20000 == 0:
-                                    conn_fts.commit()
-                                    _safe_begin(conn_fts)
-                finally:
-                    msg_conn.close()
+                for conv_username, table_name, hwm, rows in scanned:
+                    _update_build_state(key, currentConversation=str(conv_username))
+                    batch.extend(rows)
+                    hwm_key = _hwm_meta_key(db_path.stem, table_name)
+                    hwms[hwm_key] = max(hwm, hwms.get(hwm_key, 0))
+                    _set_meta(conn_fts, hwm_key, str(hwms[hwm_key]))
+
+                    while len(batch) >= 1000:
+                        chunk = batch[:1000]
+                        del batch[:1000]
+                        next_rowid = _insert_index_rows(conn_fts, chunk, next_rowid)
+                        indexed += len(chunk)
+                        since_commit += len(chunk)
+                        _update_build_state(key, indexedMessages=int(indexed))
+
+                        if since_commit >= 20000:
+                            conn_fts.commit()
+                            _safe_begin(conn_fts)
+                            since_commit = 0
 
             if batch:
-                conn_fts.executemany(insert_sql, batch)
+                next_rowid = _insert_index_rows(conn_fts, batch, next_rowid)
                 indexed += len(batch)
                 batch.clear()
                 _update_build_state(key, indexedMessages=int(indexed))
 
             conn_fts.commit()
+            _create_meta_indexes(conn_fts)
 
             finished_at = int(time.time())
-            conn_fts.execute(
-                "INSERT INTO meta(key, value) VALUES(?, ?) "
-                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
-                ("built_at", str(finished_at)),
-            )
-            conn_fts.execute(
-                "INSERT INTO meta(key, value) VALUES(?, ?) "
-                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
-                ("message_count", str(indexed)),
-            )
+            _set_meta(conn_fts, "built_at", str(finished_at))
+            _set_meta(conn_fts, "message_count", str(indexed))
             conn_fts.commit()
+            outcome["indexed"] = int(indexed)
         finally:
             conn_fts.close()
+    except BaseException as e:
+        outcome["error"] = e
+        # Keep draining so the producer never blocks on a full queue.
+        while not drained:
+            drained = results.get() is None
 
-        if rebuild or final_path.exists():
-            try:
-                os.replace(str(tmp_path), str(final_path))
-            except Exception:
-                if tmp_path.exists():
-                    tmp_path.unlink()
-                raise
-        else:
+
+def _build_worker(account_dir: Path, rebuild: bool) -> None:
+    key = _account_key(account_dir)
+    started = time.time()
+    tmp_path = _index_db_tmp_path(account_dir)
+    final_path = _index_db_path(account_dir)
+
+    try:
+        try:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        except Exception:
+            pass
+
+        sessions = _load_sessions_for_index(account_dir)
+        if not sessions:
+            raise RuntimeError("No sessions found (session.db empty or missing).")
+
+        db_paths = _iter_message_db_paths(account_dir)
+        if not db_paths:
+            raise RuntimeError("No message databases found for this account.")
+
+        tokenizer = get_chat_search_tokenizer_mode()
+        _update_build_state(key, tokenizer=tokenizer)
+        tasks = _plan_index_tasks(account_dir, db_paths, sessions, tokenizer)
+        workers = _index_build_workers()
+
+        results: "queue.Queue[Any]" = queue.Queue(maxsize=max(2, workers * 2))
+        outcome: dict[str, Any] = {}
+        stop = threading.Event()
+        writer = threading.Thread(
+            target=_index_writer,
+            args=(key, tmp_path, tokenizer, results, outcome),
+            daemon=True,
+            name=f"chat-search-index-writer:{key}",
+        )
+        writer.start()
+        try:
+            for item in _iter_scanned_tasks(tasks, workers, stop):
+                if "error" in outcome:
+                    stop.set()
+                    break
+                results.put(item)
+        finally:
+            results.put(None)
+            writer.join()
+
+        if "error" in outcome:
+            raise outcome["error"]
+
+        # A failed swap leaves the temp file to the cleanup below.
+        with _write_lock(key):
             os.replace(str(tmp_path), str(final_path))
 
         duration = max(0.0, time.time() - started)
@@ -462,6 +1074,7 @@ def _build_worker(account_dir: Path, rebuild: bool) -> None:
             currentConversation="",
             error="",
             durationSec=round(duration, 3),
+            workers=int(workers),
         )
     except Exception as e:
         logger.exception("Failed to build chat search index")
@@ -476,3 +1089,177 @@ def _build_worker(account_dir: Path, rebuild: bool) -> None:
             finishedAt=int(time.time()),
             error=str(e),
         )
+
+
+def _open_live_index(account_dir: Path) -> Optional[sqlite3.Connection]:
+    """Open the current (ready, not being rebuilt) index for in-place maintenance; None when unavailable."""
+    with _BUILD_LOCK:
+        st = _BUILD_STATE.get(_account_key(account_dir))
+        if st and st.get("status") == "building":
+            return None
+
+    index_path = _index_db_path(account_dir)
+    info = _inspect_index(index_path)
+    # Indexes from older schema versions lack `message_meta`/high-water marks; they need a full rebuild first.
+    if not bool(info.get("ready")) or info.get("schemaVersion") != _SCHEMA_VERSION:
+        return None
+
+    conn = sqlite3.connect(str(index_path), timeout=5)
+    conn.isolation_level = None
+    return conn
+
+
+def update_chat_search_index(account_dir: Path, *, usernames: Optional[list[str]] = None) -> dict[str, Any]:
+    """Append messages newer than each (db_stem, table_name) high-water mark to the live index.
+
+    Used after realtime sync writes new rows into the decrypted shards, so search stays fresh without a rebuild.
+    `usernames=None` checks every indexed session.
+    """
+
+    key = _account_key(account_dir)
+    with _write_lock(key):
+        conn = _open_live_index(account_dir)
+        if conn is None:
+            return {"status": "skipped", "indexed": 0}
+
+        try:
+            sessions = _load_sessions_for_index(account_dir)
+            if usernames is not None:
+                wanted = {str(u or "").strip() for u in usernames}
+                sessions = {u: info for u, info in sessions.items() if u in wanted}
+            if not sessions:
+                return {"status": "success", "indexed": 0, "tables": 0}
+
+            tokenizer = get_chat_search_index_tokenizer(conn)
+            hwms = _read_high_water_marks(conn)
+            next_rowid = _next_free_rowid(conn)
+            indexed = 0
+            tables = 0
+
+            _safe_begin(conn)
+            for db_path in _iter_message_db_paths(account_dir):
+                msg_conn, lower_to_actual, my_rowid = _open_message_db(db_path, account_dir.name)
+                try:
+                    for conv_username, sess_info in sessions.items():
+                        table_name = _resolve_msg_table_name_by_map(lower_to_actual, conv_username)
+                        if not table_name:
+                            continue
+
+                        hwm_key = _hwm_meta_key(db_path.stem, table_name)
+                        hwm = int(hwms.get(hwm_key) or 0)
+                        new_hwm = hwm
+                        batch: list[tuple[Any, ...]] = []
+                        for local_id, fts_row in _iter_conversation_index_rows(
+                            msg_conn,
+                            db_path=db_path,
+                            table_name=table_name,
+                            conv_username=conv_username,
+                            sess_info=sess_info,
+                            account_dir=account_dir,
+                            my_rowid=my_rowid,
+                            tokenizer=tokenizer,
+                            after_local_id=hwm,
+                        ):
+                            if local_id > new_hwm:
+                                new_hwm = local_id
+                            if fts_row is not None:
+                                batch.append(fts_row)
+
+                        if new_hwm != hwm or hwm_key not in hwms:
+                            next_rowid = _insert_index_rows(conn, batch, next_rowid)
+                            indexed += len(batch)
+                            tables += 1
+                            _set_meta(conn, hwm_key, str(new_hwm))
+                finally:
+                    msg_conn.close()
+
+            if indexed:
+                r = conn.execute("SELECT value FROM meta WHERE key='message_count' LIMIT 1").fetchone()
+                try:
+                    total = int(str(r[0] if r else "0") or "0") + indexed
+                except Exception:
+                    total = indexed
+                _set_meta(conn, "message_count", str(total))
+            _set_meta(conn, "updated_at", str(int(time.time())))
+            conn.commit()
+            return {"status": "success", "indexed": int(indexed), "tables": int(tables)}
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            logger.warning("Incremental chat search index update failed: %s", e)
+            return {"status": "error", "indexed": 0, "message": str(e)}
+        finally:
+            conn.close()
+
+
+def reindex_chat_search_messages(
+    account_dir: Path,
+    *,
+    username: str,
+    db_stem: str,
+    table_name: str,
+    local_ids: list[int],
+) -> dict[str, Any]:
+    """Apply edits/deletes of specific messages to the live index (targeted FTS delete + re-insert).
+
+    Each message is re-read from the decrypted shard; messages that no longer exist are only removed.
+    """
+
+    ids = sorted({int(x) for x in local_ids if int(x or 0) > 0})
+    key = _account_key(account_dir)
+    with _write_lock(key):
+        conn = _open_live_index(account_dir)
+        if conn is None:
+            return {"status": "skipped", "deleted": 0, "inserted": 0}
+
+        try:
+            _safe_begin(conn)
+            deleted = 0
+            for local_id in ids:
+                rows = conn.execute(
+                    "SELECT fts_rowid FROM message_meta WHERE db_stem = ? AND table_name = ? AND local_id = ?",
+                    (str(db_stem), str(table_name), int(local_id)),
+                ).fetchall()
+                for (rid,) in rows:
+                    conn.execute("DELETE FROM message_fts WHERE rowid = ?", (int(rid),))
+                    conn.execute("DELETE FROM message_meta WHERE fts_rowid = ?", (int(rid),))
+                    deleted += 1
+
+            batch: list[tuple[Any, ...]] = []
+            sess_info = _load_sessions_for_index(account_dir).get(str(username))
+            db_path = account_dir / f"{db_stem}.db"
+            if sess_info is not None and ids and db_path.exists():
+                msg_conn, lower_to_actual, my_rowid = _open_message_db(db_path, account_dir.name)
+                try:
+                    actual_table = lower_to_actual.get(str(table_name).lower())
+                    if actual_table:
+                        for _local_id, fts_row in _iter_conversation_index_rows(
+                            msg_conn,
+                            db_path=db_path,
+                            table_name=actual_table,
+                            conv_username=str(username),
+                            sess_info=sess_info,
+                            account_dir=account_dir,
+                            my_rowid=my_rowid,
+                            tokenizer=get_chat_search_index_tokenizer(conn),
+                            local_ids=ids,
+                        ):
+                            if fts_row is not None:
+                                batch.append(fts_row)
+                finally:
+                    msg_conn.close()
+
+            _insert_index_rows(conn, batch, _next_free_rowid(conn))
+            conn.commit()
+            return {"status": "success", "deleted": int(deleted), "inserted": len(batch)}
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            logger.warning("Targeted chat search re-index failed: %s", e)
+            return {"status": "error", "deleted": 0, "inserted": 0, "message": str(e)}
+        finally:
+            conn.close()
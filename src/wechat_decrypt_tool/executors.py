@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, TypeVar
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Bounded worker pools for blocking work reached from `async def` endpoints.
+#
+# Categories keep one kind of slow work from starving another:
+# - "db":     SQLite reads (search, around, nested chat history, appmsg resolve)
+# - "media":  media file scans / per-item decrypt and decode / silk transcode / avatar blobs
+# - "jobs":   whole-account jobs that run for minutes or hours (database decrypt, bulk media decrypt); they
+#             must never hold a "media" worker, or every image / voice request queues behind them
+# - "net":    remote fetches (avatar downloads, favicons) that mostly wait on the network; kept off "media"
+#             so a page of cold avatars cannot park every decode worker on 20s timeouts
+# - "sns":    Moments image / video decode (wcdb image decrypt, video keystream XOR), so SNS pages and
+#             exports keep their own workers instead of competing with chat media
+# - "index":  long background index builds (media locator), kept off the request pools
+#
+# Workers are daemon threads (ThreadPoolExecutor's are not, which can keep Ctrl+C from stopping the process;
+# see chat_realtime_autosync). A request cancelled while still queued never runs.
+
+
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+_DEFAULT_WORKERS = {
+    "db": ("WECHAT_TOOL_DB_WORKERS", 8),
+    "media": ("WECHAT_TOOL_MEDIA_WORKERS", 4),
+    "jobs": ("WECHAT_TOOL_JOB_WORKERS", 2),
+    "net": ("WECHAT_TOOL_NET_WORKERS", 8),
+    "sns": ("WECHAT_TOOL_SNS_DECODE_WORKERS", 2),
+    "index": ("WECHAT_TOOL_INDEX_WORKERS", 1),
+}
+
+
+@dataclass
+class _Pool:
+    name: str
+    max_workers: int
+    tasks: "queue.SimpleQueue[tuple[Future, Callable[[], Any], float]]" = field(default_factory=queue.SimpleQueue)
+    threads: list[threading.Thread] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    queued: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    cancelled: int = 0
+    max_queued: int = 0
+    wait_ms_total: float = 0.0
+    wait_ms_max: float = 0.0
+    run_ms_total: float = 0.0
+
+    def submit(self, call: Callable[[], Any]) -> Future:
+        fut: Future = Future()
+        with self.lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            # Threads are started lazily, only while demand exceeds the workers we already have.
+            if len(self.threads) < self.max_workers and (self.queued + self.running) > len(self.threads):
+                th = threading.Thread(
+                    target=self._worker,
+                    name=f"{self.name}-worker-{len(self.threads)}",
+                    daemon=True,
+                )
+                self.threads.append(th)
+                th.start()
+        self.tasks.put((fut, call, time.perf_counter()))
+        return fut
+
+    def _worker(self) -> None:
+        while True:
+            fut, call, enqueued_at = self.tasks.get()
+            waited_ms = (time.perf_counter() - enqueued_at) * 1000.0
+            with self.lock:
+                self.queued -= 1
+                self.wait_ms_total += waited_ms
+                self.wait_ms_max = max(self.wait_ms_max, waited_ms)
+                if fut.set_running_or_notify_cancel():
+                    self.running += 1
+                else:
+                    self.cancelled += 1
+                    continue
+            started = time.perf_counter()
+            result: Any = None
+            error: Optional[BaseException] = None
+            try:
+                result = call()
+            except BaseException as e:
+                error = e
+            # Account for the task before resolving the future, so a caller that just got its result sees the
+            # counters already updated.
+            with self.lock:
+                self.running -= 1
+                self.run_ms_total += (time.perf_counter() - started) * 1000.0
+                if error is None:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            if error is None:
+                fut.set_result(result)
+            else:
+                fut.set_exception(error)
+                error = None
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            done = self.completed + self.failed
+            started = done + self.running
+            return {
+                "maxWorkers": self.max_workers,
+                "threads": len(self.threads),
+                "queued": self.queued,
+                "running": self.running,
+                "maxQueued": self.max_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "avgWaitMs": round(self.wait_ms_total / started, 2) if started else 0.0,
+                "maxWaitMs": round(self.wait_ms_max, 2),
+                "avgRunMs": round(self.run_ms_total / done, 2) if done else 0.0,
+            }
+
+
+_POOLS: dict[str, _Pool] = {}
+_POOLS_GUARD = threading.Lock()
+
+
+def _get_pool(category: str) -> _Pool:
+    with _POOLS_GUARD:
+        pool = _POOLS.get(category)
+        if pool is None:
+            env_name, default = _DEFAULT_WORKERS.get(category, ("", 4))
+            workers = _env_int(env_name, default, min_v=1, max_v=64) if env_name else default
+            pool = _Pool(name=category, max_workers=workers)
+            _POOLS[category] = pool
+        return pool
+
+
+async def run_blocking(category: str, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+    """Run `fn(*args, **kwargs)` on the `category` pool and await its result (context vars are carried over)."""
+
+    ctx = contextvars.copy_context()
+    fut = _get_pool(category).submit(lambda: ctx.run(fn, *args, **kwargs))
+    return await asyncio.wrap_future(fut)
+
+
+def submit_blocking(category: str, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+    """Fire-and-forget variant of `run_blocking` (background warmups); failures are logged, not raised."""
+
+    ctx = contextvars.copy_context()
+    fut = _get_pool(category).submit(lambda: ctx.run(fn, *args, **kwargs))
+
+    def _log_failure(f: Future) -> None:
+        if f.cancelled():
+            return
+        err = f.exception()
+        if err is not None:
+            logger.error("[executors] background task failed category=%s fn=%s err=%r", category, getattr(fn, "__name__", fn), err)
+
+    fut.add_done_callback(_log_failure)
+    return fut
+
+
+def get_executor_stats() -> dict[str, dict[str, Any]]:
+    for category in _DEFAULT_WORKERS:
+        _get_pool(category)
+    with _POOLS_GUARD:
+        pools = dict(_POOLS)
+    return {name: pool.stats() for name, pool in pools.items()}
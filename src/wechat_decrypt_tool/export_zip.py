@@ -0,0 +1,344 @@
+"""Per-member compression policy for export zips (chat / SNS).
+
+JPEG/MP4/GIF/SILK/MP3 payloads are already compressed; deflating them again burns CPU for a few bytes.
+`ExportZip` wraps a `zipfile.ZipFile` (same `write` / `writestr` calls the exporters already use) and picks the
+compression per member:
+
+- media (image / video / audio / archive): stored
+- text (html / json / txt / js / css / svg ...): deflated (or zstd when the profile asks and zipfile supports it)
+- anything else: sniffed by magic bytes, then by a cheap compressibility probe
+
+Profiles (`WECHAT_TOOL_EXPORT_ZIP_PROFILE`, or per job):
+
+- auto:    media stored, text deflate level 6, unknown binaries probed (default)
+- fast:    media stored, text deflate level 1, unknown binaries stored
+- zstd:    like fast, but text uses ZIP_ZSTANDARD when available (Python 3.14+); otherwise falls back to fast
+- deflate: everything deflate level 6 (the old behaviour)
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import time
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Literal, Optional
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+ZipProfile = Literal["auto", "fast", "zstd", "deflate"]
+ZIP_PROFILES: tuple[str, ...] = ("auto", "fast", "zstd", "deflate")
+
+MemberClass = Literal["image", "video", "audio", "archive", "text", "other"]
+_MEMBER_CLASSES: tuple[str, ...] = ("image", "video", "audio", "archive", "text", "other")
+_STORED_CLASSES = frozenset({"image", "video", "audio", "archive"})
+
+_EXT_CLASS: dict[str, str] = {}
+for _ext in ("jpg", "jpeg", "png", "gif", "webp", "heic", "heif", "avif"):
+    _EXT_CLASS[_ext] = "image"
+for _ext in ("mp4", "mov", "m4v", "3gp", "webm", "mkv"):
+    _EXT_CLASS[_ext] = "video"
+for _ext in ("mp3", "silk", "amr", "aac", "m4a", "ogg", "opus"):
+    _EXT_CLASS[_ext] = "audio"
+for _ext in ("zip", "7z", "rar", "gz", "tgz", "bz2", "xz", "zst", "apk", "jar", "docx", "xlsx", "pptx", "woff", "woff2"):
+    _EXT_CLASS[_ext] = "archive"
+for _ext in ("html", "htm", "json", "txt", "js", "mjs", "css", "svg", "xml", "csv", "md"):
+    _EXT_CLASS[_ext] = "text"
+
+# Unknown binaries: probe this much with zlib level 1; keep deflate only when it saves at least 3%.
+_PROBE_BYTES = 64 * 1024
+_PROBE_MIN_BYTES = 4 * 1024
+_PROBE_MAX_RATIO = 0.97
+
+
+def default_zip_profile() -> str:
+    return normalize_zip_profile(os.environ.get("WECHAT_TOOL_EXPORT_ZIP_PROFILE"))
+
+
+def normalize_zip_profile(value: Any) -> str:
+    v = str(value or "").strip().lower()
+    return v if v in ZIP_PROFILES else "auto"
+
+
+def _class_from_magic(head: bytes) -> str:
+    if head.startswith(b"\xff\xd8\xff") or head.startswith(b"\x89PNG\r\n\x1a\n") or head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image"
+    if len(head) >= 12 and head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"heic", b"heix", b"mif1", b"avif"):
+            return "image"
+        if brand in (b"M4A ", b"M4B "):
+            return "audio"
+        return "video"
+    if head.startswith(b"#!SILK") or head.startswith(b"\x02#!SILK") or head.startswith(b"#!AMR"):
+        return "audio"
+    if head.startswith(b"ID3") or (len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0):
+        return "audio"
+    if head.startswith(b"OggS"):
+        return "audio"
+    if head.startswith(b"\x1aE\xdf\xa3"):
+        return "video"
+    if head.startswith((b"PK\x03\x04", b"\x1f\x8b", b"7z\xbc\xaf\x27\x1c", b"Rar!", b"BZh", b"\xfd7zXZ", b"\x28\xb5\x2f\xfd")):
+        return "archive"
+    return ""
+
+
+def classify_member(arcname: str, head: bytes = b"") -> str:
+    """Member class from the arcname extension, falling back to magic bytes for unknown extensions."""
+    ext = Path(str(arcname or "")).suffix.lstrip(".").lower()
+    cls = _EXT_CLASS.get(ext)
+    if cls:
+        return cls
+    return _class_from_magic(head[:16]) or "other"
+
+
+def _looks_incompressible(sample: bytes) -> bool:
+    if len(sample) < _PROBE_MIN_BYTES:
+        return False
+    return len(zlib.compress(sample, 1)) >= len(sample) * _PROBE_MAX_RATIO
+
+
+class ExportZip:
+    """`zipfile.ZipFile` front-end applying a compression profile per member and recording per-class stats."""
+
+    def __init__(self, zf: zipfile.ZipFile, *, profile: Any = None) -> None:
+        self._zf = zf
+        requested = normalize_zip_profile(profile) if profile else default_zip_profile()
+        self.profile = requested
+        self._text_compression = (zipfile.ZIP_DEFLATED, 6)
+        if requested in {"fast", "zstd"}:
+            self._text_compression = (zipfile.ZIP_DEFLATED, 1)
+        if requested == "zstd":
+            zstd = getattr(zipfile, "ZIP_ZSTANDARD", None)
+            if zstd is not None:
+                self._text_compression = (zstd, 3)
+            else:
+                logger.info("[export_zip] zipfile has no ZIP_ZSTANDARD; using the fast profile")
+                self.profile = "fast"
+        self._stats: dict[str, dict[str, float]] = {
+            c: {"members": 0, "bytesIn": 0, "bytesOut": 0, "seconds": 0.0} for c in _MEMBER_CLASSES
+        }
+        # First write wins; later writes of the same arcname are dropped instead of producing duplicate members.
+        self._names: set[str] = {i.filename for i in zf.filelist}
+
+    @property
+    def entry_count(self) -> int:
+        return len(self._zf.filelist)
+
+    def names(self, limit: Optional[int] = None) -> list[str]:
+        infos = self._zf.filelist if limit is None else self._zf.filelist[: int(limit)]
+        return [i.filename for i in infos]
+
+    def flush(self) -> None:
+        """Push written members to the OS so a checkpoint taken now survives a crash of this process."""
+        fp = getattr(self._zf, "fp", None)
+        if fp is not None:
+            fp.flush()
+
+    def _compression_for(self, cls: str, sample: Optional[bytes]) -> tuple[int, Optional[int]]:
+        if self.profile == "deflate":
+            return zipfile.ZIP_DEFLATED, 6
+        if cls in _STORED_CLASSES:
+            return zipfile.ZIP_STORED, None
+        if cls == "text":
+            return self._text_compression
+        if self.profile != "auto" or (sample is not None and _looks_incompressible(sample)):
+            return zipfile.ZIP_STORED, None
+        return zipfile.ZIP_DEFLATED, 6
+
+    def _record(self, cls: str, started: float) -> None:
+        info = self._zf.filelist[-1]
+        st = self._stats[cls]
+        st["members"] += 1
+        st["bytesIn"] += int(info.file_size)
+        st["bytesOut"] += int(info.compress_size)
+        st["seconds"] += time.perf_counter() - started
+
+    def writestr(self, arcname: str, data: Any) -> None:
+        if arcname in self._names:
+            return
+        self._names.add(arcname)
+        started = time.perf_counter()
+        if isinstance(data, str):
+            cls = classify_member(arcname) if Path(arcname).suffix else "text"
+            if cls == "other":
+                cls = "text"
+            sample: Optional[bytes] = None
+        else:
+            data = bytes(data)
+            cls = classify_member(arcname, data[:16])
+            sample = data[:_PROBE_BYTES] if cls == "other" else None
+        compress_type, level = self._compression_for(cls, sample)
+        self._zf.writestr(arcname, data, compress_type=compress_type, compresslevel=level)
+        self._record(cls, started)
+
+    def write(self, filename: Any, arcname: Optional[str] = None) -> None:
+        started = time.perf_counter()
+        src = Path(filename)
+        arc = str(arcname or src.name)
+        if arc in self._names:
+            return
+        self._names.add(arc)
+        cls = classify_member(arc)
+        sample: Optional[bytes] = None
+        if cls == "other":
+            try:
+                with open(src, "rb") as f:
+                    sample = f.read(_PROBE_BYTES)
+            except Exception:
+                sample = b""
+            cls = _class_from_magic(sample[:16]) or "other"
+        compress_type, level = self._compression_for(cls, sample)
+        self._zf.write(str(src), arc, compress_type=compress_type, compresslevel=level)
+        self._record(cls, started)
+
+    def stats(self) -> dict[str, Any]:
+        classes = {}
+        for cls, st in self._stats.items():
+            if not st["members"]:
+                continue
+            classes[cls] = {
+                "members": int(st["members"]),
+                "bytesIn": int(st["bytesIn"]),
+                "bytesOut": int(st["bytesOut"]),
+                "seconds": round(float(st["seconds"]), 3),
+            }
+        return {
+            "profile": self.profile,
+            "bytesIn": sum(c["bytesIn"] for c in classes.values()),
+            "bytesOut": sum(c["bytesOut"] for c in classes.values()),
+            "seconds": round(sum(c["seconds"] for c in classes.values()), 3),
+            "classes": classes,
+        }
+
+    def copy_entries_from(self, path: Path, count: int) -> Optional[list[str]]:
+        """Copy the first `count` members of an earlier (possibly unfinished) export zip into this one.
+
+        A `.part` file left by a crash has no central directory, so it is read by walking local headers.
+        Returns the copied arcnames, or None when fewer than `count` members can be recovered.
+        """
+
+        count = max(0, int(count))
+        if count == 0:
+            return []
+        entries = list(_iter_local_entries(Path(path), count))
+        if len(entries) < count:
+            return None
+
+        copied: list[str] = []
+        with open(path, "rb") as fp:
+            for name, method, comp_size, file_size, data_offset, date_time in entries:
+                if name in self._names:
+                    continue
+                started = time.perf_counter()
+                cls = classify_member(name)
+                if cls == "other" and method == zipfile.ZIP_STORED and self.profile != "deflate":
+                    compress_type = zipfile.ZIP_STORED  # already judged incompressible when first written
+                else:
+                    compress_type, _level = self._compression_for(cls, None)
+                info = zipfile.ZipInfo(name, date_time=date_time)
+                info.compress_type = compress_type
+                info.file_size = file_size
+                fp.seek(data_offset)
+                with self._zf.open(info, "w", force_zip64=file_size > zipfile.ZIP64_LIMIT) as dest:
+                    for chunk in _member_chunks(fp, method, comp_size):
+                        dest.write(chunk)
+                self._names.add(name)
+                self._record(cls, started)
+                copied.append(name)
+        return copied
+
+
+# zipfile writes ZIP_ZSTANDARD (method 93) on Python 3.14+; the "zstd" profile's members must stay copyable
+# there, or resuming such an export would silently start over.
+_ZIP_ZSTANDARD: Optional[int] = getattr(zipfile, "ZIP_ZSTANDARD", None)
+
+
+def _copyable_method(method: int) -> bool:
+    if method in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        return True
+    return _ZIP_ZSTANDARD is not None and method == _ZIP_ZSTANDARD
+
+
+def _zstd_decompressor() -> Any:
+    from compression.zstd import ZstdDecompressor  # stdlib alongside zipfile.ZIP_ZSTANDARD (3.14+)
+
+    return ZstdDecompressor()
+
+
+def _member_decompressor(method: int) -> Any:
+    if method == zipfile.ZIP_DEFLATED:
+        return zlib.decompressobj(-15)
+    if _ZIP_ZSTANDARD is not None and method == _ZIP_ZSTANDARD:
+        return _zstd_decompressor()
+    return None
+
+
+def _iter_local_entries(path: Path, limit: int) -> Iterator[tuple[str, int, int, int, int, tuple[int, ...]]]:
+    """Yield `(name, method, comp_size, file_size, data_offset, date_time)` by scanning local file headers."""
+
+    try:
+        total = path.stat().st_size
+        fp: BinaryIO = open(path, "rb")
+    except OSError:
+        return
+    with fp:
+        offset = 0
+        for _ in range(int(limit)):
+            fp.seek(offset)
+            header = fp.read(30)
+            if len(header) < 30 or header[:4] != b"PK\x03\x04":
+                return
+            (_sig, _ver, flags, method, mtime, mdate, _crc, comp_size, file_size, name_len, extra_len) = struct.unpack(
+                "<4sHHHHHIIIHH", header
+            )
+            if not _copyable_method(method):
+                return
+            name_raw = fp.read(name_len)
+            extra = fp.read(extra_len)
+            if comp_size == 0xFFFFFFFF or file_size == 0xFFFFFFFF:
+                i = 0
+                while i + 4 <= len(extra):
+                    tag, size = struct.unpack("<HH", extra[i : i + 4])
+                    if tag == 0x0001 and size >= 16:
+                        file_size, comp_size = struct.unpack("<QQ", extra[i + 4 : i + 20])
+                        break
+                    i += 4 + size
+            if flags & 0x08 and comp_size == 0:
+                return  # streamed member with a trailing data descriptor: size unknown here
+            data_offset = offset + 30 + name_len + extra_len
+            if data_offset + comp_size > total:
+                return
+            name = name_raw.decode("utf-8" if flags & 0x800 else "cp437", errors="replace")
+            date_time = (
+                ((mdate >> 9) & 0x7F) + 1980,
+                (mdate >> 5) & 0x0F,
+                mdate & 0x1F,
+                (mtime >> 11) & 0x1F,
+                (mtime >> 5) & 0x3F,
+                (mtime & 0x1F) * 2,
+            )
+            yield name, method, comp_size, file_size, data_offset, date_time
+            offset = data_offset + comp_size
+
+
+def _member_chunks(fp: BinaryIO, method: int, comp_size: int, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    inflater = _member_decompressor(method)
+    remaining = int(comp_size)
+    while remaining > 0:
+        raw = fp.read(min(chunk_size, remaining))
+        if not raw:
+            break
+        remaining -= len(raw)
+        yield inflater.decompress(raw) if inflater is not None else raw
+    flush = getattr(inflater, "flush", None)  # zlib only; a zstd frame is complete once fed
+    if flush is not None:
+        tail = flush()
+        if tail:
+            yield tail
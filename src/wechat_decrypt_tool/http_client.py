@@ -0,0 +1,536 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Mapping, Optional
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Process-wide pooled HTTP clients for remote media (SNS CDN, avatars, favicons, emoji downloads).
+#
+# - Sync callers share one `requests.Session` with per-host keep-alive pools. A per-host semaphore caps them
+#   at WECHAT_TOOL_HTTP_PER_HOST concurrent requests; waiting for a slot counts against the request's connect
+#   timeout, so a saturated (or leaked) pool fails the request instead of parking the worker forever.
+# - Async callers share one `httpx.AsyncClient` per event loop (httpx clients are bound to the loop that
+#   first used them; the SNS export runs its own loop). HTTP/2 is enabled when `h2` is installed.
+# - `fetch_bytes` / `async_fetch_bytes` coalesce identical in-flight GETs (same url + headers): the
+#   thumbnail grid and an export asking for the same CDN object pay for one download.
+# - Per-host timings are exposed via `get_http_client_stats()` (GET /api/health/http).
+
+
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+_PER_HOST = _env_int("WECHAT_TOOL_HTTP_PER_HOST", 6, min_v=1, max_v=64)
+_MAX_HOSTS = _env_int("WECHAT_TOOL_HTTP_POOL_HOSTS", 32, min_v=1, max_v=256)
+_KEEPALIVE_SEC = 30.0
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Connection management is the pool's job; HTTP/2 also rejects these outright.
+_HOP_BY_HOP_HEADERS = frozenset({"connection", "keep-alive", "proxy-connection", "upgrade"})
+
+_DEFAULT_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36"
+
+
+class ResponseTooLarge(Exception):
+    def __init__(self, url: str, limit: int) -> None:
+        super().__init__(f"response larger than {limit} bytes: {url}")
+        self.url = url
+        self.limit = limit
+
+
+@dataclass(frozen=True)
+class FetchResult:
+    url: str
+    status_code: int
+    headers: CaseInsensitiveDict
+    content: bytes
+    http_version: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= int(self.status_code) < 300
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+
+
+@dataclass
+class _HostStats:
+    requests: int = 0
+    failed: int = 0
+    coalesced: int = 0
+    inflight: int = 0
+    max_inflight: int = 0
+    bytes: int = 0
+    http2: int = 0
+    ttfb_ms_total: float = 0.0
+    ms_total: float = 0.0
+    ms_max: float = 0.0
+    status: dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        done = self.requests - self.inflight
+        return {
+            "requests": self.requests,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "inflight": self.inflight,
+            "maxInflight": self.max_inflight,
+            "bytes": self.bytes,
+            "http2": self.http2,
+            "avgTtfbMs": round(self.ttfb_ms_total / done, 2) if done else 0.0,
+            "avgMs": round(self.ms_total / done, 2) if done else 0.0,
+            "maxMs": round(self.ms_max, 2),
+            "status": dict(self.status),
+        }
+
+
+_STATS: dict[str, _HostStats] = {}
+_STATS_LOCK = threading.Lock()
+
+
+def _host_of(url: str) -> str:
+    try:
+        return str(urlparse(str(url or "")).hostname or "").lower()
+    except Exception:
+        return ""
+
+
+def _stats_for(host: str) -> _HostStats:
+    st = _STATS.get(host)
+    if st is None:
+        st = _HostStats()
+        _STATS[host] = st
+    return st
+
+
+class _Timing:
+    """Book-keeping for one request: started -> headers received -> body done (or failed)."""
+
+    def __init__(self, url: str) -> None:
+        self.host = _host_of(url)
+        self.started = time.perf_counter()
+        self.ttfb_ms: Optional[float] = None
+        self.status = 0
+        self.http_version = ""
+        self.nbytes = 0
+        with _STATS_LOCK:
+            st = _stats_for(self.host)
+            st.requests += 1
+            st.inflight += 1
+            st.max_inflight = max(st.max_inflight, st.inflight)
+
+    def headers(self, status: int, http_version: str = "") -> None:
+        self.ttfb_ms = (time.perf_counter() - self.started) * 1000.0
+        self.status = int(status or 0)
+        self.http_version = str(http_version or "")
+
+    def finish(self, *, failed: bool = False) -> None:
+        elapsed = (time.perf_counter() - self.started) * 1000.0
+        with _STATS_LOCK:
+            st = _stats_for(self.host)
+            st.inflight -= 1
+            st.bytes += self.nbytes
+            st.ms_total += elapsed
+            st.ms_max = max(st.ms_max, elapsed)
+            st.ttfb_ms_total += self.ttfb_ms if self.ttfb_ms is not None else elapsed
+            if self.http_version.upper().startswith("HTTP/2"):
+                st.http2 += 1
+            if failed:
+                st.failed += 1
+            if self.status:
+                key = str(self.status)
+                st.status[key] = st.status.get(key, 0) + 1
+
+
+def _count_coalesced(url: str) -> None:
+    with _STATS_LOCK:
+        _stats_for(_host_of(url)).coalesced += 1
+
+
+def get_http_client_stats() -> dict[str, Any]:
+    with _STATS_LOCK:
+        hosts = {h or "-": st.to_dict() for h, st in _STATS.items()}
+    return {
+        "http2Available": HTTP2_AVAILABLE,
+        "perHostLimit": _PER_HOST,
+        "hosts": hosts,
+    }
+
+
+def reset_http_client_stats() -> None:
+    with _STATS_LOCK:
+        _STATS.clear()
+
+
+def _coalesce_key(method: str, url: str, headers: Optional[Mapping[str, str]], max_bytes: int) -> tuple:
+    return (
+        method.upper(),
+        str(url),
+        tuple(sorted((str(k).lower(), str(v)) for k, v in (headers or {}).items())),
+        int(max_bytes),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Sync (requests)
+
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+_HOST_SLOTS: dict[str, threading.BoundedSemaphore] = {}
+
+
+def get_session() -> requests.Session:
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            s = requests.Session()
+            # Non-blocking urllib3 pools: `_HOST_SLOTS` does the (bounded) waiting.
+            adapter = HTTPAdapter(pool_connections=_MAX_HOSTS, pool_maxsize=_PER_HOST, pool_block=False)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            s.headers["User-Agent"] = _DEFAULT_UA
+            _SESSION = s
+            _HOST_SLOTS.clear()
+        return _SESSION
+
+
+def _host_slot(host: str) -> threading.BoundedSemaphore:
+    with _SESSION_LOCK:
+        slot = _HOST_SLOTS.get(host)
+        if slot is None:
+            slot = _HOST_SLOTS[host] = threading.BoundedSemaphore(_PER_HOST)
+        return slot
+
+
+def _slot_wait_s(timeout: Any) -> float:
+    """How long to wait for a per-host slot: the connect part of a requests-style `timeout`."""
+
+    if isinstance(timeout, tuple):
+        timeout = timeout[0] if timeout else None
+    try:
+        return max(0.0, float(timeout))
+    except (TypeError, ValueError):
+        return 20.0
+
+
+class _TimedResponse:
+    """Streaming `requests.Response` proxy that books the request into the host stats when closed."""
+
+    def __init__(self, resp: requests.Response, timing: _Timing, slot: threading.BoundedSemaphore) -> None:
+        self._resp = resp
+        self._timing = timing
+        self._slot = slot
+        self._closed = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resp, name)
+
+    def iter_content(self, chunk_size: int = 64 * 1024, decode_unicode: bool = False):
+        for chunk in self._resp.iter_content(chunk_size=chunk_size, decode_unicode=decode_unicode):
+            if chunk:
+                self._timing.nbytes += len(chunk)
+            yield chunk
+
+    @property
+    def content(self) -> bytes:
+        data = self._resp.content
+        self._timing.nbytes = len(data or b"")
+        return data
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._resp.close()
+        finally:
+            self._slot.release()
+            self._timing.finish(failed=int(self._resp.status_code or 0) >= 500)
+
+    def __enter__(self) -> "_TimedResponse":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def request(method: str, url: str, **kwargs: Any) -> _TimedResponse:
+    """`requests.request` over the shared session; the body is streamed, call `.close()` when done."""
+
+    kwargs.setdefault("stream", True)
+    kwargs.setdefault("timeout", 20)
+    if method.upper() == "HEAD":
+        kwargs.setdefault("allow_redirects", False)
+    session = get_session()
+    host = _host_of(url)
+    wait_s = _slot_wait_s(kwargs["timeout"])
+    slot = _host_slot(host)
+    if not slot.acquire(timeout=wait_s):
+        raise requests.exceptions.ConnectTimeout(f"no free connection to {host or url} within {wait_s:g}s")
+    timing = _Timing(url)
+
+    def _on_response(resp: requests.Response, *args: Any, **kw: Any) -> None:
+        timing.headers(resp.status_code, "HTTP/1.1")
+
+    kwargs["hooks"] = {"response": [_on_response]}
+    try:
+        resp = session.request(method.upper(), url, **kwargs)
+    except Exception:
+        slot.release()
+        timing.finish(failed=True)
+        raise
+    return _TimedResponse(resp, timing, slot)
+
+
+def get(url: str, **kwargs: Any) -> _TimedResponse:
+    return request("GET", url, **kwargs)
+
+
+def head(url: str, **kwargs: Any) -> _TimedResponse:
+    return request("HEAD", url, **kwargs)
+
+
+_SYNC_INFLIGHT: dict[tuple, Future] = {}
+_SYNC_INFLIGHT_LOCK = threading.Lock()
+
+
+def _fetch_bytes_uncoalesced(
+    url: str, *, headers: Optional[Mapping[str, str]], timeout: float, max_bytes: int, allow_redirects: bool
+) -> FetchResult:
+    with get(url, headers=dict(headers or {}), timeout=timeout, allow_redirects=allow_redirects) as r:
+        try:
+            cl = int(r.headers.get("content-length") or 0)
+        except Exception:
+            cl = 0
+        if max_bytes and cl > max_bytes:
+            raise ResponseTooLarge(url, max_bytes)
+        chunks: list[bytes] = []
+        total = 0
+        for chunk in r.iter_content(chunk_size=256 * 1024):
+            if not chunk:
+                continue
+            chunks.append(chunk)
+            total += len(chunk)
+            if max_bytes and total > max_bytes:
+                raise ResponseTooLarge(url, max_bytes)
+        return FetchResult(
+            url=str(r.url or url),
+            status_code=int(r.status_code),
+            headers=CaseInsensitiveDict(dict(r.headers)),
+            content=b"".join(chunks),
+            http_version="HTTP/1.1",
+        )
+
+
+def fetch_bytes(
+    url: str,
+    *,
+    headers: Optional[Mapping[str, str]] = None,
+    timeout: float = 20,
+    max_bytes: int = 0,
+    allow_redirects: bool = True,
+) -> FetchResult:
+    """GET `url` into memory. Concurrent identical calls share one download (and its result or error)."""
+
+    key = _coalesce_key("GET", url, headers, max_bytes)
+    with _SYNC_INFLIGHT_LOCK:
+        fut = _SYNC_INFLIGHT.get(key)
+        leader = fut is None
+        if leader:
+            fut = Future()
+            _SYNC_INFLIGHT[key] = fut
+    if not leader:
+        _count_coalesced(url)
+        return fut.result()
+
+    try:
+        res = _fetch_bytes_uncoalesced(
+            url, headers=headers, timeout=timeout, max_bytes=max_bytes, allow_redirects=allow_redirects
+        )
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(res)
+        return res
+    finally:
+        with _SYNC_INFLIGHT_LOCK:
+            _SYNC_INFLIGHT.pop(key, None)
+
+
+# ---------------------------------------------------------------------------
+# Async (httpx)
+
+
+@dataclass
+class _LoopState:
+    client: httpx.AsyncClient
+    host_limits: dict[str, asyncio.Semaphore] = field(default_factory=dict)
+    inflight: dict[tuple, "asyncio.Future[FetchResult]"] = field(default_factory=dict)
+
+
+_LOOP_STATES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+_LOOP_STATES_LOCK = threading.Lock()
+
+
+def _loop_state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    with _LOOP_STATES_LOCK:
+        state = _LOOP_STATES.get(loop)
+        if state is None or state.client.is_closed:
+            client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                follow_redirects=True,
+                timeout=httpx.Timeout(20.0),
+                headers={"User-Agent": _DEFAULT_UA},
+                limits=httpx.Limits(
+                    max_connections=_PER_HOST * _MAX_HOSTS,
+                    max_keepalive_connections=_PER_HOST * _MAX_HOSTS,
+                    keepalive_expiry=_KEEPALIVE_SEC,
+                ),
+            )
+            state = _LoopState(client=client)
+            _LOOP_STATES[loop] = state
+        return state
+
+
+def async_client() -> httpx.AsyncClient:
+    """The pooled `httpx.AsyncClient` of the running event loop."""
+
+    return _loop_state().client
+
+
+async def aclose_async_client() -> None:
+    """Close the running loop's client (app shutdown, or before a private loop is closed)."""
+
+    loop = asyncio.get_running_loop()
+    with _LOOP_STATES_LOCK:
+        state = _LOOP_STATES.pop(loop, None)
+    if state is not None:
+        await state.client.aclose()
+
+
+@asynccontextmanager
+async def async_stream(
+    method: str,
+    url: str,
+    *,
+    headers: Optional[Mapping[str, str]] = None,
+    timeout: Optional[float] = None,
+    follow_redirects: bool = True,
+) -> AsyncIterator[httpx.Response]:
+    """`client.stream(...)` on the shared client, holding one of the host's connection slots."""
+
+    state = _loop_state()
+    host = _host_of(url)
+    sem = state.host_limits.get(host)
+    if sem is None:
+        sem = asyncio.Semaphore(_PER_HOST)
+        state.host_limits[host] = sem
+
+    async with sem:
+        timing = _Timing(url)
+        failed = True
+        try:
+            send_headers = {k: v for k, v in (headers or {}).items() if str(k).lower() not in _HOP_BY_HOP_HEADERS}
+            kwargs: dict[str, Any] = {"headers": send_headers, "follow_redirects": follow_redirects}
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            async with state.client.stream(method.upper(), url, **kwargs) as resp:
+                timing.headers(resp.status_code, resp.http_version)
+                yield resp
+                timing.nbytes = int(resp.num_bytes_downloaded or 0)
+            failed = int(timing.status or 0) >= 500
+        finally:
+            timing.finish(failed=failed)
+
+
+async def _async_fetch_uncoalesced(
+    url: str, *, headers: Optional[Mapping[str, str]], timeout: Optional[float], max_bytes: int, follow_redirects: bool
+) -> FetchResult:
+    async with async_stream("GET", url, headers=headers, timeout=timeout, follow_redirects=follow_redirects) as resp:
+        try:
+            cl = int(resp.headers.get("content-length") or 0)
+        except Exception:
+            cl = 0
+        if max_bytes and cl > max_bytes:
+            raise ResponseTooLarge(url, max_bytes)
+        buf = bytearray()
+        async for chunk in resp.aiter_bytes():
+            buf.extend(chunk)
+            if max_bytes and len(buf) > max_bytes:
+                raise ResponseTooLarge(url, max_bytes)
+        return FetchResult(
+            url=str(resp.url),
+            status_code=int(resp.status_code),
+            headers=CaseInsensitiveDict(dict(resp.headers)),
+            content=bytes(buf),
+            http_version=str(resp.http_version or ""),
+        )
+
+
+async def async_fetch_bytes(
+    url: str,
+    *,
+    headers: Optional[Mapping[str, str]] = None,
+    timeout: Optional[float] = None,
+    max_bytes: int = 0,
+    follow_redirects: bool = True,
+) -> FetchResult:
+    """Async `fetch_bytes`: identical in-flight GETs on this loop share one download."""
+
+    state = _loop_state()
+    key = _coalesce_key("GET", url, headers, max_bytes)
+    shared = state.inflight.get(key)
+    if shared is not None:
+        _count_coalesced(url)
+        # shield: a cancelled follower must not cancel the leader's download.
+        return await asyncio.shield(shared)
+
+    fut: "asyncio.Future[FetchResult]" = asyncio.get_running_loop().create_future()
+    state.inflight[key] = fut
+    try:
+        res = await _async_fetch_uncoalesced(
+            url, headers=headers, timeout=timeout, max_bytes=max_bytes, follow_redirects=follow_redirects
+        )
+    except BaseException as e:
+        if isinstance(e, asyncio.CancelledError):
+            e = ConnectionError(f"coalesced download was cancelled: {url}")
+        fut.set_exception(e)
+        # Followers re-raise it; don't let an unobserved exception warn when there are none.
+        fut.exception()
+        raise
+    else:
+        fut.set_result(res)
+        return res
+    finally:
+        state.inflight.pop(key, None)
@@ -0,0 +1,413 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from .logging_config import get_logger
+from .media_helpers import (
+    _decrypt_and_save_resource,
+    _get_resource_dir,
+    _try_find_decrypted_resource,
+    _variant_rank,
+)
+
+logger = get_logger(__name__)
+
+# Bulk .dat -> resource/ decryption pipeline (decrypt_all / decrypt_all_stream).
+#
+# - The scan is a streaming `os.scandir` walk over msg/attach and cache; each directory's .dat files are
+#   grouped by md5 (md5.dat / md5_h.dat / md5_t.dat) and handed to a spawn process pool in small tasks, so
+#   decryption starts while the scan is still running and a slow tree never holds everything in memory.
+# - A manifest (`resource/_decrypt_manifest.db`) records (source path, md5, size, mtime_ns, output). A file whose
+#   size/mtime still match and whose output still exists is skipped with a stat instead of re-reading the output.
+#   The manifest is flushed as results arrive, so an interrupted or cancelled run resumes where it stopped.
+# - Progress is reported in batches (every `_PROGRESS_EVERY` files or 250 ms), not per file.
+_MANIFEST_NAME = "_decrypt_manifest.db"
+_TASK_FILES = 64
+_PROGRESS_EVERY = 200
+_PROGRESS_INTERVAL_SEC = 0.25
+_MANIFEST_FLUSH_ROWS = 1000
+_MANIFEST_FLUSH_SEC = 2.0
+
+_HEX = frozenset("0123456789abcdefABCDEF")
+
+
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+def _bulk_decrypt_workers() -> int:
+    default = max(1, min(8, (os.cpu_count() or 2) - 1))
+    return _env_int("WECHAT_TOOL_MEDIA_DECRYPT_WORKERS", default, min_v=1, max_v=32)
+
+
+def get_decrypt_manifest_path(account_dir: Path) -> Path:
+    return _get_resource_dir(Path(account_dir)) / _MANIFEST_NAME
+
+
+_ACTIVE: dict[str, threading.Event] = {}
+_ACTIVE_GUARD = threading.Lock()
+
+
+def begin_bulk_decrypt(account: str) -> Optional[threading.Event]:
+    """Register a run for `account`; returns its cancel event, or None when one is already running."""
+
+    with _ACTIVE_GUARD:
+        prev = _ACTIVE.get(account)
+        if prev is not None and not prev.is_set():
+            return None
+        ev = threading.Event()
+        _ACTIVE[account] = ev
+        return ev
+
+
+def end_bulk_decrypt(account: str, cancel: threading.Event) -> None:
+    with _ACTIVE_GUARD:
+        if _ACTIVE.get(account) is cancel:
+            del _ACTIVE[account]
+
+
+def cancel_bulk_decrypt(account: str) -> bool:
+    with _ACTIVE_GUARD:
+        ev = _ACTIVE.get(account)
+    if ev is None or ev.is_set():
+        return False
+    ev.set()
+    return True
+
+
+def _iter_dat_dirs(wxid_dir: Path) -> Iterator[list[tuple[str, str, int, int]]]:
+    """Yield each directory's `[(path, md5, size, mtime_ns), ...]` (only `{md5}[_x].dat` names)."""
+
+    stack = [str(wxid_dir / "msg" / "attach"), str(wxid_dir / "cache")]
+    stack.reverse()
+    while stack:
+        cur = stack.pop()
+        files: list[tuple[str, str, int, int]] = []
+        subdirs: list[str] = []
+        try:
+            with os.scandir(cur) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                            continue
+                        name = entry.name
+                        if not name.lower().endswith(".dat"):
+                            continue
+                        stem = name[:-4]
+                        md5 = stem.split("_")[0] if "_" in stem else stem
+                        if len(md5) != 32 or not _HEX.issuperset(md5):
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                        files.append((entry.path, md5.lower(), int(st.st_size), int(st.st_mtime_ns)))
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        subdirs.sort(reverse=True)
+        stack.extend(subdirs)
+        if files:
+            files.sort(key=lambda f: f[0])
+            yield files
+
+
+def _decrypt_task(
+    account_dir_str: str,
+    groups: list[tuple[str, list[str]]],
+    xor_key: int,
+    aes_key: Optional[bytes],
+) -> list[tuple[str, str, str, str]]:
+    """Decrypt md5 groups (runs in a worker process); returns `(src, status, message, output_path)` per file.
+
+    Variants are tried best-first; once one succeeds the rest of its group are skips, like the old serial loop.
+    """
+
+    account_dir = Path(account_dir_str)
+    out: list[tuple[str, str, str, str]] = []
+    for md5, srcs in groups:
+        done_path = ""
+        for src in srcs:
+            if done_path:
+                out.append((src, "skip", "已存在", done_path))
+                continue
+            ok, msg = _decrypt_and_save_resource(Path(src), md5, account_dir, xor_key, aes_key)
+            if ok:
+                done_path = msg
+                out.append((src, "success", "解密成功", msg))
+            else:
+                out.append((src, "fail", msg, ""))
+    return out
+
+
+class _Manifest:
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                src TEXT PRIMARY KEY,
+                md5 TEXT NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                mtime_ns INTEGER NOT NULL DEFAULT 0,
+                out_path TEXT NOT NULL DEFAULT '',
+                done_at INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.commit()
+        self.pending: list[tuple[str, str, int, int, str, int]] = []
+        self.flushed_at = time.time()
+
+    def load(self) -> tuple[dict[str, tuple[int, int, str]], dict[str, str]]:
+        by_src: dict[str, tuple[int, int, str]] = {}
+        by_md5: dict[str, str] = {}
+        for src, md5, size, mtime_ns, out_path in self.conn.execute(
+            "SELECT src, md5, size, mtime_ns, out_path FROM sources"
+        ):
+            by_src[str(src)] = (int(size or 0), int(mtime_ns or 0), str(out_path or ""))
+            if out_path:
+                by_md5[str(md5)] = str(out_path)
+        return by_src, by_md5
+
+    def record(self, src: str, md5: str, size: int, mtime_ns: int, out_path: str) -> None:
+        self.pending.append((src, md5, int(size), int(mtime_ns), out_path, int(time.time())))
+        if len(self.pending) >= _MANIFEST_FLUSH_ROWS or time.time() - self.flushed_at >= _MANIFEST_FLUSH_SEC:
+            self.flush()
+
+    def flush(self) -> None:
+        self.flushed_at = time.time()
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO sources VALUES(?, ?, ?, ?, ?, ?)", rows)
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+
+
+def _open_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    if workers <= 1:
+        return None
+    try:
+        # "spawn" everywhere: forking a server process that already runs threads can deadlock (see chat_search_index).
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    except Exception as e:
+        logger.warning("[media_decrypt] process pool unavailable, decrypting inline: %s", e)
+        return None
+
+
+def run_bulk_decrypt(
+    account_dir: Path,
+    wxid_dir: Path,
+    xor_key: int,
+    aes_key: Optional[bytes],
+    *,
+    cancel: Optional[threading.Event] = None,
+    on_progress: Optional[Callable[[dict[str, Any]], None]] = None,
+    workers: Optional[int] = None,
+) -> dict[str, Any]:
+    """Decrypt every .dat image under `wxid_dir` into `account_dir/resource`; returns the final counters."""
+
+    account_dir = Path(account_dir)
+    cancel = cancel or threading.Event()
+    resource_dir = _get_resource_dir(account_dir)
+    resource_dir.mkdir(parents=True, exist_ok=True)
+    workers = int(workers) if workers else _bulk_decrypt_workers()
+
+    manifest = _Manifest(get_decrypt_manifest_path(account_dir))
+    by_src, by_md5 = manifest.load()
+    sizes: dict[str, tuple[int, int]] = {}
+
+    c = {"total": 0, "current": 0, "success_count": 0, "skip_count": 0, "fail_count": 0, "manifest_skip": 0}
+    failed_files: list[dict[str, str]] = []
+    last = {"file": "", "status": "", "message": "", "emitted_at": 0.0, "emitted_count": 0}
+    scan_done = False
+    started = time.time()
+
+    def emit(force: bool = False) -> None:
+        if on_progress is None:
+            return
+        now = time.time()
+        if not force and (c["current"] - last["emitted_count"] < _PROGRESS_EVERY) and (
+            now - last["emitted_at"] < _PROGRESS_INTERVAL_SEC
+        ):
+            return
+        last["emitted_at"] = now
+        last["emitted_count"] = c["current"]
+        elapsed = max(0.001, now - started)
+        on_progress(
+            {
+                "type": "progress",
+                **{k: c[k] for k in ("current", "total", "success_count", "skip_count", "fail_count")},
+                "scan_done": scan_done,
+                "files_per_sec": round(c["current"] / elapsed, 1),
+                "current_file": last["file"],
+                "status": last["status"],
+                "message": last["message"],
+            }
+        )
+
+    def on_result(src: str, status: str, msg: str, out_path: str) -> None:
+        c["current"] += 1
+        md5 = Path(src).name[:32].lower()
+        size, mtime_ns = sizes.pop(src, (0, 0))
+        if status == "fail":
+            c["fail_count"] += 1
+            logger.warning(f"[media_decrypt] 解密失败: {src} - {msg}")
+            if len(failed_files) < 100:
+                failed_files.append({"file": Path(src).name, "md5": md5, "error": msg})
+        else:
+            c["success_count" if status == "success" else "skip_count"] += 1
+            by_md5[md5] = out_path
+            manifest.record(src, md5, size, mtime_ns, out_path)
+        last["file"], last["status"], last["message"] = Path(src).name, status, msg
+
+    def skip(src: str, md5: str, size: int, mtime_ns: int, out_path: str, *, record: bool) -> None:
+        c["current"] += 1
+        c["skip_count"] += 1
+        if record:
+            manifest.record(src, md5, size, mtime_ns, out_path)
+        last["file"], last["status"], last["message"] = Path(src).name, "skip", "已存在"
+
+    pool = _open_pool(workers)
+    in_flight: set[Future] = set()
+    # Future -> its task, so a task that blows up still counts every one of its files toward `current`.
+    task_of: dict[Future, list[tuple[str, list[str]]]] = {}
+    queued_md5: set[str] = set()
+    task: list[tuple[str, list[str]]] = []
+    task_files = 0
+    max_in_flight = max(2, workers * 2)
+
+    def submit() -> None:
+        nonlocal task, task_files
+        if not task:
+            return
+        if pool is None:
+            fut: Future = Future()
+            try:
+                fut.set_result(_decrypt_task(str(account_dir), task, xor_key, aes_key))
+            except Exception as e:
+                fut.set_exception(e)
+        else:
+            fut = pool.submit(_decrypt_task, str(account_dir), task, xor_key, aes_key)
+        in_flight.add(fut)
+        task_of[fut] = task
+        task, task_files = [], 0
+
+    scanner = _iter_dat_dirs(Path(wxid_dir))
+    try:
+        while True:
+            while (not cancel.is_set()) and (not scan_done) and len(in_flight) < max_in_flight:
+                files = next(scanner, None)
+                if files is None:
+                    scan_done = True
+                    break
+                c["total"] += len(files)
+                groups: dict[str, list[tuple[str, int, int]]] = {}
+                for src, md5, size, mtime_ns in files:
+                    prev = by_src.get(src)
+                    if prev and prev[0] == size and prev[1] == mtime_ns and prev[2] and os.path.exists(prev[2]):
+                        c["manifest_skip"] += 1
+                        skip(src, md5, size, mtime_ns, prev[2], record=False)
+                        continue
+                    done_path = by_md5.get(md5)
+                    if done_path and os.path.exists(done_path):
+                        skip(src, md5, size, mtime_ns, done_path, record=True)
+                        continue
+                    if md5 in queued_md5 and md5 not in groups:
+                        # Another directory's variant is already queued in this run.
+                        skip(src, md5, size, mtime_ns, "", record=False)
+                        continue
+                    if md5 not in groups:
+                        existing = _try_find_decrypted_resource(account_dir, md5)
+                        if existing is not None:
+                            by_md5[md5] = str(existing)
+                            skip(src, md5, size, mtime_ns, str(existing), record=True)
+                            continue
+                    groups.setdefault(md5, []).append((src, size, mtime_ns))
+                for md5, variants in groups.items():
+                    variants.sort(key=lambda v: (_variant_rank(Path(v[0]).name[:-4]), v[0]))
+                    for src, size, mtime_ns in variants:
+                        sizes[src] = (size, mtime_ns)
+                    queued_md5.add(md5)
+                    task.append((md5, [v[0] for v in variants]))
+                    task_files += len(variants)
+                if task_files >= _TASK_FILES:
+                    submit()
+                emit()
+            if scan_done and not cancel.is_set():
+                submit()
+
+            if cancel.is_set():
+                for fut in list(in_flight):
+                    if fut.cancel():
+                        in_flight.discard(fut)
+                        task_of.pop(fut, None)
+            if not in_flight:
+                if scan_done or cancel.is_set():
+                    break
+                continue
+
+            done, _ = wait(in_flight, timeout=_PROGRESS_INTERVAL_SEC, return_when=FIRST_COMPLETED)
+            for fut in done:
+                in_flight.discard(fut)
+                failed_task = task_of.pop(fut, [])
+                try:
+                    results = fut.result()
+                except Exception as e:
+                    logger.exception("[media_decrypt] worker task failed")
+                    err = f"worker task failed: {e}"
+                    results = [(src, "fail", err, "") for _md5, srcs in failed_task for src in srcs]
+                for src, status, msg, out_path in results:
+                    on_result(src, status, msg, out_path)
+            emit()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        manifest.close()
+
+    cancelled = cancel.is_set() and not (scan_done and not task and not in_flight)
+    duration = round(time.time() - started, 3)
+    logger.info(
+        "[media_decrypt] %s account=%s total=%s success=%s skip=%s (manifest=%s) fail=%s workers=%s durationSec=%s",
+        "cancelled" if cancelled else "done",
+        account_dir.name,
+        c["total"],
+        c["success_count"],
+        c["skip_count"],
+        c["manifest_skip"],
+        c["fail_count"],
+        workers,
+        duration,
+    )
+    emit(force=True)
+    return {
+        **c,
+        "cancelled": bool(cancelled),
+        "scan_done": scan_done,
+        "output_dir": str(resource_dir),
+        "failed_files": failed_files,
+        "duration_sec": duration,
+    }
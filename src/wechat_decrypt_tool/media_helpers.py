@@ -5,19 +5,24 @@ import hashlib
 import ipaddress
 import json
 import mimetypes
+import mmap
 import os
 import re
 import sqlite3
 import struct
+from contextlib import contextmanager
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterator, Optional, Union
 from urllib.parse import urlparse
 
 from fastapi import HTTPException
 
+from . import http_client
 from .app_paths import get_output_databases_dir
 from .logging_config import get_logger
+from .media_locator import locate_media_files
+from .sqlite_pool import connect_readonly
 
 logger = get_logger(__name__)
 
@@ -327,36 +332,14 @@ def _download_http_bytes(url: str, *, timeout: int = 20, max_bytes: int = 30 * 1
         raise HTTPException(status_code=400, detail="Unsafe URL.")
 
     try:
-        import requests
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"requests not available: {e}")
-
-    try:
-        with requests.get(url, stream=True, timeout=timeout) as r:
-            r.raise_for_status()
-            try:
-                cl = int(r.headers.get("content-length") or 0)
-                if cl and cl > int(max_bytes):
-                    raise HTTPException(status_code=413, detail="Remote file too large.")
-            except HTTPException:
-                raise
-            except Exception:
-                pass
-
-            chunks: list[bytes] = []
-            total = 0
-            for chunk in r.iter_content(chunk_size=256 * 1024):
-                if not chunk:
-                    continue
-                chunks.append(chunk)
-                total += len(chunk)
-                if total > int(max_bytes):
-                    raise HTTPException(status_code=413, detail="Remote file too large.")
-            return b"".join(chunks)
-    except HTTPException:
-        raise
+        res = http_client.fetch_bytes(url, timeout=timeout, max_bytes=int(max_bytes))
+    except http_client.ResponseTooLarge:
+        raise HTTPException(status_code=413, detail="Remote file too large.")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Download failed: {e}")
+    if not res.ok:
+        raise HTTPException(status_code=502, detail=f"Download failed: http {res.status_code}")
+    return res.content
 
 
 def _decrypt_emoticon_aes_cbc(data: bytes, aes_key_hex: str) -> Optional[bytes]:
@@ -406,7 +389,7 @@ def _lookup_emoticon_info(account_dir_str: str, md5: str) -> dict[str, str]:
     if not db_path.exists():
         return {}
 
-    conn = sqlite3.connect(str(db_path))
+    conn = connect_readonly(db_path)
     conn.row_factory = sqlite3.Row
     try:
         row = conn.execute(
@@ -716,6 +699,27 @@ def _resolve_hardlink_dir2id_table_name(conn: sqlite3.Connection) -> Optional[st
     return str(rows[0][0]) if rows[0] and rows[0][0] else None
 
 
+def _rglob_media_files(wxid_dir: Path, base: Path, file_name: str, *, limit: int) -> list[Path]:
+    """`base.rglob(file_name)` (files only, at most `limit`), answered by the media locator index when it can."""
+    located = locate_media_files(wxid_dir, [base], [glob.escape(file_name)], key=file_name, limit=limit)
+    if located is not None:
+        return located
+
+    hits: list[Path] = []
+    try:
+        for p in base.rglob(file_name):
+            try:
+                if p.is_file():
+                    hits.append(p)
+                    if len(hits) >= limit:
+                        break
+            except Exception:
+                continue
+    except Exception:
+        return []
+    return hits
+
+
 def _resolve_media_path_from_hardlink(
     hardlink_db_path: Path,
     wxid_dir: Path,
@@ -873,24 +877,15 @@ def _resolve_media_path_from_hardlink(
 
                             # Fallback: scan within the month directory for the exact file_name.
                             if guessed_month:
-                                try:
-                                    for p in d.rglob(file_name):
-                                        try:
-                                            if p.is_file():
-                                                return p
-                                        except Exception:
-                                            continue
-                                except Exception:
-                                    pass
+                                hits = _rglob_media_files(wxid_dir, d, file_name, limit=1)
+                                if hits:
+                                    return hits[0]
 
                 # Final fallback: locate by name under msg/video and cache.
                 for base in _iter_video_base_dirs(wxid_dir):
-                    try:
-                        for p in base.rglob(file_name):
-                            if p.is_file():
-                                return p
-                    except Exception:
-                        pass
+                    hits = _rglob_media_files(wxid_dir, base, file_name, limit=1)
+                    if hits:
+                        return hits[0]
                 return None
 
             if kind_key == "file":
@@ -1016,36 +1011,13 @@ def _resolve_media_path_from_hardlink(
                         except Exception:
                             pass
 
-                        hits: list[Path] = []
-                        try:
-                            for p in month_dir.rglob(file_name):
-                                try:
-                                    if p.is_file():
-                                        hits.append(p)
-                                        if len(hits) >= 20:
-                                            break
-                                except Exception:
-                                    continue
-                        except Exception:
-                            hits = []
-
+                        hits = _rglob_media_files(wxid_dir, month_dir, file_name, limit=20)
                         best = _pick_best_hit(hits)
                         if best:
                             return best
 
                     # Final fallback: search across all months (covers rare nesting patterns)
-                    hits_all: list[Path] = []
-                    try:
-                        for p in base.rglob(file_name):
-                            try:
-                                if p.is_file():
-                                    hits_all.append(p)
-                                    if len(hits_all) >= 50:
-                                        break
-                            except Exception:
-                                continue
-                    except Exception:
-                        hits_all = []
+                    hits_all = _rglob_media_files(wxid_dir, base, file_name, limit=50)
 
                     best_all = _pick_best_hit(hits_all)
                     if best_all:
@@ -1273,6 +1245,10 @@ def _fallback_search_media_by_md5(weixin_root_str: str, md5: str, kind: str = ""
             f"{md5}*.mp4",
         ]
 
+    located = locate_media_files(root, search_dirs, patterns, key=md5)
+    if located is not None:
+        return str(located[0]) if located else None
+
     for d in search_dirs:
         try:
             if not d.exists() or not d.is_dir():
@@ -1302,7 +1278,7 @@ def _guess_media_type_by_path(path: Path, fallback: str = "application/octet-str
     return fallback
 
 
-def _try_xor_decrypt_by_magic(data: bytes) -> tuple[Optional[bytes], Optional[str]]:
+def _try_xor_decrypt_by_magic(data: Union[bytes, memoryview]) -> tuple[Optional[bytes], Optional[str]]:
     if not data:
         return None, None
 
@@ -1345,7 +1321,7 @@ def _try_xor_decrypt_by_magic(data: bytes) -> tuple[Optional[bytes], Optional[st
         if not ok:
             continue
 
-        decoded = bytes(b ^ key for b in data)
+        decoded = _xor_bytes(data, key)
 
         if magic == b"wxgf":
             try:
@@ -1387,9 +1363,10 @@ def _try_xor_decrypt_by_magic(data: bytes) -> tuple[Optional[bytes], Optional[st
         preview_len = 8192
 
     if preview_len > 0:
+        preview = bytes(data[:preview_len])
         for key in range(256):
             try:
-                pv = bytes(b ^ key for b in data[:preview_len])
+                pv = _xor_bytes(preview, key)
             except Exception:
                 continue
             try:
@@ -1403,7 +1380,7 @@ def _try_xor_decrypt_by_magic(data: bytes) -> tuple[Optional[bytes], Optional[st
                     or (scan.find(b"RIFF") >= 0)
                     or (scan.find(b"ftyp") >= 0)
                 ):
-                    decoded = bytes(b ^ key for b in data)
+                    decoded = _xor_bytes(data, key)
                     dec2, mt2 = _try_strip_media_prefix(decoded)
                     if mt2 != "application/octet-stream":
                         if mt2.startswith("image/") and (not _is_probably_valid_image(dec2, mt2)):
@@ -1415,10 +1392,10 @@ def _try_xor_decrypt_by_magic(data: bytes) -> tuple[Optional[bytes], Optional[st
     return None, None
 
 
-def _detect_wechat_dat_version(data: bytes) -> int:
+def _detect_wechat_dat_version(data: Union[bytes, memoryview]) -> int:
     if not data or len(data) < 6:
         return -1
-    sig = data[:6]
+    sig = bytes(data[:6])
     if sig == b"\x07\x08V1\x08\x07":
         return 1
     if sig == b"\x07\x08V2\x08\x07":
@@ -1500,6 +1477,10 @@ def _fallback_search_media_by_file_id(
             ]
         )
 
+    located = locate_media_files(root, uniq_dirs, patterns, key=fid)
+    if located is not None:
+        return str(located[0]) if located else None
+
     for d in uniq_dirs:
         try:
             if not d.exists() or not d.is_dir():
@@ -1539,19 +1520,58 @@ def _save_media_keys(account_dir: Path, xor_key: int, aes_key16: Optional[bytes]
         pass
 
 
-def _decrypt_wechat_dat_v3(data: bytes, xor_key: int) -> bytes:
-    return bytes(b ^ xor_key for b in data)
+# Single-byte XOR via `bytes.translate`: the per-byte loop runs in C (~1 GB/s) instead of a Python generator.
+_XOR_TABLES: tuple[bytes, ...] = tuple(bytes(b ^ k for b in range(256)) for k in range(256))
+
+# Files at least this large are memory-mapped instead of read into a bytes object.
+_MMAP_MIN_BYTES = 256 * 1024
+
+
+def _xor_bytes(data: Union[bytes, bytearray, memoryview], key: int) -> bytes:
+    if not isinstance(data, bytes):
+        data = bytes(data)
+    return data.translate(_XOR_TABLES[int(key) & 0xFF])
+
+
+@contextmanager
+def _open_media_view(path: Path) -> Iterator[Union[bytes, memoryview]]:
+    """Read-only view of a media file: a memoryview over an mmap for large files, plain bytes otherwise."""
+    with open(path, "rb") as f:
+        try:
+            size = os.fstat(f.fileno()).st_size
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size >= _MMAP_MIN_BYTES else None
+        except (OSError, ValueError):
+            mm = None
+        if mm is None:
+            yield f.read()
+            return
+        view = memoryview(mm)
+        try:
+            yield view
+        finally:
+            view.release()
+            try:
+                mm.close()
+            except BufferError:
+                # A slice is still referenced (e.g. by a traceback); the map closes when it is collected.
+                pass
+
+
+def _decrypt_wechat_dat_v3(data: Union[bytes, memoryview], xor_key: int) -> bytes:
+    return _xor_bytes(data, xor_key)
 
 
-def _decrypt_wechat_dat_v4(data: bytes, xor_key: int, aes_key: bytes) -> bytes:
+def _decrypt_wechat_dat_v4(data: Union[bytes, memoryview], xor_key: int, aes_key: bytes) -> bytes:
     from Crypto.Cipher import AES
     from Crypto.Util import Padding
 
-    header, rest = data[:0xF], data[0xF:]
+    # Slice through a memoryview: the raw middle section is copied exactly once, into the joined output.
+    view = memoryview(data)
+    header, rest = bytes(view[:0xF]), view[0xF:]
     signature, aes_size, xor_size = struct.unpack("<6sLLx", header)
     aes_size += AES.block_size - aes_size % AES.block_size
 
-    aes_data = rest[:aes_size]
+    aes_data = bytes(rest[:aes_size])
     raw_data = rest[aes_size:]
 
     cipher = AES.new(aes_key[:16], AES.MODE_ECB)
@@ -1560,11 +1580,11 @@ def _decrypt_wechat_dat_v4(data: bytes, xor_key: int, aes_key: bytes) -> bytes:
     if xor_size > 0:
         raw_data = rest[aes_size:-xor_size]
         xor_data = rest[-xor_size:]
-        xored_data = bytes(b ^ xor_key for b in xor_data)
+        xored_data = _xor_bytes(xor_data, xor_key)
     else:
         xored_data = b""
 
-    return decrypted_data + raw_data + xored_data
+    return b"".join((decrypted_data, raw_data, xored_data))
 
 
 def _load_media_keys(account_dir: Path) -> dict[str, Any]:
@@ -1641,8 +1661,10 @@ def _read_and_maybe_decrypt_media(
     if mt != "application/octet-stream":
         return path.read_bytes(), mt
 
+    data = path.read_bytes()
+
     if head.startswith(b"wxgf"):
-        data0 = path.read_bytes()
+        data0 = data
         converted0 = _wxgf_to_image_bytes(data0)
         if converted0:
             mt0 = _detect_image_media_type(converted0[:32])
@@ -1655,8 +1677,7 @@ def _read_and_maybe_decrypt_media(
         idx = -1
     if 0 < idx <= 4:
         try:
-            data0 = path.read_bytes()
-            payload0 = data0[idx:]
+            payload0 = data[idx:]
             converted0 = _wxgf_to_image_bytes(payload0)
             if converted0:
                 mt0 = _detect_image_media_type(converted0[:32])
@@ -1666,7 +1687,7 @@ def _read_and_maybe_decrypt_media(
             pass
 
     try:
-        data_pref = path.read_bytes()
+        data_pref = data
         # Only accept prefix stripping when it looks like a real image/video,
         # otherwise encrypted/random bytes may trigger false positives.
         stripped, mtp = _try_strip_media_prefix(data_pref)
@@ -1678,8 +1699,6 @@ def _read_and_maybe_decrypt_media(
     except Exception:
         pass
 
-    data = path.read_bytes()
-
     # Try WeChat .dat v1/v2 decrypt.
     version = _detect_wechat_dat_version(data)
     if version in (0, 1, 2):
@@ -1885,32 +1904,32 @@ def _decrypt_and_save_resource(
         (success, message)
     """
     try:
-        data = dat_path.read_bytes()
-        if not data:
-            return False, "文件为空"
-
-        version = _detect_wechat_dat_version(data)
-        decrypted: Optional[bytes] = None
-
-        if version == 0:
-            # V3: 纯XOR解密
-            decrypted = _decrypt_wechat_dat_v3(data, xor_key)
-        elif version == 1:
-            # V4-V1: 使用固定AES密钥
-            decrypted = _decrypt_wechat_dat_v4(data, xor_key, b"cfcd208495d565ef")
-        elif version == 2:
-            # V4-V2: 需要动态AES密钥
-            if aes_key and len(aes_key) >= 16:
-                decrypted = _decrypt_wechat_dat_v4(data, xor_key, aes_key[:16])
-            else:
-                return False, "V4-V2版本需要AES密钥"
-        else:
-            # 尝试简单XOR解密
-            dec, mt = _try_xor_decrypt_by_magic(data)
-            if dec:
-                decrypted = dec
+        with _open_media_view(dat_path) as data:
+            if not data:
+                return False, "文件为空"
+
+            version = _detect_wechat_dat_version(data)
+            decrypted: Optional[bytes] = None
+
+            if version == 0:
+                # V3: 纯XOR解密
+                decrypted = _decrypt_wechat_dat_v3(data, xor_key)
+            elif version == 1:
+                # V4-V1: 使用固定AES密钥
+                decrypted = _decrypt_wechat_dat_v4(data, xor_key, b"cfcd208495d565ef")
+            elif version == 2:
+                # V4-V2: 需要动态AES密钥
+                if aes_key and len(aes_key) >= 16:
+                    decrypted = _decrypt_wechat_dat_v4(data, xor_key, aes_key[:16])
+                else:
+                    return False, "V4-V2版本需要AES密钥"
             else:
-                return False, f"未知加密版本: {version}"
+                # 尝试简单XOR解密
+                dec, mt = _try_xor_decrypt_by_magic(data)
+                if dec:
+                    decrypted = dec
+                else:
+                    return False, f"未知加密版本: {version}"
 
         if not decrypted:
             return False, "解密结果为空"
@@ -0,0 +1,507 @@
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from .app_paths import get_output_dir
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Persistent per-wxid media locator: file name -> (directory, kind, size, mtime) for every file under the
+# WeChat media trees we used to `rglob` (msg/attach, msg/file, msg/video, cache, emoji dirs).
+#
+# - Built once by a single `os.scandir` walk in the background; until it is ready, callers keep their rglob
+#   fallback.
+# - Each directory's mtime_ns is stored. A refresh stats every known directory and rescans only the ones whose
+#   mtime changed (a file added / removed / renamed in a directory bumps that directory's mtime), so keeping
+#   the index current costs one stat per directory instead of a walk over every file.
+# - Lookups match the same glob patterns the rglob fallbacks used, in the same (directory, pattern) order.
+#   A miss triggers at most one throttled incremental refresh before the answer is trusted.
+# - Candidates come from indexed columns: `lname` range scans for `{key}*` patterns, and the md5 token
+#   extracted from each name (`token`) for `*{md5}*` patterns. `instr()` over every row is only used for a
+#   substring key that is not an md5.
+_SCHEMA_VERSION = 2
+
+# (path relative to the wxid dir, kind)
+_AREAS: tuple[tuple[str, str], ...] = (
+    ("msg/attach", "image"),
+    ("msg/file", "file"),
+    ("msg/video", "video"),
+    ("msg/emoji", "emoji"),
+    ("msg/emoticon", "emoji"),
+    ("cache", "cache"),
+    ("video", "video"),
+    ("emoji", "emoji"),
+    ("emoticon", "emoji"),
+)
+
+_BATCH = 5000
+
+# A standalone 32-hex run inside a file name: the md5 WeChat names media after.
+_NAME_MD5_RE = re.compile(r"(?<![0-9a-f])[0-9a-f]{32}(?![0-9a-f])")
+_MD5_KEY_RE = re.compile(r"[0-9a-f]{32}")
+
+
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+_REFRESH_INTERVAL_SEC = _env_int("WECHAT_TOOL_MEDIA_INDEX_REFRESH_SEC", 30, min_v=0, max_v=24 * 3600)
+
+
+def is_media_locator_enabled() -> bool:
+    v = str(os.environ.get("WECHAT_TOOL_MEDIA_INDEX", "1") or "").strip().lower()
+    return v not in {"", "0", "false", "off", "no"}
+
+
+def _safe_segment(value: str) -> str:
+    cleaned = re.sub(r"[^0-9A-Za-z._-]+", "_", str(value or "").strip())
+    cleaned = cleaned.strip("._-")
+    return cleaned or "default"
+
+
+def _root_key(wxid_dir: Path) -> str:
+    return os.path.normcase(os.path.abspath(str(wxid_dir)))
+
+
+def get_media_locator_db_path(wxid_dir: Path) -> Path:
+    key = _root_key(wxid_dir)
+    digest = hashlib.sha1(key.encode("utf-8", errors="surrogatepass")).hexdigest()[:10]
+    return get_output_dir() / "media_index" / f"{_safe_segment(Path(wxid_dir).name)}_{digest}.db"
+
+
+@dataclass
+class _LocatorState:
+    root: Path
+    db_path: Path
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    ready: bool = False
+    building: bool = False
+    last_refresh: float = 0.0
+
+
+_STATES: dict[str, _LocatorState] = {}
+_STATES_GUARD = threading.Lock()
+
+_STATS_LOCK = threading.Lock()
+_STATS: dict[str, int] = {"builds": 0, "refreshes": 0, "rescannedDirs": 0, "hits": 0, "misses": 0, "notReady": 0}
+
+
+def _bump(key: str, n: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[key] = _STATS.get(key, 0) + n
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _ensure_schema(conn: sqlite3.Connection, *, reset: bool = False) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+    if reset or row is None or str(row[0] or "") != str(_SCHEMA_VERSION):
+        conn.execute("DROP TABLE IF EXISTS files")
+        conn.execute("DROP TABLE IF EXISTS dirs")
+        conn.execute("DELETE FROM meta WHERE key = 'built_at'")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS dirs (
+            rel_dir TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS files (
+            rel_dir TEXT NOT NULL,
+            name TEXT NOT NULL,
+            lname TEXT NOT NULL,
+            kind TEXT NOT NULL DEFAULT '',
+            size INTEGER NOT NULL DEFAULT 0,
+            mtime_ns INTEGER NOT NULL DEFAULT 0,
+            token TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (rel_dir, name)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_lname ON files(lname)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_token ON files(token)")
+    conn.execute(
+        "INSERT OR REPLACE INTO meta(key, value) VALUES('schema_version', ?)",
+        (str(_SCHEMA_VERSION),),
+    )
+
+
+_INSERT_FILE_SQL = "INSERT OR REPLACE INTO files VALUES(?, ?, ?, ?, ?, ?, ?)"
+
+
+def _kind_for(rel_dir: str) -> str:
+    for area, kind in _AREAS:
+        if rel_dir == area or rel_dir.startswith(area + "/"):
+            return kind
+    return ""
+
+
+def _name_token(lname: str) -> str:
+    m = _NAME_MD5_RE.search(lname)
+    return m.group(0) if m else ""
+
+
+def _file_row(rel_dir: str, kind: str, name: str, size: int, mtime_ns: int) -> tuple[str, str, str, str, int, int, str]:
+    lname = name.lower()
+    return rel_dir, name, lname, kind, size, mtime_ns, _name_token(lname)
+
+
+def _abs(root: Path, rel_dir: str) -> str:
+    return os.path.join(str(root), *rel_dir.split("/")) if rel_dir else str(root)
+
+
+def _list_dir(root: Path, rel_dir: str) -> Optional[tuple[int, list[tuple[str, int, int]], list[str]]]:
+    """(dir mtime_ns, files [(name, size, mtime_ns)], subdir names); None when the directory is gone."""
+
+    full = _abs(root, rel_dir)
+    try:
+        # Stat before listing: an entry created while we list bumps the mtime again and is picked up next time.
+        mtime_ns = int(os.stat(full).st_mtime_ns)
+        it = os.scandir(full)
+    except OSError:
+        return None
+    files: list[tuple[str, int, int]] = []
+    subdirs: list[str] = []
+    with it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    files.append((entry.name, int(st.st_size), int(st.st_mtime_ns)))
+            except OSError:
+                continue
+    return mtime_ns, files, subdirs
+
+
+def _index_tree(conn: sqlite3.Connection, root: Path, rel_dir: str) -> int:
+    """Walk `rel_dir` (and everything below it) into the index; returns the number of directories scanned."""
+
+    stack = [rel_dir]
+    pending: list[tuple[str, str, str, str, int, int, str]] = []
+    scanned = 0
+    while stack:
+        cur = stack.pop()
+        listed = _list_dir(root, cur)
+        if listed is None:
+            continue
+        mtime_ns, files, subdirs = listed
+        scanned += 1
+        conn.execute("INSERT OR REPLACE INTO dirs(rel_dir, mtime_ns) VALUES(?, ?)", (cur, mtime_ns))
+        kind = _kind_for(cur)
+        pending.extend(_file_row(cur, kind, name, size, mt) for name, size, mt in files)
+        if len(pending) >= _BATCH:
+            conn.executemany(_INSERT_FILE_SQL, pending)
+            pending = []
+        stack.extend(f"{cur}/{name}" for name in subdirs)
+    if pending:
+        conn.executemany(_INSERT_FILE_SQL, pending)
+    return scanned
+
+
+def _delete_subtree(conn: sqlite3.Connection, rel_dir: str) -> None:
+    lo, hi = rel_dir + "/", rel_dir + "0"  # "0" sorts right after "/"
+    conn.execute("DELETE FROM dirs WHERE rel_dir = ? OR (rel_dir >= ? AND rel_dir < ?)", (rel_dir, lo, hi))
+    conn.execute("DELETE FROM files WHERE rel_dir = ? OR (rel_dir >= ? AND rel_dir < ?)", (rel_dir, lo, hi))
+
+
+def _build(state: _LocatorState) -> dict[str, Any]:
+    started = time.time()
+    conn = _connect(state.db_path)
+    try:
+        with conn:
+            _ensure_schema(conn, reset=True)
+            scanned = 0
+            for area, _kind in _AREAS:
+                scanned += _index_tree(conn, state.root, area)
+            conn.execute(
+                "INSERT OR REPLACE INTO meta(key, value) VALUES('built_at', ?)",
+                (str(int(time.time())),),
+            )
+        files = int(conn.execute("SELECT COUNT(1) FROM files").fetchone()[0] or 0)
+    finally:
+        conn.close()
+    duration = round(time.time() - started, 3)
+    _bump("builds")
+    logger.info(
+        "[media_locator] build done root=%s dirs=%s files=%s durationSec=%s",
+        state.root,
+        scanned,
+        files,
+        duration,
+    )
+    return {"dirs": scanned, "files": files, "durationSec": duration}
+
+
+def _refresh(state: _LocatorState) -> int:
+    """Rescan directories whose mtime changed since they were indexed; returns how many were rescanned."""
+
+    conn = _connect(state.db_path)
+    try:
+        known = {str(r[0]): int(r[1] or 0) for r in conn.execute("SELECT rel_dir, mtime_ns FROM dirs").fetchall()}
+        changed: list[str] = []
+        removed: list[str] = []
+        for rel_dir, mtime_ns in known.items():
+            try:
+                cur = int(os.stat(_abs(state.root, rel_dir)).st_mtime_ns)
+            except OSError:
+                removed.append(rel_dir)
+                continue
+            if cur != mtime_ns:
+                changed.append(rel_dir)
+        new_areas = [area for area, _kind in _AREAS if area not in known]
+
+        rescanned = 0
+        with conn:
+            for rel_dir in removed:
+                _delete_subtree(conn, rel_dir)
+            for rel_dir in changed:
+                listed = _list_dir(state.root, rel_dir)
+                if listed is None:
+                    _delete_subtree(conn, rel_dir)
+                    continue
+                mtime_ns, files, subdirs = listed
+                rescanned += 1
+                kind = _kind_for(rel_dir)
+                conn.execute("DELETE FROM files WHERE rel_dir = ?", (rel_dir,))
+                conn.executemany(_INSERT_FILE_SQL, [_file_row(rel_dir, kind, name, size, mt) for name, size, mt in files])
+                conn.execute("UPDATE dirs SET mtime_ns = ? WHERE rel_dir = ?", (mtime_ns, rel_dir))
+                for name in subdirs:
+                    sub = f"{rel_dir}/{name}"
+                    if sub not in known:
+                        rescanned += _index_tree(conn, state.root, sub)
+            for area in new_areas:
+                rescanned += _index_tree(conn, state.root, area)
+    finally:
+        conn.close()
+    _bump("refreshes")
+    if rescanned:
+        _bump("rescannedDirs", rescanned)
+        logger.info("[media_locator] refresh root=%s rescannedDirs=%s", state.root, rescanned)
+    return rescanned
+
+
+def _has_index(db_path: Path) -> bool:
+    if not db_path.exists():
+        return False
+    try:
+        conn = sqlite3.connect(str(db_path), timeout=5)
+        try:
+            rows = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return str(rows.get("schema_version") or "") == str(_SCHEMA_VERSION) and bool(rows.get("built_at"))
+
+
+def _run_in_background(state: _LocatorState, fn: Callable[[_LocatorState], Any]) -> None:
+    from .executors import submit_blocking
+
+    def _job() -> None:
+        try:
+            with state.lock:
+                fn(state)
+                state.ready = True
+                state.last_refresh = time.time()
+        finally:
+            state.building = False
+
+    state.building = True
+    submit_blocking("index", _job)
+
+
+def _get_state(wxid_dir: Path, *, background: bool = True) -> _LocatorState:
+    key = _root_key(wxid_dir)
+    with _STATES_GUARD:
+        state = _STATES.get(key)
+        if state is not None:
+            return state
+        state = _LocatorState(root=Path(key), db_path=get_media_locator_db_path(wxid_dir))
+        _STATES[key] = state
+        if not background:
+            return state
+        if _has_index(state.db_path):
+            # Usable right away; catch up on whatever changed while we were not running.
+            state.ready = True
+            _run_in_background(state, _refresh)
+        else:
+            _run_in_background(state, _build)
+        return state
+
+
+def _rel_to_root(state: _LocatorState, d: Path) -> Optional[str]:
+    root = str(state.root)
+    for cand in (d, _resolved(d)):
+        p = os.path.normcase(os.path.abspath(str(cand)))
+        if p == root:
+            return ""
+        if p.startswith(root.rstrip(os.sep) + os.sep):
+            return p[len(root.rstrip(os.sep)) + 1 :].replace(os.sep, "/")
+    return None
+
+
+def _resolved(p: Path) -> Path:
+    try:
+        return p.resolve()
+    except Exception:
+        return p
+
+
+def _is_covered(rel_dir: str) -> bool:
+    return any(rel_dir == area or rel_dir.startswith(area + "/") for area, _kind in _AREAS)
+
+
+def _query(state: _LocatorState, key: str, contains: bool) -> list[tuple[str, str]]:
+    conn = sqlite3.connect(str(state.db_path), timeout=30)
+    try:
+        if contains and _MD5_KEY_RE.fullmatch(key):
+            # Names holding the md5 as a standalone token, plus names starting with it (longer hex runs).
+            rows = conn.execute(
+                "SELECT rel_dir, name FROM files WHERE token = ? "
+                "UNION SELECT rel_dir, name FROM files WHERE lname >= ? AND lname < ?",
+                (key, key, key + "\U0010ffff"),
+            ).fetchall()
+        elif contains:
+            rows = conn.execute("SELECT rel_dir, name FROM files WHERE instr(lname, ?) > 0", (key,)).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT rel_dir, name FROM files WHERE lname >= ? AND lname < ?",
+                (key, key + "\U0010ffff"),
+            ).fetchall()
+    finally:
+        conn.close()
+    return sorted((str(r[0]), str(r[1])) for r in rows)
+
+
+def _match(
+    state: _LocatorState,
+    rows: list[tuple[str, str]],
+    rel_dirs: list[str],
+    patterns: list[str],
+    limit: int,
+) -> list[Path]:
+    lowered = [p.lower() for p in patterns]
+    out: list[Path] = []
+    seen: set[tuple[str, str]] = set()
+    for rel_dir in rel_dirs:
+        prefix = rel_dir + "/"
+        in_dir = [r for r in rows if r[0] == rel_dir or r[0].startswith(prefix)]
+        for pat in lowered:
+            for row in in_dir:
+                if row in seen or not fnmatch.fnmatchcase(row[1].lower(), pat):
+                    continue
+                p = Path(_abs(state.root, row[0])) / row[1]
+                if not p.is_file():
+                    continue
+                seen.add(row)
+                out.append(p)
+                if len(out) >= limit:
+                    return out
+    return out
+
+
+def locate_media_files(
+    wxid_dir: Path,
+    search_dirs: list[Path],
+    patterns: list[str],
+    *,
+    key: str,
+    limit: int = 1,
+) -> Optional[list[Path]]:
+    """Index-backed replacement for `for d in search_dirs: for pat in patterns: d.rglob(pat)`.
+
+    `key` is the literal part every pattern starts with (md5 / file_id / file name); patterns starting with
+    `*` are matched by substring. Returns None when the index cannot answer yet (still building, disabled, or a
+    search dir outside the indexed trees) so the caller can fall back to its filesystem search.
+    """
+
+    lkey = str(key or "").strip().lower()
+    if (not lkey) or (not patterns) or (not is_media_locator_enabled()):
+        return None
+    state = _get_state(Path(wxid_dir))
+    if not state.ready:
+        _bump("notReady")
+        return None
+
+    rel_dirs: list[str] = []
+    for d in search_dirs:
+        rel = _rel_to_root(state, Path(d))
+        if rel is None or not _is_covered(rel):
+            return None
+        if rel not in rel_dirs:
+            rel_dirs.append(rel)
+
+    contains = any(str(p).startswith("*") for p in patterns)
+    try:
+        hits = _match(state, _query(state, lkey, contains), rel_dirs, patterns, limit)
+        if not hits and time.time() - state.last_refresh >= _REFRESH_INTERVAL_SEC and state.lock.acquire(blocking=False):
+            try:
+                state.last_refresh = time.time()
+                if _refresh(state):
+                    hits = _match(state, _query(state, lkey, contains), rel_dirs, patterns, limit)
+            finally:
+                state.lock.release()
+    except sqlite3.Error:
+        logger.exception("[media_locator] lookup failed root=%s", state.root)
+        return None
+
+    _bump("hits" if hits else "misses")
+    return hits
+
+
+def build_media_locator(wxid_dir: Path, *, rebuild: bool = False) -> dict[str, Any]:
+    """Build (or incrementally refresh) the locator synchronously."""
+
+    state = _get_state(Path(wxid_dir), background=False)
+    with state.lock:
+        if rebuild or not _has_index(state.db_path):
+            out = _build(state)
+        else:
+            out = {"rescannedDirs": _refresh(state)}
+        state.ready = True
+        state.last_refresh = time.time()
+    return {"status": "success", "root": str(state.root), **out}
+
+
+def get_media_locator_stats() -> dict[str, Any]:
+    with _STATS_LOCK:
+        stats: dict[str, Any] = dict(_STATS)
+    with _STATES_GUARD:
+        states = list(_STATES.values())
+    stats["roots"] = [
+        {"root": str(s.root), "ready": bool(s.ready), "building": bool(s.building), "lastRefresh": int(s.last_refresh)}
+        for s in states
+    ]
+    stats["enabled"] = is_media_locator_enabled()
+    return stats
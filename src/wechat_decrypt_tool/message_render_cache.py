@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Bounded LRU of parsed chat messages (the dicts `_append_full_messages_from_rows` builds, before the
+# contact/avatar/transfer post-processing that depends on other messages).
+#
+# - Key: (account, db_stem, table_name, local_id, table_version). `table_version` is bumped whenever we
+#   write to a conversation table (edit / restore / realtime sync), so edited messages never hit old entries.
+# - Each entry also stores a row fingerprint (crc32 of the content columns + scalar columns + render context).
+#   Rows changed behind our back (re-decrypt, revoke rewritten in place, realtime source) simply miss.
+
+
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+_FINGERPRINT_COLUMNS = (
+    "local_type",
+    "server_id",
+    "create_time",
+    "sort_seq",
+    "real_sender_id",
+    "sender_username",
+    "message_content",
+    "compress_content",
+    "packed_info_data",
+)
+
+
+def message_row_fingerprint(row: Any, *context: Any) -> tuple[Any, ...]:
+    """Cheap identity of a message row's inputs; blobs are reduced to (len, crc32)."""
+
+    out: list[Any] = list(context)
+    for k in _FINGERPRINT_COLUMNS:
+        try:
+            v = row[k]
+        except Exception:
+            v = None
+        if isinstance(v, str):
+            v = v.encode("utf-8", errors="surrogatepass")
+        if isinstance(v, (bytes, bytearray, memoryview)):
+            b = bytes(v)
+            out.append((len(b), zlib.crc32(b)))
+        else:
+            out.append(v)
+    return tuple(out)
+
+
+class RenderedMessageCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(0, int(max_entries))
+        self._mu = threading.Lock()
+        self._entries: "OrderedDict[tuple[Any, ...], tuple[tuple[Any, ...], dict[str, Any], tuple[str, ...]]]" = (
+            OrderedDict()
+        )
+        self._versions: dict[tuple[str, str, str], int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _key(self, account: str, db_stem: str, table_name: str, local_id: int) -> tuple[Any, ...]:
+        tk = (str(account), str(db_stem), str(table_name).lower())
+        return (*tk, int(local_id), self._versions.get(tk, 0))
+
+    def get(
+        self,
+        account: str,
+        db_stem: str,
+        table_name: str,
+        local_id: int,
+        fingerprint: tuple[Any, ...],
+    ) -> Optional[tuple[dict[str, Any], tuple[str, ...]]]:
+        """Return (message copy, pat usernames) or None."""
+
+        if not self.enabled:
+            return None
+        with self._mu:
+            key = self._key(account, db_stem, table_name, local_id)
+            cached = self._entries.get(key)
+            if cached is None or cached[0] != fingerprint:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(cached[1]), cached[2]
+
+    def put(
+        self,
+        account: str,
+        db_stem: str,
+        table_name: str,
+        local_id: int,
+        fingerprint: tuple[Any, ...],
+        message: dict[str, Any],
+        pat_usernames: tuple[str, ...] = (),
+    ) -> None:
+        if not self.enabled:
+            return
+        with self._mu:
+            key = self._key(account, db_stem, table_name, local_id)
+            self._entries[key] = (fingerprint, dict(message), tuple(pat_usernames))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_table(self, account: str, db_stem: str, table_name: str) -> None:
+        """Bump the table version; old entries are never hit again and age out of the LRU."""
+
+        tk = (str(account), str(db_stem), str(table_name).lower())
+        with self._mu:
+            self._versions[tk] = self._versions.get(tk, 0) + 1
+
+    def invalidate_account(self, account: Optional[str] = None) -> int:
+        """Drop every entry of one account (or all); returns the number removed."""
+
+        with self._mu:
+            if account is None:
+                n = len(self._entries)
+                self._entries.clear()
+                self._versions.clear()
+                return n
+            acc = str(account)
+            doomed = [k for k in self._entries if k[0] == acc]
+            for k in doomed:
+                del self._entries[k]
+            for tk in [tk for tk in self._versions if tk[0] == acc]:
+                del self._versions[tk]
+            return len(doomed)
+
+    def stats(self) -> dict[str, Any]:
+        with self._mu:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(float(self.hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+RENDERED_MESSAGE_CACHE = RenderedMessageCache(_env_int("WECHAT_TOOL_RENDER_CACHE_SIZE", 20000, min_v=0, max_v=1_000_000))
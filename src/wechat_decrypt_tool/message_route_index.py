@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from .chat_helpers import _iter_message_db_paths, _quote_ident, _resolve_msg_table_name
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Per-account routing index: md5(username) -> the decrypted message shards holding that conversation's
+# `Msg_<md5>` table, with the table's create_time range and row count.
+#
+# - Built at decrypt time (or lazily on first lookup) and kept current by realtime sync / edits via
+#   `refresh_message_route`.
+# - Each shard is stamped with (mtime_ns, size); a shard that changed behind our back is rescanned on the next
+#   lookup, so table membership stays exact. The per-table stats are best-effort hints.
+# - The file name deliberately avoids "message" so `_iter_message_db_paths` never picks it up as a shard.
+# - Tables named with only a truncated md5 are also routed under "~<first 24 hex>" keys, mirroring the
+#   last-resort partial match of `_resolve_msg_table_name`; a shard's full-md5 table always wins.
+_SCHEMA_VERSION = 2
+_ROUTE_DB_NAME = "conversation_routes.db"
+
+_MD5_RE = re.compile(r"[0-9a-f]{32}")
+_HEX_RUN_RE = re.compile(r"[0-9a-f]{24,}")
+_PARTIAL_LEN = 24
+_PARTIAL_PREFIX = "~"
+
+_LOCKS: dict[str, threading.Lock] = {}
+_LOCKS_GUARD = threading.Lock()
+
+# account_dir -> (shard signatures, md5 -> [(db_stem, table_name, min_ct, max_ct, row_count)]).
+# Lets the hot path answer from memory after one stat() per shard.
+_MEMO: dict[str, tuple[dict[str, tuple[int, int]], dict[str, list[tuple[str, str, int, int, int]]]]] = {}
+
+
+@dataclass(frozen=True)
+class MessageRoute:
+    db_path: Path
+    table_name: str
+    min_create_time: int
+    max_create_time: int
+    row_count: int
+
+
+def get_message_route_index_db_path(account_dir: Path) -> Path:
+    return Path(account_dir) / _ROUTE_DB_NAME
+
+
+def _get_lock(key: str) -> threading.Lock:
+    with _LOCKS_GUARD:
+        lock = _LOCKS.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _LOCKS[key] = lock
+        return lock
+
+
+def _shard_signature(db_path: Path) -> Optional[tuple[int, int]]:
+    try:
+        st = db_path.stat()
+    except OSError:
+        return None
+    return int(st.st_mtime_ns), int(st.st_size)
+
+
+def _table_rank(name_lower: str, md5_hex: str) -> int:
+    # Same preference order as `_resolve_msg_table_name`.
+    if name_lower == f"msg_{md5_hex}":
+        return 0
+    if name_lower == f"chat_{md5_hex}":
+        return 1
+    if name_lower.startswith("msg_") or name_lower.startswith("chat_"):
+        return 2
+    return 3
+
+
+def _list_conversation_tables(conn: sqlite3.Connection) -> dict[str, str]:
+    best: dict[str, tuple[int, str]] = {}
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+    for r in rows:
+        if not r or not r[0]:
+            continue
+        name = str(r[0])
+        ln = name.lower()
+        for md5_hex in _MD5_RE.findall(ln):
+            rank = _table_rank(ln, md5_hex)
+            cur = best.get(md5_hex)
+            if cur is None or rank < cur[0]:
+                best[md5_hex] = (rank, name)
+        for run in _HEX_RUN_RE.findall(ln):
+            if len(run) >= 32:
+                continue
+            for i in range(len(run) - _PARTIAL_LEN + 1):
+                best.setdefault(_PARTIAL_PREFIX + run[i : i + _PARTIAL_LEN], (4, name))
+    return {md5_hex: name for md5_hex, (_, name) in best.items()}
+
+
+def _table_stats(conn: sqlite3.Connection, table_name: str) -> tuple[int, int, int]:
+    try:
+        row = conn.execute(
+            "SELECT MIN(CAST(create_time AS INTEGER)), MAX(CAST(create_time AS INTEGER)), COUNT(1) "
+            f"FROM {_quote_ident(table_name)}"
+        ).fetchone()
+    except Exception:
+        return 0, 0, 0
+    if not row:
+        return 0, 0, 0
+    return int(row[0] or 0), int(row[1] or 0), int(row[2] or 0)
+
+
+def _ensure_schema(conn: sqlite3.Connection, *, reset: bool = False) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+    if reset or row is None or str(row[0] or "") != str(_SCHEMA_VERSION):
+        conn.execute("DROP TABLE IF EXISTS routes")
+        conn.execute("DROP TABLE IF EXISTS shards")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS shards (
+            db_stem TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL DEFAULT 0,
+            size INTEGER NOT NULL DEFAULT 0,
+            built_at INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS routes (
+            username_md5 TEXT NOT NULL,
+            db_stem TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            min_create_time INTEGER NOT NULL DEFAULT 0,
+            max_create_time INTEGER NOT NULL DEFAULT 0,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username_md5, db_stem)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_routes_stem ON routes(db_stem)")
+    conn.execute(
+        "INSERT OR REPLACE INTO meta(key, value) VALUES('schema_version', ?)",
+        (str(_SCHEMA_VERSION),),
+    )
+
+
+def _scan_shard(
+    conn: sqlite3.Connection,
+    db_path: Path,
+    signature: tuple[int, int],
+    *,
+    keep_stats: bool = False,
+    fresh_tables: tuple[str, ...] = (),
+) -> int:
+    """(Re)write the routes of one shard. Returns the number of conversation tables found.
+
+    `keep_stats`: reuse stored stats for tables we already know (only new tables and `fresh_tables` are
+    aggregated); used after our own writes where a full rescan would be wasted work.
+    """
+
+    stem = db_path.stem
+    known: dict[str, tuple[str, int, int, int]] = {}
+    if keep_stats:
+        for md5_hex, table_name, mn, mx, cnt in conn.execute(
+            "SELECT username_md5, table_name, min_create_time, max_create_time, row_count FROM routes WHERE db_stem = ?",
+            (stem,),
+        ).fetchall():
+            known[str(md5_hex)] = (str(table_name), int(mn or 0), int(mx or 0), int(cnt or 0))
+    fresh = {str(t).lower() for t in fresh_tables if t}
+
+    rows: list[tuple[str, str, str, int, int, int]] = []
+    aggregated: dict[str, tuple[int, int, int]] = {}
+    shard_conn = sqlite3.connect(str(db_path))
+    try:
+        for md5_hex, table_name in _list_conversation_tables(shard_conn).items():
+            prev = known.get(md5_hex)
+            if prev is not None and prev[0] == table_name and table_name.lower() not in fresh:
+                stats = prev[1:]
+            else:
+                # A truncated-md5 table is listed under several partial keys; aggregate it once.
+                stats = aggregated.get(table_name)
+                if stats is None:
+                    stats = aggregated[table_name] = _table_stats(shard_conn, table_name)
+            rows.append((md5_hex, stem, table_name, *stats))
+    finally:
+        shard_conn.close()
+
+    conn.execute("DELETE FROM routes WHERE db_stem = ?", (stem,))
+    conn.executemany(
+        "INSERT OR REPLACE INTO routes(username_md5, db_stem, table_name, min_create_time, max_create_time, row_count) "
+        "VALUES(?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO shards(db_stem, mtime_ns, size, built_at) VALUES(?, ?, ?, ?)",
+        (stem, int(signature[0]), int(signature[1]), int(time.time())),
+    )
+    return len(rows)
+
+
+def _load_routes(conn: sqlite3.Connection) -> dict[str, list[tuple[str, str, int, int, int]]]:
+    out: dict[str, list[tuple[str, str, int, int, int]]] = {}
+    for md5_hex, stem, table_name, mn, mx, cnt in conn.execute(
+        "SELECT username_md5, db_stem, table_name, min_create_time, max_create_time, row_count FROM routes"
+    ).fetchall():
+        out.setdefault(str(md5_hex), []).append((str(stem), str(table_name), int(mn or 0), int(mx or 0), int(cnt or 0)))
+    return out
+
+
+def _sync_routes(
+    account_dir: Path, db_paths: list[Path], *, rebuild: bool = False
+) -> tuple[dict[str, list[tuple[str, str, int, int, int]]], int]:
+    """Bring the route index in line with the shards on disk. Returns (routes, rescanned shard count)."""
+
+    sigs: dict[str, tuple[int, int]] = {}
+    for p in db_paths:
+        sig = _shard_signature(p)
+        if sig is not None:
+            sigs[p.stem] = sig
+
+    key = str(Path(account_dir))
+    with _get_lock(key):
+        memo = _MEMO.get(key)
+        if memo is not None and not rebuild and memo[0] == sigs:
+            return memo[1], 0
+
+        conn = sqlite3.connect(str(get_message_route_index_db_path(account_dir)))
+        try:
+            _ensure_schema(conn, reset=rebuild)
+            stored = {
+                str(stem): (int(mtime_ns or 0), int(size or 0))
+                for stem, mtime_ns, size in conn.execute("SELECT db_stem, mtime_ns, size FROM shards").fetchall()
+            }
+            rescanned = 0
+            for stem in stored:
+                if stem not in sigs:
+                    conn.execute("DELETE FROM routes WHERE db_stem = ?", (stem,))
+                    conn.execute("DELETE FROM shards WHERE db_stem = ?", (stem,))
+            for p in db_paths:
+                sig = sigs.get(p.stem)
+                if sig is None or stored.get(p.stem) == sig:
+                    continue
+                _scan_shard(conn, p, sig)
+                rescanned += 1
+            conn.commit()
+            routes = _load_routes(conn)
+        finally:
+            conn.close()
+
+        _MEMO[key] = (sigs, routes)
+        if rescanned:
+            logger.info("[message_routes] rescanned account=%s shards=%s", Path(account_dir).name, rescanned)
+        return routes, rescanned
+
+
+def get_message_routes_bulk(account_dir: Path, usernames: list[str]) -> dict[str, list[MessageRoute]]:
+    """Route lookup for many conversations; shards are returned in `_iter_message_db_paths` order."""
+
+    account_dir = Path(account_dir)
+    uniq = list(dict.fromkeys([str(u or "").strip() for u in usernames if str(u or "").strip()]))
+    if not uniq:
+        return {}
+    db_paths = _iter_message_db_paths(account_dir)
+    if not db_paths:
+        return {u: [] for u in uniq}
+
+    routes, _ = _sync_routes(account_dir, db_paths)
+    order = {p.stem: i for i, p in enumerate(db_paths)}
+    stem_to_path = {p.stem: p for p in db_paths}
+    out: dict[str, list[MessageRoute]] = {}
+    for u in uniq:
+        md5_hex = hashlib.md5(u.encode("utf-8")).hexdigest()
+        items = [r for r in routes.get(md5_hex, []) if r[0] in stem_to_path]
+        full_stems = {r[0] for r in items}
+        items += [
+            r
+            for r in routes.get(_PARTIAL_PREFIX + md5_hex[:_PARTIAL_LEN], [])
+            if r[0] in stem_to_path and r[0] not in full_stems
+        ]
+        items.sort(key=lambda r: order[r[0]])
+        out[u] = [
+            MessageRoute(
+                db_path=stem_to_path[stem],
+                table_name=table_name,
+                min_create_time=mn,
+                max_create_time=mx,
+                row_count=cnt,
+            )
+            for stem, table_name, mn, mx, cnt in items
+        ]
+    return out
+
+
+def get_message_routes(account_dir: Path, username: str) -> list[MessageRoute]:
+    return get_message_routes_bulk(account_dir, [username]).get(str(username or "").strip(), [])
+
+
+def resolve_conversation_tables(
+    account_dir: Path, username: str, *, db_paths: Optional[list[Path]] = None
+) -> list[tuple[Path, str]]:
+    """(db_path, table_name) for every shard holding `username`, optionally restricted to `db_paths`.
+
+    Falls back to probing each shard's sqlite_master when the route index cannot be used.
+    """
+
+    uname = str(username or "").strip()
+    if not uname:
+        return []
+    try:
+        routes = get_message_routes(account_dir, uname)
+    except Exception:
+        logger.exception("message route lookup failed account=%s username=%s", Path(account_dir).name, uname)
+    else:
+        if db_paths is None:
+            return [(r.db_path, r.table_name) for r in routes]
+        by_path = {r.db_path: r.table_name for r in routes}
+        return [(p, by_path[p]) for p in db_paths if p in by_path]
+
+    out: list[tuple[Path, str]] = []
+    for db_path in db_paths if db_paths is not None else _iter_message_db_paths(account_dir):
+        conn = sqlite3.connect(str(db_path))
+        try:
+            table_name = _resolve_msg_table_name(conn, uname)
+        finally:
+            conn.close()
+        if table_name:
+            out.append((db_path, table_name))
+    return out
+
+
+def refresh_message_route(account_dir: Path, *, db_path: Path, table_name: str) -> None:
+    """Record a write we made to `db_path`: refresh that table's stats and restamp the shard.
+
+    Other tables in the shard keep their stats, but the shard's table list is re-read so conversations
+    created meanwhile are never missed.
+    """
+
+    account_dir = Path(account_dir)
+    db_path = Path(db_path)
+    sig = _shard_signature(db_path)
+    if sig is None:
+        return
+    key = str(account_dir)
+    with _get_lock(key):
+        conn = sqlite3.connect(str(get_message_route_index_db_path(account_dir)))
+        try:
+            _ensure_schema(conn)
+            _scan_shard(conn, db_path, sig, keep_stats=True, fresh_tables=(str(table_name or ""),))
+            conn.commit()
+        finally:
+            conn.close()
+        _MEMO.pop(key, None)
+
+
+def build_message_route_index(account_dir: Path, *, rebuild: bool = False) -> dict[str, Any]:
+    account_dir = Path(account_dir)
+    db_paths = _iter_message_db_paths(account_dir)
+    if not db_paths:
+        return {
+            "status": "error",
+            "account": account_dir.name,
+            "message": "No message databases found.",
+        }
+
+    started = time.time()
+    routes, rescanned = _sync_routes(account_dir, db_paths, rebuild=rebuild)
+    duration = round(time.time() - started, 3)
+    logger.info(
+        "[message_routes] build done account=%s shards=%s rescanned=%s conversations=%s durationSec=%s",
+        account_dir.name,
+        len(db_paths),
+        rescanned,
+        sum(1 for k in routes if not k.startswith(_PARTIAL_PREFIX)),
+        duration,
+    )
+    return {
+        "status": "success",
+        "account": account_dir.name,
+        "shards": len(db_paths),
+        "rescanned": int(rescanned),
+        "conversations": sum(1 for k in routes if not k.startswith(_PARTIAL_PREFIX)),
+        "durationSec": duration,
+    }
@@ -2,6 +2,8 @@ import os
 import re
 import sqlite3
 import asyncio
+import base64
+import heapq
 import json
 import shutil
 import time
@@ -14,16 +16,22 @@ from urllib.parse import quote
 
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from ..executors import run_blocking
 from ..logging_config import get_logger
 from ..chat_search_index import (
+    build_chat_search_match,
+    build_chat_search_query,
     get_chat_search_index_db_path,
+    get_chat_search_index_scan_source,
+    get_chat_search_index_tokenizer,
     get_chat_search_index_status,
+    reindex_chat_search_messages,
     start_chat_search_index_build,
+    update_chat_search_index,
 )
 from ..chat_helpers import (
     _build_avatar_url,
     _build_latest_message_preview,
-    _build_fts_query,
     _decode_message_content,
     _decode_sqlite_text,
     _extract_md5_from_packed_info,
@@ -67,10 +75,13 @@ from ..chat_helpers import (
     _to_char_token_text,
 )
 from ..media_helpers import _resolve_account_db_storage_dir, _try_find_decrypted_resource
+from ..message_render_cache import RENDERED_MESSAGE_CACHE, message_row_fingerprint
+from ..message_route_index import get_message_routes_bulk, refresh_message_route, resolve_conversation_tables
 from .. import chat_edit_store
 from ..app_paths import get_output_dir
 from ..key_store import remove_account_keys_from_store
 from ..path_fix import PathFixRoute
+from ..sqlite_pool import cached_table_info, connect_readonly, invalidate_sqlite_pool
 from ..session_last_message import (
     build_session_last_message_table,
     get_session_last_message_status,
@@ -534,6 +545,55 @@ def _realtime_sync_all_lock(account: str) -> threading.Lock:
         return lock
 
 
+def _update_search_index_after_sync(account_dir: Path, usernames: list[str]) -> None:
+    # Best-effort: keep the FTS index fresh after realtime sync appended rows (no-op while it is (re)building).
+    if not usernames:
+        return
+    try:
+        update_chat_search_index(account_dir, usernames=usernames)
+    except Exception:
+        logger.exception("update chat search index after sync failed account=%s", account_dir.name)
+
+
+def _note_message_table_write(
+    account_dir: Path,
+    *,
+    db_path: Path,
+    table_name: str,
+    rows_rewritten: bool = True,
+) -> None:
+    # Edits / restores / realtime backfills rewrite existing rows: drop their rendered copies.
+    # Pure appends (`rows_rewritten=False`) leave the cached messages valid.
+    if rows_rewritten:
+        RENDERED_MESSAGE_CACHE.invalidate_table(account_dir.name, db_path.stem, table_name)
+    # Best-effort: restamp the shard in the conversation routing index so our own writes don't force a rescan.
+    try:
+        refresh_message_route(account_dir, db_path=db_path, table_name=table_name)
+    except Exception:
+        logger.exception("refresh message route failed account=%s db=%s", account_dir.name, db_path.name)
+
+
+def _reindex_search_messages(
+    account_dir: Path,
+    *,
+    username: str,
+    db_stem: str,
+    table_name: str,
+    local_ids: list[int],
+) -> None:
+    # Best-effort: mirror message edits/resets into the FTS index without a rebuild.
+    try:
+        reindex_chat_search_messages(
+            account_dir,
+            username=username,
+            db_stem=db_stem,
+            table_name=table_name,
+            local_ids=local_ids,
+        )
+    except Exception:
+        logger.exception("re-index edited messages failed account=%s username=%s", account_dir.name, username)
+
+
 def _normalize_chat_source(value: Optional[str]) -> str:
     v = str(value or "").strip().lower()
     if not v or v in {"decrypted", "local", "sqlite"}:
@@ -704,20 +764,8 @@ async def stream_chat_realtime_events(
 
 
 def _resolve_decrypted_message_table(account_dir: Path, username: str) -> Optional[tuple[Path, str]]:
-    db_paths = _iter_message_db_paths(account_dir)
-    if not db_paths:
-        return None
-
-    for db_path in db_paths:
-        conn = sqlite3.connect(str(db_path))
-        try:
-            table_name = _resolve_msg_table_name(conn, username)
-            if table_name:
-                return db_path, table_name
-        finally:
-            conn.close()
-
-    return None
+    tables = resolve_conversation_tables(account_dir, username)
+    return tables[0] if tables else None
 
 
 def _local_month_range_epoch_seconds(*, year: int, month: int) -> tuple[int, int]:
@@ -850,6 +898,7 @@ def _ensure_decrypted_message_table(account_dir: Path, username: str) -> tuple[P
     finally:
         conn.close()
 
+    _note_message_table_write(account_dir, db_path=target_db, table_name=table_name)
     return target_db, table_name
 
 
@@ -882,6 +931,13 @@ def _resolve_decrypted_message_tables(
     if not db_paths:
         return {}
 
+    try:
+        routes = get_message_routes_bulk(account_dir, uniq)
+    except Exception:
+        logger.exception("bulk message route lookup failed account=%s", account_dir.name)
+    else:
+        return {u: (r[0].db_path, r[0].table_name) for u, r in routes.items() if r}
+
     remaining = {u for u in uniq if u}
     resolved: dict[str, tuple[Path, str]] = {}
     for db_path in db_paths:
@@ -1564,6 +1620,12 @@ def sync_chat_realtime_messages(
                 int(backfilled),
                 int(max_local_id),
             )
+            if inserted or backfilled:
+                _note_message_table_write(
+                    account_dir, db_path=msg_db_path, table_name=table_name, rows_rewritten=bool(backfilled)
+                )
+            if inserted:
+                _update_search_index_after_sync(account_dir, [username])
             return {
                 "status": "success",
                 "account": account_dir.name,
@@ -1917,6 +1979,10 @@ def _sync_chat_realtime_messages_for_table(
             finally:
                 sconn.close()
 
+        if inserted or backfilled:
+            _note_message_table_write(
+                account_dir, db_path=msg_db_path, table_name=table_name, rows_rewritten=bool(backfilled)
+            )
         return {
             "username": username,
             "scanned": int(scanned),
@@ -2178,6 +2244,7 @@ def sync_chat_realtime_messages_all(
         synced = 0
         skipped_missing_table = 0
         updated_sessions = 0
+        updated_usernames: list[str] = []
         errors: list[str] = []
 
         for uname in sync_usernames:
@@ -2205,6 +2272,7 @@ def sync_chat_realtime_messages_all(
                 inserted_total += ins
                 if ins:
                     updated_sessions += 1
+                    updated_usernames.append(uname)
                     logger.info(
                         "[%s] synced session account=%s username=%s inserted=%s scanned=%s",
                         trace_id,
@@ -2233,6 +2301,8 @@ def sync_chat_realtime_messages_all(
                 )
                 continue
 
+        _update_search_index_after_sync(account_dir, updated_usernames)
+
         elapsed_ms = int((time.time() - started) * 1000)
         if len(errors) > 20:
             errors = errors[:20] + [f"... and {len(errors) - 20} more"]
@@ -2289,6 +2359,42 @@ def _normalize_render_type_key(value: Any) -> str:
     return lower
 
 
+# Render types that only ever come from a single local_type family (see `_append_full_messages_from_rows`).
+# Everything else (appmsg-derived types, text, system, ...) needs the full parse to decide.
+_RENDER_TYPE_LOCAL_TYPES: dict[str, tuple[int, ...]] = {
+    "image": (3,),
+    "voice": (34,),
+    "video": (43, 62),
+    "emoji": (47,),
+    "voip": (50,),
+}
+
+# Realtime (WCDB) message scans: hard cap on rows walked per request, and the bounds for the adaptive window.
+_REALTIME_SCAN_MAX_ROWS = 50000
+_REALTIME_WINDOW_MIN_ROWS = 200
+_REALTIME_WINDOW_MAX_ROWS = 5000
+
+
+def _local_types_for_render_types(want_types: Optional[set[str]]) -> Optional[frozenset[int]]:
+    """local_type values that can produce `want_types`, or None when a row must be parsed to tell."""
+    if not want_types:
+        return None
+    out: set[int] = set()
+    for t in want_types:
+        local_types = _RENDER_TYPE_LOCAL_TYPES.get(t)
+        if local_types is None:
+            return None
+        out.update(local_types)
+    return frozenset(out)
+
+
+def _row_local_type(row: dict[str, Any]) -> int:
+    try:
+        return int(row.get("local_type") or 0)
+    except Exception:
+        return 0
+
+
 @router.get("/api/chat/search-index/status", summary="消息搜索索引状态")
 async def chat_search_index_status(account: Optional[str] = None):
     account_dir = _resolve_account_dir(account)
@@ -2416,11 +2522,15 @@ async def chat_search_index_senders(
         where_parts: list[str] = ["sender_username <> ''"]
         params: list[Any] = []
 
+        # MATCH needs the FTS table; plain per-conversation listings can scan the B-tree side table instead.
+        from_sql, ts_expr = "message_fts", "CAST(create_time AS INTEGER)"
         if message_q is not None:
-            fts_query = _build_fts_query(message_q)
-            if fts_query:
-                where_parts.insert(0, "message_fts MATCH ?")
-                params.append(fts_query)
+            match_sql, match_params = build_chat_search_match(message_q, get_chat_search_index_tokenizer(conn))
+            if match_sql:
+                where_parts.insert(0, match_sql)
+                params.extend(match_params)
+        else:
+            from_sql, ts_expr = get_chat_search_index_scan_source(conn) or (from_sql, ts_expr)
 
         if username is not None:
             where_parts.append("username = ?")
@@ -2457,10 +2567,10 @@ async def chat_search_index_senders(
             end_ts = 0
 
         if start_ts is not None:
-            where_parts.append("CAST(create_time AS INTEGER) >= ?")
+            where_parts.append(f"{ts_expr} >= ?")
             params.append(int(start_ts))
         if end_ts is not None:
-            where_parts.append("CAST(create_time AS INTEGER) <= ?")
+            where_parts.append(f"{ts_expr} <= ?")
             params.append(int(end_ts))
 
         if not include_hidden:
@@ -2474,7 +2584,7 @@ async def chat_search_index_senders(
             SELECT
                 sender_username AS sender_username,
                 COUNT(*) AS c
-            FROM message_fts
+            FROM {from_sql}
             WHERE {where_sql}
             GROUP BY sender_username
             ORDER BY c DESC, sender_username ASC
@@ -2522,6 +2632,27 @@ async def chat_search_index_senders(
     }
 
 
+def _append_cached_message(
+    hit: tuple[dict[str, Any], tuple[str, ...]],
+    *,
+    merged: list[dict[str, Any]],
+    sender_usernames: list[str],
+    quote_usernames: list[str],
+    pat_usernames: Optional[set[str]],
+) -> None:
+    # Replays the side outputs the parse loop would have produced for a cached message.
+    message, pats = hit
+    if pat_usernames is not None:
+        pat_usernames.update(pats)
+    su = str(message.get("senderUsername") or "")
+    if su:
+        sender_usernames.append(su)
+    qu = str(message.get("quoteUsername") or "")
+    if qu:
+        quote_usernames.append(qu)
+    merged.append(message)
+
+
 def _append_full_messages_from_rows(
     *,
     merged: list[dict[str, Any]],
@@ -2537,7 +2668,9 @@ def _append_full_messages_from_rows(
     my_rowid: Optional[int],
     resource_conn: Optional[sqlite3.Connection],
     resource_chat_id: Optional[int],
+    use_cache: bool = False,
 ) -> None:
+    # `use_cache`: only for rows read from the conversation itself (not edit previews of original rows).
     contact_conn: Optional[sqlite3.Connection] = None
     alias_cache: dict[str, str] = {}
     if is_group:
@@ -2550,6 +2683,20 @@ def _append_full_messages_from_rows(
 
     for r in rows:
         local_id = int(r["local_id"] or 0)
+        fingerprint: tuple[Any, ...] = ()
+        if use_cache:
+            fingerprint = message_row_fingerprint(r, "full", username, is_group, my_rowid, resource_conn is not None)
+            hit = RENDERED_MESSAGE_CACHE.get(account_dir.name, db_path.stem, table_name, local_id, fingerprint)
+            if hit is not None:
+                _append_cached_message(
+                    hit,
+                    merged=merged,
+                    sender_usernames=sender_usernames,
+                    quote_usernames=quote_usernames,
+                    pat_usernames=pat_usernames,
+                )
+                continue
+        row_pat_usernames: set[str] = set()
         create_time = int(r["create_time"] or 0)
         sort_seq = int(r["sort_seq"] or 0) if r["sort_seq"] is not None else 0
         local_type = int(r["local_type"] or 0)
@@ -2730,9 +2877,8 @@ def _append_full_messages_from_rows(
             render_type = "system"
             template = _extract_xml_tag_text(raw_text, "template")
             if template:
-                pat_usernames.update(
-                    {m.group(1) for m in re.finditer(r"\$\{([^}]+)\}", template) if m.group(1)}
-                )
+                row_pat_usernames = {m.group(1) for m in re.finditer(r"\$\{([^}]+)\}", template) if m.group(1)}
+                pat_usernames.update(row_pat_usernames)
                 content_text = "[拍一拍]"
             else:
                 content_text = "[拍一拍]"
@@ -3037,6 +3183,10 @@ def _append_full_messages_from_rows(
                 "_rawText": raw_text if local_type == 266287972401 else "",
             }
         )
+        if use_cache:
+            RENDERED_MESSAGE_CACHE.put(
+                account_dir.name, db_path.stem, table_name, local_id, fingerprint, merged[-1], tuple(row_pat_usernames)
+            )
 
     if contact_conn is not None:
         try:
@@ -3562,6 +3712,9 @@ def delete_chat_account(account: str):
             # Ignore export cleanup failure; account dir removal is the core operation.
             pass
 
+    # Pooled read-only handles would keep the files open (and block the delete on Windows).
+    invalidate_sqlite_pool(account_dir)
+    RENDERED_MESSAGE_CACHE.invalidate_account(account_dir.name)
     try:
         shutil.rmtree(account_dir)
     except Exception as e:
@@ -4015,7 +4168,9 @@ def _collect_chat_messages(
     resource_chat_id: Optional[int],
     take: int,
     want_types: Optional[set[str]],
+    before: Optional[tuple[int, int, int, str]] = None,
 ) -> tuple[list[dict[str, Any]], bool, list[str], list[str], set[str]]:
+    # `before`: keyset bound (create_time, sort_seq, local_id, db_stem); only strictly older rows are read.
     is_group = bool(username.endswith("@chatroom"))
     take = int(take)
     if take < 0:
@@ -4034,18 +4189,24 @@ def _collect_chat_messages(
         try:
             contact_db_path = account_dir / "contact.db"
             if contact_db_path.exists():
-                contact_conn = sqlite3.connect(str(contact_db_path))
+                contact_conn = connect_readonly(contact_db_path)
         except Exception:
             contact_conn = None
 
-    for db_path in db_paths:
-        conn = sqlite3.connect(str(db_path))
+    shard_order = {p.stem: i for i, p in enumerate(db_paths)}
+    for db_path, table_name in resolve_conversation_tables(account_dir, username, db_paths=db_paths):
+        where_sql = ""
+        where_params: list[Any] = []
+        if before is not None:
+            # Ties on (create_time, sort_seq, local_id) keep shard order, so later shards may repeat the key.
+            later_shard = shard_order.get(db_path.stem, -1) > shard_order.get(before[3], len(db_paths))
+            op = "<=" if later_shard else "<"
+            where_sql = f"WHERE (m.create_time, COALESCE(m.sort_seq, 0), m.local_id) {op} (?, ?, ?) "
+            where_params = [int(before[0]), int(before[1]), int(before[2])]
+
+        conn = connect_readonly(db_path)
         conn.row_factory = sqlite3.Row
         try:
-            table_name = _resolve_msg_table_name(conn, username)
-            if not table_name:
-                continue
-
             my_wxid = account_dir.name
             my_rowid = None
             try:
@@ -4061,7 +4222,7 @@ def _collect_chat_messages(
             quoted_table = _quote_ident(table_name)
             has_packed_info_data = False
             try:
-                cols = conn.execute(f"PRAGMA table_info({quoted_table})").fetchall()
+                cols = cached_table_info(conn, table_name)
                 has_packed_info_data = any(str(c[1] or "").strip().lower() == "packed_info_data" for c in cols)
             except Exception:
                 has_packed_info_data = False
@@ -4077,6 +4238,7 @@ def _collect_chat_messages(
                 + "n.user_name AS sender_username "
                 f"FROM {quoted_table} m "
                 "LEFT JOIN Name2Id n ON m.real_sender_id = n.rowid "
+                f"{where_sql}"
                 "ORDER BY m.create_time DESC, m.sort_seq DESC, m.local_id DESC "
                 "LIMIT ?"
             )
@@ -4087,6 +4249,7 @@ def _collect_chat_messages(
                 + packed_select
                 + "'' AS sender_username "
                 f"FROM {quoted_table} m "
+                f"{where_sql}"
                 "ORDER BY m.create_time DESC, m.sort_seq DESC, m.local_id DESC "
                 "LIMIT ?"
             )
@@ -4096,15 +4259,31 @@ def _collect_chat_messages(
             conn.text_factory = bytes
 
             try:
-                rows = conn.execute(sql_with_join, (take_probe,)).fetchall()
+                rows = conn.execute(sql_with_join, (*where_params, take_probe)).fetchall()
             except Exception:
-                rows = conn.execute(sql_no_join, (take_probe,)).fetchall()
+                rows = conn.execute(sql_no_join, (*where_params, take_probe)).fetchall()
             if len(rows) > take:
                 has_more_any = True
                 rows = rows[:take]
 
             for r in rows:
                 local_id = int(r["local_id"] or 0)
+                fingerprint = message_row_fingerprint(r, "list", username, is_group, my_rowid, resource_conn is not None)
+                hit = RENDERED_MESSAGE_CACHE.get(account_dir.name, db_path.stem, table_name, local_id, fingerprint)
+                if hit is not None:
+                    pat_usernames.update(hit[1])
+                    rt_key = _normalize_render_type_key(str(hit[0].get("renderType") or ""))
+                    if want_types is not None and rt_key not in want_types:
+                        continue
+                    _append_cached_message(
+                        hit,
+                        merged=merged,
+                        sender_usernames=sender_usernames,
+                        quote_usernames=quote_usernames,
+                        pat_usernames=None,
+                    )
+                    continue
+                row_pat_usernames: set[str] = set()
                 create_time = int(r["create_time"] or 0)
                 sort_seq = int(r["sort_seq"] or 0) if r["sort_seq"] is not None else 0
                 local_type = int(r["local_type"] or 0)
@@ -4239,7 +4418,8 @@ def _collect_chat_messages(
                     template = _extract_xml_tag_text(raw_text, "template")
                     if template:
                         # import re
-                        pat_usernames.update({m.group(1) for m in re.finditer(r"\$\{([^}]+)\}", template) if m.group(1)})
+                        row_pat_usernames = {m.group(1) for m in re.finditer(r"\$\{([^}]+)\}", template) if m.group(1)}
+                        pat_usernames.update(row_pat_usernames)
                         content_text = "[拍一拍]"
                     else:
                         content_text = "[拍一拍]"
@@ -4529,6 +4709,9 @@ def _collect_chat_messages(
                         "_rawText": raw_text if local_type == 266287972401 else "",
                     }
                 )
+                RENDERED_MESSAGE_CACHE.put(
+                    account_dir.name, db_path.stem, table_name, local_id, fingerprint, merged[-1], tuple(row_pat_usernames)
+                )
         finally:
             conn.close()
 
@@ -4541,6 +4724,88 @@ def _collect_chat_messages(
     return merged, has_more_any, sender_usernames, quote_usernames, pat_usernames
 
 
+def _message_sort_key(m: dict[str, Any]) -> tuple[int, int, int]:
+    return (int(m.get("createTime") or 0), int(m.get("sortSeq") or 0), int(m.get("localId") or 0))
+
+
+def _encode_messages_cursor(m: dict[str, Any]) -> str:
+    db_stem = str(m.get("id") or "").split(":", 1)[0]
+    raw = json.dumps([*_message_sort_key(m), db_stem], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_messages_cursor(cursor: str) -> Optional[tuple[int, int, int, str]]:
+    s = str(cursor or "").strip()
+    if not s:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(s + "=" * (-len(s) % 4)).decode("utf-8")
+        create_time, sort_seq, local_id, db_stem = json.loads(raw)
+        return int(create_time), int(sort_seq), int(local_id), str(db_stem)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def _collect_chat_messages_page(
+    *,
+    username: str,
+    account_dir: Path,
+    db_paths: list[Path],
+    resource_conn: Optional[sqlite3.Connection],
+    resource_chat_id: Optional[int],
+    limit: int,
+    want_types: Optional[set[str]],
+    before: Optional[tuple[int, int, int, str]],
+) -> tuple[list[dict[str, Any]], bool, list[str], list[str], set[str]]:
+    """Keyset page: up to `limit` messages older than `before`, newest first.
+
+    Each round reads at most `limit + 1` rows per shard past the cursor, k-way merges the per-shard runs and
+    consumes the newest `limit`; rounds only repeat while a render-type filter leaves the page short. Deep
+    history therefore costs O(limit) per page instead of O(offset).
+    """
+
+    limit = max(1, int(limit))
+    page: list[dict[str, Any]] = []
+    sender_usernames: list[str] = []
+    quote_usernames: list[str] = []
+    pat_usernames: set[str] = set()
+    has_more = False
+
+    while True:
+        batch, shard_has_more, senders, quotes, pats = _collect_chat_messages(
+            username=username,
+            account_dir=account_dir,
+            db_paths=db_paths,
+            resource_conn=resource_conn,
+            resource_chat_id=resource_chat_id,
+            take=limit,
+            want_types=None,
+            before=before,
+        )
+        sender_usernames.extend(senders)
+        quote_usernames.extend(quotes)
+        pat_usernames.update(pats)
+
+        runs: dict[str, list[dict[str, Any]]] = {}
+        for m in batch:
+            runs.setdefault(str(m.get("id") or "").split(":", 1)[0], []).append(m)
+        window = list(heapq.merge(*runs.values(), key=_message_sort_key, reverse=True))[:limit]
+        exhausted = (not shard_has_more) and len(batch) <= limit
+
+        for i, m in enumerate(window):
+            if want_types is not None and _normalize_render_type_key(m.get("renderType")) not in want_types:
+                continue
+            page.append(m)
+            if len(page) >= limit:
+                has_more = (i < len(window) - 1) or not exhausted
+                return page, has_more, sender_usernames, quote_usernames, pat_usernames
+
+        if exhausted or not window:
+            return page, False, sender_usernames, quote_usernames, pat_usernames
+        last = window[-1]
+        before = (*_message_sort_key(last), str(last.get("id") or "").split(":", 1)[0])
+
+
 @router.get("/api/chat/messages/daily_counts", summary="获取某月每日消息数（热力图）")
 def get_chat_message_daily_counts(
     username: str,
@@ -4569,13 +4834,10 @@ def get_chat_message_daily_counts(
 
     counts: dict[str, int] = {}
 
-    for db_path in db_paths:
-        conn = sqlite3.connect(str(db_path))
+    for db_path, table_name in resolve_conversation_tables(account_dir, username, db_paths=db_paths):
+        conn = connect_readonly(db_path)
         try:
             try:
-                table_name = _resolve_msg_table_name(conn, username)
-                if not table_name:
-                    continue
                 quoted_table = _quote_ident(table_name)
                 rows = conn.execute(
                     "SELECT strftime('%Y-%m-%d', CAST(create_time AS INTEGER), 'unixepoch', 'localtime') AS day, "
@@ -4649,13 +4911,10 @@ def get_chat_message_anchor(
     best_anchor_id = ""
     best_create_time = 0
 
-    for db_path in db_paths:
-        conn = sqlite3.connect(str(db_path))
+    for db_path, table_name in resolve_conversation_tables(account_dir, username, db_paths=db_paths):
+        conn = connect_readonly(db_path)
         try:
             try:
-                table_name = _resolve_msg_table_name(conn, username)
-                if not table_name:
-                    continue
                 quoted_table = _quote_ident(table_name)
 
                 if kind_norm == "first":
@@ -4727,7 +4986,14 @@ def list_chat_messages(
     order: str = "asc",
     render_types: Optional[str] = None,
     source: Optional[str] = None,
+    cursor: Optional[str] = None,
 ):
+    """
+    分页方式：
+    - offset：默认；每页需要读取并合并 offset+limit 条消息，越往前翻越慢。
+    - cursor：传入 cursor（首页传空字符串）启用游标分页，响应中的 nextCursor 用于获取更早的一页；
+      每页只读取 limit 量级的数据，与翻页深度无关。仅对解密库生效（realtime 仍按 offset）。
+    """
     if not username:
         raise HTTPException(status_code=400, detail="Missing username.")
     if limit <= 0:
@@ -4738,6 +5004,11 @@ def list_chat_messages(
         offset = 0
 
     source_norm = _normalize_chat_source(source)
+    cursor_mode = cursor is not None and source_norm != "realtime"
+    before: Optional[tuple[int, int, int, str]] = None
+    if cursor_mode:
+        before = _decode_messages_cursor(str(cursor))
+        offset = 0
     account_dir = _resolve_account_dir(account)
     contact_db_path = account_dir / "contact.db"
     head_image_db_path = account_dir / "head_image.db"
@@ -4761,7 +5032,7 @@ def list_chat_messages(
     resource_chat_id: Optional[int] = None
     try:
         if message_resource_db_path.exists():
-            resource_conn = sqlite3.connect(str(message_resource_db_path))
+            resource_conn = connect_readonly(message_resource_db_path)
             resource_conn.row_factory = sqlite3.Row
             resource_chat_id = _resource_lookup_chat_id(resource_conn, username)
     except Exception:
@@ -4833,26 +5104,32 @@ def list_chat_messages(
         table_name = f"msg_{hashlib.md5(username.encode('utf-8')).hexdigest()}"
         rt_db_path = Path(f"realtime_{account_dir.name}.db")
 
+        # Walk newest -> oldest in offset windows; every WCDB row is fetched and parsed once. Without a
+        # render-type filter the first window (offset + limit + 1) is the whole answer; with one, later windows
+        # are sized from the hit rate seen so far, and rows whose local_type cannot yield a wanted render type
+        # are dropped before the (expensive) full parse.
+        need = int(offset) + int(limit)
+        allowed_local_types = _local_types_for_render_types(want_types)
+        fetched = 0
+        hits = 0
+        window = need + 1
         while True:
-            probe = int(scan_take) + 1
-            if probe <= 0:
-                probe = 1
-            if probe > 50000:
-                probe = 50000
+            take = min(int(window), _REALTIME_SCAN_MAX_ROWS - fetched)
+            if take <= 0:
+                has_more_any = True
+                break
 
             with rt_conn.lock:
-                raw_rows = _wcdb_get_messages(rt_conn.handle, username, limit=probe, offset=0)
-            has_more_any = len(raw_rows) > int(scan_take)
-            raw_rows = raw_rows[: int(scan_take)] if int(scan_take) > 0 else []
-
-            merged = []
-            sender_usernames = []
-            quote_usernames = []
-            pat_usernames = set()
+                raw_rows = _wcdb_get_messages(rt_conn.handle, username, limit=take, offset=fetched)
+            fetched += len(raw_rows)
+            exhausted = len(raw_rows) < take
 
             norm_rows = [_normalize_wcdb_message_row(r) for r in raw_rows if isinstance(r, dict)]
+            if allowed_local_types is not None:
+                norm_rows = [r for r in norm_rows if _row_local_type(r) in allowed_local_types]
+            batch: list[dict[str, Any]] = []
             _append_full_messages_from_rows(
-                merged=merged,
+                merged=batch,
                 sender_usernames=sender_usernames,
                 quote_usernames=quote_usernames,
                 pat_usernames=pat_usernames,
@@ -4865,22 +5142,41 @@ def list_chat_messages(
                 my_rowid=None,
                 resource_conn=resource_conn,
                 resource_chat_id=resource_chat_id,
+                use_cache=True,
             )
-
             if want_types is not None:
-                merged = [m for m in merged if _normalize_render_type_key(m.get("renderType")) in want_types]
+                batch = [m for m in batch if _normalize_render_type_key(m.get("renderType")) in want_types]
+            hits += len(batch)
+            merged.extend(batch)
 
-            if want_types is None:
+            if exhausted:
+                has_more_any = False
                 break
-            if (len(merged) >= (int(offset) + int(limit))) or (not has_more_any):
+            if want_types is None or len(merged) >= need:
+                has_more_any = True
                 break
 
-            next_take = scan_take * 2 if scan_take > 0 else (int(limit) + int(offset))
-            if next_take <= scan_take:
-                break
-            if next_take > 50000:
-                next_take = 50000
-            scan_take = next_take
+            missing = need - len(merged)
+            rate = max(hits / fetched, 1.0 / _REALTIME_WINDOW_MAX_ROWS) if fetched > 0 else 1.0
+            window = max(_REALTIME_WINDOW_MIN_ROWS, min(_REALTIME_WINDOW_MAX_ROWS, int(missing / rate * 1.25) + 1))
+
+    elif cursor_mode:
+        (
+            merged,
+            has_more_any,
+            sender_usernames,
+            quote_usernames,
+            pat_usernames,
+        ) = _collect_chat_messages_page(
+            username=username,
+            account_dir=account_dir,
+            db_paths=db_paths,
+            resource_conn=resource_conn,
+            resource_chat_id=resource_chat_id,
+            limit=int(limit),
+            want_types=want_types,
+            before=before,
+        )
 
     else:
         while True:
@@ -4918,6 +5214,7 @@ def list_chat_messages(
         and (source is None or not str(source).strip())
         and (not merged)
         and int(offset) == 0
+        and before is None
     ):
         missing_table = False
         try:
@@ -4950,21 +5247,39 @@ def list_chat_messages(
                 except Exception:
                     pass
 
-                (
-                    merged,
-                    has_more_any,
-                    sender_usernames,
-                    quote_usernames,
-                    pat_usernames,
-                ) = _collect_chat_messages(
-                    username=username,
-                    account_dir=account_dir,
-                    db_paths=db_paths,
-                    resource_conn=resource_conn,
-                    resource_chat_id=resource_chat_id,
-                    take=scan_take,
-                    want_types=want_types,
-                )
+                if cursor_mode:
+                    (
+                        merged,
+                        has_more_any,
+                        sender_usernames,
+                        quote_usernames,
+                        pat_usernames,
+                    ) = _collect_chat_messages_page(
+                        username=username,
+                        account_dir=account_dir,
+                        db_paths=db_paths,
+                        resource_conn=resource_conn,
+                        resource_chat_id=resource_chat_id,
+                        limit=int(limit),
+                        want_types=want_types,
+                        before=None,
+                    )
+                else:
+                    (
+                        merged,
+                        has_more_any,
+                        sender_usernames,
+                        quote_usernames,
+                        pat_usernames,
+                    ) = _collect_chat_messages(
+                        username=username,
+                        account_dir=account_dir,
+                        db_paths=db_paths,
+                        resource_conn=resource_conn,
+                        resource_chat_id=resource_chat_id,
+                        take=scan_take,
+                        want_types=want_types,
+                    )
                 if want_types is not None:
                     merged = [m for m in merged if _normalize_render_type_key(m.get("renderType")) in want_types]
 
@@ -5449,6 +5764,9 @@ def list_chat_messages(
     merged.sort(key=sort_key, reverse=True)
     has_more_global = bool(has_more_any or (len(merged) > (int(offset) + int(limit))))
     page = merged[int(offset) : int(offset) + int(limit)]
+    extra: dict[str, Any] = {}
+    if cursor_mode:
+        extra["nextCursor"] = _encode_messages_cursor(page[-1]) if (page and has_more_global) else ""
     if want_asc:
         page = list(reversed(page))
 
@@ -5461,6 +5779,7 @@ def list_chat_messages(
             "total": int(offset) + (1 if has_more_global else 0),
             "hasMore": bool(has_more_global),
             "messages": [],
+            **extra,
         }
 
     messages_window = page
@@ -5721,10 +6040,11 @@ def list_chat_messages(
         "total": int(offset) + len(page) + (1 if has_more_global else 0),
         "hasMore": bool(has_more_global),
         "messages": page,
+        **extra,
     }
 
 
-async def _search_chat_messages_via_fts(
+def _search_chat_messages_via_fts(
     request: Request,
     *,
     q: str,
@@ -5833,71 +6153,32 @@ async def _search_chat_messages_via_fts(
             "message": "Search index is building. Please retry in a moment.",
         }
 
-    fts_query = _build_fts_query(q)
-    if not fts_query:
-        raise HTTPException(status_code=400, detail="Missing q.")
-
     index_db_path = get_chat_search_index_db_path(account_dir)
     conn = sqlite3.connect(str(index_db_path))
     conn.row_factory = sqlite3.Row
     try:
-        try:
-            where_parts: list[str] = ["message_fts MATCH ?"]
-            params: list[Any] = [fts_query]
-
-            if username:
-                where_parts.append("username = ?")
-                params.append(str(username))
-            elif session_type_norm == "group":
-                where_parts.append("username LIKE ?")
-                params.append("%@chatroom")
-            elif session_type_norm == "single":
-                where_parts.append("username NOT LIKE ?")
-                params.append("%@chatroom")
-
-            if sender:
-                where_parts.append("sender_username = ?")
-                params.append(str(sender))
+        match_sql, match_params = build_chat_search_match(q, get_chat_search_index_tokenizer(conn))
+        if not match_sql:
+            raise HTTPException(status_code=400, detail="Missing q.")
 
-            if want_types is not None:
-                types_sorted = sorted(want_types)
-                placeholders = ",".join(["?"] * len(types_sorted))
-                where_parts.append(f"render_type IN ({placeholders})")
-                params.extend(types_sorted)
-
-            if start_ts is not None:
-                where_parts.append("CAST(create_time AS INTEGER) >= ?")
-                params.append(int(start_ts))
-            if end_ts is not None:
-                where_parts.append("CAST(create_time AS INTEGER) <= ?")
-                params.append(int(end_ts))
-
-            if not include_hidden:
-                where_parts.append("CAST(is_hidden AS INTEGER) = 0")
-            if not include_official:
-                where_parts.append("CAST(is_official AS INTEGER) = 0")
-
-            where_sql = " AND ".join(where_parts)
-            total_row = conn.execute(f"SELECT COUNT(*) AS c FROM message_fts WHERE {where_sql}", params).fetchone()
+        try:
+            hits_sql, count_sql, params = build_chat_search_query(
+                conn,
+                match_sql,
+                match_params,
+                username=username,
+                session_type=session_type_norm,
+                sender=sender,
+                render_types=sorted(want_types) if want_types is not None else None,
+                start_ts=start_ts,
+                end_ts=end_ts,
+                include_hidden=include_hidden,
+                include_official=include_official,
+            )
+            total_row = conn.execute(count_sql, params).fetchone()
             total = int(total_row[0] or 0) if total_row is not None else 0
 
-            rows = conn.execute(
-                f"""
-                SELECT
-                    username,
-                    db_stem,
-                    table_name,
-                    local_id
-                FROM message_fts
-                WHERE {where_sql}
-                ORDER BY
-                    CAST(create_time AS INTEGER) DESC,
-                    CAST(sort_seq AS INTEGER) DESC,
-                    CAST(local_id AS INTEGER) DESC
-                LIMIT ? OFFSET ?
-                """,
-                params + [int(limit), int(offset)],
-            ).fetchall()
+            rows = conn.execute(hits_sql, params + [int(limit), int(offset)]).fetchall()
         except Exception as e:
             logger.exception("Chat search index query failed")
             return {
@@ -6219,7 +6500,9 @@ async def search_chat_messages(
     per_chat_scan: int = 200,
     scan_limit: int = 20000,
 ):
-    return await _search_chat_messages_via_fts(
+    return await run_blocking(
+        "db",
+        _search_chat_messages_via_fts,
         request,
         q=q,
         account=account,
@@ -6310,14 +6593,10 @@ async def search_chat_messages(
         hits: list[dict[str, Any]] = []
         seen_ids: set[str] = set()
 
-        for db_path in db_paths:
+        for db_path, table_name in resolve_conversation_tables(account_dir, conv_username, db_paths=db_paths):
             conn = sqlite3.connect(str(db_path))
             conn.row_factory = sqlite3.Row
             try:
-                table_name = _resolve_msg_table_name(conn, conv_username)
-                if not table_name:
-                    continue
-
                 my_wxid = account_dir.name
                 my_rowid = None
                 try:
@@ -6585,8 +6864,7 @@ async def search_chat_messages(
     }
 
 
-@router.get("/api/chat/messages/around", summary="定位到某条消息并返回上下文")
-async def get_chat_messages_around(
+def _get_chat_messages_around(
     request: Request,
     username: str,
     anchor_id: str,
@@ -6637,7 +6915,7 @@ async def get_chat_messages_around(
     resource_chat_id: Optional[int] = None
     try:
         if message_resource_db_path.exists():
-            resource_conn = sqlite3.connect(str(message_resource_db_path))
+            resource_conn = connect_readonly(message_resource_db_path)
             resource_conn.row_factory = sqlite3.Row
             resource_chat_id = _resource_lookup_chat_id(resource_conn, username)
     except Exception:
@@ -6656,7 +6934,7 @@ async def get_chat_messages_around(
     anchor_row: Optional[sqlite3.Row] = None
     anchor_packed_select = "NULL AS packed_info_data, "
     try:
-        conn_a = sqlite3.connect(str(anchor_db_path))
+        conn_a = connect_readonly(anchor_db_path)
         conn_a.row_factory = sqlite3.Row
         try:
             if not anchor_table_name:
@@ -6678,7 +6956,7 @@ async def get_chat_messages_around(
             quoted_table_a = _quote_ident(anchor_table_name)
             has_packed_info_data = False
             try:
-                cols = conn_a.execute(f"PRAGMA table_info({quoted_table_a})").fetchall()
+                cols = cached_table_info(conn_a, anchor_table_name)
                 has_packed_info_data = any(str(c[1] or "").strip().lower() == "packed_info_data" for c in cols)
             except Exception:
                 has_packed_info_data = False
@@ -6732,20 +7010,20 @@ async def get_chat_messages_around(
     pat_usernames_all: set[str] = set()
     is_group = bool(username.endswith("@chatroom"))
 
+    routed_tables = dict(resolve_conversation_tables(account_dir, username, db_paths=db_paths))
     for db_path in db_paths:
+        if db_path.stem != anchor_db_stem and db_path not in routed_tables:
+            continue
         conn: Optional[sqlite3.Connection] = None
         try:
-            conn = sqlite3.connect(str(db_path))
+            conn = connect_readonly(db_path)
             conn.row_factory = sqlite3.Row
 
             table_name = ""
             if db_path.stem == anchor_db_stem:
                 table_name = anchor_table_name
             else:
-                try:
-                    table_name = _resolve_msg_table_name(conn, username) or ""
-                except Exception:
-                    table_name = ""
+                table_name = routed_tables.get(db_path, "")
             if not table_name:
                 continue
 
@@ -6764,7 +7042,7 @@ async def get_chat_messages_around(
             quoted_table = _quote_ident(table_name)
             has_packed_info_data = False
             try:
-                cols = conn.execute(f"PRAGMA table_info({quoted_table})").fetchall()
+                cols = cached_table_info(conn, table_name)
                 has_packed_info_data = any(str(c[1] or "").strip().lower() == "packed_info_data" for c in cols)
             except Exception:
                 has_packed_info_data = False
@@ -6922,6 +7200,7 @@ async def get_chat_messages_around(
                 my_rowid=my_rowid,
                 resource_conn=resource_conn,
                 resource_chat_id=resource_chat_id,
+                use_cache=True,
             )
         except HTTPException:
             raise
@@ -7038,18 +7317,32 @@ async def get_chat_messages_around(
     }
 
 
-@router.get("/api/chat/chat_history/resolve", summary="解析嵌套合并转发聊天记录（通过 server_id）")
-async def resolve_nested_chat_history(
+@router.get("/api/chat/messages/around", summary="定位到某条消息并返回上下文")
+async def get_chat_messages_around(
     request: Request,
-    server_id: int,
+    username: str,
+    anchor_id: str,
     account: Optional[str] = None,
+    before: int = 20,
+    after: int = 20,
 ):
-    """Resolve a nested merged-forward chat history item (datatype=17) to its full recordItem XML.
+    return await run_blocking(
+        "db",
+        _get_chat_messages_around,
+        request=request,
+        username=username,
+        anchor_id=anchor_id,
+        account=account,
+        before=before,
+        after=after,
+    )
 
-    Some nested records inside a merged-forward recordItem only carry pointers like `fromnewmsgid` (server_id),
-    while the full recordItem exists in the original app message (local_type=49, appmsg type=19) stored elsewhere.
-    WeChat can open it by looking up the original message; we do the same here.
-    """
+
+def _resolve_nested_chat_history(
+    request: Request,
+    server_id: int,
+    account: Optional[str] = None,
+):
     if not server_id:
         raise HTTPException(status_code=400, detail="Missing server_id.")
 
@@ -7061,7 +7354,7 @@ async def resolve_nested_chat_history(
     for db_path in db_paths:
         conn: Optional[sqlite3.Connection] = None
         try:
-            conn = sqlite3.connect(str(db_path))
+            conn = connect_readonly(db_path)
             conn.row_factory = sqlite3.Row
             conn.text_factory = bytes
 
@@ -7154,18 +7447,26 @@ async def resolve_nested_chat_history(
     raise HTTPException(status_code=404, detail="Message not found for server_id.")
 
 
-@router.get("/api/chat/appmsg/resolve", summary="解析卡片/小程序等 App 消息（通过 server_id）")
-async def resolve_app_message(
+@router.get("/api/chat/chat_history/resolve", summary="解析嵌套合并转发聊天记录（通过 server_id）")
+async def resolve_nested_chat_history(
     request: Request,
     server_id: int,
     account: Optional[str] = None,
 ):
-    """Resolve an app message (base local_type=49) by server_id.
+    """Resolve a nested merged-forward chat history item (datatype=17) to its full recordItem XML.
 
-    This is mainly used by merged-forward recordItem dataitems that only contain pointers like
-    `fromnewmsgid` (server_id). WeChat can open the original card by looking up the appmsg in
-    message DBs; we do the same and return the parsed appmsg fields.
+    Some nested records inside a merged-forward recordItem only carry pointers like `fromnewmsgid` (server_id),
+    while the full recordItem exists in the original app message (local_type=49, appmsg type=19) stored elsewhere.
+    WeChat can open it by looking up the original message; we do the same here.
     """
+    return await run_blocking("db", _resolve_nested_chat_history, request=request, server_id=server_id, account=account)
+
+
+def _resolve_app_message(
+    request: Request,
+    server_id: int,
+    account: Optional[str] = None,
+):
     if not server_id:
         raise HTTPException(status_code=400, detail="Missing server_id.")
 
@@ -7177,7 +7478,7 @@ async def resolve_app_message(
     for db_path in db_paths:
         conn: Optional[sqlite3.Connection] = None
         try:
-            conn = sqlite3.connect(str(db_path))
+            conn = connect_readonly(db_path)
             conn.row_factory = sqlite3.Row
             conn.text_factory = bytes
 
@@ -7262,6 +7563,21 @@ async def resolve_app_message(
     raise HTTPException(status_code=404, detail="Message not found for server_id.")
 
 
+@router.get("/api/chat/appmsg/resolve", summary="解析卡片/小程序等 App 消息（通过 server_id）")
+async def resolve_app_message(
+    request: Request,
+    server_id: int,
+    account: Optional[str] = None,
+):
+    """Resolve an app message (base local_type=49) by server_id.
+
+    This is mainly used by merged-forward recordItem dataitems that only contain pointers like
+    `fromnewmsgid` (server_id). WeChat can open the original card by looking up the appmsg in
+    message DBs; we do the same and return the parsed appmsg fields.
+    """
+    return await run_blocking("db", _resolve_app_message, request=request, server_id=server_id, account=account)
+
+
 def _normalize_table_name_case(conn: sqlite3.Connection, table_name: str) -> str:
     t = str(table_name or "").strip()
     if not t:
@@ -7915,6 +8231,15 @@ async def edit_chat_message(request: Request) -> dict[str, Any]:
     except Exception:
         updated_message = None
 
+    _note_message_table_write(account_dir, db_path=account_dir / f"{db_stem}.db", table_name=table_name)
+    _reindex_search_messages(
+        account_dir,
+        username=session_id,
+        db_stem=db_stem,
+        table_name=table_name,
+        local_ids=[int(local_id_old), int(new_local_id)],
+    )
+
     resp: dict[str, Any] = {
         "status": "success",
         "account": account_dir.name,
@@ -8317,6 +8642,19 @@ async def repair_chat_message_sender(request: Request) -> dict[str, Any]:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to update output db: {e}")
 
+    _note_message_table_write(
+        account_dir,
+        db_path=account_dir / f"{db_stem}.db",
+        table_name=table_name_out or table_name_in,
+    )
+    _reindex_search_messages(
+        account_dir,
+        username=session_id,
+        db_stem=db_stem,
+        table_name=table_name_out or table_name_in,
+        local_ids=[int(local_id)],
+    )
+
     return {
         "status": "success",
         "account": account_dir.name,
@@ -8786,6 +9124,21 @@ def _restore_message_from_snapshot(
                 except Exception:
                     pass
 
+    reindex_ids = [int(local_id_current)]
+    if "local_id" in edited_cols and "local_id" in orig_key_map:
+        try:
+            reindex_ids.append(int(original_msg.get(orig_key_map["local_id"]) or 0))
+        except Exception:
+            pass
+    _note_message_table_write(account_dir, db_path=account_dir / f"{db_stem}.db", table_name=table_name)
+    _reindex_search_messages(
+        account_dir,
+        username=session_id,
+        db_stem=db_stem,
+        table_name=table_name,
+        local_ids=reindex_ids,
+    )
+
 
 @router.post("/api/chat/edits/reset_message", summary="恢复某条消息到首次快照，并删除修改记录")
 async def reset_chat_edited_message(request: Request) -> dict[str, Any]:
@@ -13,6 +13,7 @@ from ..path_fix import PathFixRoute
 router = APIRouter(route_class=PathFixRoute)
 
 ExportFormat = Literal["json", "txt", "html"]
+ZipProfile = Literal["auto", "fast", "zstd", "deflate"]
 ExportScope = Literal["selected", "all", "groups", "singles"]
 MediaKind = Literal["image", "emoji", "video", "video_thumb", "voice", "file"]
 MessageType = Literal[
@@ -68,29 +69,38 @@ class ChatExportCreateRequest(BaseModel):
         description="隐私模式导出：隐藏会话/用户名/内容，不打包头像与媒体",
     )
     file_name: Optional[str] = Field(None, description="导出 zip 文件名（可选，不含/含 .zip 都可）")
+    zip_profile: Optional[ZipProfile] = Field(None, description="zip 压缩策略：auto=媒体仅存储、文本压缩（默认）；fast=文本快速压缩；zstd=文本使用 zstd（需 Python 3.14+，否则同 fast）；deflate=全部 deflate（旧行为）")
+    resume_from: Optional[str] = Field(None, description="继续一个被中断的导出（exportId，见 GET /api/chat/exports 的 resumable）；其余参数沿用原任务")
 
 
 @router.post("/api/chat/exports", summary="创建聊天记录导出任务（离线 zip）")
 async def create_chat_export(req: ChatExportCreateRequest):
-    job = CHAT_EXPORT_MANAGER.create_job(
-        account=req.account,
-        scope=req.scope,
-        usernames=req.usernames,
-        export_format=req.format,
-        start_time=req.start_time,
-        end_time=req.end_time,
-        include_hidden=req.include_hidden,
-        include_official=req.include_official,
-        include_media=req.include_media,
-        media_kinds=req.media_kinds,
-        message_types=req.message_types,
-        output_dir=req.output_dir,
-        allow_process_key_extract=req.allow_process_key_extract,
-        download_remote_media=req.download_remote_media,
-        html_page_size=req.html_page_size,
-        privacy_mode=req.privacy_mode,
-        file_name=req.file_name,
-    )
+    try:
+        job = CHAT_EXPORT_MANAGER.create_job(
+            account=req.account,
+            scope=req.scope,
+            usernames=req.usernames,
+            export_format=req.format,
+            start_time=req.start_time,
+            end_time=req.end_time,
+            include_hidden=req.include_hidden,
+            include_official=req.include_official,
+            include_media=req.include_media,
+            media_kinds=req.media_kinds,
+            message_types=req.message_types,
+            output_dir=req.output_dir,
+            allow_process_key_extract=req.allow_process_key_extract,
+            download_remote_media=req.download_remote_media,
+            html_page_size=req.html_page_size,
+            privacy_mode=req.privacy_mode,
+            file_name=req.file_name,
+            zip_profile=req.zip_profile,
+            resume_from=req.resume_from,
+        )
+    except ValueError as e:
+        if req.resume_from:
+            raise HTTPException(status_code=409, detail=str(e))
+        raise
     return {"status": "success", "job": job.to_public_dict()}
 
 
@@ -98,7 +108,7 @@ async def create_chat_export(req: ChatExportCreateRequest):
 async def list_chat_exports():
     jobs = [j.to_public_dict() for j in CHAT_EXPORT_MANAGER.list_jobs()]
     jobs.sort(key=lambda x: int(x.get("createdAt") or 0), reverse=True)
-    return {"status": "success", "jobs": jobs}
+    return {"status": "success", "jobs": jobs, "resumable": CHAT_EXPORT_MANAGER.list_resumable_jobs()}
 
 
 @router.get("/api/chat/exports/{export_id}", summary="获取导出任务状态")
@@ -1,4 +1,5 @@
 import asyncio
+from dataclasses import dataclass
 from functools import lru_cache
 import hashlib
 import html
@@ -11,11 +12,11 @@ from pathlib import Path
 from typing import Any, Optional
 from urllib.parse import urlparse
 
-import requests
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, Field
 
+from .. import http_client
 from ..avatar_cache import (
     AVATAR_CACHE_TTL_SECONDS,
     avatar_cache_entry_file_exists,
@@ -31,6 +32,7 @@ from ..avatar_cache import (
     upsert_avatar_cache_entry,
     write_avatar_cache_payload,
 )
+from ..executors import run_blocking, submit_blocking
 from ..logging_config import get_logger
 from ..media_helpers import (
     _convert_silk_to_browser_audio,
@@ -59,7 +61,10 @@ from ..media_helpers import (
     _try_strip_media_prefix,
 )
 from ..chat_helpers import _extract_md5_from_packed_info, _load_contact_rows, _pick_avatar_url
+from ..media_locator import locate_media_files
 from ..path_fix import PathFixRoute
+from ..sqlite_pool import connect_readonly
+from ..voice_cache import is_voice_cache_enabled, load_voice_data, prefetch_voices, transcode_voice_cached
 from ..wcdb_realtime import WCDB_REALTIME, get_avatar_urls as _wcdb_get_avatar_urls
 
 logger = get_logger(__name__)
@@ -159,44 +164,49 @@ def _fast_probe_image_path_in_chat_attach(
             return 4
         return 2
 
+    def iter_candidates():
+        located = locate_media_files(wxid_dir, [base_dir], [f"{md5_norm}*"], key=md5_norm, limit=200)
+        if located is not None:
+            yield from located
+            return
+        for dirpath, _dirnames, filenames in os.walk(base_dir):
+            for fn in filenames:
+                if str(fn).lower().startswith(md5_norm):
+                    yield Path(dirpath) / fn
+
     best_key: Optional[tuple[int, int, int, float, str]] = None
     best_path: Optional[str] = None
 
     try:
-        for dirpath, _dirnames, filenames in os.walk(base_dir):
-            for fn in filenames:
-                fn_low = str(fn).lower()
-                if not fn_low.startswith(md5_norm):
-                    continue
-                p = Path(dirpath) / fn
-                try:
-                    if not p.is_file():
-                        continue
-                except Exception:
+        for p in iter_candidates():
+            try:
+                if not p.is_file():
                     continue
+            except Exception:
+                continue
 
-                ext = str(p.suffix or "").lower()
-                if ext not in {".dat", ".jpg", ".jpeg", ".png", ".gif", ".webp"}:
-                    continue
+            ext = str(p.suffix or "").lower()
+            if ext not in {".dat", ".jpg", ".jpeg", ".png", ".gif", ".webp"}:
+                continue
 
-                stem = str(p.stem or "")
-                rank = variant_rank(stem)
-                ext_penalty = 1 if ext == ".dat" else 0
-                try:
-                    st = p.stat()
-                    sz = int(st.st_size)
-                    mt = float(st.st_mtime)
-                except Exception:
-                    sz = 0
-                    mt = 0.0
-
-                key = (rank, ext_penalty, -sz, -mt, str(p))
-                if best_key is None or key < best_key:
-                    best_key = key
-                    best_path = str(p)
-                    # Found a non-.dat big variant; that's good enough.
-                    if rank == 0 and ext_penalty == 0 and sz > 0:
-                        return best_path
+            stem = str(p.stem or "")
+            rank = variant_rank(stem)
+            ext_penalty = 1 if ext == ".dat" else 0
+            try:
+                st = p.stat()
+                sz = int(st.st_size)
+                mt = float(st.st_mtime)
+            except Exception:
+                sz = 0
+                mt = 0.0
+
+            key = (rank, ext_penalty, -sz, -mt, str(p))
+            if best_key is None or key < best_key:
+                best_key = key
+                best_path = str(p)
+                # Found a non-.dat big variant; that's good enough.
+                if rank == 0 and ext_penalty == 0 and sz > 0:
+                    return best_path
     except Exception:
         return None
 
@@ -210,7 +220,7 @@ def _hardlink_has_table_prefix(hardlink_db_path: str, prefix: str) -> bool:
     if not p or not pref:
         return False
     try:
-        conn = sqlite3.connect(p)
+        conn = connect_readonly(Path(p))
     except Exception:
         return False
     try:
@@ -319,8 +329,94 @@ def _fast_probe_video_path_by_md5(
     return None
 
 
-@router.get("/api/chat/avatar", summary="获取联系人头像")
-async def get_chat_avatar(username: str, account: Optional[str] = None):
+def _download_remote_avatar(
+    source_url: str,
+    *,
+    etag: str,
+    last_modified: str,
+) -> tuple[bytes, str, str, str, bool]:
+    """Revalidate / download a remote avatar; returns (payload, content_type, etag, last_modified, not_modified)."""
+
+    base_headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36",
+        "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
+    }
+
+    header_variants = [
+        {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36 MicroMessenger/7.0.20.1781(0x6700143B) WindowsWechat(0x63090719) XWEB/8351",
+            "Accept": "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8",
+            "Accept-Language": "zh-CN,zh;q=0.9",
+            "Referer": "https://servicewechat.com/",
+            "Origin": "https://servicewechat.com",
+            "Range": "bytes=0-",
+        },
+        {"Referer": "https://wx.qq.com/", "Origin": "https://wx.qq.com"},
+        {"Referer": "https://mp.weixin.qq.com/", "Origin": "https://mp.weixin.qq.com"},
+        {"Referer": "https://www.baidu.com/", "Origin": "https://www.baidu.com"},
+        {},
+    ]
+
+    last_err: Exception | None = None
+    for extra in header_variants:
+        headers = dict(base_headers)
+        headers.update(extra)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        r = http_client.get(source_url, headers=headers, timeout=20, stream=True)
+        try:
+            if r.status_code == 304:
+                e2, lm2 = _parse_304_headers(r.headers)
+                return b"", "", (e2 or etag), (lm2 or last_modified), True
+            r.raise_for_status()
+            content_type = str(r.headers.get("Content-Type") or "").strip()
+            e2, lm2 = _parse_304_headers(r.headers)
+            max_bytes = 10 * 1024 * 1024
+            chunks: list[bytes] = []
+            total = 0
+            for ch in r.iter_content(chunk_size=64 * 1024):
+                if not ch:
+                    continue
+                chunks.append(ch)
+                total += len(ch)
+                if total > max_bytes:
+                    raise HTTPException(status_code=400, detail="Avatar too large (>10MB).")
+            return b"".join(chunks), content_type, e2, lm2, False
+        except HTTPException:
+            raise
+        except Exception as e:
+            last_err = e
+        finally:
+            try:
+                r.close()
+            except Exception:
+                pass
+
+    raise last_err or RuntimeError("avatar remote download failed")
+
+
+@dataclass(frozen=True)
+class _AvatarDownload:
+    """Returned by `_get_chat_avatar` when it needs a remote fetch; the caller runs it on the "net" pool."""
+
+    url: str
+    etag: str
+    last_modified: str
+
+
+def _get_chat_avatar(
+    username: str,
+    account: Optional[str] = None,
+    *,
+    fetched: Optional[tuple[_AvatarDownload, Any]] = None,
+):
+    """Serve an avatar from cache / head_image.db; may return `_AvatarDownload` instead of a response.
+
+    `fetched` carries `(download, result_or_exception)` from that remote fetch into the second pass.
+    """
     if not username:
         raise HTTPException(status_code=400, detail="Missing username.")
     account_dir = _resolve_account_dir(account)
@@ -351,7 +447,7 @@ async def get_chat_avatar(username: str, account: Optional[str] = None):
             )
         raise HTTPException(status_code=404, detail="head_image.db not found.")
 
-    conn = sqlite3.connect(str(head_image_db_path))
+    conn = connect_readonly(head_image_db_path)
     try:
         meta = conn.execute(
             "SELECT md5, update_time FROM head_image WHERE username = ? ORDER BY update_time DESC LIMIT 1",
@@ -456,82 +552,17 @@ async def get_chat_avatar(username: str, account: Optional[str] = None):
                 headers=headers,
             )
 
-        # Revalidate / download remote avatar
-        def _download_remote_avatar(
-            source_url: str,
-            *,
-            etag: str,
-            last_modified: str,
-        ) -> tuple[bytes, str, str, str, bool]:
-            base_headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36",
-                "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
-            }
-
-            header_variants = [
-                {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36 MicroMessenger/7.0.20.1781(0x6700143B) WindowsWechat(0x63090719) XWEB/8351",
-                    "Accept": "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8",
-                    "Accept-Language": "zh-CN,zh;q=0.9",
-                    "Referer": "https://servicewechat.com/",
-                    "Origin": "https://servicewechat.com",
-                    "Range": "bytes=0-",
-                },
-                {"Referer": "https://wx.qq.com/", "Origin": "https://wx.qq.com"},
-                {"Referer": "https://mp.weixin.qq.com/", "Origin": "https://mp.weixin.qq.com"},
-                {"Referer": "https://www.baidu.com/", "Origin": "https://www.baidu.com"},
-                {},
-            ]
-
-            last_err: Exception | None = None
-            for extra in header_variants:
-                headers = dict(base_headers)
-                headers.update(extra)
-                if etag:
-                    headers["If-None-Match"] = etag
-                if last_modified:
-                    headers["If-Modified-Since"] = last_modified
-
-                r = requests.get(source_url, headers=headers, timeout=20, stream=True)
-                try:
-                    if r.status_code == 304:
-                        e2, lm2 = _parse_304_headers(r.headers)
-                        return b"", "", (e2 or etag), (lm2 or last_modified), True
-                    r.raise_for_status()
-                    content_type = str(r.headers.get("Content-Type") or "").strip()
-                    e2, lm2 = _parse_304_headers(r.headers)
-                    max_bytes = 10 * 1024 * 1024
-                    chunks: list[bytes] = []
-                    total = 0
-                    for ch in r.iter_content(chunk_size=64 * 1024):
-                        if not ch:
-                            continue
-                        chunks.append(ch)
-                        total += len(ch)
-                        if total > max_bytes:
-                            raise HTTPException(status_code=400, detail="Avatar too large (>10MB).")
-                    return b"".join(chunks), content_type, e2, lm2, False
-                except HTTPException:
-                    raise
-                except Exception as e:
-                    last_err = e
-                finally:
-                    try:
-                        r.close()
-                    except Exception:
-                        pass
-
-            raise last_err or RuntimeError("avatar remote download failed")
-
         etag0 = str((url_entry or {}).get("etag") or "").strip()
         lm0 = str((url_entry or {}).get("last_modified") or "").strip()
+        download = _AvatarDownload(url=remote_url, etag=etag0, last_modified=lm0)
+        if fetched is None or fetched[0] != download:
+            # The network round trip (up to 20s per attempt) must not hold a media-decode worker.
+            return download
         try:
-            payload, ct, etag_new, lm_new, not_modified = await asyncio.to_thread(
-                _download_remote_avatar,
-                remote_url,
-                etag=etag0,
-                last_modified=lm0,
-            )
+            result = fetched[1]
+            if isinstance(result, BaseException):
+                raise result
+            payload, ct, etag_new, lm_new, not_modified = result
         except Exception as e:
             logger.warning(f"[avatar_cache_error] kind=url account={account_name} username={user_key} err={e}")
             if url_entry and url_file:
@@ -629,6 +660,23 @@ async def get_chat_avatar(username: str, account: Optional[str] = None):
     raise HTTPException(status_code=404, detail="Avatar not found.")
 
 
+@router.get("/api/chat/avatar", summary="获取联系人头像")
+async def get_chat_avatar(username: str, account: Optional[str] = None):
+    out = await run_blocking("media", _get_chat_avatar, username=username, account=account)
+    if isinstance(out, _AvatarDownload):
+        try:
+            result: Any = await run_blocking(
+                "net", _download_remote_avatar, out.url, etag=out.etag, last_modified=out.last_modified
+            )
+        except Exception as e:
+            result = e
+        out = await run_blocking("media", _get_chat_avatar, username=username, account=account, fetched=(out, result))
+        if isinstance(out, _AvatarDownload):
+            # The cache entry changed under us between the two passes; let the next request fetch again.
+            raise HTTPException(status_code=404, detail="Avatar not found.")
+    return out
+
+
 class EmojiDownloadRequest(BaseModel):
     account: Optional[str] = Field(None, description="账号目录名（可选，默认使用第一个）")
     md5: str = Field(..., description="表情 MD5")
@@ -665,7 +713,7 @@ def _lookup_resource_md5_by_server_id(account_dir_str: str, server_id: int, want
     if not db_path.exists():
         return ""
 
-    conn = sqlite3.connect(str(db_path))
+    conn = connect_readonly(db_path)
     try:
         row = conn.execute(
             "SELECT message_local_type, packed_info FROM MessageResourceInfo "
@@ -729,7 +777,7 @@ def _lookup_image_md5_by_server_id_from_messages(account_dir_str: str, server_id
 
     for db_path in db_paths:
         try:
-            conn = sqlite3.connect(str(db_path))
+            conn = connect_readonly(db_path)
         except Exception:
             continue
 
@@ -902,7 +950,7 @@ async def proxy_image(url: str):
                 headers["If-None-Match"] = if_none_match
             if if_modified_since:
                 headers["If-Modified-Since"] = if_modified_since
-            r = requests.get(u, headers=headers, timeout=20, stream=True)
+            r = http_client.get(u, headers=headers, timeout=20, stream=True)
             try:
                 if r.status_code == 304:
                     etag0 = str(r.headers.get("ETag") or "").strip()
@@ -1046,7 +1094,7 @@ def _resolve_final_url_for_favicon(page_url: str) -> str:
 
     # Prefer HEAD (no body). Some hosts reject HEAD; fall back to GET+stream.
     try:
-        r = requests.head(u, headers=headers, timeout=10, allow_redirects=True)
+        r = http_client.head(u, headers=headers, timeout=10, allow_redirects=True)
         try:
             final = str(getattr(r, "url", "") or "").strip()
             return final or u
@@ -1059,7 +1107,7 @@ def _resolve_final_url_for_favicon(page_url: str) -> str:
         pass
 
     try:
-        r = requests.get(u, headers=headers, timeout=10, allow_redirects=True, stream=True)
+        r = http_client.get(u, headers=headers, timeout=10, allow_redirects=True, stream=True)
         try:
             final = str(getattr(r, "url", "") or "").strip()
             return final or u
@@ -1072,14 +1120,7 @@ def _resolve_final_url_for_favicon(page_url: str) -> str:
         return u
 
 
-@router.get("/api/chat/media/favicon", summary="获取网站 favicon（用于链接卡片来源头像）")
-async def get_favicon(url: str):
-    page_url = html.unescape(str(url or "")).strip()
-    if not page_url:
-        raise HTTPException(status_code=400, detail="Missing url.")
-    if not _is_safe_http_url(page_url):
-        raise HTTPException(status_code=400, detail="Invalid url (only public http/https allowed).")
-
+def _get_favicon(page_url: str):
     # Resolve redirects first (e.g. b23.tv -> www.bilibili.com), so cached favicons are hit early.
     final_url = _resolve_final_url_for_favicon(page_url)
     candidates: list[str] = []
@@ -1115,7 +1156,7 @@ async def get_favicon(url: str):
         }
         r = None
         try:
-            r = requests.get(source_url, headers=headers, timeout=20, stream=True, allow_redirects=True)
+            r = http_client.get(source_url, headers=headers, timeout=20, stream=True, allow_redirects=True)
             if int(getattr(r, "status_code", 0) or 0) != 200:
                 continue
 
@@ -1184,6 +1225,18 @@ async def get_favicon(url: str):
     raise HTTPException(status_code=404, detail="favicon not found.")
 
 
+@router.get("/api/chat/media/favicon", summary="获取网站 favicon（用于链接卡片来源头像）")
+async def get_favicon(url: str):
+    page_url = html.unescape(str(url or "")).strip()
+    if not page_url:
+        raise HTTPException(status_code=400, detail="Missing url.")
+    if not _is_safe_http_url(page_url):
+        raise HTTPException(status_code=400, detail="Invalid url (only public http/https allowed).")
+
+    # HEAD/GET round-trips to the remote site: keep them off the event loop.
+    return await run_blocking("net", _get_favicon, page_url)
+
+
 @router.post("/api/chat/media/emoji/download", summary="下载表情消息资源到本地 resource")
 async def download_chat_emoji(req: EmojiDownloadRequest):
     md5 = str(req.md5 or "").strip().lower()
@@ -1213,25 +1266,13 @@ async def download_chat_emoji(req: EmojiDownloadRequest):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36",
             "Accept": "*/*",
         }
-        r = requests.get(emoji_url, headers=headers, timeout=20, stream=True)
         try:
-            r.raise_for_status()
-            max_bytes = 30 * 1024 * 1024
-            chunks: list[bytes] = []
-            total = 0
-            for ch in r.iter_content(chunk_size=64 * 1024):
-                if not ch:
-                    continue
-                chunks.append(ch)
-                total += len(ch)
-                if total > max_bytes:
-                    raise HTTPException(status_code=400, detail="Emoji download too large (>30MB).")
-            return b"".join(chunks)
-        finally:
-            try:
-                r.close()
-            except Exception:
-                pass
+            res = http_client.fetch_bytes(emoji_url, headers=headers, timeout=20, max_bytes=30 * 1024 * 1024)
+        except http_client.ResponseTooLarge:
+            raise HTTPException(status_code=400, detail="Emoji download too large (>30MB).")
+        if not res.ok:
+            raise RuntimeError(f"http {res.status_code}")
+        return res.content
 
     try:
         data = await asyncio.to_thread(_download_bytes)
@@ -1280,8 +1321,7 @@ async def download_chat_emoji(req: EmojiDownloadRequest):
     }
 
 
-@router.get("/api/chat/media/image", summary="获取图片消息资源")
-async def get_chat_image(
+def _get_chat_image(
     md5: Optional[str] = None,
     file_id: Optional[str] = None,
     server_id: Optional[int] = None,
@@ -1458,8 +1498,28 @@ async def get_chat_image(
     return Response(content=data, media_type=media_type)
 
 
-@router.get("/api/chat/media/emoji", summary="获取表情消息资源")
-async def get_chat_emoji(
+@router.get("/api/chat/media/image", summary="获取图片消息资源")
+async def get_chat_image(
+    md5: Optional[str] = None,
+    file_id: Optional[str] = None,
+    server_id: Optional[int] = None,
+    account: Optional[str] = None,
+    username: Optional[str] = None,
+    deep_scan: bool = False,
+):
+    return await run_blocking(
+        "media",
+        _get_chat_image,
+        md5=md5,
+        file_id=file_id,
+        server_id=server_id,
+        account=account,
+        username=username,
+        deep_scan=deep_scan,
+    )
+
+
+def _get_chat_emoji(
     md5: str,
     account: Optional[str] = None,
     username: Optional[str] = None,
@@ -1551,8 +1611,26 @@ async def get_chat_emoji(
     return Response(content=data, media_type=media_type)
 
 
-@router.get("/api/chat/media/video_thumb", summary="获取视频缩略图资源")
-async def get_chat_video_thumb(
+@router.get("/api/chat/media/emoji", summary="获取表情消息资源")
+async def get_chat_emoji(
+    md5: str,
+    account: Optional[str] = None,
+    username: Optional[str] = None,
+    emoji_url: Optional[str] = None,
+    aes_key: Optional[str] = None,
+):
+    return await run_blocking(
+        "media",
+        _get_chat_emoji,
+        md5=md5,
+        account=account,
+        username=username,
+        emoji_url=emoji_url,
+        aes_key=aes_key,
+    )
+
+
+def _get_chat_video_thumb(
     md5: Optional[str] = None,
     file_id: Optional[str] = None,
     account: Optional[str] = None,
@@ -1631,8 +1709,26 @@ async def get_chat_video_thumb(
     return Response(content=data, media_type=media_type)
 
 
-@router.get("/api/chat/media/video", summary="获取视频资源")
-async def get_chat_video(
+@router.get("/api/chat/media/video_thumb", summary="获取视频缩略图资源")
+async def get_chat_video_thumb(
+    md5: Optional[str] = None,
+    file_id: Optional[str] = None,
+    account: Optional[str] = None,
+    username: Optional[str] = None,
+    deep_scan: bool = False,
+):
+    return await run_blocking(
+        "media",
+        _get_chat_video_thumb,
+        md5=md5,
+        file_id=file_id,
+        account=account,
+        username=username,
+        deep_scan=deep_scan,
+    )
+
+
+def _get_chat_video(
     md5: Optional[str] = None,
     file_id: Optional[str] = None,
     account: Optional[str] = None,
@@ -1734,8 +1830,26 @@ async def get_chat_video(
     return Response(content=data, media_type=media_type)
 
 
-@router.get("/api/chat/media/voice", summary="获取语音消息资源")
-async def get_chat_voice(server_id: int, account: Optional[str] = None):
+@router.get("/api/chat/media/video", summary="获取视频资源")
+async def get_chat_video(
+    md5: Optional[str] = None,
+    file_id: Optional[str] = None,
+    account: Optional[str] = None,
+    username: Optional[str] = None,
+    deep_scan: bool = False,
+):
+    return await run_blocking(
+        "media",
+        _get_chat_video,
+        md5=md5,
+        file_id=file_id,
+        account=account,
+        username=username,
+        deep_scan=deep_scan,
+    )
+
+
+def _get_chat_voice(server_id: int, account: Optional[str] = None, if_none_match: str = ""):
     if not server_id:
         raise HTTPException(status_code=400, detail="Missing server_id.")
     account_dir = _resolve_account_dir(account)
@@ -1743,31 +1857,30 @@ async def get_chat_voice(server_id: int, account: Optional[str] = None):
     if not media_db_path.exists():
         raise HTTPException(status_code=404, detail="media_0.db not found.")
 
-    conn = sqlite3.connect(str(media_db_path))
-    conn.row_factory = sqlite3.Row
-    try:
-        row = conn.execute(
-            "SELECT voice_data FROM VoiceInfo WHERE svr_id = ? ORDER BY create_time DESC LIMIT 1",
-            (int(server_id),),
-        ).fetchone()
-    except Exception:
-        row = None
-    finally:
-        conn.close()
-
-    if not row or row[0] is None:
+    data = load_voice_data(media_db_path, int(server_id))
+    if not data:
         raise HTTPException(status_code=404, detail="Voice not found.")
 
-    data = bytes(row[0]) if isinstance(row[0], (memoryview, bytearray)) else row[0]
-    if not isinstance(data, (bytes, bytearray)):
-        data = bytes(data)
-
-    payload, ext, media_type = _convert_silk_to_browser_audio(data, preferred_format="mp3")
-    if payload and ext != "silk":
+    voice = transcode_voice_cached(
+        account_dir.name, int(server_id), data, converter=_convert_silk_to_browser_audio
+    )
+    if voice.path is not None:
+        # Content-addressed file: the ETag never changes for a given clip, so revalidation is a cheap 304.
+        headers = {"ETag": voice.etag, "Cache-Control": "private, max-age=31536000, immutable"}
+        if if_none_match and voice.etag in {t.strip() for t in if_none_match.split(",")}:
+            return Response(status_code=304, headers=headers)
+        return FileResponse(
+            str(voice.path),
+            media_type=voice.media_type,
+            headers=headers,
+            filename=f"voice_{int(server_id)}.{voice.ext}",
+            content_disposition_type="inline",
+        )
+    if voice.payload and voice.ext != "silk":
         return Response(
-            content=payload,
-            media_type=media_type,
-            headers={"Content-Disposition": f"inline; filename=voice_{int(server_id)}.{ext}"},
+            content=voice.payload,
+            media_type=voice.media_type,
+            headers={"Content-Disposition": f"inline; filename=voice_{int(server_id)}.{voice.ext}"},
         )
 
     # Fallback to raw SILK if conversion fails
@@ -1778,6 +1891,32 @@ async def get_chat_voice(server_id: int, account: Optional[str] = None):
     )
 
 
+@router.get("/api/chat/media/voice", summary="获取语音消息资源")
+async def get_chat_voice(request: Request, server_id: int, account: Optional[str] = None):
+    return await run_blocking(
+        "media",
+        _get_chat_voice,
+        server_id=server_id,
+        account=account,
+        if_none_match=str(request.headers.get("if-none-match") or ""),
+    )
+
+
+class VoicePrefetchRequest(BaseModel):
+    account: Optional[str] = Field(None, description="账号目录名（可选，默认使用第一个）")
+    server_ids: list[int] = Field(..., max_length=500, description="当前可见窗口内语音消息的 server_id")
+
+
+@router.post("/api/chat/media/voice/prefetch", summary="后台预转码语音消息")
+async def prefetch_chat_voices(req: VoicePrefetchRequest):
+    """把一批语音提前转码进缓存（不等待完成），播放时直接命中"""
+    account_dir = _resolve_account_dir(req.account)
+    server_ids = [int(s) for s in req.server_ids if int(s or 0) > 0]
+    if server_ids and is_voice_cache_enabled():
+        submit_blocking("media", prefetch_voices, account_dir, server_ids)
+    return {"status": "success", "queued": len(server_ids) if is_voice_cache_enabled() else 0}
+
+
 @router.post("/api/chat/media/open_folder", summary="在资源管理器中打开媒体文件所在位置")
 async def open_chat_media_folder(
     kind: str,
@@ -1802,7 +1941,7 @@ async def open_chat_media_folder(
         if not media_db_path.exists():
             raise HTTPException(status_code=404, detail="media_0.db not found.")
 
-        conn = sqlite3.connect(str(media_db_path))
+        conn = connect_readonly(media_db_path)
         conn.row_factory = sqlite3.Row
         try:
             row = conn.execute(
@@ -3,7 +3,9 @@ from __future__ import annotations
 import asyncio
 import json
 import os
+import queue
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from fastapi import APIRouter, HTTPException, Request
@@ -11,10 +13,18 @@ from pydantic import BaseModel, Field
 from starlette.responses import StreamingResponse
 
 from ..app_paths import get_output_databases_dir
+from ..executors import run_blocking
 from ..logging_config import get_logger
 from ..path_fix import PathFixRoute
+from ..sqlite_pool import invalidate_sqlite_pool
 from ..key_store import upsert_account_keys_in_store
-from ..wechat_decrypt import WeChatDatabaseDecryptor, decrypt_wechat_databases, scan_account_databases_from_path
+from ..wechat_decrypt import (
+    WeChatDatabaseDecryptor,
+    decrypt_wechat_databases,
+    order_shards_largest_first,
+    resolve_decrypt_workers,
+    scan_account_databases_from_path,
+)
 
 logger = get_logger(__name__)
 
@@ -26,21 +36,11 @@ class DecryptRequest(BaseModel):
 
     key: str = Field(..., description="解密密钥，64位十六进制字符串")
     db_storage_path: str = Field(..., description="数据库存储路径，必须是绝对路径")
+    incremental: bool = Field(False, description="增量解密：仅重写相对上次解密发生变化的页面")
+    workers: int | None = Field(None, ge=1, le=32, description="同时解密的分片数，默认按CPU核数")
 
 
-@router.post("/api/decrypt", summary="解密微信数据库")
-async def decrypt_databases(request: DecryptRequest):
-    """使用提供的密钥解密指定账户的微信数据库
-
-    参数:
-    - key: 解密密钥（必选）- 64位十六进制字符串
-    - db_storage_path: 数据库存储路径（必选），如 D:\\wechatMSG\\xwechat_files\\{微信id}\\db_storage
-
-    注意：
-    - 一个密钥只能解密对应账户的数据库
-    - 必须提供具体的db_storage_path，不支持自动检测多账户
-    - 支持自动处理Windows路径中的反斜杠转义问题
-    """
+def _decrypt_databases(request: DecryptRequest):
     logger.info(f"开始解密请求: db_storage_path={request.db_storage_path}")
     try:
         # 验证密钥格式
@@ -52,6 +52,8 @@ async def decrypt_databases(request: DecryptRequest):
         results = decrypt_wechat_databases(
             db_storage_path=request.db_storage_path,
             key=request.key,
+            incremental=request.incremental,
+            workers=request.workers,
         )
 
         if results["status"] == "error":
@@ -77,6 +79,7 @@ async def decrypt_databases(request: DecryptRequest):
             "processed_files": results["processed_files"],
             "failed_files": results["failed_files"],
             "account_results": results.get("account_results", {}),
+            "key_cache": results.get("key_cache", {}),
         }
 
     except HTTPException:
@@ -86,11 +89,29 @@ async def decrypt_databases(request: DecryptRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/api/decrypt", summary="解密微信数据库")
+async def decrypt_databases(request: DecryptRequest):
+    """使用提供的密钥解密指定账户的微信数据库
+
+    参数:
+    - key: 解密密钥（必选）- 64位十六进制字符串
+    - db_storage_path: 数据库存储路径（必选），如 D:\\wechatMSG\\xwechat_files\\{微信id}\\db_storage
+
+    注意：
+    - 一个密钥只能解密对应账户的数据库
+    - 必须提供具体的db_storage_path，不支持自动检测多账户
+    - 支持自动处理Windows路径中的反斜杠转义问题
+    """
+    return await run_blocking("jobs", _decrypt_databases, request=request)
+
+
 @router.get("/api/decrypt_stream", summary="解密微信数据库（SSE实时进度）")
 async def decrypt_databases_stream(
     request: Request,
     key: str | None = None,
     db_storage_path: str | None = None,
+    incremental: bool = False,
+    workers: int | None = None,
 ):
     """通过SSE实时推送数据库解密进度。
 
@@ -148,8 +169,9 @@ async def decrypt_databases_stream(
         base_output_dir = get_output_databases_dir()
         base_output_dir.mkdir(parents=True, exist_ok=True)
 
+        shard_workers, page_workers = resolve_decrypt_workers(workers)
         try:
-            decryptor = WeChatDatabaseDecryptor(k)
+            decryptor = WeChatDatabaseDecryptor(k, page_workers=page_workers)
         except ValueError as e:
             yield _sse({"type": "error", "message": f"密钥错误: {e}"})
             return
@@ -165,6 +187,8 @@ async def decrypt_databases_stream(
         for account, dbs in account_databases.items():
             account_output_dir = base_output_dir / account
             account_output_dir.mkdir(parents=True, exist_ok=True)
+            # Decrypt rewrites the account's db files: drop pooled read-only handles first.
+            invalidate_sqlite_pool(account_output_dir)
 
             # Save a hint for later UI (same as non-stream endpoint).
             try:
@@ -182,77 +206,111 @@ async def decrypt_databases_stream(
             account_processed: list[str] = []
             account_failed: list[str] = []
 
-            for db_info in dbs:
-                if await request.is_disconnected():
-                    return
-
-                overall_current += 1
-                db_path = str(db_info.get("path") or "")
-                db_name = str(db_info.get("name") or "")
-                current_file = f"{account}/{db_name}" if account else db_name
+            # Shard-level concurrency: largest files start first; events stay per file.
+            started: "queue.SimpleQueue[int]" = queue.SimpleQueue()
 
-                # Emit a "processing" event so UI updates immediately for large db files.
-                yield _sse(
-                    {
-                        "type": "progress",
-                        "current": overall_current,
-                        "total": total_databases,
-                        "success_count": success_count,
-                        "fail_count": fail_count,
-                        "current_file": current_file,
-                        "status": "processing",
-                        "message": "解密中...",
-                    }
+            def _decrypt_one(idx: int, _dbs=dbs, _out_dir=account_output_dir):
+                started.put(idx)
+                db_info = _dbs[idx]
+                return decryptor.decrypt_database_with_stats(
+                    str(db_info.get("path") or ""),
+                    str(_out_dir / str(db_info.get("name") or "")),
+                    incremental=incremental,
                 )
 
-                output_path = account_output_dir / db_name
-                task = asyncio.create_task(asyncio.to_thread(decryptor.decrypt_database, db_path, str(output_path)))
+            def _current_file(idx: int) -> str:
+                db_name = str(dbs[idx].get("name") or "")
+                return f"{account}/{db_name}" if account else db_name
 
-                # Wait with heartbeat (can't yield while awaiting the thread directly).
+            pool = ThreadPoolExecutor(max_workers=max(1, min(shard_workers, len(dbs))), thread_name_prefix="shard-decrypt")
+            pending = {
+                asyncio.wrap_future(pool.submit(_decrypt_one, idx)): idx for idx in order_shards_largest_first(dbs)
+            }
+            outcomes: dict[int, bool] = {}
+            try:
                 last_heartbeat = time.time()
-                while not task.done():
+                while pending:
                     if await request.is_disconnected():
                         return
+
+                    done, _ = await asyncio.wait(pending.keys(), timeout=0.6, return_when=asyncio.FIRST_COMPLETED)
+
+                    # Emit a "processing" event so UI updates immediately for large db files. Shards start
+                    # concurrently, so it carries no "current": that counter only moves on completion events.
+                    while True:
+                        try:
+                            idx = started.get_nowait()
+                        except queue.Empty:
+                            break
+                        last_heartbeat = time.time()
+                        yield _sse(
+                            {
+                                "type": "progress",
+                                "total": total_databases,
+                                "success_count": success_count,
+                                "fail_count": fail_count,
+                                "current_file": _current_file(idx),
+                                "status": "processing",
+                                "message": "解密中...",
+                                "key_cache": decryptor.key_cache_stats(),
+                            }
+                        )
+
+                    for fut in done:
+                        idx = pending.pop(fut)
+                        try:
+                            file_stats = fut.result()
+                            ok = bool(file_stats.ok)
+                        except Exception:
+                            file_stats = None
+                            ok = False
+                        outcomes[idx] = ok
+                        overall_current += 1
+
+                        if ok:
+                            success_count += 1
+                            status = "success"
+                            msg = "解密成功"
+                        else:
+                            fail_count += 1
+                            status = "fail"
+                            msg = "解密失败"
+
+                        last_heartbeat = time.time()
+                        yield _sse(
+                            {
+                                "type": "progress",
+                                "current": overall_current,
+                                "total": total_databases,
+                                "success_count": success_count,
+                                "fail_count": fail_count,
+                                "current_file": _current_file(idx),
+                                "status": status,
+                                "message": msg,
+                                "decrypt_stats": file_stats.to_dict() if file_stats is not None else None,
+                                "key_cache": decryptor.key_cache_stats(),
+                            }
+                        )
+
                     now = time.time()
                     if now - last_heartbeat > 15:
                         last_heartbeat = now
                         # SSE comment heartbeat; browsers ignore but keeps proxies alive.
                         yield ": ping\n\n"
-                    await asyncio.sleep(0.6)
-                try:
-                    ok = bool(task.result())
-                except Exception:
-                    ok = False
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
 
-                if ok:
+            # Collect per-account lists in the original scan order.
+            for idx, db_info in enumerate(dbs):
+                output_path = account_output_dir / str(db_info.get("name") or "")
+                if outcomes.get(idx):
                     account_success += 1
-                    success_count += 1
                     account_processed.append(str(output_path))
                     processed_files.append(str(output_path))
-                    status = "success"
-                    msg = "解密成功"
                 else:
+                    db_path = str(db_info.get("path") or "")
                     account_failed.append(db_path)
                     failed_files.append(db_path)
-                    fail_count += 1
-                    status = "fail"
-                    msg = "解密失败"
-
-                yield _sse(
-                    {
-                        "type": "progress",
-                        "current": overall_current,
-                        "total": total_databases,
-                        "success_count": success_count,
-                        "fail_count": fail_count,
-                        "current_file": current_file,
-                        "status": status,
-                        "message": msg,
-                    }
-                )
-
-                if overall_current % 5 == 0:
-                    await asyncio.sleep(0)
 
             account_results[account] = {
                 "total": len(dbs),
@@ -300,6 +358,37 @@ async def decrypt_databases_stream(
                 except Exception as e:
                     account_results[account]["session_last_message"] = {"status": "error", "message": str(e)}
 
+            # Conversation -> shard routing index, so message reads only open shards holding the conversation.
+            if os.environ.get("WECHAT_TOOL_BUILD_MESSAGE_ROUTES", "1") != "0":
+                yield _sse(
+                    {
+                        "type": "phase",
+                        "phase": "message_routes",
+                        "account": account,
+                        "message": "正在构建会话分片索引...",
+                    }
+                )
+                await asyncio.sleep(0)
+
+                try:
+                    from ..message_route_index import build_message_route_index
+
+                    task = asyncio.create_task(
+                        asyncio.to_thread(build_message_route_index, account_output_dir, rebuild=True)
+                    )
+                    last_heartbeat = time.time()
+                    while not task.done():
+                        if await request.is_disconnected():
+                            return
+                        now = time.time()
+                        if now - last_heartbeat > 15:
+                            last_heartbeat = now
+                            yield ": ping\n\n"
+                        await asyncio.sleep(0.6)
+                    account_results[account]["message_routes"] = task.result()
+                except Exception as e:
+                    account_results[account]["message_routes"] = {"status": "error", "message": str(e)}
+
         status = "completed" if success_count > 0 else "failed"
         result = {
             "status": status,
@@ -311,6 +400,7 @@ async def decrypt_databases_stream(
             "processed_files": processed_files,
             "failed_files": failed_files,
             "account_results": account_results,
+            "key_cache": decryptor.key_cache_stats(),
         }
 
         # Save db key for frontend autofill.
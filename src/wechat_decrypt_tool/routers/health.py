@@ -1,7 +1,13 @@
 from fastapi import APIRouter
 
+from ..executors import get_executor_stats
+from ..http_client import get_http_client_stats
 from ..logging_config import get_logger
+from ..media_locator import get_media_locator_stats
+from ..message_render_cache import RENDERED_MESSAGE_CACHE
 from ..path_fix import PathFixRoute
+from ..sqlite_pool import get_sqlite_pool_stats
+from ..voice_cache import get_voice_cache_stats
 
 logger = get_logger(__name__)
 
@@ -20,3 +26,39 @@ async def health_check():
     """健康检查端点"""
     logger.debug("健康检查请求")
     return {"status": "healthy", "service": "微信解密工具"}
+
+
+@router.get("/api/health/sqlite-pool", summary="SQLite 只读连接池统计")
+async def sqlite_pool_stats():
+    """只读连接池命中率、打开/关闭次数与 table_info 缓存统计"""
+    return {"status": "success", **get_sqlite_pool_stats()}
+
+
+@router.get("/api/health/render-cache", summary="消息解析缓存统计")
+async def render_cache_stats():
+    """已解析消息 LRU 缓存的条目数与命中率"""
+    return {"status": "success", **RENDERED_MESSAGE_CACHE.stats()}
+
+
+@router.get("/api/health/executors", summary="后台线程池队列统计")
+async def executor_stats():
+    """按类别（db / media / crypto）返回排队数、运行数、等待与执行耗时"""
+    return {"status": "success", "executors": get_executor_stats()}
+
+
+@router.get("/api/health/http", summary="远程媒体 HTTP 连接池统计")
+async def http_client_stats():
+    """按主机返回请求数、合并请求数、并发峰值、首字节与总耗时"""
+    return {"status": "success", "http": get_http_client_stats()}
+
+
+@router.get("/api/health/voice-cache", summary="语音转码缓存统计")
+async def voice_cache_stats():
+    """返回语音转码磁盘缓存的命中、写入、淘汰次数与容量"""
+    return {"status": "success", "voiceCache": get_voice_cache_stats()}
+
+
+@router.get("/api/health/media-index", summary="媒体文件定位索引统计")
+async def media_index_stats():
+    """返回媒体定位索引的构建/刷新次数、命中与未命中次数及各 wxid 目录状态"""
+    return {"status": "success", "mediaIndex": get_media_locator_stats()}
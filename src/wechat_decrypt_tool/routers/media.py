@@ -6,19 +6,18 @@ from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 
+from ..executors import run_blocking
 from ..logging_config import get_logger
 from ..media_helpers import (
-    _collect_all_dat_files,
-    _decrypt_and_save_resource,
     _detect_image_media_type,
-    _is_probably_valid_image,
-    _get_resource_dir,
     _load_media_keys,
     _resolve_account_dir,
     _resolve_account_wxid_dir,
     _save_media_keys,
     _try_find_decrypted_resource,
 )
+from ..media_bulk_decrypt import begin_bulk_decrypt, cancel_bulk_decrypt, end_bulk_decrypt, run_bulk_decrypt
+from ..media_locator import build_media_locator
 from ..path_fix import PathFixRoute
 from ..key_store import upsert_account_keys_in_store
 
@@ -85,18 +84,7 @@ async def save_media_keys_api(request: MediaKeysSaveRequest):
     }
 
 
-@router.post("/api/media/decrypt_all", summary="批量解密所有图片资源")
-async def decrypt_all_media(request: MediaDecryptRequest):
-    """批量解密所有图片资源到 output/databases/{账号}/resource 目录
-
-    解密后的图片按MD5哈希命名，存储在 resource/{md5前2位}/{md5}.{ext} 路径下。
-    这样可以快速通过MD5定位资源文件。
-
-    参数:
-    - account: 账号目录名（可选）
-    - xor_key: XOR密钥（可选，不提供则从缓存读取）
-    - aes_key: AES密钥（可选，不提供则从缓存读取）
-    """
+def _decrypt_all_media(request: MediaDecryptRequest):
     account_dir = _resolve_account_dir(request.account)
     wxid_dir = _resolve_account_wxid_dir(account_dir)
 
@@ -138,13 +126,15 @@ async def decrypt_all_media(request: MediaDecryptRequest):
             detail="未找到XOR密钥，请先使用 wx_key 获取并通过前端填写（或调用 /api/media/keys 保存）",
         )
 
-    # 收集所有.dat文件
-    logger.info(f"开始扫描 {wxid_dir} 中的.dat文件...")
-    dat_files = _collect_all_dat_files(wxid_dir)
-    total_files = len(dat_files)
-    logger.info(f"共发现 {total_files} 个.dat文件")
+    cancel = begin_bulk_decrypt(account_dir.name)
+    if cancel is None:
+        raise HTTPException(status_code=409, detail="该账号已有批量解密任务在进行中")
+    try:
+        result = run_bulk_decrypt(account_dir, wxid_dir, int(xor_key_int), aes_key16, cancel=cancel)
+    finally:
+        end_bulk_decrypt(account_dir.name, cancel)
 
-    if total_files == 0:
+    if result["total"] == 0:
         return {
             "status": "success",
             "message": "未发现需要解密的.dat文件",
@@ -152,64 +142,38 @@ async def decrypt_all_media(request: MediaDecryptRequest):
             "success_count": 0,
             "skip_count": 0,
             "fail_count": 0,
-            "output_dir": str(_get_resource_dir(account_dir)),
+            "output_dir": result["output_dir"],
         }
 
-    # 开始解密
-    success_count = 0
-    skip_count = 0
-    fail_count = 0
-    failed_files: list[dict] = []
-
-    resource_dir = _get_resource_dir(account_dir)
-    resource_dir.mkdir(parents=True, exist_ok=True)
-
-    for dat_path, md5 in dat_files:
-        # 检查是否已解密
-        existing = _try_find_decrypted_resource(account_dir, md5)
-        if existing:
-            skip_count += 1
-            continue
-
-        # 解密并保存
-        success, msg = _decrypt_and_save_resource(
-            dat_path, md5, account_dir, xor_key_int, aes_key16
-        )
-
-        if success:
-            success_count += 1
-        else:
-            fail_count += 1
-            if len(failed_files) < 100:  # 只记录前100个失败
-                failed_files.append(
-                    {
-                        "file": str(dat_path),
-                        "md5": md5,
-                        "error": msg,
-                    }
-                )
-
-    logger.info(f"解密完成: 成功={success_count}, 跳过={skip_count}, 失败={fail_count}")
-
+    success_count, skip_count, fail_count = result["success_count"], result["skip_count"], result["fail_count"]
     return {
-        "status": "success",
-        "message": f"解密完成: 成功 {success_count}, 跳过 {skip_count}, 失败 {fail_count}",
-        "total": total_files,
+        "status": "cancelled" if result["cancelled"] else "success",
+        "message": f"解密{'已取消' if result['cancelled'] else '完成'}: 成功 {success_count}, 跳过 {skip_count}, 失败 {fail_count}",
+        "total": result["total"],
         "success_count": success_count,
         "skip_count": skip_count,
         "fail_count": fail_count,
-        "output_dir": str(resource_dir),
-        "failed_files": failed_files[:20] if failed_files else [],
+        "output_dir": result["output_dir"],
+        "failed_files": result["failed_files"][:20],
     }
 
 
-@router.get("/api/media/resource/{md5}", summary="获取已解密的资源文件")
-async def get_decrypted_resource(md5: str, account: Optional[str] = None):
-    """直接从解密资源目录获取图片
+@router.post("/api/media/decrypt_all", summary="批量解密所有图片资源")
+async def decrypt_all_media(request: MediaDecryptRequest):
+    """批量解密所有图片资源到 output/databases/{账号}/resource 目录
 
-    如果资源已解密，直接返回解密后的文件。
-    这比实时解密更快，适合频繁访问的场景。
+    解密后的图片按MD5哈希命名，存储在 resource/{md5前2位}/{md5}.{ext} 路径下。
+    这样可以快速通过MD5定位资源文件。
+
+    参数:
+    - account: 账号目录名（可选）
+    - xor_key: XOR密钥（可选，不提供则从缓存读取）
+    - aes_key: AES密钥（可选，不提供则从缓存读取）
     """
+    return await run_blocking("jobs", _decrypt_all_media, request=request)
+
+
+def _get_decrypted_resource(md5: str, account: Optional[str] = None):
     if not md5 or len(md5) != 32:
         raise HTTPException(status_code=400, detail="无效的MD5")
 
@@ -224,6 +188,54 @@ async def get_decrypted_resource(md5: str, account: Optional[str] = None):
     return Response(content=data, media_type=media_type)
 
 
+@router.get("/api/media/resource/{md5}", summary="获取已解密的资源文件")
+async def get_decrypted_resource(md5: str, account: Optional[str] = None):
+    """直接从解密资源目录获取图片
+
+    如果资源已解密，直接返回解密后的文件。
+    这比实时解密更快，适合频繁访问的场景。
+    """
+    return await run_blocking("media", _get_decrypted_resource, md5=md5, account=account)
+
+
+class MediaDecryptCancelRequest(BaseModel):
+    """批量解密取消请求模型"""
+
+    account: Optional[str] = Field(None, description="账号目录名（可选，默认使用第一个）")
+
+
+@router.post("/api/media/decrypt_all/cancel", summary="取消批量解密图片")
+async def cancel_decrypt_all_media(request: MediaDecryptCancelRequest):
+    """取消正在进行的批量解密；已完成的文件已写入解密清单，下次运行会跳过"""
+    account_dir = _resolve_account_dir(request.account)
+    return {"status": "success", "cancelled": cancel_bulk_decrypt(account_dir.name)}
+
+
+class MediaIndexBuildRequest(BaseModel):
+    """媒体文件定位索引构建请求模型"""
+
+    account: Optional[str] = Field(None, description="账号目录名（可选，默认使用第一个）")
+    rebuild: bool = Field(False, description="是否丢弃旧索引重新全量扫描（默认按目录 mtime 增量刷新）")
+
+
+def _build_media_index(request: MediaIndexBuildRequest):
+    account_dir = _resolve_account_dir(request.account)
+    wxid_dir = _resolve_account_wxid_dir(account_dir)
+    if not wxid_dir:
+        raise HTTPException(status_code=400, detail="未找到微信数据目录，无法构建媒体索引")
+    return {"account": account_dir.name, **build_media_locator(wxid_dir, rebuild=bool(request.rebuild))}
+
+
+@router.post("/api/media/index/build", summary="构建/刷新媒体文件定位索引")
+async def build_media_index(request: MediaIndexBuildRequest):
+    """扫描 msg/attach、msg/file、msg/video、cache 等目录，生成持久化的 文件名 -> 路径 索引
+
+    图片/视频/文件/表情的兜底查找优先命中该索引，避免在大目录上反复 rglob。
+    未手动构建时，首次兜底查找会在后台自动构建。
+    """
+    return await run_blocking("index", _build_media_index, request)
+
+
 @router.get("/api/media/decrypt_all_stream", summary="批量解密所有图片资源（SSE实时进度）")
 async def decrypt_all_media_stream(
     account: Optional[str] = None,
@@ -243,7 +255,10 @@ async def decrypt_all_media_stream(
     - status: 当前文件状态（success/skip/fail）
     - message: 状态消息
 
-    跳过原因：文件已经解密过
+    跳过原因：文件已经解密过（按解密清单中的 源文件大小/mtime 判断，不再重新读取输出文件）
+
+    进度按批次推送（每 200 个文件或 250ms 一次），扫描与解密流水线并行（多进程）。
+    客户端断开或调用 /api/media/decrypt_all/cancel 会取消任务；再次运行从中断处继续。
     失败原因：
     - 文件为空
     - V4-V2版本需要AES密钥但未提供
@@ -292,99 +307,70 @@ async def decrypt_all_media_stream(
                 yield f"data: {json.dumps({'type': 'error', 'message': '未找到XOR密钥，请先使用 wx_key 获取并保存/填写'})}\n\n"
                 return
 
-            # 收集所有.dat文件
-            logger.info(f"[SSE] 开始扫描 {wxid_dir} 中的.dat文件...")
+            cancel = begin_bulk_decrypt(account_dir.name)
+            if cancel is None:
+                yield f"data: {json.dumps({'type': 'error', 'message': '该账号已有批量解密任务在进行中'})}\n\n"
+                return
+
+            logger.info(f"[SSE] 开始扫描并解密 {wxid_dir} 中的.dat文件...")
             yield f"data: {json.dumps({'type': 'scanning', 'message': '正在扫描图片文件...'})}\n\n"
-            await asyncio.sleep(0)
 
-            dat_files = _collect_all_dat_files(wxid_dir)
-            total_files = len(dat_files)
-            logger.info(f"[SSE] 共发现 {total_files} 个.dat文件（仅图片）")
+            loop = asyncio.get_running_loop()
+            events: asyncio.Queue = asyncio.Queue()
 
-            if total_files == 0:
+            def on_progress(evt: dict) -> None:
+                loop.call_soon_threadsafe(events.put_nowait, evt)
+
+            def run_job() -> dict:
+                try:
+                    return run_bulk_decrypt(
+                        account_dir, wxid_dir, int(xor_key_int), aes_key16, cancel=cancel, on_progress=on_progress
+                    )
+                finally:
+                    end_bulk_decrypt(account_dir.name, cancel)
+
+            job = asyncio.ensure_future(run_blocking("jobs", run_job))
+            started = False
+            try:
+                while True:
+                    getter = asyncio.ensure_future(events.get())
+                    done, _ = await asyncio.wait({getter, job}, return_when=asyncio.FIRST_COMPLETED)
+                    if getter not in done:
+                        getter.cancel()
+                        break
+                    evt = getter.result()
+                    if not started:
+                        started = True
+                        yield f"data: {json.dumps({'type': 'start', 'total': evt['total'], 'message': '开始解密图片文件（边扫描边解密）'})}\n\n"
+                    yield f"data: {json.dumps(evt)}\n\n"
+                result = await job
+            finally:
+                # Client went away (or we failed): stop the workers; finished files are already in the manifest.
+                cancel.set()
+
+            while not events.empty():
+                yield f"data: {json.dumps(events.get_nowait())}\n\n"
+
+            success_count, skip_count, fail_count = result["success_count"], result["skip_count"], result["fail_count"]
+            if result["total"] == 0:
                 yield f"data: {json.dumps({'type': 'complete', 'message': '未发现需要解密的图片文件', 'total': 0, 'success_count': 0, 'skip_count': 0, 'fail_count': 0})}\n\n"
                 return
 
-            # 发送总数信息
-            yield f"data: {json.dumps({'type': 'start', 'total': total_files, 'message': f'开始解密 {total_files} 个图片文件'})}\n\n"
-            await asyncio.sleep(0)
-
-            # 开始解密
-            success_count = 0
-            skip_count = 0
-            fail_count = 0
-            failed_files: list[dict] = []
-
-            resource_dir = _get_resource_dir(account_dir)
-            resource_dir.mkdir(parents=True, exist_ok=True)
-
-            for i, (dat_path, md5) in enumerate(dat_files):
-                current = i + 1
-                file_name = dat_path.name
-
-                # 检查是否已解密
-                existing = _try_find_decrypted_resource(account_dir, md5)
-                if existing:
-                    try:
-                        cached = existing.read_bytes()
-                        cached_mt = _detect_image_media_type(cached[:32])
-                        if cached_mt != "application/octet-stream" and _is_probably_valid_image(cached, cached_mt):
-                            skip_count += 1
-                            # 每100个跳过的文件发送一次进度，减少消息量
-                            if skip_count % 100 == 0 or current == total_files:
-                                yield (
-                                    f"data: {json.dumps({'type': 'progress', 'current': current, 'total': total_files, 'success_count': success_count, 'skip_count': skip_count, 'fail_count': fail_count, 'current_file': file_name, 'status': 'skip', 'message': '已存在'})}\n\n"
-                                )
-                                await asyncio.sleep(0)
-                            continue
-                        # Cache exists but looks corrupted: remove and regenerate.
-                        existing.unlink(missing_ok=True)
-                    except Exception:
-                        # If we can't read/validate it, try regenerating.
-                        try:
-                            existing.unlink(missing_ok=True)
-                        except Exception:
-                            pass
-
-                # 解密并保存
-                success, msg = _decrypt_and_save_resource(
-                    dat_path, md5, account_dir, xor_key_int, aes_key16
-                )
-
-                if success:
-                    success_count += 1
-                    status = "success"
-                    status_msg = "解密成功"
-                    logger.debug(f"[SSE] 解密成功: {file_name}")
-                else:
-                    fail_count += 1
-                    status = "fail"
-                    status_msg = msg
-                    logger.warning(f"[SSE] 解密失败: {file_name} - {msg}")
-                    if len(failed_files) < 100:
-                        failed_files.append(
-                            {
-                                "file": file_name,
-                                "md5": md5,
-                                "error": msg,
-                            }
-                        )
-
-                # 每处理一个文件发送进度（成功或失败都发送）
-                yield (
-                    f"data: {json.dumps({'type': 'progress', 'current': current, 'total': total_files, 'success_count': success_count, 'skip_count': skip_count, 'fail_count': fail_count, 'current_file': file_name, 'status': status, 'message': status_msg})}\n\n"
-                )
-
-                # 每处理10个文件让出一次控制权，避免阻塞
-                if current % 10 == 0:
-                    await asyncio.sleep(0)
-
-            logger.info(f"[SSE] 解密完成: 成功={success_count}, 跳过={skip_count}, 失败={fail_count}")
-
-            # 发送完成消息
-            yield (
-                f"data: {json.dumps({'type': 'complete', 'total': total_files, 'success_count': success_count, 'skip_count': skip_count, 'fail_count': fail_count, 'output_dir': str(resource_dir), 'failed_files': failed_files[:20], 'message': f'解密完成: 成功 {success_count}, 跳过 {skip_count}, 失败 {fail_count}'})}\n\n"
-            )
+            verb = "已取消（再次运行将从中断处继续）" if result["cancelled"] else "完成"
+            logger.info(f"[SSE] 解密{verb}: 成功={success_count}, 跳过={skip_count}, 失败={fail_count}")
+            final = {
+                "type": "cancelled" if result["cancelled"] else "complete",
+                "current": result["current"],
+                "total": result["total"],
+                "success_count": success_count,
+                "skip_count": skip_count,
+                "fail_count": fail_count,
+                "output_dir": result["output_dir"],
+                "failed_files": result["failed_files"][:20],
+                "duration_sec": result["duration_sec"],
+                "message": f"解密{verb}: 成功 {success_count}, 跳过 {skip_count}, 失败 {fail_count}",
+            }
+            yield f"data: {json.dumps(final)}\n\n"
 
         except Exception as e:
             logger.error(f"[SSE] 解密过程出错: {e}")
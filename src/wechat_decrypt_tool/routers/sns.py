@@ -22,11 +22,13 @@ from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response, FileResponse  # 返回视频文件
 from pydantic import BaseModel, Field
 
+from .. import http_client
 from ..chat_helpers import _load_contact_rows, _pick_display_name, _resolve_account_dir
 from ..logging_config import get_logger
 from ..media_helpers import _read_and_maybe_decrypt_media, _resolve_account_wxid_dir
 from ..path_fix import PathFixRoute
 from .. import sns_media as _sns_media
+from ..sqlite_pool import connect_readonly
 from ..wcdb_realtime import (
     WCDBRealtimeError,
     WCDB_REALTIME,
@@ -161,7 +163,7 @@ def _count_sns_timeline_rows_in_decrypted_sqlite(
     sql = f"SELECT COUNT(*) AS c FROM SnsTimeLine {where_sql}"
 
     try:
-        conn = sqlite3.connect(str(sns_db_path), timeout=2.0)
+        conn = connect_readonly(sns_db_path)
         try:
             conn.execute("PRAGMA busy_timeout=2000")
             row = conn.execute(sql, params).fetchone()
@@ -217,7 +219,7 @@ def _count_sns_timeline_posts_in_decrypted_sqlite(
     sql = f"SELECT COUNT(*) AS c FROM SnsTimeLine {where_sql}"
 
     try:
-        conn = sqlite3.connect(str(sns_db_path), timeout=2.0)
+        conn = connect_readonly(sns_db_path)
         try:
             conn.execute("PRAGMA busy_timeout=2000")
             row = conn.execute(sql, params).fetchone()
@@ -398,7 +400,7 @@ def _build_biz_to_official_index(contact_db_path: str, mtime_ns: int, size: int)
     if not contact_db_path:
         return out
 
-    conn = sqlite3.connect(str(contact_db_path))
+    conn = connect_readonly(Path(contact_db_path))
     conn.row_factory = sqlite3.Row
     try:
         try:
@@ -1449,10 +1451,12 @@ def _get_sns_covers(account_dir: Path, target_wxid: str, limit: int = 20) -> lis
         if sns_db_path.exists():
             try:
                 # 只读模式防止锁死
-                conn_sq = sqlite3.connect(f"file:{sns_db_path}?mode=ro", uri=True)
-                conn_sq.row_factory = sqlite3.Row
-                rows_sq = conn_sq.execute(cover_sql).fetchall()
-                conn_sq.close()
+                conn_sq = connect_readonly(sns_db_path)
+                try:
+                    conn_sq.row_factory = sqlite3.Row
+                    rows_sq = conn_sq.execute(cover_sql).fetchall()
+                finally:
+                    conn_sq.close()
                 rows = [{"tid": r["tid"], "content": r["content"]} for r in (rows_sq or [])]
             except Exception as e:
                 logger.warning("[sns] SQLite cover fetch failed: %s", e)
@@ -1532,8 +1536,7 @@ def api_sns_self_info(account: Optional[str] = None):
     if contact_db_path.exists():
         conn = None
         try:
-            db_uri = f"file:{contact_db_path}?mode=ro"
-            conn = sqlite3.connect(db_uri, uri=True, timeout=5)
+            conn = connect_readonly(contact_db_path)
             conn.row_factory = sqlite3.Row
 
             cursor = conn.execute("PRAGMA table_info(contact)")
@@ -1825,7 +1828,7 @@ def list_sns_timeline(
         # Fetch 1 extra row to determine hasMore.
         params_with_page = params + [limit + 1, offset]
 
-        conn2 = sqlite3.connect(str(sns_db_path))
+        conn2 = connect_readonly(sns_db_path)
         conn2.row_factory = sqlite3.Row
         try:
             rows2 = conn2.execute(sql, params_with_page).fetchall()
@@ -2512,7 +2515,7 @@ def list_sns_users(
 
     kw = str(keyword or "").strip().lower()
 
-    conn = sqlite3.connect(str(sns_db_path))
+    conn = connect_readonly(sns_db_path)
     conn.row_factory = sqlite3.Row
     try:
         cur = conn.cursor()
@@ -3145,27 +3148,27 @@ async def proxy_article_thumb(url: str):
         raise HTTPException(status_code=400, detail="Invalid URL")
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-            resp = await client.get(u, headers=headers)
-            resp.raise_for_status()
-            html_text = resp.text
+        client = http_client.async_client()
+        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+        resp = await client.get(u, headers=headers, timeout=10.0)
+        resp.raise_for_status()
+        html_text = resp.text
 
-            match = re.search(r'["\'](https?://[^"\']*?mmbiz_[a-zA-Z]+[^"\']*?)["\']', html_text)
+        match = re.search(r'["\'](https?://[^"\']*?mmbiz_[a-zA-Z]+[^"\']*?)["\']', html_text)
 
-            if not match:
-                raise HTTPException(status_code=404, detail="未在 HTML 中找到图片 URL")
+        if not match:
+            raise HTTPException(status_code=404, detail="未在 HTML 中找到图片 URL")
 
-            img_url = match.group(1)
-            img_url = html.unescape(img_url).replace("&amp;", "&")
+        img_url = match.group(1)
+        img_url = html.unescape(img_url).replace("&amp;", "&")
 
-            img_resp = await client.get(img_url, headers=headers)
-            img_resp.raise_for_status()
+        img_resp = await client.get(img_url, headers=headers, timeout=10.0)
+        img_resp.raise_for_status()
 
-            return Response(
-                content=img_resp.content,
-                media_type=img_resp.headers.get("Content-Type", "image/jpeg")
-            )
+        return Response(
+            content=img_resp.content,
+            media_type=img_resp.headers.get("Content-Type", "image/jpeg")
+        )
 
     except Exception as e:
         logger.warning(f"[sns] 提取公众号封面失败 url={u[:50]}... : {e}")
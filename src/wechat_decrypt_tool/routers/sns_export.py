@@ -13,6 +13,7 @@ from ..sns_export_service import SNS_EXPORT_MANAGER
 router = APIRouter(route_class=PathFixRoute)
 
 ExportScope = Literal["selected", "all"]
+ZipProfile = Literal["auto", "fast", "zstd", "deflate"]
 
 
 class SnsExportCreateRequest(BaseModel):
@@ -22,6 +23,7 @@ class SnsExportCreateRequest(BaseModel):
     use_cache: bool = Field(True, description="是否复用导出过程中的本地缓存（默认开启）")
     output_dir: Optional[str] = Field(None, description="导出目录绝对路径（可选；不填时使用默认目录）")
     file_name: Optional[str] = Field(None, description="导出 zip 文件名（可选，不含/含 .zip 都可）")
+    zip_profile: Optional[ZipProfile] = Field(None, description="zip 压缩策略：auto=媒体仅存储、文本压缩（默认）；fast=文本快速压缩；zstd=文本使用 zstd（需 Python 3.14+，否则同 fast）；deflate=全部 deflate（旧行为）")
 
 
 @router.post("/api/sns/exports", summary="创建朋友圈导出任务（离线 HTML zip）")
@@ -33,6 +35,7 @@ async def create_sns_export(req: SnsExportCreateRequest):
         use_cache=bool(req.use_cache),
         output_dir=req.output_dir,
         file_name=req.file_name,
+        zip_profile=req.zip_profile,
     )
     return {"status": "success", "job": job.to_public_dict()}
 
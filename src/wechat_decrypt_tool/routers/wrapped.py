@@ -1,12 +1,23 @@
 from __future__ import annotations
 
 import asyncio
+import json
+import time
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
 
+from ..logging_config import get_logger
 from ..path_fix import PathFixRoute
-from ..wrapped.service import build_wrapped_annual_card, build_wrapped_annual_meta, build_wrapped_annual_response
+from ..wrapped.service import (
+    build_wrapped_annual_card,
+    build_wrapped_annual_meta,
+    build_wrapped_annual_response,
+    iter_wrapped_annual_cards,
+)
+
+logger = get_logger(__name__)
 
 router = APIRouter(route_class=PathFixRoute)
 
@@ -34,6 +45,50 @@ async def wrapped_annual_meta(
     return await asyncio.to_thread(build_wrapped_annual_meta, account=account, year=year, refresh=refresh)
 
 
+@router.get("/api/wrapped/annual/stream", summary="微信聊天年度总结（WeChat Wrapped）- 并发生成全部卡片（SSE）")
+async def wrapped_annual_stream(
+    request: Request,
+    year: Optional[int] = Query(None, description="年份（例如 2026）。默认当前年份。"),
+    account: Optional[str] = Query(None, description="解密后的账号目录名。默认取第一个可用账号。"),
+    refresh: bool = Query(False, description="是否强制重新计算（忽略缓存）。"),
+):
+    """并发生成整套卡片，每完成一张就通过 SSE 推送（meta -> card/error ... -> done）。"""
+
+    async def gen():
+        it = iter_wrapped_annual_cards(account=account, year=year, refresh=refresh)
+        last_heartbeat = time.time()
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+                # Cards are built by a worker pool; `next` blocks until the next one completes.
+                next_task = asyncio.ensure_future(asyncio.to_thread(next, it, None))
+                while not next_task.done():
+                    await asyncio.wait({next_task}, timeout=15)
+                    if not next_task.done() and time.time() - last_heartbeat > 15:
+                        last_heartbeat = time.time()
+                        yield ": ping\n\n"
+                try:
+                    event = next_task.result()
+                except Exception as e:
+                    logger.exception("Wrapped stream failed")
+                    yield "event: error\ndata: " + json.dumps({"error": str(e)}, ensure_ascii=False) + "\n\n"
+                    break
+                if event is None:
+                    break
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            # Stops scheduling further cards; cards already running still finish and fill the cache.
+            # (If a `next` call is still in flight the generator is closed once it is collected.)
+            try:
+                await asyncio.to_thread(it.close)
+            except ValueError:
+                pass
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
+
+
 @router.get("/api/wrapped/annual/cards/{card_id}", summary="微信聊天年度总结（WeChat Wrapped）- 单张卡片（按页加载）")
 async def wrapped_annual_card(
     card_id: int = Path(..., description="卡片ID（与前端页面一一对应）", ge=0),
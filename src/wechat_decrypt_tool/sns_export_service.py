@@ -18,7 +18,9 @@ import zipfile
 from pathlib import Path
 from typing import Any, Literal, Optional
 
+from . import http_client
 from .chat_helpers import _load_contact_rows, _pick_display_name, _resolve_account_dir
+from .export_zip import ExportZip, default_zip_profile, normalize_zip_profile
 from .logging_config import get_logger
 from .media_helpers import _detect_image_media_type, _read_and_maybe_decrypt_media, _resolve_account_wxid_dir
 
@@ -56,6 +58,25 @@ ExportScope = Literal["selected", "all"]
 _INVALID_PATH_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
 
 
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+# Remote media of the next batch of posts is fetched concurrently before the batch is rendered; rendering
+# (and therefore every zip write) stays serial, in post order.
+_PREFETCH_CONCURRENCY = _env_int("WECHAT_TOOL_SNS_EXPORT_FETCH_CONCURRENCY", 8, min_v=1, max_v=64)
+_PREFETCH_BATCH_POSTS = _env_int("WECHAT_TOOL_SNS_EXPORT_BATCH_POSTS", 50, min_v=1, max_v=1000)
+
+
 def _safe_name(s: str, max_len: int = 80) -> str:
     t = str(s or "").strip()
     if not t:
@@ -198,6 +219,7 @@ class ExportProgress:
     posts_exported: int = 0
     media_copied: int = 0
     media_missing: int = 0
+    media_bytes: int = 0
 
 
 @dataclass
@@ -213,8 +235,12 @@ class ExportJob:
     options: dict[str, Any] = field(default_factory=dict)
     progress: ExportProgress = field(default_factory=ExportProgress)
     cancel_requested: bool = False
+    zip_stats: dict[str, Any] = field(default_factory=dict)
 
     def to_public_dict(self) -> dict[str, Any]:
+        elapsed = 0.0
+        if self.started_at:
+            elapsed = max(0.0, float(self.finished_at or time.time()) - float(self.started_at))
         return {
             "exportId": self.export_id,
             "account": self.account,
@@ -234,7 +260,11 @@ class ExportJob:
                 "postsExported": self.progress.posts_exported,
                 "mediaCopied": self.progress.media_copied,
                 "mediaMissing": self.progress.media_missing,
+                "mediaBytes": self.progress.media_bytes,
+                "mediaPerSecond": round(self.progress.media_copied / elapsed, 2) if elapsed > 0 else 0.0,
+                "mediaKBps": round(self.progress.media_bytes / 1024 / elapsed, 1) if elapsed > 0 else 0.0,
             },
+            "zipStats": self.zip_stats,
         }
 
 
@@ -275,6 +305,7 @@ class SnsExportManager:
         use_cache: bool,
         output_dir: Optional[str],
         file_name: Optional[str],
+        zip_profile: Optional[str] = None,
     ) -> ExportJob:
         account_dir = _resolve_account_dir(account)
         export_id = uuid.uuid4().hex[:12]
@@ -289,6 +320,7 @@ class SnsExportManager:
                 "useCache": bool(use_cache),
                 "outputDir": str(output_dir or "").strip(),
                 "fileName": str(file_name or "").strip(),
+                "zipProfile": normalize_zip_profile(zip_profile) if zip_profile else default_zip_profile(),
             },
         )
 
@@ -415,6 +447,14 @@ class SnsExportManager:
         written: set[str] = set()
         media_written: dict[str, str] = {}
         avatar_written: dict[str, str] = {}
+        # Prefetched remote results for the batch being rendered, keyed by (fixed url, key).
+        remote_images: dict[tuple[str, str], Any] = {}
+        remote_videos: dict[tuple[str, str], Optional[Path]] = {}
+
+        def count_media_written(nbytes: int) -> None:
+            with self._lock:
+                job.progress.media_copied += 1
+                job.progress.media_bytes += max(0, int(nbytes or 0))
 
         wxid_dir = _resolve_account_wxid_dir(account_dir)
 
@@ -535,8 +575,7 @@ class SnsExportManager:
                 if arc not in written:
                     zf.writestr(arc, payload)
                     written.add(arc)
-                    with self._lock:
-                        job.progress.media_copied += 1
+                    count_media_written(len(payload))
                 return arc
             except Exception:
                 return ""
@@ -628,15 +667,18 @@ class SnsExportManager:
             # 0) Prefer WeFlow-style remote download+decrypt (accurate when keys are present).
             if fixed:
                 should_cancel()
-                res = run_async(
-                    _try_fetch_and_decrypt_sns_image_remote(
-                        account_dir=account_dir,
-                        url=fixed,
-                        key=str(key or ""),
-                        token=str(token or ""),
-                        use_cache=use_cache,
+                if (fixed, str(key or "")) in remote_images:
+                    res = remote_images[(fixed, str(key or ""))]
+                else:
+                    res = run_async(
+                        _try_fetch_and_decrypt_sns_image_remote(
+                            account_dir=account_dir,
+                            url=fixed,
+                            key=str(key or ""),
+                            token=str(token or ""),
+                            use_cache=use_cache,
+                        )
                     )
-                )
                 if res is not None:
                     payload = bytes(res.payload or b"")
                     mt = str(res.media_type or "")
@@ -791,8 +833,7 @@ class SnsExportManager:
                         try:
                             zf.write(str(local), arcname=arc)
                             written.add(arc)
-                            with self._lock:
-                                job.progress.media_copied += 1
+                            count_media_written(Path(str(local)).stat().st_size)
                         except Exception:
                             arc = ""
                     if arc:
@@ -800,15 +841,20 @@ class SnsExportManager:
                         return arc
 
             should_cancel()
-            path = run_async(
-                _materialize_sns_remote_video(
-                    account_dir=account_dir,
-                    url=fixed,
-                    key=str(key or ""),
-                    token=str(token or ""),
-                    use_cache=use_cache,
+            # Popped: without the cache the path is a temp file that is deleted once written.
+            vkey = (fixed, str(key or ""))
+            if vkey in remote_videos:
+                path = remote_videos.pop(vkey)
+            else:
+                path = run_async(
+                    _materialize_sns_remote_video(
+                        account_dir=account_dir,
+                        url=fixed,
+                        key=str(key or ""),
+                        token=str(token or ""),
+                        use_cache=use_cache,
+                    )
                 )
-            )
             if path is None:
                 with self._lock:
                     job.progress.media_missing += 1
@@ -820,8 +866,7 @@ class SnsExportManager:
                 try:
                     zf.write(str(path), arcname=arc)
                     written.add(arc)
-                    with self._lock:
-                        job.progress.media_copied += 1
+                    count_media_written(Path(str(path)).stat().st_size)
                     # When cache is disabled, `_materialize_sns_remote_video` returns a temp file path.
                     # Clean it up after the zip entry is written to avoid leaving `.tmp` files behind.
                     if not use_cache:
@@ -838,6 +883,128 @@ class SnsExportManager:
             media_written[cache_key] = arc
             return arc
 
+        def plan_remote_media(post: dict[str, Any]) -> tuple[list[tuple[str, str, str]], list[tuple[str, str, str]]]:
+            """(images, videos) as (fixed url, key, token) that rendering `post` will fetch remotely.
+
+            Mirrors render_post_html / render_media_block; anything missed here is simply fetched inline.
+            """
+            images: list[tuple[str, str, str]] = []
+            videos: list[tuple[str, str, str]] = []
+            media = post.get("media") if isinstance(post.get("media"), list) else []
+            try:
+                post_type = int(post.get("type") or 1)
+            except Exception:
+                post_type = 1
+            if post_type == 28:
+                return images, videos
+            if post_type in (3, 5, 42):
+                media = media[:1]
+
+            def add_image(m: dict[str, Any]) -> None:
+                raw_url = str(m.get("thumb") or m.get("url") or "").strip()
+                token = _sns_media_token(m)
+                fixed = _fix_sns_cdn_url(raw_url, token=token, is_video=False) if raw_url else ""
+                if fixed:
+                    images.append((fixed, _sns_media_key(m), token))
+
+            def add_video(url: str, key: str, token: str, post_id: str, media_id: str) -> None:
+                fixed = _fix_sns_cdn_url(str(url or ""), token=str(token or ""), is_video=True)
+                if not fixed:
+                    return
+                if use_cache and wxid_dir and post_id and media_id:
+                    try:
+                        if _resolve_sns_cached_video_path(wxid_dir, post_id, media_id):
+                            return
+                    except Exception:
+                        pass
+                videos.append((fixed, str(key or ""), str(token or "")))
+
+            post_id = str(post.get("id") or "").strip()
+            for m_raw in media[:9]:
+                m = m_raw if isinstance(m_raw, dict) else {}
+                add_image(m)
+                if post_type in (3, 5, 42):
+                    continue
+                try:
+                    mtype = int(m.get("type") or 0)
+                except Exception:
+                    mtype = 0
+                if mtype == 6:
+                    add_video(
+                        str(m.get("url") or ""),
+                        str(m.get("videoKey") or ""),
+                        _sns_media_token(m),
+                        post_id,
+                        str(m.get("id") or "").strip(),
+                    )
+                elif isinstance(m.get("livePhoto"), dict) and str(m["livePhoto"].get("url") or "").strip():
+                    lp = m["livePhoto"]
+                    add_video(
+                        str(lp.get("url") or ""),
+                        str(lp.get("key") or m.get("videoKey") or ""),
+                        _pick_str(lp.get("token"), _sns_media_token(m)),
+                        "",
+                        "",
+                    )
+            return images, videos
+
+        async def prefetch_remote_media(posts: list[dict[str, Any]]) -> None:
+            images: dict[tuple[str, str], str] = {}
+            videos: dict[tuple[str, str], str] = {}
+            for p in posts:
+                imgs, vids = plan_remote_media(p)
+                for fixed, key, token in imgs:
+                    if (fixed, key) not in remote_images:
+                        images.setdefault((fixed, key), token)
+                for fixed, key, token in vids:
+                    if (fixed, key) not in remote_videos:
+                        videos.setdefault((fixed, key), token)
+            if not images and not videos:
+                return
+
+            sem = asyncio.Semaphore(_PREFETCH_CONCURRENCY)
+
+            async def fetch_image(fixed: str, key: str, token: str) -> None:
+                async with sem:
+                    if self._should_cancel(job):
+                        return
+                    try:
+                        res = await _try_fetch_and_decrypt_sns_image_remote(
+                            account_dir=account_dir, url=fixed, key=key, token=token, use_cache=use_cache
+                        )
+                    except Exception:
+                        res = None
+                    remote_images[(fixed, key)] = res
+
+            async def fetch_video(fixed: str, key: str, token: str) -> None:
+                async with sem:
+                    if self._should_cancel(job):
+                        return
+                    try:
+                        path = await _materialize_sns_remote_video(
+                            account_dir=account_dir, url=fixed, key=key, token=token, use_cache=use_cache
+                        )
+                    except Exception:
+                        path = None
+                    remote_videos[(fixed, key)] = path
+
+            await asyncio.gather(
+                *(fetch_image(f, k, t) for (f, k), t in images.items()),
+                *(fetch_video(f, k, t) for (f, k), t in videos.items()),
+            )
+
+        def release_prefetched() -> None:
+            remote_images.clear()
+            leftovers = [p for p in remote_videos.values() if p is not None]
+            remote_videos.clear()
+            if not use_cache:
+                # Uncached downloads are temp files owned by the export.
+                for p in leftovers:
+                    try:
+                        Path(str(p)).unlink(missing_ok=True)
+                    except Exception:
+                        pass
+
         def render_media_block(*, zf: zipfile.ZipFile, post: dict[str, Any]) -> str:
             media = post.get("media") if isinstance(post.get("media"), list) else []
             if not media:
@@ -1384,7 +1551,9 @@ class SnsExportManager:
             return "".join(out)
 
         try:
-            with zipfile.ZipFile(str(tmp_zip), mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+            with zipfile.ZipFile(str(tmp_zip), mode="w", compression=zipfile.ZIP_DEFLATED) as raw_zf:
+                # SNS images/videos are stored, pages deflated; see export_zip for the profiles.
+                zf = ExportZip(raw_zf, profile=opts.get("zipProfile"))
                 css_payload = _load_ui_css_bundle(ui_public_dir=ui_public_dir, report=report) + "\n\n" + _SNS_EXPORT_CSS_PATCH
                 zf.writestr("assets/wechat-sns-export.css", css_payload)
                 written.add("assets/wechat-sns-export.css")
@@ -1447,11 +1616,18 @@ class SnsExportManager:
                             break
 
                     post_parts: list[str] = []
-                    for p in posts_all:
+                    for start in range(0, len(posts_all), _PREFETCH_BATCH_POSTS):
+                        batch = posts_all[start : start + _PREFETCH_BATCH_POSTS]
                         should_cancel()
-                        post_parts.append(render_post_html(zf=zf, post=p))
-                        with self._lock:
-                            job.progress.posts_exported += 1
+                        run_async(prefetch_remote_media(batch))
+                        try:
+                            for p in batch:
+                                should_cancel()
+                                post_parts.append(render_post_html(zf=zf, post=p))
+                                with self._lock:
+                                    job.progress.posts_exported += 1
+                        finally:
+                            release_prefetched()
 
                     safe_uname = _safe_name(uname, max_len=80) or hashlib.md5(uname.encode("utf-8", errors="ignore")).hexdigest()[:12]
                     page_name = f"sns_{safe_uname}.html"
@@ -1573,16 +1749,30 @@ class SnsExportManager:
                         zf.writestr("index.html", index_html)
                         written.add("index.html")
 
+                with self._lock:
+                    report["media"] = {
+                        "copied": job.progress.media_copied,
+                        "missing": job.progress.media_missing,
+                        "bytes": job.progress.media_bytes,
+                        "seconds": round(time.time() - float(job.started_at or time.time()), 3),
+                        "fetchConcurrency": _PREFETCH_CONCURRENCY,
+                    }
                 try:
+                    report["zip"] = zf.stats()
                     zf.writestr("export_report.json", json.dumps(report, ensure_ascii=False, indent=2))
                 except Exception:
                     pass
+                zip_stats = zf.stats()
         finally:
             try:
                 if avatar_conn is not None:
                     avatar_conn.close()
             except Exception:
                 pass
+            try:
+                loop.run_until_complete(http_client.aclose_async_client())
+            except Exception:
+                pass
             try:
                 loop.close()
             except Exception:
@@ -1596,6 +1786,7 @@ class SnsExportManager:
 
         with self._lock:
             job.zip_path = final_out
+            job.zip_stats = zip_stats
             if job.status != "cancelled":
                 job.status = "done"
             job.finished_at = time.time()
@@ -27,9 +27,10 @@ import re
 import subprocess
 import time
 
-import httpx
 from fastapi import HTTPException
 
+from . import http_client
+from .executors import run_blocking
 from .logging_config import get_logger
 from .wcdb_realtime import decrypt_sns_image as _wcdb_decrypt_sns_image
 
@@ -202,37 +203,36 @@ async def _download_sns_remote_to_file(url: str, dest_path: Path, *, max_bytes:
     ]
 
     last_err: Exception | None = None
-    async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-        for extra in header_variants:
-            headers = dict(base_headers)
-            headers.update(extra)
-            try:
-                if dest_path.exists():
-                    try:
-                        dest_path.unlink(missing_ok=True)
-                    except Exception:
-                        pass
-
-                total = 0
-                async with client.stream("GET", u, headers=headers) as resp:
-                    resp.raise_for_status()
-                    content_type = str(resp.headers.get("Content-Type") or "").strip()
-                    x_enc = str(resp.headers.get("x-enc") or "").strip()
-                    dest_path.parent.mkdir(parents=True, exist_ok=True)
-                    with dest_path.open("wb") as f:
-                        async for chunk in resp.aiter_bytes():
-                            if not chunk:
-                                continue
-                            total += len(chunk)
-                            if total > max_bytes:
-                                raise HTTPException(status_code=400, detail="SNS video too large.")
-                            f.write(chunk)
-                return content_type, x_enc
-            except HTTPException:
-                raise
-            except Exception as e:
-                last_err = e
-                continue
+    for extra in header_variants:
+        headers = dict(base_headers)
+        headers.update(extra)
+        try:
+            if dest_path.exists():
+                try:
+                    dest_path.unlink(missing_ok=True)
+                except Exception:
+                    pass
+
+            total = 0
+            async with http_client.async_stream("GET", u, headers=headers, timeout=30.0) as resp:
+                resp.raise_for_status()
+                content_type = str(resp.headers.get("Content-Type") or "").strip()
+                x_enc = str(resp.headers.get("x-enc") or "").strip()
+                dest_path.parent.mkdir(parents=True, exist_ok=True)
+                with dest_path.open("wb") as f:
+                    async for chunk in resp.aiter_bytes():
+                        if not chunk:
+                            continue
+                        total += len(chunk)
+                        if total > max_bytes:
+                            raise HTTPException(status_code=400, detail="SNS video too large.")
+                        f.write(chunk)
+            return content_type, x_enc
+        except HTTPException:
+            raise
+        except Exception as e:
+            last_err = e
+            continue
 
     raise last_err or RuntimeError("sns remote download failed")
 
@@ -332,8 +332,8 @@ async def materialize_sns_remote_video(
             pass
         return None
 
-    # Decrypt in-place if the file isn't already a mp4.
-    maybe_decrypt_sns_video_file(tmp_path, str(key or ""))
+    # Decrypt in-place if the file isn't already a mp4 (keystream + XOR off the event loop).
+    await run_blocking("sns", maybe_decrypt_sns_video_file, tmp_path, str(key or ""))
 
     # Validate: mp4 must have `ftyp` at offset 4.
     ok_mp4 = False
@@ -519,24 +519,22 @@ async def _download_sns_remote_bytes(url: str) -> tuple[bytes, str, str]:
     ]
 
     last_err: Exception | None = None
-    async with httpx.AsyncClient(timeout=20.0, follow_redirects=True) as client:
-        for extra in header_variants:
-            headers = dict(base_headers)
-            headers.update(extra)
-            try:
-                resp = await client.get(u, headers=headers)
-                resp.raise_for_status()
-                payload = bytes(resp.content or b"")
-                if len(payload) > max_bytes:
-                    raise HTTPException(status_code=400, detail="SNS media too large (>25MB).")
-                content_type = str(resp.headers.get("Content-Type") or "").strip()
-                x_enc = str(resp.headers.get("x-enc") or "").strip()
-                return payload, content_type, x_enc
-            except HTTPException:
-                raise
-            except Exception as e:
-                last_err = e
-                continue
+    for extra in header_variants:
+        headers = dict(base_headers)
+        headers.update(extra)
+        try:
+            # Shared keep-alive client; concurrent requests for the same object share one download.
+            res = await http_client.async_fetch_bytes(u, headers=headers, timeout=20.0, max_bytes=max_bytes)
+            if not res.ok:
+                raise RuntimeError(f"http {res.status_code}")
+            content_type = str(res.headers.get("Content-Type") or "").strip()
+            x_enc = str(res.headers.get("x-enc") or "").strip()
+            return res.content, content_type, x_enc
+        except http_client.ResponseTooLarge:
+            raise HTTPException(status_code=400, detail="SNS media too large (>25MB).")
+        except Exception as e:
+            last_err = e
+            continue
 
     raise last_err or RuntimeError("sns remote download failed")
 
@@ -652,7 +650,7 @@ async def try_fetch_and_decrypt_sns_image_remote(
 
     if need_decrypt:
         try:
-            decoded2 = _wcdb_decrypt_sns_image(raw, k)
+            decoded2 = await run_blocking("sns", _wcdb_decrypt_sns_image, raw, k)
             mt2 = detect_image_mime(decoded2)
             if mt2:
                 decoded = decoded2
@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Pooled read-only connections for the decrypted account databases (message_*.db, contact.db, ...).
+#
+# - One pool per db file; connections are opened with `mode=ro` and handed out exclusively, so a borrowed
+#   connection is never shared between threads at the same time.
+# - Each pool is stamped with the file's (inode, mtime_ns, size). Decrypt rewrites, realtime sync inserts and
+#   index swaps change that stamp; the next borrow drops the idle connections (and the cached table_info) so
+#   nobody keeps reading an unlinked file or a stale schema.
+# - `immutable=1` is deliberately not used: realtime sync appends to these files while the app is running.
+# - Writers never truncate or rewrite these files under a live reader (a memory-mapped reader would SIGBUS):
+#   a full decrypt writes a temp file and `os.replace`s it right after `invalidate_sqlite_pool()`, which closes
+#   idle connections and waits for borrowed ones to come back (on Windows an open handle would make the replace
+#   fail). An incremental decrypt patches pages in place inside `exclusive_sqlite_file()`, which also keeps new
+#   borrowers waiting until the patch is done.
+
+
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+_POOL_SIZE = _env_int("WECHAT_TOOL_SQLITE_POOL_SIZE", 4, min_v=0, max_v=64)
+_MMAP_BYTES = _env_int("WECHAT_TOOL_SQLITE_MMAP_MB", 256, min_v=0, max_v=8192) * 1024 * 1024
+_CACHE_KB = _env_int("WECHAT_TOOL_SQLITE_CACHE_KB", 16384, min_v=0, max_v=1024 * 1024)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection that remembers its pool; `close()` hands it back instead of closing it.
+
+    This keeps the usual `conn = ...; try: ... finally: conn.close()` shape working unchanged.
+    """
+
+    pool_key: str = ""
+    pool_generation: int = 0
+    borrowed: bool = False
+
+    def close(self) -> None:
+        if self.borrowed:
+            _release(self)
+
+
+@dataclass
+class _FilePool:
+    signature: Optional[tuple[int, int, int]] = None
+    generation: int = 0
+    idle: deque = field(default_factory=deque)
+    borrowed: int = 0
+    writers: int = 0
+    table_info: dict[str, list[tuple[Any, ...]]] = field(default_factory=dict)
+    # Condition doubles as the pool lock; `_release` notifies it so invalidation can wait for borrowers.
+    lock: threading.Condition = field(default_factory=threading.Condition)
+
+
+_POOLS: dict[str, _FilePool] = {}
+_POOLS_GUARD = threading.Lock()
+
+_STATS_LOCK = threading.Lock()
+_STATS: dict[str, int] = {
+    "hits": 0,
+    "misses": 0,
+    "opened": 0,
+    "closed": 0,
+    "invalidations": 0,
+    "tableInfoHits": 0,
+    "tableInfoMisses": 0,
+}
+
+
+def _bump(key: str, n: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[key] = _STATS.get(key, 0) + n
+
+
+def _pool_key(db_path: Path) -> str:
+    return os.path.normcase(os.path.abspath(str(db_path)))
+
+
+def _get_pool(key: str) -> _FilePool:
+    with _POOLS_GUARD:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _FilePool()
+            _POOLS[key] = pool
+        return pool
+
+
+def _file_signature(db_path: Path) -> tuple[int, int, int]:
+    st = os.stat(db_path)
+    return int(st.st_ino), int(st.st_mtime_ns), int(st.st_size)
+
+
+def _close_quietly(conn: sqlite3.Connection) -> None:
+    try:
+        sqlite3.Connection.close(conn)
+    except Exception:
+        pass
+    _bump("closed")
+
+
+def _drain(pool: _FilePool) -> None:
+    # Caller holds pool.lock.
+    while pool.idle:
+        _close_quietly(pool.idle.pop())
+    pool.table_info.clear()
+    pool.generation += 1
+
+
+def _open(db_path: Path, key: str, generation: int) -> PooledConnection:
+    uri = Path(os.path.abspath(str(db_path))).as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=PooledConnection)
+    conn.pool_key = key
+    conn.pool_generation = generation
+    try:
+        if _MMAP_BYTES > 0:
+            conn.execute(f"PRAGMA mmap_size={int(_MMAP_BYTES)}")
+        if _CACHE_KB > 0:
+            conn.execute(f"PRAGMA cache_size=-{int(_CACHE_KB)}")
+        conn.execute("PRAGMA query_only=1")
+    except Exception:
+        pass
+    _bump("opened")
+    return conn
+
+
+def connect_readonly(db_path: Path) -> PooledConnection:
+    """Borrow a read-only connection to `db_path`; `close()` returns it to the pool.
+
+    `row_factory` / `text_factory` may be changed freely; they are reset before the connection is reused.
+    Raises `sqlite3.OperationalError` when the file does not exist (it is never created).
+    """
+
+    db_path = Path(db_path)
+    key = _pool_key(db_path)
+    try:
+        sig = _file_signature(db_path)
+    except OSError:
+        raise sqlite3.OperationalError(f"unable to open database file: {db_path}")
+
+    pool = _get_pool(key)
+    conn: Optional[PooledConnection] = None
+    with pool.lock:
+        if pool.writers > 0:
+            pool.lock.wait_for(lambda: pool.writers <= 0)
+            try:
+                sig = _file_signature(db_path)
+            except OSError:
+                raise sqlite3.OperationalError(f"unable to open database file: {db_path}")
+        if pool.signature != sig:
+            if pool.signature is not None:
+                _bump("invalidations")
+            _drain(pool)
+            pool.signature = sig
+        generation = pool.generation
+        if pool.idle:
+            conn = pool.idle.pop()
+        pool.borrowed += 1
+    if conn is not None:
+        _bump("hits")
+    else:
+        _bump("misses")
+        try:
+            conn = _open(db_path, key, generation)
+        except BaseException:
+            with pool.lock:
+                pool.borrowed -= 1
+                pool.lock.notify_all()
+            raise
+    conn.borrowed = True
+    return conn
+
+
+def _release(conn: PooledConnection) -> None:
+    conn.borrowed = False
+    reusable = True
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+        conn.text_factory = str
+    except Exception:
+        reusable = False
+    pool = _get_pool(conn.pool_key)
+    with pool.lock:
+        keep = reusable and conn.pool_generation == pool.generation and len(pool.idle) < _POOL_SIZE
+        if keep:
+            pool.idle.append(conn)
+    if not keep:
+        _close_quietly(conn)
+    with pool.lock:
+        pool.borrowed = max(0, pool.borrowed - 1)
+        pool.lock.notify_all()
+
+
+@contextmanager
+def readonly_connection(db_path: Path) -> Iterator[sqlite3.Connection]:
+    conn = connect_readonly(db_path)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def cached_table_info(conn: sqlite3.Connection, table_name: str) -> list[tuple[Any, ...]]:
+    """`PRAGMA table_info(table)` rows, cached per pooled db file until the file changes."""
+
+    key = getattr(conn, "pool_key", "")
+    lk = str(table_name or "").lower()
+    pool = _get_pool(key) if key else None
+    if pool is not None:
+        with pool.lock:
+            if getattr(conn, "pool_generation", -1) == pool.generation and lk in pool.table_info:
+                _bump("tableInfoHits")
+                return pool.table_info[lk]
+
+    quoted = '"' + str(table_name).replace('"', '""') + '"'
+    rows = [tuple(r) for r in conn.execute(f"PRAGMA table_info({quoted})").fetchall()]
+    _bump("tableInfoMisses")
+    if pool is not None:
+        with pool.lock:
+            if getattr(conn, "pool_generation", -1) == pool.generation:
+                pool.table_info[lk] = rows
+    return rows
+
+
+def invalidate_sqlite_pool(path: Optional[Path] = None, *, wait_s: float = 0.0) -> int:
+    """Close idle pooled connections for one db file, every file under a directory, or everything.
+
+    Returns the number of pools invalidated. Borrowed connections are closed when they are returned;
+    `wait_s > 0` blocks (up to that many seconds) until they have been returned, so the caller can replace
+    the file without a live handle on it.
+    """
+
+    prefix = _pool_key(Path(path)) if path is not None else ""
+    with _POOLS_GUARD:
+        items = list(_POOLS.items())
+    matched: list[tuple[str, _FilePool]] = []
+    for key, pool in items:
+        if prefix and key != prefix and not key.startswith(prefix.rstrip(os.sep) + os.sep):
+            continue
+        with pool.lock:
+            _drain(pool)
+            pool.signature = None
+        matched.append((key, pool))
+    if matched:
+        _bump("invalidations", len(matched))
+
+    if wait_s > 0:
+        deadline = time.monotonic() + float(wait_s)
+        for key, pool in matched:
+            with pool.lock:
+                if not pool.lock.wait_for(lambda: pool.borrowed <= 0, timeout=max(0.0, deadline - time.monotonic())):
+                    logger.warning("[sqlite_pool] %s connection(s) still borrowed after %.1fs: %s", pool.borrowed, wait_s, key)
+    return len(matched)
+
+
+@contextmanager
+def exclusive_sqlite_file(db_path: Path, *, wait_s: float) -> Iterator[bool]:
+    """Hold `db_path` for an in-place rewrite: new borrowers wait until the block exits.
+
+    Idle connections are closed and borrowed ones waited for (up to `wait_s` seconds). Yields False when some
+    are still out after that; the caller must then leave the file alone (e.g. write a temp file and replace).
+    """
+
+    key = _pool_key(Path(db_path))
+    pool = _get_pool(key)
+    with pool.lock:
+        pool.writers += 1
+        _drain(pool)
+        pool.signature = None
+        drained = pool.lock.wait_for(lambda: pool.borrowed <= 0, timeout=max(0.0, float(wait_s)))
+    _bump("invalidations")
+    if not drained:
+        logger.warning("[sqlite_pool] %s connection(s) still borrowed after %.1fs: %s", pool.borrowed, wait_s, key)
+    try:
+        yield drained
+    finally:
+        with pool.lock:
+            pool.writers -= 1
+            _drain(pool)
+            pool.signature = None
+            pool.lock.notify_all()
+
+
+def get_sqlite_pool_stats() -> dict[str, Any]:
+    with _STATS_LOCK:
+        stats: dict[str, Any] = dict(_STATS)
+    with _POOLS_GUARD:
+        pools = list(_POOLS.values())
+    idle = 0
+    borrowed = 0
+    for pool in pools:
+        with pool.lock:
+            idle += len(pool.idle)
+            borrowed += pool.borrowed
+    lookups = int(stats["hits"]) + int(stats["misses"])
+    stats["hitRate"] = round(float(stats["hits"]) / lookups, 4) if lookups else 0.0
+    stats["pools"] = len(pools)
+    stats["idle"] = idle
+    stats["borrowed"] = borrowed
+    stats["poolSize"] = _POOL_SIZE
+    stats["mmapBytes"] = _MMAP_BYTES
+    stats["cacheKb"] = _CACHE_KB
+    return stats
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from .app_paths import get_output_dir
+from .logging_config import get_logger
+from .media_helpers import _convert_silk_to_browser_audio
+from .sqlite_pool import connect_readonly
+
+logger = get_logger(__name__)
+
+# On-disk cache of transcoded voice messages (SILK -> MP3/WAV).
+#
+# - Files are content-addressed: `{server_id}_{sha1(silk)[:24]}.{ext}`, so a re-decrypted / changed blob never
+#   serves a stale transcode, and the name doubles as a strong ETag.
+# - LRU by mtime (touched on every hit), capped by WECHAT_TOOL_VOICE_CACHE_MB across all accounts.
+# - Failed transcodes (raw SILK fallback) are not cached, so installing ffmpeg later takes effect.
+
+_EXTS: tuple[tuple[str, str], ...] = (("mp3", "audio/mpeg"), ("wav", "audio/wav"))
+
+
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+_MAX_BYTES = _env_int("WECHAT_TOOL_VOICE_CACHE_MB", 512, min_v=0, max_v=1024 * 1024) * 1024 * 1024
+
+
+def is_voice_cache_enabled() -> bool:
+    v = str(os.environ.get("WECHAT_TOOL_VOICE_CACHE_ENABLED", "1") or "").strip().lower()
+    return v not in {"", "0", "false", "off", "no"} and _MAX_BYTES > 0
+
+
+def get_voice_cache_root_dir() -> Path:
+    return get_output_dir() / "voice_cache"
+
+
+def _safe_segment(value: str) -> str:
+    cleaned = re.sub(r"[^0-9A-Za-z._-]+", "_", str(value or "").strip())
+    cleaned = cleaned.strip("._-")
+    return cleaned or "default"
+
+
+@dataclass(frozen=True)
+class TranscodedVoice:
+    # `path` is set when the audio is served from the cache; otherwise `payload` holds the bytes.
+    payload: bytes
+    ext: str
+    media_type: str
+    path: Optional[Path] = None
+    etag: str = ""
+
+
+# Fixed lock stripes (hash(key) % N) so concurrent requests for one clip transcode once without keeping a
+# lock per clip for the lifetime of the process.
+_KEY_LOCK_STRIPES = 64
+_KEY_LOCKS: tuple[threading.Lock, ...] = tuple(threading.Lock() for _ in range(_KEY_LOCK_STRIPES))
+_EVICT_LOCK = threading.Lock()
+_SIZE_ESTIMATE: Optional[int] = None
+
+_STATS_LOCK = threading.Lock()
+_STATS: dict[str, int] = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+
+def _bump(key: str, n: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[key] = _STATS.get(key, 0) + n
+
+
+def _key_lock(key: str) -> threading.Lock:
+    return _KEY_LOCKS[hash(key) % _KEY_LOCK_STRIPES]
+
+
+def _entry_base(account: str, server_id: int, silk_data: bytes) -> tuple[Path, str]:
+    digest = hashlib.sha1(bytes(silk_data)).hexdigest()[:24]
+    name = f"{int(server_id)}_{digest}"
+    return get_voice_cache_root_dir() / _safe_segment(account) / "files" / digest[:2] / name, name
+
+
+def _lookup(base: Path, name: str) -> Optional[TranscodedVoice]:
+    for ext, media_type in _EXTS:
+        p = base.with_name(f"{name}.{ext}")
+        try:
+            if p.stat().st_size <= 0:
+                continue
+        except OSError:
+            continue
+        try:
+            os.utime(p, None)
+        except OSError:
+            pass
+        return TranscodedVoice(payload=b"", ext=ext, media_type=media_type, path=p, etag=f'"{name}.{ext}"')
+    return None
+
+
+def _evict_if_needed(added: int) -> None:
+    global _SIZE_ESTIMATE
+    with _EVICT_LOCK:
+        root = get_voice_cache_root_dir()
+        if _SIZE_ESTIMATE is None:
+            _SIZE_ESTIMATE = sum(p.stat().st_size for p in root.glob("*/files/*/*") if p.is_file())
+        else:
+            _SIZE_ESTIMATE += int(added)
+        if _SIZE_ESTIMATE <= _MAX_BYTES:
+            return
+
+        files: list[tuple[float, int, Path]] = []
+        for p in root.glob("*/files/*/*"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        files.sort()
+        total = sum(f[1] for f in files)
+        target = int(_MAX_BYTES * 0.9)
+        evicted = 0
+        for _mtime, size, p in files:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        _SIZE_ESTIMATE = total
+        if evicted:
+            _bump("evicted", evicted)
+            logger.info("[voice_cache] evicted=%s size=%s cap=%s", evicted, total, _MAX_BYTES)
+
+
+def transcode_voice_cached(
+    account: str,
+    server_id: int,
+    silk_data: bytes,
+    *,
+    converter: Optional[Callable[..., tuple[bytes, str, str]]] = None,
+) -> TranscodedVoice:
+    """Browser-playable audio for a voice blob, from the cache when possible (transcoding and storing it otherwise)."""
+
+    convert = converter or _convert_silk_to_browser_audio
+    data = bytes(silk_data or b"")
+    if (not data) or (not is_voice_cache_enabled()) or (not str(account or "").strip()):
+        payload, ext, media_type = convert(data, preferred_format="mp3")
+        return TranscodedVoice(payload=payload, ext=ext, media_type=media_type)
+
+    base, name = _entry_base(account, server_id, data)
+    hit = _lookup(base, name)
+    if hit is not None:
+        _bump("hits")
+        return hit
+
+    # One transcode per clip even when the player and a prefetch pass race for it.
+    with _key_lock(name):
+        hit = _lookup(base, name)
+        if hit is not None:
+            _bump("hits")
+            return hit
+        _bump("misses")
+
+        payload, ext, media_type = convert(data, preferred_format="mp3")
+        if (not payload) or ext == "silk":
+            return TranscodedVoice(payload=payload, ext=ext, media_type=media_type)
+
+        path = base.with_name(f"{name}.{ext}")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{time.time_ns()}.tmp")
+            tmp_path.write_bytes(payload)
+            os.replace(str(tmp_path), str(path))
+        except Exception as e:
+            logger.warning(f"[voice_cache] write failed path={path} err={e}")
+            return TranscodedVoice(payload=payload, ext=ext, media_type=media_type)
+        _bump("stored")
+
+    try:
+        _evict_if_needed(len(payload))
+    except Exception:
+        logger.exception("[voice_cache] eviction failed")
+    if not path.exists():
+        return TranscodedVoice(payload=payload, ext=ext, media_type=media_type)
+    return TranscodedVoice(payload=b"", ext=ext, media_type=media_type, path=path, etag=f'"{name}.{ext}"')
+
+
+def load_voice_data(media_db_path: Path, server_id: int) -> Optional[bytes]:
+    if not media_db_path.exists():
+        return None
+    conn = connect_readonly(media_db_path)
+    try:
+        row = conn.execute(
+            "SELECT voice_data FROM VoiceInfo WHERE svr_id = ? ORDER BY create_time DESC LIMIT 1",
+            (int(server_id),),
+        ).fetchone()
+    except Exception:
+        row = None
+    finally:
+        conn.close()
+    if not row or row[0] is None:
+        return None
+    data = row[0]
+    return bytes(data) if not isinstance(data, bytes) else data
+
+
+def prefetch_voices(account_dir: Path, server_ids: Iterable[int]) -> dict[str, Any]:
+    """Transcode the given voice messages into the cache (used for a conversation's visible window)."""
+
+    ids = list(dict.fromkeys(int(s) for s in server_ids if int(s or 0) > 0))
+    out = {"requested": len(ids), "cached": 0, "failed": 0}
+    if (not ids) or (not is_voice_cache_enabled()):
+        return out
+
+    media_db_path = Path(account_dir) / "media_0.db"
+    if not media_db_path.exists():
+        return out
+
+    blobs: dict[int, bytes] = {}
+    conn = connect_readonly(media_db_path)
+    try:
+        placeholders = ",".join(["?"] * len(ids))
+        rows = conn.execute(
+            f"SELECT svr_id, voice_data FROM VoiceInfo WHERE svr_id IN ({placeholders}) ORDER BY create_time ASC",
+            ids,
+        ).fetchall()
+        for svr_id, data in rows:
+            if data is not None:
+                blobs[int(svr_id)] = bytes(data)
+    except sqlite3.Error:
+        logger.exception("[voice_cache] prefetch query failed account=%s", Path(account_dir).name)
+        return out
+    finally:
+        conn.close()
+
+    for svr_id in ids:
+        data = blobs.get(svr_id)
+        if not data:
+            continue
+        try:
+            tv = transcode_voice_cached(Path(account_dir).name, svr_id, data)
+        except Exception:
+            logger.exception("[voice_cache] prefetch transcode failed server_id=%s", svr_id)
+            tv = None
+        if tv is not None and tv.path is not None:
+            out["cached"] += 1
+        else:
+            out["failed"] += 1
+    return out
+
+
+def get_voice_cache_stats() -> dict[str, Any]:
+    with _STATS_LOCK:
+        stats: dict[str, Any] = dict(_STATS)
+    stats["maxBytes"] = _MAX_BYTES
+    stats["sizeEstimate"] = _SIZE_ESTIMATE
+    stats["enabled"] = is_voice_cache_enabled()
+    return stats
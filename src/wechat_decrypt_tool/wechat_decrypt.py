@@ -13,20 +13,42 @@ import hashlib
 import hmac
 import os
 import json
+import shutil
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 from .app_paths import get_output_databases_dir
+from .sqlite_pool import exclusive_sqlite_file, invalidate_sqlite_pool
 
 # 注意：不再支持默认密钥，所有密钥必须通过参数传入
 
 # SQLite文件头
 SQLITE_HEADER = b"SQLite format 3\x00"
 
+# SQLCipher 4.0 页面布局参数
+PAGE_SIZE = 4096
+SALT_SIZE = 16
+IV_SIZE = 16
+HMAC_SIZE = 64  # SHA512的HMAC是64字节
+# 保留区域大小 (IV + HMAC，对齐到AES块大小)
+RESERVE_SIZE = ((IV_SIZE + HMAC_SIZE + 15) // 16) * 16
+KDF_ITERATIONS = 256000
+
+# 流式解密：每个批次的页数（256页 = 1MB）
+DECRYPT_BATCH_PAGES = 256
+
 
 def _normalize_account_name(name: str) -> str:
     value = str(name or "").strip()
@@ -205,14 +227,446 @@ def setup_logging():
 
 
 
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw)
+    except Exception:
+        v = int(default)
+    if v < min_v:
+        v = min_v
+    if v > max_v:
+        v = max_v
+    return v
+
+
+def _default_page_workers() -> int:
+    return _env_int(
+        "WECHAT_TOOL_DECRYPT_PAGE_WORKERS",
+        min(4, os.cpu_count() or 1),
+        min_v=1,
+        max_v=32,
+    )
+
+
+def resolve_decrypt_workers(workers: Optional[int] = None) -> tuple[int, int]:
+    """返回 (分片并发数, 每个分片的页面线程数)
+
+    分片并发数默认读取 WECHAT_TOOL_DECRYPT_SHARD_WORKERS；同时跑多个分片时，
+    按分片数均分页面线程，避免线程数成倍膨胀。
+    """
+    if workers:
+        shard_workers = min(32, max(1, int(workers)))
+    else:
+        shard_workers = _env_int(
+            "WECHAT_TOOL_DECRYPT_SHARD_WORKERS",
+            min(4, os.cpu_count() or 1),
+            min_v=1,
+            max_v=32,
+        )
+    page_workers = max(1, _default_page_workers() // shard_workers)
+    return shard_workers, page_workers
+
+
+def order_shards_largest_first(databases: list[dict]) -> list[int]:
+    """按文件大小降序返回分片下标：最大的分片最先开始，缩短整体尾部等待"""
+
+    def _size(idx: int) -> int:
+        try:
+            return os.path.getsize(str(databases[idx].get("path") or ""))
+        except OSError:
+            return 0
+
+    return sorted(range(len(databases)), key=lambda i: (-_size(i), i))
+
+
+@dataclass
+class DecryptStats:
+    """单个数据库文件的解密统计"""
+
+    ok: bool = False
+    total_pages: int = 0
+    successful_pages: int = 0
+    failed_pages: int = 0
+    bytes_written: int = 0
+    elapsed_s: float = 0.0
+    workers: int = 1
+    copied: bool = False
+    key_cache_hit: bool = False
+    incremental: bool = False
+    unchanged_pages: int = 0
+
+    @property
+    def pages_per_sec(self) -> float:
+        if self.elapsed_s <= 0:
+            return 0.0
+        return float(self.successful_pages) / self.elapsed_s
+
+    def to_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "total_pages": self.total_pages,
+            "successful_pages": self.successful_pages,
+            "failed_pages": self.failed_pages,
+            "bytes_written": self.bytes_written,
+            "elapsed_ms": round(self.elapsed_s * 1000.0, 1),
+            "pages_per_sec": round(self.pages_per_sec, 1),
+            "workers": self.workers,
+            "copied": self.copied,
+            "key_cache_hit": self.key_cache_hit,
+            "incremental": self.incremental,
+            "unchanged_pages": self.unchanged_pages,
+        }
+
+
+class _DerivedKeyCache:
+    """按 (密钥, salt) 缓存 PBKDF2 派生结果，避免重复解密同一分片时再跑 256000 轮迭代
+
+    - 内存中为有界LRU（WECHAT_TOOL_KDF_CACHE_SIZE，默认256条）
+    - 可选落盘（WECHAT_TOOL_KDF_DISK_CACHE，默认开启）：每个账号密钥一个文件，
+      内容使用由账号密钥派生的 AES-GCM 密钥加密，没有账号密钥无法读取
+    """
+
+    def __init__(self, max_entries: int, disk_enabled: bool) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.disk_enabled = bool(disk_enabled)
+        self._mu = threading.Lock()
+        self._entries: "OrderedDict[tuple[bytes, bytes], tuple[bytes, bytes]]" = OrderedDict()
+        self._disk_loaded: set[bytes] = set()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key_id(key_bytes: bytes) -> bytes:
+        # 内存/磁盘索引只使用密钥摘要，不直接持有原始密钥
+        return hashlib.sha256(b"wechat-kdf-cache-id\x00" + key_bytes).digest()
+
+    @staticmethod
+    def _disk_path(key_id: bytes) -> Path:
+        from .app_paths import get_output_dir
+
+        return get_output_dir() / "kdf_cache" / f"{key_id.hex()[:32]}.bin"
+
+    @staticmethod
+    def _disk_cipher(key_bytes: bytes) -> AESGCM:
+        return AESGCM(hmac.new(key_bytes, b"wechat-kdf-cache-v1", hashlib.sha256).digest())
+
+    def get(self, key_bytes: bytes, salt: bytes) -> Optional[tuple[bytes, bytes]]:
+        key_id = self._key_id(key_bytes)
+        if self.disk_enabled:
+            self._load_disk(key_bytes, key_id)
+        with self._mu:
+            cached = self._entries.get((key_id, salt))
+            if cached is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((key_id, salt))
+            self.hits += 1
+            return cached
+
+    def put(self, key_bytes: bytes, salt: bytes, keys: tuple[bytes, bytes]) -> None:
+        key_id = self._key_id(key_bytes)
+        with self._mu:
+            self._entries[(key_id, salt)] = keys
+            self._entries.move_to_end((key_id, salt))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.disk_enabled:
+            self._save_disk(key_bytes, key_id)
+
+    def invalidate(self, key_bytes: Optional[bytes] = None, salt: Optional[bytes] = None) -> int:
+        """清除缓存；不传参数时清空全部，返回移除的内存条目数"""
+        key_id = self._key_id(key_bytes) if key_bytes is not None else None
+        if key_id is not None and self.disk_enabled:
+            self._load_disk(key_bytes, key_id)
+        with self._mu:
+            drop = [
+                k for k in self._entries
+                if (key_id is None or k[0] == key_id) and (salt is None or k[1] == salt)
+            ]
+            for k in drop:
+                self._entries.pop(k, None)
+            if key_id is None:
+                self._disk_loaded.clear()
+                self.hits = 0
+                self.misses = 0
+
+        if self.disk_enabled:
+            try:
+                if key_id is None:
+                    from .app_paths import get_output_dir
+
+                    shutil.rmtree(get_output_dir() / "kdf_cache", ignore_errors=True)
+                elif salt is None:
+                    self._disk_path(key_id).unlink(missing_ok=True)
+                else:
+                    self._save_disk(key_bytes, key_id)
+            except Exception:
+                pass
+        return len(drop)
+
+    def stats(self) -> dict:
+        with self._mu:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_entries,
+            }
+
+    def _load_disk(self, key_bytes: bytes, key_id: bytes) -> None:
+        with self._mu:
+            if key_id in self._disk_loaded:
+                return
+            self._disk_loaded.add(key_id)
+
+        path = self._disk_path(key_id)
+        try:
+            if not path.is_file():
+                return
+            blob = path.read_bytes()
+            raw = self._disk_cipher(key_bytes).decrypt(blob[:12], blob[12:], key_id)
+            data = json.loads(raw.decode("utf-8"))
+        except Exception:
+            # 文件损坏或密钥不匹配：忽略，后续写入会覆盖
+            return
+        if not isinstance(data, dict):
+            return
+
+        with self._mu:
+            for salt_hex, pair in data.items():
+                try:
+                    salt = bytes.fromhex(salt_hex)
+                    entry = (bytes.fromhex(pair[0]), bytes.fromhex(pair[1]))
+                except Exception:
+                    continue
+                self._entries.setdefault((key_id, salt), entry)
+                self._entries.move_to_end((key_id, salt), last=False)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _save_disk(self, key_bytes: bytes, key_id: bytes) -> None:
+        with self._mu:
+            data = {
+                k[1].hex(): [v[0].hex(), v[1].hex()]
+                for k, v in self._entries.items()
+                if k[0] == key_id
+            }
+        path = self._disk_path(key_id)
+        try:
+            if not data:
+                path.unlink(missing_ok=True)
+                return
+            nonce = os.urandom(12)
+            blob = nonce + self._disk_cipher(key_bytes).encrypt(
+                nonce, json.dumps(data).encode("utf-8"), key_id
+            )
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_bytes(blob)
+            tmp.replace(path)
+        except Exception:
+            pass
+
+
+_KDF_CACHE = _DerivedKeyCache(
+    max_entries=_env_int("WECHAT_TOOL_KDF_CACHE_SIZE", 256, min_v=1, max_v=100_000),
+    disk_enabled=str(os.environ.get("WECHAT_TOOL_KDF_DISK_CACHE", "1") or "").strip().lower()
+    not in {"0", "false", "no", "off"},
+)
+
+
+def get_derived_key_cache_stats() -> dict:
+    """派生密钥缓存的全局命中统计"""
+    return _KDF_CACHE.stats()
+
+
+def invalidate_derived_key_cache(key_hex: Optional[str] = None, salt: Optional[bytes] = None) -> int:
+    """显式失效派生密钥缓存
+
+    参数:
+        key_hex: 仅清除该密钥的条目；为None时清空全部（含磁盘缓存）
+        salt: 仅清除指定salt的条目
+    """
+    key_bytes = bytes.fromhex(key_hex) if key_hex else None
+    return _KDF_CACHE.invalidate(key_bytes, salt)
+
+
+def _decrypt_page_batch(
+    chunk: bytes,
+    first_page_num: int,
+    aes: algorithms.AES,
+    mac_template: "hmac.HMAC",
+) -> tuple[bytes, list[int]]:
+    """解密一批连续的页面，返回 (解密后数据, HMAC/AES失败的页号列表)
+
+    页号从1开始；第1页需要跳过salt。失败的页面不输出（与逐页解密的行为一致）。
+    hashlib/OpenSSL 在处理整页数据时会释放GIL，因此多个批次可以在线程池中并行执行。
+    """
+    view = memoryview(chunk)
+    out = bytearray()
+    failed: list[int] = []
+    reserve_start = PAGE_SIZE - RESERVE_SIZE
+    data_end = reserve_start + IV_SIZE
+
+    for i in range(len(chunk) // PAGE_SIZE):
+        page = view[i * PAGE_SIZE:(i + 1) * PAGE_SIZE]
+        page_num = first_page_num + i
+        offset = SALT_SIZE if page_num == 1 else 0
+
+        # 分步计算HMAC：先更新数据(加密数据+IV)，再更新页面编号(小端序)
+        mac = mac_template.copy()
+        mac.update(page[offset:data_end])
+        mac.update(page_num.to_bytes(4, "little"))
+        if page[data_end:data_end + HMAC_SIZE] != mac.digest():
+            failed.append(page_num)
+            continue
+
+        try:
+            decryptor = Cipher(aes, modes.CBC(bytes(page[reserve_start:data_end]))).decryptor()
+            out += decryptor.update(page[offset:reserve_start])
+            out += decryptor.finalize()
+        except Exception:
+            failed.append(page_num)
+            continue
+        # 按照wechat-dump-rs的方式重组页面数据：保留区域原样写回
+        out += page[reserve_start:]
+
+    return bytes(out), failed
+
+
+# 增量解密：每页记录存储HMAC的前16字节作为指纹
+_FINGERPRINT_SIZE = 16
+# 清单同时记录输出文件的大小/mtime：输出被本地改写（如实时同步写入）后不能再增量覆盖
+_PAGE_MANIFEST_MAGIC = b"WXPGMAP2"
+_PAGE_MANIFEST_HEADER = struct.Struct("<8s16sQqQqI")
+
+
+def _page_manifest_path(output_path: str) -> Path:
+    return Path(str(output_path) + ".pages")
+
+
+# 替换输出文件前等待连接池交还借出连接的最长时间（秒）
+_POOL_RELEASE_WAIT_S = 10.0
+
+
+def _decrypt_tmp_path(output_path: str) -> Path:
+    return Path(str(output_path) + ".tmp")
+
+
+def _replace_output(tmp_path: Path, output_path: str) -> None:
+    """把写好的临时文件换到输出位置；先让连接池交还该文件上的只读连接（Windows下打开的句柄会让替换失败）"""
+    invalidate_sqlite_pool(Path(output_path), wait_s=_POOL_RELEASE_WAIT_S)
+    os.replace(tmp_path, output_path)
+
+
+def _page_fingerprints(chunk: bytes) -> bytes:
+    """提取一批页面的存储HMAC指纹（无需任何解密计算）"""
+    start = PAGE_SIZE - RESERVE_SIZE + IV_SIZE
+    return b"".join(
+        chunk[i + start:i + start + _FINGERPRINT_SIZE]
+        for i in range(0, len(chunk) - len(chunk) % PAGE_SIZE, PAGE_SIZE)
+    )
+
+
+def _read_page_batches(src, first_page: bytes):
+    """分块读取加密文件，产出 (起始页号, 整页数据)；末尾不足一页的数据直接忽略"""
+    page_num = 1
+    chunk = first_page + src.read(PAGE_SIZE * (DECRYPT_BATCH_PAGES - 1))
+    while len(chunk) >= PAGE_SIZE:
+        usable = len(chunk) - len(chunk) % PAGE_SIZE
+        yield page_num, chunk[:usable]
+        page_num += usable // PAGE_SIZE
+        if usable < len(chunk):
+            break
+        chunk = src.read(PAGE_SIZE * DECRYPT_BATCH_PAGES)
+
+
+@dataclass
+class _PageManifest:
+    """输出数据库旁的页面指纹清单（`<output>.pages`），用于增量解密"""
+
+    salt: bytes
+    source_size: int
+    source_mtime_ns: int
+    output_size: int
+    output_mtime_ns: int
+    fingerprints: bytes
+
+    @property
+    def page_count(self) -> int:
+        return len(self.fingerprints) // _FINGERPRINT_SIZE
+
+    def fingerprint(self, index: int) -> Optional[bytes]:
+        if index < 0 or index >= self.page_count:
+            return None
+        return self.fingerprints[index * _FINGERPRINT_SIZE:(index + 1) * _FINGERPRINT_SIZE]
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["_PageManifest"]:
+        try:
+            raw = path.read_bytes()
+            magic, salt, size, mtime_ns, out_size, out_mtime_ns, count = _PAGE_MANIFEST_HEADER.unpack_from(raw, 0)
+        except Exception:
+            return None
+        body = raw[_PAGE_MANIFEST_HEADER.size:]
+        if magic != _PAGE_MANIFEST_MAGIC or len(body) != count * _FINGERPRINT_SIZE:
+            return None
+        return cls(
+            salt=salt,
+            source_size=size,
+            source_mtime_ns=mtime_ns,
+            output_size=out_size,
+            output_mtime_ns=out_mtime_ns,
+            fingerprints=body,
+        )
+
+    def matches_output(self, output_path: str) -> bool:
+        """输出文件是否仍是上次解密写下的那一份（大小与mtime均一致，且没有未checkpoint的WAL）"""
+        try:
+            st = os.stat(output_path)
+        except OSError:
+            return False
+        try:
+            if os.path.getsize(str(output_path) + "-wal") > 0:
+                return False
+        except OSError:
+            pass
+        return (
+            int(st.st_size) == self.output_size == self.page_count * PAGE_SIZE
+            and int(st.st_mtime_ns) == self.output_mtime_ns
+        )
+
+    def save(self, path: Path) -> None:
+        header = _PAGE_MANIFEST_HEADER.pack(
+            _PAGE_MANIFEST_MAGIC,
+            self.salt,
+            self.source_size,
+            self.source_mtime_ns,
+            self.output_size,
+            self.output_mtime_ns,
+            self.page_count,
+        )
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            tmp.write_bytes(header + self.fingerprints)
+            tmp.replace(path)
+        except Exception:
+            pass
+
+
 class WeChatDatabaseDecryptor:
     """微信4.x数据库解密器"""
 
-    def __init__(self, key_hex: str):
+    def __init__(self, key_hex: str, *, page_workers: Optional[int] = None, use_key_cache: bool = True):
         """初始化解密器
 
         参数:
             key_hex: 64位十六进制密钥
+            page_workers: 页面并行解密线程数，默认读取 WECHAT_TOOL_DECRYPT_PAGE_WORKERS
+            use_key_cache: 是否复用按 (密钥, salt) 缓存的派生密钥
         """
         if len(key_hex) != 64:
             raise ValueError("密钥必须是64位十六进制字符串")
@@ -221,8 +675,71 @@ class WeChatDatabaseDecryptor:
             self.key_bytes = bytes.fromhex(key_hex)
         except ValueError:
             raise ValueError("密钥必须是有效的十六进制字符串")
-    
-    def decrypt_database(self, db_path: str, output_path: str) -> bool:
+
+        self.page_workers = max(1, int(page_workers)) if page_workers else _default_page_workers()
+        self.use_key_cache = bool(use_key_cache)
+        self._stats_mu = threading.Lock()
+        self.key_cache_hits = 0
+        self.key_cache_misses = 0
+
+    def key_cache_stats(self) -> dict:
+        """本解密器实例的派生密钥缓存命中统计"""
+        with self._stats_mu:
+            total = self.key_cache_hits + self.key_cache_misses
+            return {
+                "hits": self.key_cache_hits,
+                "misses": self.key_cache_misses,
+                "hit_rate": round(self.key_cache_hits / total, 4) if total else 0.0,
+            }
+
+    def invalidate_key_cache(self, salt: Optional[bytes] = None) -> int:
+        """清除本密钥（可选指定salt）的派生密钥缓存"""
+        return _KDF_CACHE.invalidate(self.key_bytes, salt)
+
+    def derive_keys(self, salt: bytes) -> tuple[bytes, bytes]:
+        """根据salt派生 (AES密钥, HMAC密钥)，优先命中派生密钥缓存"""
+        return self._derive_keys_cached(salt)[0]
+
+    def _derive_keys_cached(self, salt: bytes) -> tuple[tuple[bytes, bytes], bool]:
+        salt = bytes(salt)
+        if self.use_key_cache:
+            cached = _KDF_CACHE.get(self.key_bytes, salt)
+            if cached is not None:
+                with self._stats_mu:
+                    self.key_cache_hits += 1
+                return cached, True
+
+        keys = self._derive_keys_uncached(salt)
+        if self.use_key_cache:
+            _KDF_CACHE.put(self.key_bytes, salt, keys)
+            with self._stats_mu:
+                self.key_cache_misses += 1
+        return keys, False
+
+    def _derive_keys_uncached(self, salt: bytes) -> tuple[bytes, bytes]:
+        # 使用PBKDF2-SHA512派生密钥
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA512(),
+            length=32,
+            salt=salt,
+            iterations=KDF_ITERATIONS,
+            backend=default_backend()
+        )
+        derived_key = kdf.derive(self.key_bytes)
+
+        # 派生MAC密钥：mac_salt = salt XOR 0x3a
+        mac_salt = bytes(b ^ 0x3a for b in salt)
+        mac_kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA512(),
+            length=32,
+            salt=mac_salt,
+            iterations=2,
+            backend=default_backend()
+        )
+        mac_key = mac_kdf.derive(derived_key)
+        return derived_key, mac_key
+
+    def decrypt_database(self, db_path: str, output_path: str, *, incremental: bool = False) -> bool:
         """解密微信4.x版本数据库
 
         使用SQLCipher 4.0参数:
@@ -231,145 +748,236 @@ class WeChatDatabaseDecryptor:
         - HMAC-SHA512验证
         - 页面大小4096字节
         """
+        return self.decrypt_database_with_stats(db_path, output_path, incremental=incremental).ok
+
+    def decrypt_database_with_stats(
+        self,
+        db_path: str,
+        output_path: str,
+        *,
+        incremental: bool = False,
+    ) -> DecryptStats:
+        """流式解密数据库，返回解密统计（含页/秒）
+
+        按批次分块读取加密文件，批次交给线程池并行解密，再按原顺序写入输出文件。
+        同时在途的批次数量有上限，因此内存占用与文件大小无关。
+
+        incremental=True 时，若输出文件旁存在有效的页面指纹清单（`*.pages`），
+        只解密并覆盖存储HMAC发生变化的页面，再按新页数截断/扩展输出文件。
+        """
         from .logging_config import get_logger
         logger = get_logger(__name__)
 
         logger.info(f"开始解密数据库: {db_path}")
-        
+        stats = DecryptStats(workers=self.page_workers)
+        t0 = time.perf_counter()
+        manifest_path = _page_manifest_path(output_path)
+
         try:
-            with open(db_path, 'rb') as f:
-                encrypted_data = f.read()
-            
-            logger.info(f"读取文件大小: {len(encrypted_data)} bytes")
+            src_stat = os.stat(db_path)
+            file_size = int(src_stat.st_size)
+            logger.info(f"读取文件大小: {file_size} bytes")
 
-            if len(encrypted_data) < 4096:
+            if file_size < PAGE_SIZE:
                 logger.warning(f"文件太小，跳过解密: {db_path}")
-                return False
+                return stats
+
+            if incremental and self._decrypt_incremental(db_path, output_path, src_stat, stats, logger):
+                return stats
+            stats.incremental = False
+            stats.successful_pages = stats.failed_pages = stats.unchanged_pages = 0
+
+            fingerprints = bytearray()
+            # 先写临时文件，成功后再原子替换：中途失败不会破坏上一次的解密结果
+            tmp_path = _decrypt_tmp_path(output_path)
+            with open(db_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                first_page = src.read(PAGE_SIZE)
+
+                # 检查是否已经是解密的数据库
+                if first_page.startswith(SQLITE_HEADER):
+                    logger.info(f"文件已是SQLite格式，直接复制: {db_path}")
+                    dst.write(first_page)
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                    stats.copied = True
+                    stats.bytes_written = file_size
+                else:
+                    # 提取salt (前16字节)
+                    salt = first_page[:SALT_SIZE]
+                    (derived_key, mac_key), stats.key_cache_hit = self._derive_keys_cached(salt)
+                    aes = algorithms.AES(derived_key)
+                    mac_template = hmac.new(mac_key, digestmod=hashlib.sha512)
+
+                    stats.total_pages = file_size // PAGE_SIZE
+                    dst.write(SQLITE_HEADER)
+                    stats.bytes_written = len(SQLITE_HEADER)
+
+                    def _jobs():
+                        for page_num, chunk in _read_page_batches(src, first_page):
+                            fingerprints.extend(_page_fingerprints(chunk))
+                            yield page_num, chunk
+
+                    for _page_num, data, failed in self._map_page_batches(_jobs(), stats.total_pages, aes, mac_template):
+                        for page_num in failed:
+                            logger.warning(f"页面 {page_num} HMAC验证失败")
+                        dst.write(data)
+                        stats.bytes_written += len(data)
+                        stats.failed_pages += len(failed)
+
+            _replace_output(tmp_path, output_path)
+            if stats.copied:
+                manifest_path.unlink(missing_ok=True)
+                stats.ok = True
+                return stats
+
+            stats.successful_pages = stats.total_pages - stats.failed_pages
+            stats.elapsed_s = time.perf_counter() - t0
+            stats.ok = True
+
+            # 失败页会被跳过（后续页前移），此时页号与输出偏移不再对应，不能作为增量基线
+            if stats.failed_pages == 0:
+                out_stat = os.stat(output_path)
+                _PageManifest(
+                    salt=salt,
+                    source_size=file_size,
+                    source_mtime_ns=int(src_stat.st_mtime_ns),
+                    output_size=int(out_stat.st_size),
+                    output_mtime_ns=int(out_stat.st_mtime_ns),
+                    fingerprints=bytes(fingerprints),
+                ).save(manifest_path)
+            else:
+                manifest_path.unlink(missing_ok=True)
 
-            # 检查是否已经是解密的数据库
-            if encrypted_data.startswith(SQLITE_HEADER):
-                logger.info(f"文件已是SQLite格式，直接复制: {db_path}")
-                with open(output_path, 'wb') as f:
-                    f.write(encrypted_data)
-                return True
-            
-            # 提取salt (前16字节)
-            salt = encrypted_data[:16]
-            
-            # 计算mac_salt (salt XOR 0x3a)
-            mac_salt = bytes(b ^ 0x3a for b in salt)
-            
-            # 使用PBKDF2-SHA512派生密钥
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA512(),
-                length=32,
-                salt=salt,
-                iterations=256000,
-                backend=default_backend()
-            )
-            derived_key = kdf.derive(self.key_bytes)
-            
-            # 派生MAC密钥
-            mac_kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA512(),
-                length=32,
-                salt=mac_salt,
-                iterations=2,
-                backend=default_backend()
+            logger.info(
+                f"解密完成: 成功 {stats.successful_pages} 页, 失败 {stats.failed_pages} 页, "
+                f"{stats.pages_per_sec:.0f} 页/秒 (线程数 {stats.workers})"
             )
-            mac_key = mac_kdf.derive(derived_key)
-            
-            # 解密数据
-            decrypted_data = bytearray()
-            decrypted_data.extend(SQLITE_HEADER)
-            
-            page_size = 4096
-            iv_size = 16
-            hmac_size = 64  # SHA512的HMAC是64字节
-            
-            # 计算保留区域大小 (对齐到AES块大小)
-            reserve_size = iv_size + hmac_size
-            if reserve_size % 16 != 0:
-                reserve_size = ((reserve_size // 16) + 1) * 16
-            
-            total_pages = len(encrypted_data) // page_size
-            successful_pages = 0
-            failed_pages = 0
-            
-            # 逐页解密
-            for cur_page in range(total_pages):
-                start = cur_page * page_size
-                end = start + page_size
-                page = encrypted_data[start:end]
-                
-                page_num = cur_page + 1  # 页面编号从1开始
-                
-                if len(page) < page_size:
-                    logger.warning(f"页面 {page_num} 大小不足: {len(page)} bytes")
-                    break
-                
-                # 确定偏移量：第一页(cur_page == 0)需要跳过salt
-                offset = 16 if cur_page == 0 else 0  # SALT_SIZE = 16
-                
-                # 提取存储的HMAC
-                hmac_start = page_size - reserve_size + iv_size
-                hmac_end = hmac_start + hmac_size
-                stored_hmac = page[hmac_start:hmac_end]
-                
-                # 按照wechat-dump-rs的方式验证HMAC
-                data_end = page_size - reserve_size + iv_size
-                hmac_data = page[offset:data_end]
-                
-                # 分步计算HMAC：先更新数据，再更新页面编号
-                mac = hmac.new(mac_key, digestmod=hashlib.sha512)
-                mac.update(hmac_data)  # 包含加密数据+IV
-                mac.update(page_num.to_bytes(4, 'little'))  # 页面编号(小端序)
-                expected_hmac = mac.digest()
-                
-                if stored_hmac != expected_hmac:
-                    logger.warning(f"页面 {page_num} HMAC验证失败")
-                    failed_pages += 1
-                    continue
-                
-                # 提取IV和加密数据用于AES解密
-                iv = page[page_size - reserve_size:page_size - reserve_size + iv_size]
-                encrypted_page = page[offset:page_size - reserve_size]
-                
-                # AES-CBC解密
-                try:
-                    cipher = Cipher(
-                        algorithms.AES(derived_key),
-                        modes.CBC(iv),
-                        backend=default_backend()
-                    )
-                    decryptor = cipher.decryptor()
-                    decrypted_page = decryptor.update(encrypted_page) + decryptor.finalize()
-                    
-                    # 按照wechat-dump-rs的方式重组页面数据
-                    decrypted_data.extend(decrypted_page)
-                    decrypted_data.extend(page[page_size - reserve_size:])  # 保留区域
-                    
-                    successful_pages += 1
-                
-                except Exception as e:
-                    logger.error(f"页面 {page_num} AES解密失败: {e}")
-                    failed_pages += 1
-                    continue
-
-            logger.info(f"解密完成: 成功 {successful_pages} 页, 失败 {failed_pages} 页")
-
-            # 写入解密后的文件
-            with open(output_path, 'wb') as f:
-                f.write(decrypted_data)
-
-            logger.info(f"解密文件大小: {len(decrypted_data)} bytes")
-            return True
+            logger.info(f"解密文件大小: {stats.bytes_written} bytes")
+            return stats
 
         except Exception as e:
             logger.error(f"解密失败: {db_path}, 错误: {e}")
+            stats.ok = False
+            try:
+                _decrypt_tmp_path(output_path).unlink(missing_ok=True)
+                manifest_path.unlink(missing_ok=True)
+            except Exception:
+                pass
+            return stats
+        finally:
+            stats.elapsed_s = time.perf_counter() - t0
+
+    def _map_page_batches(self, jobs, total_pages: int, aes, mac_template):
+        """按提交顺序产出 (起始页号, 解密数据, 失败页号列表)
+
+        小文件或单线程时直接在当前线程解密；否则使用有界的在途队列交给线程池。
+        """
+        if self.page_workers <= 1 or total_pages <= DECRYPT_BATCH_PAGES:
+            for page_num, chunk in jobs:
+                yield (page_num, *_decrypt_page_batch(chunk, page_num, aes, mac_template))
+            return
+
+        max_inflight = self.page_workers * 2
+        inflight: deque = deque()
+        with ThreadPoolExecutor(max_workers=self.page_workers, thread_name_prefix="db-decrypt") as pool:
+            for page_num, chunk in jobs:
+                inflight.append((page_num, pool.submit(_decrypt_page_batch, chunk, page_num, aes, mac_template)))
+                if len(inflight) >= max_inflight:
+                    num, fut = inflight.popleft()
+                    yield (num, *fut.result())
+            while inflight:
+                num, fut = inflight.popleft()
+                yield (num, *fut.result())
+
+    def _decrypt_incremental(self, db_path: str, output_path: str, src_stat, stats: DecryptStats, logger) -> bool:
+        """按页面指纹清单增量更新输出文件；清单不可用或出现失败页时返回False（调用方走全量解密）"""
+        manifest_path = _page_manifest_path(output_path)
+        manifest = _PageManifest.load(manifest_path)
+        if manifest is None:
             return False
+        if not manifest.matches_output(output_path):
+            logger.info(f"输出文件已被修改，改为全量解密: {output_path}")
+            return False
+
+        file_size = int(src_stat.st_size)
+        stats.total_pages = file_size // PAGE_SIZE
+        stats.incremental = True
+
+        with open(db_path, 'rb') as src:
+            first_page = src.read(PAGE_SIZE)
+            if first_page.startswith(SQLITE_HEADER) or first_page[:SALT_SIZE] != manifest.salt:
+                return False
 
-def decrypt_wechat_databases(db_storage_path: str = None, key: str = None) -> dict:
+            if manifest.source_size == file_size and manifest.source_mtime_ns == int(src_stat.st_mtime_ns):
+                logger.info(f"文件未变化，跳过解密: {db_path}")
+                stats.unchanged_pages = stats.total_pages
+                stats.ok = True
+                return True
+
+            (derived_key, mac_key), stats.key_cache_hit = self._derive_keys_cached(manifest.salt)
+            aes = algorithms.AES(derived_key)
+            mac_template = hmac.new(mac_key, digestmod=hashlib.sha512)
+            fingerprints = bytearray()
+
+            def _changed_runs():
+                # 只把存储HMAC变化的连续页面段交给解密
+                for page_num, chunk in _read_page_batches(src, first_page):
+                    fps = _page_fingerprints(chunk)
+                    fingerprints.extend(fps)
+                    run_start = None
+                    for i in range(len(chunk) // PAGE_SIZE + 1):
+                        changed = False
+                        if i < len(chunk) // PAGE_SIZE:
+                            fp = fps[i * _FINGERPRINT_SIZE:(i + 1) * _FINGERPRINT_SIZE]
+                            changed = fp != manifest.fingerprint(page_num + i - 1)
+                        if changed and run_start is None:
+                            run_start = i
+                        elif not changed and run_start is not None:
+                            yield page_num + run_start, chunk[run_start * PAGE_SIZE:i * PAGE_SIZE]
+                            run_start = None
+
+            # 原地打补丁（I/O只与变化页数成正比）：期间连接池不借出该文件的连接，借出的连接先交还，
+            # 不会有mmap读者看到被截断/半写的页面。交还超时则改走全量解密（写临时文件再替换）
+            with exclusive_sqlite_file(Path(output_path), wait_s=_POOL_RELEASE_WAIT_S) as drained:
+                if not drained:
+                    logger.warning(f"输出文件仍被占用，改为全量解密: {output_path}")
+                    return False
+                with open(output_path, 'r+b') as dst:
+                    for page_num, data, failed in self._map_page_batches(
+                        _changed_runs(), stats.total_pages, aes, mac_template
+                    ):
+                        if failed:
+                            logger.warning(f"增量解密遇到失败页 {failed[:5]}，改为全量解密: {db_path}")
+                            return False
+                        dst.seek((page_num - 1) * PAGE_SIZE + (SALT_SIZE if page_num == 1 else 0))
+                        dst.write(data)
+                        stats.bytes_written += len(data)
+                        stats.successful_pages += len(data) // PAGE_SIZE + (1 if page_num == 1 else 0)
+                    dst.truncate(stats.total_pages * PAGE_SIZE)
+
+        stats.unchanged_pages = stats.total_pages - stats.successful_pages
+        out_stat = os.stat(output_path)
+        _PageManifest(
+            salt=manifest.salt,
+            source_size=file_size,
+            source_mtime_ns=int(src_stat.st_mtime_ns),
+            output_size=int(out_stat.st_size),
+            output_mtime_ns=int(out_stat.st_mtime_ns),
+            fingerprints=bytes(fingerprints),
+        ).save(manifest_path)
+        stats.ok = True
+        logger.info(
+            f"增量解密完成: 重写 {stats.successful_pages} 页, 未变化 {stats.unchanged_pages} 页, "
+            f"共 {stats.total_pages} 页"
+        )
+        return True
+
+
+def decrypt_wechat_databases(
+    db_storage_path: str = None,
+    key: str = None,
+    incremental: bool = False,
+    workers: Optional[int] = None,
+) -> dict:
     """
     微信数据库解密API函数
 
@@ -377,6 +985,8 @@ def decrypt_wechat_databases(db_storage_path: str = None, key: str = None) -> di
         db_storage_path: 数据库存储路径，如 ......\\{微信id}\\db_storage
                         如果为None，将自动搜索数据库文件
         key: 解密密钥（必需参数），64位十六进制字符串
+        incremental: 增量模式，仅重写与上次解密相比发生变化的页面
+        workers: 同时解密的分片数，默认读取 WECHAT_TOOL_DECRYPT_SHARD_WORKERS
 
     返回值:
         dict: 解密结果统计信息
@@ -473,8 +1083,9 @@ def decrypt_wechat_databases(db_storage_path: str = None, key: str = None) -> di
     total_databases = sum(len(dbs) for dbs in account_databases.values())
 
     # 创建解密器
+    shard_workers, page_workers = resolve_decrypt_workers(workers)
     try:
-        decryptor = WeChatDatabaseDecryptor(decrypt_key)
+        decryptor = WeChatDatabaseDecryptor(decrypt_key, page_workers=page_workers)
         logger.info("解密器初始化成功")
     except ValueError as e:
         return {
@@ -501,6 +1112,8 @@ def decrypt_wechat_databases(db_storage_path: str = None, key: str = None) -> di
         account_output_dir = base_output_dir / account_name
         account_output_dir.mkdir(parents=True, exist_ok=True)
         logger.info(f"账号 {account_name} 输出目录: {account_output_dir}")
+        # Decrypt rewrites the account's db files: drop pooled read-only handles first.
+        invalidate_sqlite_pool(account_output_dir)
 
         try:
             source_info = account_sources.get(account_name, {})
@@ -524,25 +1137,44 @@ def decrypt_wechat_databases(db_storage_path: str = None, key: str = None) -> di
         account_processed = []
         account_failed = []
 
-        for db_info in databases:
-            db_path = db_info['path']
-            db_name = db_info['name']
-
+        # 分片级并发：大文件先跑；结果按原始顺序汇总，保持 account_results 结构不变
+        def _decrypt_one(db_info: dict) -> bool:
             # 生成输出文件名（保持原始文件名，不添加前缀）
-            output_path = account_output_dir / db_name
-
-            # 解密数据库
-            logger.info(f"解密 {account_name}/{db_name}")
-            if decryptor.decrypt_database(db_path, str(output_path)):
+            output_path = account_output_dir / db_info['name']
+            logger.info(f"解密 {account_name}/{db_info['name']}")
+            return decryptor.decrypt_database(db_info['path'], str(output_path), incremental=incremental)
+
+        outcomes: dict[int, bool] = {}
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(shard_workers, len(databases))),
+            thread_name_prefix="shard-decrypt",
+        ) as pool:
+            futures = {
+                pool.submit(_decrypt_one, databases[idx]): idx
+                for idx in order_shards_largest_first(databases)
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    outcomes[idx] = bool(future.result())
+                except Exception:
+                    outcomes[idx] = False
+                db_name = databases[idx]['name']
+                if outcomes[idx]:
+                    logger.info(f"解密成功: {account_name}/{db_name}")
+                else:
+                    logger.error(f"解密失败: {account_name}/{db_name}")
+
+        for idx, db_info in enumerate(databases):
+            output_path = account_output_dir / db_info['name']
+            if outcomes.get(idx):
                 account_success += 1
                 success_count += 1
                 account_processed.append(str(output_path))
                 processed_files.append(str(output_path))
-                logger.info(f"解密成功: {account_name}/{db_name}")
             else:
-                account_failed.append(db_path)
-                failed_files.append(db_path)
-                logger.error(f"解密失败: {account_name}/{db_name}")
+                account_failed.append(db_info['path'])
+                failed_files.append(db_info['path'])
 
         # 记录账号解密结果
         account_results[account_name] = {
@@ -572,6 +1204,21 @@ def decrypt_wechat_databases(db_storage_path: str = None, key: str = None) -> di
                     "message": str(e),
                 }
 
+        # 会话 -> 分片路由索引：与 /api/decrypt_stream 一致，解密后立即重建，读消息时只打开包含该会话的分片
+        if os.environ.get("WECHAT_TOOL_BUILD_MESSAGE_ROUTES", "1") != "0":
+            try:
+                from .message_route_index import build_message_route_index
+
+                account_results[account_name]["message_routes"] = build_message_route_index(
+                    account_output_dir, rebuild=True
+                )
+            except Exception as e:
+                logger.warning(f"构建会话分片索引失败: {account_name}: {e}")
+                account_results[account_name]["message_routes"] = {
+                    "status": "error",
+                    "message": str(e),
+                }
+
         logger.info(f"账号 {account_name} 解密完成: 成功 {account_success}/{len(databases)}")
 
     # 返回结果
@@ -586,6 +1233,7 @@ def decrypt_wechat_databases(db_storage_path: str = None, key: str = None) -> di
         "failed_files": failed_files,
         "account_results": account_results,  # 新增：按账号的详细结果
         "detected_accounts": detected_accounts,
+        "key_cache": decryptor.key_cache_stats(),
     }
 
     logger.info("=" * 60)
@@ -11,7 +11,7 @@ from pathlib import Path
 from typing import Any, Optional
 
 from .card_01_cyber_schedule import WeekdayHourHeatmap, compute_weekday_hour_heatmap
-from ...chat_search_index import get_chat_search_index_db_path
+from ...chat_search_index import get_chat_search_index_db_path, get_chat_search_index_scan_source
 from ...chat_helpers import (
     _build_avatar_url,
     _decode_sqlite_text,
@@ -20,9 +20,10 @@ from ...chat_helpers import (
     _pick_display_name,
     _quote_ident,
     _should_keep_session,
-    _to_char_token_text,
 )
+from ...chat_search_index import _to_index_token_text, get_chat_search_index_tokenizer
 from ...logging_config import get_logger
+from ..facts import YearMessageFacts, get_year_message_facts
 
 logger = get_logger(__name__)
 
@@ -189,26 +190,33 @@ def compute_annual_daily_counts(*, account_dir: Path, year: int, sender_username
 
     sender = str(sender_username or "").strip()
 
+    facts = get_year_message_facts(account_dir=account_dir, year=year)
+    if facts is not None and (not sender or sender == facts.my_username) and facts.days_in_year == days:
+        t0 = time.time()
+        total = 0
+        for out, doy in zip(facts.outgoing, facts.doy):
+            if sender and not out:
+                continue
+            counts[doy] += 1
+            total += 1
+        logger.info(
+            "Wrapped annual heatmap computed (facts): account=%s year=%s total=%s sender=%s elapsed=%.2fs",
+            str(account_dir.name or "").strip(),
+            year,
+            total,
+            sender or "*",
+            time.time() - t0,
+        )
+        return counts
+
     # Prefer using our unified search index if available; it's much faster than scanning all msg tables.
     index_path = get_chat_search_index_db_path(account_dir)
     if index_path.exists():
         conn = sqlite3.connect(str(index_path))
         try:
-            has_fts = (
-                conn.execute(
-                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1"
-                ).fetchone()
-                is not None
-            )
-            if has_fts:
-                # Convert millisecond timestamps defensively (some datasets store ms).
-                ts_expr = (
-                    "CASE "
-                    "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-                    "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-                    "ELSE CAST(create_time AS INTEGER) "
-                    "END"
-                )
+            source = get_chat_search_index_scan_source(conn)
+            if source is not None:
+                from_sql, ts_expr = source
                 sender_clause = ""
                 if sender:
                     sender_clause = "    AND sender_username = ?"
@@ -219,7 +227,7 @@ def compute_annual_daily_counts(*, account_dir: Path, year: int, sender_username
                     "COUNT(1) AS cnt "
                     "FROM ("
                     f"  SELECT {ts_expr} AS ts"
-                    "  FROM message_fts"
+                    f"  FROM {from_sql}"
                     f"  WHERE {ts_expr} >= ? AND {ts_expr} < ?"
                     "    AND db_stem NOT LIKE 'biz_message%'"
                     f"{sender_clause}"
@@ -418,6 +426,31 @@ def _kind_label_zh(kind: str) -> str:
     }.get(kind, kind)
 
 
+def _overview_counts_from_facts(
+    facts: YearMessageFacts, *, sent_only: bool
+) -> tuple[int, int, Counter[int], Counter[str], Counter[str]]:
+    """Return (active_days, latest_ts, local_type_counts, kind_counts, per_username_counts)."""
+
+    active: set[int] = set()
+    latest = 0
+    local_type_counts: Counter[int] = Counter()
+    per_conv: Counter[int] = Counter()
+    for out, ts, doy, lt, conv in zip(facts.outgoing, facts.ts, facts.doy, facts.local_type, facts.conv):
+        if sent_only and not out:
+            continue
+        active.add(doy)
+        if ts > latest:
+            latest = ts
+        local_type_counts[lt] += 1
+        per_conv[conv] += 1
+
+    kind_counts: Counter[str] = Counter()
+    for lt, cnt in local_type_counts.items():
+        kind_counts[_kind_from_local_type(lt)] += cnt
+    per_username = Counter({facts.usernames[c]: cnt for c, cnt in per_conv.items()})
+    return len(active), int(latest), local_type_counts, kind_counts, per_username
+
+
 def compute_global_overview_stats(
     *,
     account_dir: Path,
@@ -441,97 +474,98 @@ def compute_global_overview_stats(
     if index_path.exists():
         conn = sqlite3.connect(str(index_path))
         try:
-            has_fts = (
-                conn.execute(
-                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1"
-                ).fetchone()
-                is not None
-            )
-            if has_fts:
+            source = get_chat_search_index_scan_source(conn)
+            text_source = get_chat_search_index_scan_source(conn, with_text=True)
+            if source is not None and text_source is not None:
                 t0 = time.time()
 
-                ts_expr = (
-                    "CASE "
-                    "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-                    "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-                    "ELSE CAST(create_time AS INTEGER) "
-                    "END"
-                )
+                from_sql, ts_expr = source
+                text_from_sql = text_source[0]
                 where = f"{ts_expr} >= ? AND {ts_expr} < ? AND db_stem NOT LIKE 'biz_message%'"
                 params: tuple[Any, ...] = (start_ts, end_ts)
                 if sender:
                     where += " AND sender_username = ?"
                     params = (start_ts, end_ts, sender)
 
-                # activeDays + latest_ts in one pass.
-                sql_meta = (
-                    "SELECT "
-                    "COUNT(DISTINCT date(datetime(ts, 'unixepoch', 'localtime'))) AS active_days, "
-                    "MAX(ts) AS latest_ts "
-                    "FROM ("
-                    f"  SELECT {ts_expr} AS ts"
-                    "  FROM message_fts"
-                    f"  WHERE {where}"
-                    ") sub"
-                )
-                r = conn.execute(sql_meta, params).fetchone()
-                active_days_i = int((r[0] if r else 0) or 0)
-                latest_ts_i = int((r[1] if r else 0) or 0)
+                facts = get_year_message_facts(account_dir=account_dir, year=year)
+                if facts is not None and (not sender or sender == facts.my_username):
+                    (
+                        active_days_i,
+                        latest_ts_i,
+                        local_type_counts_i,
+                        kind_counts_i,
+                        per_username_counts_i,
+                    ) = _overview_counts_from_facts(facts, sent_only=bool(sender))
+                else:
+                    # activeDays + latest_ts in one pass.
+                    sql_meta = (
+                        "SELECT "
+                        "COUNT(DISTINCT date(datetime(ts, 'unixepoch', 'localtime'))) AS active_days, "
+                        "MAX(ts) AS latest_ts "
+                        "FROM ("
+                        f"  SELECT {ts_expr} AS ts"
+                        f"  FROM {from_sql}"
+                        f"  WHERE {where}"
+                        ") sub"
+                    )
+                    r = conn.execute(sql_meta, params).fetchone()
+                    active_days_i = int((r[0] if r else 0) or 0)
+                    latest_ts_i = int((r[1] if r else 0) or 0)
 
-                # local_type distribution (for message kind).
-                local_type_counts_i: Counter[int] = Counter()
-                kind_counts_i: Counter[str] = Counter()
-                try:
-                    rows = conn.execute(
-                        f"SELECT CAST(local_type AS INTEGER) AS lt, COUNT(1) AS cnt "
-                        f"FROM message_fts WHERE {where} GROUP BY lt",
-                        params,
-                    ).fetchall()
-                except Exception:
-                    rows = []
-                for rr in rows:
-                    if not rr:
-                        continue
+                    # local_type distribution (for message kind).
+                    local_type_counts_i: Counter[int] = Counter()
+                    kind_counts_i: Counter[str] = Counter()
                     try:
-                        lt = int(rr[0] or 0)
-                        cnt = int(rr[1] or 0)
+                        rows = conn.execute(
+                            f"SELECT CAST(local_type AS INTEGER) AS lt, COUNT(1) AS cnt "
+                            f"FROM {from_sql} WHERE {where} GROUP BY lt",
+                            params,
+                        ).fetchall()
                     except Exception:
-                        continue
-                    if cnt <= 0:
-                        continue
-                    local_type_counts_i[lt] += cnt
-                    kind_counts_i[_kind_from_local_type(lt)] += cnt
+                        rows = []
+                    for rr in rows:
+                        if not rr:
+                            continue
+                        try:
+                            lt = int(rr[0] or 0)
+                            cnt = int(rr[1] or 0)
+                        except Exception:
+                            continue
+                        if cnt <= 0:
+                            continue
+                        local_type_counts_i[lt] += cnt
+                        kind_counts_i[_kind_from_local_type(lt)] += cnt
 
-                # Top conversations (best-effort: only needs a small LIMIT).
-                per_username_counts_i: Counter[str] = Counter()
-                try:
-                    rows_u = conn.execute(
-                        f"SELECT username, COUNT(1) AS cnt "
-                        f"FROM message_fts WHERE {where} "
-                        "GROUP BY username ORDER BY cnt DESC LIMIT 400",
-                        params,
-                    ).fetchall()
-                except Exception:
-                    rows_u = []
-                for rr in rows_u:
-                    if not rr:
-                        continue
-                    u = str(rr[0] or "").strip()
-                    if not u:
-                        continue
+                    # Top conversations (best-effort: only needs a small LIMIT).
+                    per_username_counts_i: Counter[str] = Counter()
                     try:
-                        cnt = int(rr[1] or 0)
+                        rows_u = conn.execute(
+                            f"SELECT username, COUNT(1) AS cnt "
+                            f"FROM {from_sql} WHERE {where} "
+                            "GROUP BY username ORDER BY cnt DESC LIMIT 400",
+                            params,
+                        ).fetchall()
                     except Exception:
-                        cnt = 0
-                    if cnt > 0:
-                        per_username_counts_i[u] = cnt
+                        rows_u = []
+                    for rr in rows_u:
+                        if not rr:
+                            continue
+                        u = str(rr[0] or "").strip()
+                        if not u:
+                            continue
+                        try:
+                            cnt = int(rr[1] or 0)
+                        except Exception:
+                            cnt = 0
+                        if cnt > 0:
+                            per_username_counts_i[u] = cnt
 
                 # Top phrases (short text only).
                 phrase_counts_i: Counter[str] = Counter()
                 try:
                     rows_p = conn.execute(
                         f"SELECT \"text\" AS txt, COUNT(1) AS cnt "
-                        f"FROM message_fts WHERE {where} AND render_type = 'text' "
+                        f"FROM {text_from_sql} WHERE {where} AND render_type = 'text' "
                         "  AND \"text\" IS NOT NULL "
                         "  AND TRIM(\"text\") != '' "
                         "  AND LENGTH(TRIM(\"text\")) <= 12 "
@@ -582,8 +616,9 @@ def compute_global_overview_stats(
                 added_friend_usernames: set[str] = set()
                 try:
                     like_patterns: list[str] = []
+                    tokenizer = get_chat_search_index_tokenizer(conn)
                     for pat in _ADDED_FRIEND_PATTERNS:
-                        tok = _to_char_token_text(pat)
+                        tok = _to_index_token_text(pat, tokenizer)
                         if tok:
                             like_patterns.append(f"%{tok}%")
 
@@ -591,7 +626,7 @@ def compute_global_overview_stats(
                         where_added = f"{ts_expr} >= ? AND {ts_expr} < ? AND db_stem NOT LIKE 'biz_message%'"
                         cond_added = " OR ".join(['\"text\" LIKE ?'] * len(like_patterns))
                         rows_added = conn.execute(
-                            f"SELECT DISTINCT username FROM message_fts "
+                            f"SELECT DISTINCT username FROM {text_from_sql} "
                             f"WHERE {where_added} "
                             "AND CAST(local_type AS INTEGER) = 10000 "
                             f"AND ({cond_added})",
@@ -9,7 +9,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Optional
 
-from ...chat_search_index import get_chat_search_index_db_path
+from ...chat_search_index import get_chat_search_index_db_path, get_chat_search_index_scan_source
 from ...chat_helpers import (
     _build_avatar_url,
     _decode_sqlite_text,
@@ -20,6 +20,7 @@ from ...chat_helpers import (
     _row_to_search_hit,
 )
 from ...logging_config import get_logger
+from ..facts import get_year_message_facts
 
 logger = get_logger(__name__)
 
@@ -159,20 +160,10 @@ def _compute_year_first_last_from_index(
 
     conn = sqlite3.connect(str(index_path))
     try:
-        has_fts = (
-            conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1").fetchone()
-            is not None
-        )
-        if not has_fts:
+        source = get_chat_search_index_scan_source(conn)
+        if source is None:
             return None, None
-
-        ts_expr = (
-            "CASE "
-            "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-            "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-            "ELSE CAST(create_time AS INTEGER) "
-            "END"
-        )
+        from_sql, ts_expr = source
 
         where = (
             f"{ts_expr} >= ? AND {ts_expr} < ? "
@@ -183,7 +174,7 @@ def _compute_year_first_last_from_index(
 
         base_sql = (
             f"SELECT {ts_expr} AS ts, username, db_stem, table_name, CAST(local_id AS INTEGER) AS local_id "
-            "FROM message_fts "
+            f"FROM {from_sql} "
             f"WHERE {where} "
         )
 
@@ -381,21 +372,11 @@ def _compute_sent_moment_refs_from_index(
 
     conn = sqlite3.connect(str(index_path))
     try:
-        has_fts = (
-            conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1").fetchone()
-            is not None
-        )
-        if not has_fts:
+        # `ts_expr` yields epoch seconds (legacy FTS-only indexes may store ms).
+        source = get_chat_search_index_scan_source(conn)
+        if source is None:
             return None, None
-
-        # Convert millisecond timestamps defensively (some datasets store ms).
-        ts_expr = (
-            "CASE "
-            "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-            "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-            "ELSE CAST(create_time AS INTEGER) "
-            "END"
-        )
+        from_sql, ts_expr = source
 
         # NOTE: local_type=10000 are mostly system messages; exclude to make the moment nicer.
         where = (
@@ -412,7 +393,7 @@ def _compute_sent_moment_refs_from_index(
             "CAST(strftime('%S', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) AS s "
             "FROM ("
             f"  SELECT {ts_expr} AS ts, username, db_stem, table_name, local_id "
-            "  FROM message_fts "
+            f"  FROM {from_sql} "
             f"  WHERE {where}"
             ") sub "
         )
@@ -854,26 +835,41 @@ def compute_weekday_hour_heatmap(*, account_dir: Path, year: int, sender_usernam
     matrix: list[list[int]] = [[0 for _ in range(24)] for _ in range(7)]
     total = 0
 
+    sender = str(sender_username).strip() if sender_username else ""
+    facts = get_year_message_facts(account_dir=account_dir, year=year)
+    if facts is not None and (not sender or sender == facts.my_username):
+        t0 = time.time()
+        weekday_of_day = [facts.day(d).weekday() for d in range(facts.days_in_year)]
+        for out, doy, hour in zip(facts.outgoing, facts.doy, facts.hour):
+            if sender and not out:
+                continue
+            matrix[weekday_of_day[doy]][hour] += 1
+            total += 1
+
+        logger.info(
+            "Wrapped heatmap computed (facts): account=%s year=%s total=%s sender=%s elapsed=%.2fs",
+            str(account_dir.name or "").strip(),
+            year,
+            total,
+            sender or "*",
+            time.time() - t0,
+        )
+        return WeekdayHourHeatmap(
+            weekday_labels=list(_WEEKDAY_LABELS_ZH),
+            hour_labels=list(_HOUR_LABELS),
+            matrix=matrix,
+            total_messages=total,
+        )
+
     # Prefer using our unified search index if available; it's much faster than scanning all msg tables.
     index_path = get_chat_search_index_db_path(account_dir)
     if index_path.exists():
         conn = sqlite3.connect(str(index_path))
         try:
-            has_fts = (
-                conn.execute(
-                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1"
-                ).fetchone()
-                is not None
-            )
-            if has_fts:
-                # Convert millisecond timestamps defensively (some datasets store ms).
-                ts_expr = (
-                    "CASE "
-                    "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-                    "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-                    "ELSE CAST(create_time AS INTEGER) "
-                    "END"
-                )
+            source = get_chat_search_index_scan_source(conn)
+            if source is not None:
+                # `ts_expr` yields epoch seconds (legacy FTS-only indexes may store ms).
+                from_sql, ts_expr = source
                 sender_clause = ""
                 if sender_username and str(sender_username).strip():
                     sender_clause = "    AND sender_username = ?"
@@ -884,7 +880,7 @@ def compute_weekday_hour_heatmap(*, account_dir: Path, year: int, sender_usernam
                     "COUNT(1) AS cnt "
                     "FROM ("
                     f"  SELECT {ts_expr} AS ts"
-                    "  FROM message_fts"
+                    f"  FROM {from_sql}"
                     f"  WHERE {ts_expr} >= ? AND {ts_expr} < ?"
                     "    AND db_stem NOT LIKE 'biz_message%'"
                     f"{sender_clause}"
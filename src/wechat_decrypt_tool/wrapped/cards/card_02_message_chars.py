@@ -12,8 +12,9 @@ from typing import Any, Optional
 from pypinyin import lazy_pinyin, Style
 
 from ...chat_helpers import _decode_message_content, _decode_sqlite_text, _iter_message_db_paths, _quote_ident
-from ...chat_search_index import get_chat_search_index_db_path
+from ...chat_search_index import get_chat_search_index_db_path, get_chat_search_index_scan_source
 from ...logging_config import get_logger
+from ..facts import get_year_message_facts
 
 logger = get_logger(__name__)
 
@@ -243,18 +244,9 @@ def compute_keyboard_stats(*, account_dir: Path, year: int, sample_rate: float =
     if index_path.exists():
         conn = sqlite3.connect(str(index_path))
         try:
-            has_fts = (
-                conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1").fetchone()
-                is not None
-            )
-            if has_fts and my_username:
-                ts_expr = (
-                    "CASE "
-                    "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-                    "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-                    "ELSE CAST(create_time AS INTEGER) "
-                    "END"
-                )
+            source = get_chat_search_index_scan_source(conn, with_text=True)
+            if source is not None and my_username:
+                from_sql, ts_expr = source
                 where = (
                     f"{ts_expr} >= ? AND {ts_expr} < ? "
                     "AND db_stem NOT LIKE 'biz_message%' "
@@ -264,7 +256,7 @@ def compute_keyboard_stats(*, account_dir: Path, year: int, sample_rate: float =
                     "AND sender_username = ?"
                 )
 
-                sql = f"SELECT \"text\" FROM message_fts WHERE {where}"
+                sql = f"SELECT \"text\" FROM {from_sql} WHERE {where}"
                 try:
                     cur = conn.execute(sql, (start_ts, end_ts, my_username))
                     used_index = True
@@ -628,23 +620,29 @@ def compute_text_message_char_counts(*, account_dir: Path, year: int) -> tuple[i
     start_ts, end_ts = _year_range_epoch_seconds(year)
     my_username = str(account_dir.name or "").strip()
 
+    facts = get_year_message_facts(account_dir=account_dir, year=year)
+    if facts is not None and facts.has_text:
+        sent_chars = 0
+        recv_chars = 0
+        for out, chars in zip(facts.outgoing, facts.text_chars):
+            if not chars:
+                continue
+            if out:
+                sent_chars += chars
+            else:
+                recv_chars += chars
+        if my_username:
+            return int(sent_chars), int(recv_chars)
+        return 0, int(sent_chars + recv_chars)
+
     # Prefer search index when available.
     index_path = get_chat_search_index_db_path(account_dir)
     if index_path.exists():
         conn = sqlite3.connect(str(index_path))
         try:
-            has_fts = (
-                conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1").fetchone()
-                is not None
-            )
-            if has_fts:
-                ts_expr = (
-                    "CASE "
-                    "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-                    "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-                    "ELSE CAST(create_time AS INTEGER) "
-                    "END"
-                )
+            source = get_chat_search_index_scan_source(conn, with_text=True)
+            if source is not None:
+                from_sql, ts_expr = source
                 where = (
                     f"{ts_expr} >= ? AND {ts_expr} < ? "
                     "AND db_stem NOT LIKE 'biz_message%' "
@@ -653,7 +651,7 @@ def compute_text_message_char_counts(*, account_dir: Path, year: int) -> tuple[i
                     "AND TRIM(CAST(\"text\" AS TEXT)) != ''"
                 )
 
-                sql_total = f"SELECT COALESCE(SUM(LENGTH(REPLACE(\"text\", ' ', ''))), 0) AS chars FROM message_fts WHERE {where}"
+                sql_total = f"SELECT COALESCE(SUM(LENGTH(REPLACE(\"text\", ' ', ''))), 0) AS chars FROM {from_sql} WHERE {where}"
                 r_total = conn.execute(sql_total, (start_ts, end_ts)).fetchone()
                 total_chars = int((r_total[0] if r_total else 0) or 0)
 
@@ -17,10 +17,12 @@ from ...chat_helpers import (
 )
 from ...chat_search_index import (
     get_chat_search_index_db_path,
+    get_chat_search_index_scan_source,
     get_chat_search_index_status,
     start_chat_search_index_build,
 )
 from ...logging_config import get_logger
+from ..facts import get_year_message_facts
 
 logger = get_logger(__name__)
 
@@ -86,6 +88,14 @@ def _compute_streak_days(doys: list[int]) -> int:
     return int(best)
 
 
+def _best_buddy_extras(*, doys: list[int], peak_hour: int | None) -> dict[str, Any]:
+    out: dict[str, Any] = {"longestStreakDays": int(_compute_streak_days(doys))}
+    if peak_hour is not None and 0 <= peak_hour <= 23:
+        out["peakHour"] = int(peak_hour)
+        out["peakHourLabel"] = f"{int(peak_hour):02d}:00"
+    return out
+
+
 def _compute_best_buddy_extras_from_index(*, account_dir: Path, year: int, buddy_username: str) -> dict[str, Any]:
     """Compute a few extra fields for Card07 Bento summary.
 
@@ -96,65 +106,71 @@ def _compute_best_buddy_extras_from_index(*, account_dir: Path, year: int, buddy
     """
 
     buddy = str(buddy_username or "").strip()
-    if not buddy:
+    if not buddy or buddy.endswith("@chatroom"):
         return {}
 
+    facts = get_year_message_facts(account_dir=account_dir, year=int(year))
+    if facts is not None:
+        start, end = facts.conversation_slice(buddy)
+        days: set[int] = set()
+        hour_counts = [0] * 24
+        for i in range(start, end):
+            if facts.local_type[i] == 10000:
+                continue
+            days.add(facts.doy[i] + 1)  # 1-based, like strftime("%j")
+            hour_counts[facts.hour[i]] += 1
+        peak_hour = None
+        if days:
+            peak_hour = max(range(24), key=lambda h: (hour_counts[h], -h))
+        return _best_buddy_extras(doys=sorted(days), peak_hour=peak_hour)
+
     index_path = get_chat_search_index_db_path(account_dir)
     if not index_path.exists():
         return {}
 
     start_ts, end_ts = _year_range_epoch_seconds(int(year))
 
-    ts_expr = (
-        "CASE "
-        "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-        "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-        "ELSE CAST(create_time AS INTEGER) "
-        "END"
-    )
-    where = (
-        f"{ts_expr} >= ? AND {ts_expr} < ? "
-        "AND db_stem NOT LIKE 'biz_message%' "
-        "AND CAST(local_type AS INTEGER) != 10000 "
-        "AND username = ? "
-        "AND username NOT LIKE '%@chatroom'"
-    )
-
-    sql_days = (
-        "SELECT DISTINCT "
-        "CAST(strftime('%j', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) AS doy "
-        "FROM ("
-        f"  SELECT {ts_expr} AS ts "
-        "  FROM message_fts "
-        f"  WHERE {where}"
-        ") sub "
-        "WHERE ts > 0 "
-        "ORDER BY doy ASC"
-    )
-
-    sql_peak_hour = (
-        "SELECT "
-        "CAST(strftime('%H', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) AS h, "
-        "COUNT(1) AS cnt "
-        "FROM ("
-        f"  SELECT {ts_expr} AS ts "
-        "  FROM message_fts "
-        f"  WHERE {where}"
-        ") sub "
-        "WHERE ts > 0 "
-        "GROUP BY h "
-        "ORDER BY cnt DESC, h ASC "
-        "LIMIT 1"
-    )
-
     conn = sqlite3.connect(str(index_path))
     try:
-        has_fts = (
-            conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1").fetchone()
-            is not None
-        )
-        if not has_fts:
+        source = get_chat_search_index_scan_source(conn)
+        if source is None:
             return {}
+        from_sql, ts_expr = source
+
+        where = (
+            f"{ts_expr} >= ? AND {ts_expr} < ? "
+            "AND db_stem NOT LIKE 'biz_message%' "
+            "AND CAST(local_type AS INTEGER) != 10000 "
+            "AND username = ? "
+            "AND username NOT LIKE '%@chatroom'"
+        )
+
+        sql_days = (
+            "SELECT DISTINCT "
+            "CAST(strftime('%j', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) AS doy "
+            "FROM ("
+            f"  SELECT {ts_expr} AS ts "
+            f"  FROM {from_sql} "
+            f"  WHERE {where}"
+            ") sub "
+            "WHERE ts > 0 "
+            "ORDER BY doy ASC"
+        )
+
+        sql_peak_hour = (
+            "SELECT "
+            "CAST(strftime('%H', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) AS h, "
+            "COUNT(1) AS cnt "
+            "FROM ("
+            f"  SELECT {ts_expr} AS ts "
+            f"  FROM {from_sql} "
+            f"  WHERE {where}"
+            ") sub "
+            "WHERE ts > 0 "
+            "GROUP BY h "
+            "ORDER BY cnt DESC, h ASC "
+            "LIMIT 1"
+        )
 
         params = (start_ts, end_ts, buddy)
 
@@ -171,8 +187,6 @@ def _compute_best_buddy_extras_from_index(*, account_dir: Path, year: int, buddy
             except Exception:
                 continue
 
-        longest_streak_days = _compute_streak_days(doys)
-
         peak_hour: int | None = None
         try:
             row = conn.execute(sql_peak_hour, params).fetchone()
@@ -181,11 +195,7 @@ def _compute_best_buddy_extras_from_index(*, account_dir: Path, year: int, buddy
         except Exception:
             peak_hour = None
 
-        out: dict[str, Any] = {"longestStreakDays": int(longest_streak_days)}
-        if peak_hour is not None and 0 <= peak_hour <= 23:
-            out["peakHour"] = int(peak_hour)
-            out["peakHourLabel"] = f"{int(peak_hour):02d}:00"
-        return out
+        return _best_buddy_extras(doys=doys, peak_hour=peak_hour)
     except Exception:
         return {}
     finally:
@@ -323,21 +333,12 @@ def compute_reply_speed_stats(*, account_dir: Path, year: int) -> dict[str, Any]
     if index_path.exists():
         conn = sqlite3.connect(str(index_path))
         try:
-            has_fts = (
-                conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1").fetchone()
-                is not None
-            )
-            if has_fts and my_username:
+            source = get_chat_search_index_scan_source(conn)
+            if source is not None and my_username:
                 used_index = True
                 t0 = time.time()
 
-                ts_expr = (
-                    "CASE "
-                    "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-                    "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-                    "ELSE CAST(create_time AS INTEGER) "
-                    "END"
-                )
+                from_sql, ts_expr = source
 
                 where = (
                     f"{ts_expr} >= ? AND {ts_expr} < ? "
@@ -349,16 +350,22 @@ def compute_reply_speed_stats(*, account_dir: Path, year: int) -> dict[str, Any]
                 # Order by username, then time (ties broken by sort_seq/local_id if possible).
                 sql = (
                     "SELECT "
-                    "username, sender_username, "
+                    "username, (sender_username = ?) AS is_me, "
                     f"{ts_expr} AS ts, "
                     "CAST(sort_seq AS INTEGER) AS sort_seq_i, "
                     "CAST(local_id AS INTEGER) AS local_id_i "
-                    "FROM message_fts "
+                    f"FROM {from_sql} "
                     f"WHERE {where} "
                     "ORDER BY username ASC, ts ASC, sort_seq_i ASC, local_id_i ASC"
                 )
 
-                cur = conn.execute(sql, (start_ts, end_ts))
+                # The shared per-year fact store yields the same (username, is_me, ts) stream without
+                # another pass over the index.
+                facts = get_year_message_facts(account_dir=account_dir, year=int(year))
+                if facts is not None:
+                    cur = facts.iter_rows(skip_local_types=(10000,), skip_chatrooms=True)
+                else:
+                    cur = conn.execute(sql, (my_username, start_ts, end_ts))
 
                 cur_username: str = ""
                 incoming = 0
@@ -390,7 +397,7 @@ def compute_reply_speed_stats(*, account_dir: Path, year: int) -> dict[str, Any]
                 for row in cur:
                     try:
                         username = str(row[0] or "").strip()
-                        sender = str(row[1] or "").strip()
+                        is_me = bool(row[1])
                         ts = int(row[2] or 0)
                     except Exception:
                         continue
@@ -411,7 +418,6 @@ def compute_reply_speed_stats(*, account_dir: Path, year: int) -> dict[str, Any]
                     if not _should_keep_session(username, include_official=False):
                         continue
 
-                    is_me = sender == my_username
                     if is_me:
                         outgoing += 1
                         if prev_other_ts is not None and ts >= prev_other_ts:
@@ -620,15 +626,7 @@ def compute_reply_speed_stats(*, account_dir: Path, year: int) -> dict[str, Any]
         days_in_year = int((datetime(int(year) + 1, 1, 1) - datetime(int(year), 1, 1)).days)
         u_list = [u for u, _ in sorted(all_totals.items(), key=lambda kv: (-int(kv[1] or 0), str(kv[0] or ""))) if u]
         if days_in_year > 0 and u_list:
-            # Convert millisecond timestamps defensively.
-            ts_expr = (
-                "CASE "
-                "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-                "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-                "ELSE CAST(create_time AS INTEGER) "
-                "END"
-            )
-
+            # Same source/timestamp expression as the aggregation pass above (seconds, ms-safe).
             base_where = (
                 f"{ts_expr} >= ? AND {ts_expr} < ? "
                 "AND db_stem NOT LIKE 'biz_message%' "
@@ -639,28 +637,41 @@ def compute_reply_speed_stats(*, account_dir: Path, year: int) -> dict[str, Any]
             sql_daily = (
                 "SELECT username, "
                 "CAST(strftime('%j', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) - 1 AS doy, "
-                "sender_username, "
+                "is_me, "
                 "COUNT(1) AS cnt "
                 "FROM ("
-                f"  SELECT username, sender_username, {ts_expr} AS ts "
-                "  FROM message_fts "
+                f"  SELECT username, (sender_username = ?) AS is_me, {ts_expr} AS ts "
+                f"  FROM {from_sql} "
                 f"  WHERE {base_where}"
                 ") sub "
-                "GROUP BY username, doy, sender_username"
+                "GROUP BY username, doy, is_me"
             )
 
             u_set = set(u_list)
             per_user_daily_total: dict[str, list[int]] = {}
             per_user_daily_outgoing: dict[str, list[int]] = {}
             per_user_daily_incoming: dict[str, list[int]] = {}
-            try:
-                conn2 = sqlite3.connect(str(index_path))
+            facts = get_year_message_facts(account_dir=account_dir, year=int(year))
+            if facts is not None:
+                daily_counts: dict[tuple[str, int, int], int] = {}
+                for u, start, end in facts.iter_conversations():
+                    if u not in u_set:
+                        continue
+                    for i in range(start, end):
+                        if facts.local_type[i] == 10000:
+                            continue
+                        k = (u, facts.doy[i], facts.outgoing[i])
+                        daily_counts[k] = daily_counts.get(k, 0) + 1
+                rows = [(u, doy, out, cnt) for (u, doy, out), cnt in daily_counts.items()]
+            else:
                 try:
-                    rows = conn2.execute(sql_daily, (start_ts, end_ts)).fetchall()
-                finally:
-                    conn2.close()
-            except Exception:
-                rows = []
+                    conn2 = sqlite3.connect(str(index_path))
+                    try:
+                        rows = conn2.execute(sql_daily, (my_username, start_ts, end_ts)).fetchall()
+                    finally:
+                        conn2.close()
+                except Exception:
+                    rows = []
 
             for r in rows:
                 if not r:
@@ -670,7 +681,7 @@ def compute_reply_speed_stats(*, account_dir: Path, year: int) -> dict[str, Any]
                     continue
                 try:
                     doy = int(r[1] if r[1] is not None else -1)
-                    sender = str(r[2] or "").strip()
+                    is_me = bool(r[2])
                     cnt = int(r[3] or 0)
                 except Exception:
                     continue
@@ -682,7 +693,7 @@ def compute_reply_speed_stats(*, account_dir: Path, year: int) -> dict[str, Any]
                     per_user_daily_total[u] = daily_total
                 daily_total[doy] += cnt
 
-                if sender == my_username:
+                if is_me:
                     daily_outgoing = per_user_daily_outgoing.get(u)
                     if daily_outgoing is None:
                         daily_outgoing = [0] * days_in_year
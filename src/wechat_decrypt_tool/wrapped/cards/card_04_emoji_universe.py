@@ -24,8 +24,9 @@ from ...chat_helpers import (
     _resource_lookup_chat_id,
     _should_keep_session,
 )
-from ...chat_search_index import get_chat_search_index_db_path
+from ...chat_search_index import get_chat_search_index_db_path, get_chat_search_index_scan_source
 from ...logging_config import get_logger
+from ..facts import get_year_message_facts
 
 logger = get_logger(__name__)
 
@@ -146,13 +147,11 @@ def _emoji_key_priority(key: str) -> tuple[int, int, str]:
 
 def _normalize_index_text_for_emoji_match(text: str) -> str:
     """
-    Our chat search index stores `message_fts.text` as `_to_char_token_text`, i.e.:
-    - lowercased
-    - whitespace removed
-    - every character joined by single spaces
+    Our chat search index stores `message_fts.text` lowercased with whitespace removed; legacy
+    char-tokenized indexes additionally join every character by single spaces.
 
-    Example: "[捂脸]" -> "[ 捂 脸 ]"
-    For emoji matching, we normalize it back by removing whitespace and lowercasing.
+    Example: "[捂脸]" -> "[捂脸]" (trigram) / "[ 捂 脸 ]" (char)
+    For emoji matching, we normalize both back by removing whitespace and lowercasing.
     """
 
     return "".join(ch for ch in str(text or "").lower() if not ch.isspace())
@@ -364,7 +363,7 @@ def _load_wechat_text_emoji_matcher() -> tuple[Optional[re.Pattern[str]], dict[s
     """
     Build a matcher for extracting WeChat "small yellow face" codes from `message_fts.text`.
 
-    Note: `message_fts.text` is stored as a char-tokenized string (see `_normalize_index_text_for_emoji_match`),
+    Note: `message_fts.text` may be char-tokenized (see `_normalize_index_text_for_emoji_match`),
     so we match against normalized keys (lowercased + whitespace removed).
 
     Returns:
@@ -513,106 +512,117 @@ def compute_emoji_universe_stats(*, account_dir: Path, year: int) -> dict[str, A
     if index_path.exists():
         conn = sqlite3.connect(str(index_path))
         try:
-            has_fts = (
-                conn.execute(
-                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1"
-                ).fetchone()
-                is not None
-            )
-            if has_fts and my_username:
+            source = get_chat_search_index_scan_source(conn)
+            text_source = get_chat_search_index_scan_source(conn, with_text=True)
+            if source is not None and text_source is not None and my_username:
                 used_index = True
-                ts_expr = (
-                    "CASE "
-                    "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-                    "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-                    "ELSE CAST(create_time AS INTEGER) "
-                    "END"
-                )
+                from_sql, ts_expr = source
+                text_from_sql = text_source[0]
                 where_base = (
                     f"{ts_expr} >= ? AND {ts_expr} < ? "
                     "AND db_stem NOT LIKE 'biz_message%' "
                     "AND sender_username = ?"
                 )
 
-                try:
-                    r_total = conn.execute(
-                        f"SELECT COUNT(1) FROM message_fts WHERE {where_base} AND CAST(local_type AS INTEGER) != 10000",
-                        (start_ts, end_ts, my_username),
-                    ).fetchone()
-                    total_sent_messages = int((r_total[0] if r_total else 0) or 0)
-                except Exception:
-                    total_sent_messages = 0
-
-                try:
-                    r_sticker = conn.execute(
-                        f"SELECT COUNT(1) FROM message_fts WHERE {where_base} AND CAST(local_type AS INTEGER) = 47",
-                        (start_ts, end_ts, my_username),
-                    ).fetchone()
-                    sent_sticker_count = int((r_sticker[0] if r_sticker else 0) or 0)
-                except Exception:
-                    sent_sticker_count = 0
+                facts = get_year_message_facts(account_dir=account_dir, year=int(year))
+                if facts is not None:
+                    conv_stickers: Counter[int] = Counter()
+                    for i, out in enumerate(facts.outgoing):
+                        if not out:
+                            continue
+                        lt = facts.local_type[i]
+                        if lt != 10000:
+                            total_sent_messages += 1
+                        if lt != 47:
+                            continue
+                        sent_sticker_count += 1
+                        conv_stickers[facts.conv[i]] += 1
+                        day = facts.day(facts.doy[i])
+                        sticker_active_days.add(day.isoformat())
+                        hour_counts[facts.hour[i]] += 1
+                        weekday_counts[day.weekday()] += 1
+                    for c, cnt in conv_stickers.items():
+                        sticker_by_username[facts.usernames[c]] += cnt
+                else:
+                    try:
+                        r_total = conn.execute(
+                            f"SELECT COUNT(1) FROM {from_sql} WHERE {where_base} AND CAST(local_type AS INTEGER) != 10000",
+                            (start_ts, end_ts, my_username),
+                        ).fetchone()
+                        total_sent_messages = int((r_total[0] if r_total else 0) or 0)
+                    except Exception:
+                        total_sent_messages = 0
 
-                try:
-                    rows_u = conn.execute(
-                        f"SELECT username, COUNT(1) AS cnt "
-                        f"FROM message_fts WHERE {where_base} AND CAST(local_type AS INTEGER) = 47 "
-                        "GROUP BY username",
-                        (start_ts, end_ts, my_username),
-                    ).fetchall()
-                except Exception:
-                    rows_u = []
-                for r in rows_u:
-                    if not r:
-                        continue
-                    username = str(r[0] or "").strip()
-                    if not username:
-                        continue
                     try:
-                        cnt = int(r[1] or 0)
+                        r_sticker = conn.execute(
+                            f"SELECT COUNT(1) FROM {from_sql} WHERE {where_base} AND CAST(local_type AS INTEGER) = 47",
+                            (start_ts, end_ts, my_username),
+                        ).fetchone()
+                        sent_sticker_count = int((r_sticker[0] if r_sticker else 0) or 0)
                     except Exception:
-                        cnt = 0
-                    if cnt > 0:
-                        sticker_by_username[username] += cnt
+                        sent_sticker_count = 0
 
-                try:
-                    rows_t = conn.execute(
-                        "SELECT "
-                        "date(datetime(ts, 'unixepoch', 'localtime')) AS d, "
-                        "CAST(strftime('%H', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) AS h, "
-                        "CAST(strftime('%w', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) AS w "
-                        "FROM ("
-                        f"  SELECT {ts_expr} AS ts "
-                        "  FROM message_fts "
-                        f"  WHERE {where_base} AND CAST(local_type AS INTEGER) = 47"
-                        ") sub",
-                        (start_ts, end_ts, my_username),
-                    ).fetchall()
-                except Exception:
-                    rows_t = []
-                for r in rows_t:
-                    if not r:
-                        continue
-                    d = str(r[0] or "").strip()
                     try:
-                        h = int(r[1] if r[1] is not None else -1)
+                        rows_u = conn.execute(
+                            f"SELECT username, COUNT(1) AS cnt "
+                            f"FROM {from_sql} WHERE {where_base} AND CAST(local_type AS INTEGER) = 47 "
+                            "GROUP BY username",
+                            (start_ts, end_ts, my_username),
+                        ).fetchall()
                     except Exception:
-                        h = -1
+                        rows_u = []
+                    for r in rows_u:
+                        if not r:
+                            continue
+                        username = str(r[0] or "").strip()
+                        if not username:
+                            continue
+                        try:
+                            cnt = int(r[1] or 0)
+                        except Exception:
+                            cnt = 0
+                        if cnt > 0:
+                            sticker_by_username[username] += cnt
+
                     try:
-                        w0 = int(r[2] if r[2] is not None else -1)
+                        rows_t = conn.execute(
+                            "SELECT "
+                            "date(datetime(ts, 'unixepoch', 'localtime')) AS d, "
+                            "CAST(strftime('%H', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) AS h, "
+                            "CAST(strftime('%w', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) AS w "
+                            "FROM ("
+                            f"  SELECT {ts_expr} AS ts "
+                            f"  FROM {from_sql} "
+                            f"  WHERE {where_base} AND CAST(local_type AS INTEGER) = 47"
+                            ") sub",
+                            (start_ts, end_ts, my_username),
+                        ).fetchall()
                     except Exception:
-                        w0 = -1
-                    if d:
-                        sticker_active_days.add(d)
-                    if 0 <= h <= 23:
-                        hour_counts[h] += 1
-                    if 0 <= w0 <= 6:
-                        # sqlite: 0=Sun..6=Sat -> 0=Mon..6=Sun
-                        w = 6 if w0 == 0 else (w0 - 1)
-                        weekday_counts[w] += 1
+                        rows_t = []
+                    for r in rows_t:
+                        if not r:
+                            continue
+                        d = str(r[0] or "").strip()
+                        try:
+                            h = int(r[1] if r[1] is not None else -1)
+                        except Exception:
+                            h = -1
+                        try:
+                            w0 = int(r[2] if r[2] is not None else -1)
+                        except Exception:
+                            w0 = -1
+                        if d:
+                            sticker_active_days.add(d)
+                        if 0 <= h <= 23:
+                            hour_counts[h] += 1
+                        if 0 <= w0 <= 6:
+                            # sqlite: 0=Sun..6=Sat -> 0=Mon..6=Sun
+                            w = 6 if w0 == 0 else (w0 - 1)
+                            weekday_counts[w] += 1
 
                 try:
                     rows_text = conn.execute(
-                        f"SELECT \"text\" FROM message_fts "
+                        f"SELECT \"text\" FROM {text_from_sql} "
                         f"WHERE {where_base} AND render_type = 'text' "
                         "AND \"text\" IS NOT NULL AND TRIM(\"text\") != ''",
                         (start_ts, end_ts, my_username),
@@ -16,10 +16,12 @@ from ...chat_helpers import (
 )
 from ...chat_search_index import (
     get_chat_search_index_db_path,
+    get_chat_search_index_scan_source,
     get_chat_search_index_status,
     start_chat_search_index_build,
 )
 from ...logging_config import get_logger
+from ..facts import get_year_message_facts
 
 logger = get_logger(__name__)
 
@@ -143,21 +145,12 @@ def compute_monthly_best_friends_wall_stats(*, account_dir: Path, year: int) ->
     if index_path.exists():
         conn = sqlite3.connect(str(index_path))
         try:
-            has_fts = (
-                conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1").fetchone()
-                is not None
-            )
-            if has_fts and my_username:
+            source = get_chat_search_index_scan_source(conn)
+            if source is not None and my_username:
                 used_index = True
                 t0 = time.time()
 
-                ts_expr = (
-                    "CASE "
-                    "WHEN CAST(create_time AS INTEGER) > 1000000000000 "
-                    "THEN CAST(CAST(create_time AS INTEGER)/1000 AS INTEGER) "
-                    "ELSE CAST(create_time AS INTEGER) "
-                    "END"
-                )
+                from_sql, ts_expr = source
 
                 where = (
                     f"{ts_expr} >= ? AND {ts_expr} < ? "
@@ -168,16 +161,22 @@ def compute_monthly_best_friends_wall_stats(*, account_dir: Path, year: int) ->
 
                 sql = (
                     "SELECT "
-                    "username, sender_username, "
+                    "username, (sender_username = ?) AS is_me, "
                     f"{ts_expr} AS ts, "
                     "CAST(sort_seq AS INTEGER) AS sort_seq_i, "
                     "CAST(local_id AS INTEGER) AS local_id_i "
-                    "FROM message_fts "
+                    f"FROM {from_sql} "
                     f"WHERE {where} "
                     "ORDER BY username ASC, ts ASC, sort_seq_i ASC, local_id_i ASC"
                 )
 
-                cur = conn.execute(sql, (start_ts, end_ts))
+                # The shared per-year fact store yields the same (username, is_me, ts) stream without
+                # another pass over the index.
+                facts = get_year_message_facts(account_dir=account_dir, year=int(year))
+                if facts is not None:
+                    cur = facts.iter_rows(skip_local_types=(10000,), skip_chatrooms=True)
+                else:
+                    cur = conn.execute(sql, (my_username, start_ts, end_ts))
 
                 cur_username = ""
                 conv_month_aggs: dict[int, _MonthConvAgg] = {}
@@ -196,7 +195,7 @@ def compute_monthly_best_friends_wall_stats(*, account_dir: Path, year: int) ->
                 for row in cur:
                     try:
                         username = str(row[0] or "").strip()
-                        sender = str(row[1] or "").strip()
+                        is_me = bool(row[1])
                         ts = int(row[2] or 0)
                     except Exception:
                         continue
@@ -221,7 +220,6 @@ def compute_monthly_best_friends_wall_stats(*, account_dir: Path, year: int) ->
                         conv_month_aggs[month] = agg
                     agg.observe(day=int(dt.day), hour=int(dt.hour))
 
-                    is_me = sender == my_username
                     if is_me:
                         agg.outgoing += 1
                         if prev_other_ts is not None and ts >= prev_other_ts:
@@ -0,0 +1,406 @@
+"""Per-year message fact store shared by the Wrapped cards.
+
+Most annual cards only need a handful of columns per message (time, conversation, direction, type).
+Instead of letting each card re-scan `chat_search_index.db` with its own SQL, we materialise those
+columns once per account/year into compact `array.array` columns, persist them under
+`<account>/_wrapped/facts/`, and keep the most recent stores in memory so the cards of one deck
+share a single pass over the index.
+
+Rows exclude `biz_message*.db` shards and are ordered by (username, ts, sort_seq, local_id), so
+each conversation is a contiguous slice and per-conversation scans (reply speed, monthly wall)
+can walk the columns directly.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+from ..chat_search_index import get_chat_search_index_db_path, get_chat_search_index_scan_source
+from ..logging_config import get_logger
+from .storage import wrapped_facts_dir
+
+logger = get_logger(__name__)
+
+
+# Bump when the on-disk layout or row semantics change.
+_FACTS_VERSION = 1
+
+# (name, array typecode) in on-disk order.
+_COLUMNS: tuple[tuple[str, str], ...] = (
+    ("ts", "q"),
+    ("conv", "i"),
+    ("outgoing", "b"),
+    ("local_type", "q"),
+    ("text_chars", "i"),
+    ("doy", "h"),
+    ("hour", "b"),
+)
+
+# Local-time buckets: every supported UTC offset is a multiple of 15 minutes, so all timestamps in
+# one bucket share the same local day/hour.
+_LOCALTIME_BUCKET_SECONDS = 15 * 60
+
+
+def _env_int(name: str, default: int, *, min_v: int, max_v: int) -> int:
+    raw = str(os.environ.get(name, "") or "").strip()
+    try:
+        v = int(raw) if raw else int(default)
+    except Exception:
+        v = int(default)
+    return max(int(min_v), min(int(max_v), v))
+
+
+@dataclass
+class YearMessageFacts:
+    """Columnar per-message facts for one account/year.
+
+    - `ts`: epoch seconds
+    - `conv`: index into `usernames`
+    - `outgoing`: 1 when sent by `my_username`
+    - `local_type`: raw WeChat message type
+    - `text_chars`: non-space characters for `render_type='text'` rows (0 otherwise; always 0 when
+      `has_text` is False, i.e. the index predates the text/render_type columns)
+    - `doy` / `hour`: 0-based local day-of-year and local hour
+    """
+
+    year: int
+    my_username: str
+    signature: str
+    has_text: bool
+    usernames: list[str]
+    ts: array
+    conv: array
+    outgoing: array
+    local_type: array
+    text_chars: array
+    doy: array
+    hour: array
+    _days: list[date] = field(default_factory=list, repr=False)
+    _slices: list[tuple[int, int]] = field(default_factory=list, repr=False)
+
+    def __post_init__(self) -> None:
+        start = date(int(self.year), 1, 1)
+        n_days = (date(int(self.year) + 1, 1, 1) - start).days
+        self._days = [start + timedelta(days=i) for i in range(n_days)]
+
+        slices: list[tuple[int, int]] = [(0, 0) for _ in self.usernames]
+        conv = self.conv
+        n = len(conv)
+        i = 0
+        while i < n:
+            c = conv[i]
+            j = i + 1
+            while j < n and conv[j] == c:
+                j += 1
+            slices[c] = (i, j)
+            i = j
+        self._slices = slices
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @property
+    def days_in_year(self) -> int:
+        return len(self._days)
+
+    def day(self, doy: int) -> date:
+        """Local calendar date of a 0-based day-of-year."""
+
+        return self._days[int(doy)]
+
+    def iter_conversations(self) -> Iterator[tuple[str, int, int]]:
+        """Yield (username, start, end) row slices in username order."""
+
+        for username, (start, end) in zip(self.usernames, self._slices):
+            if end > start:
+                yield username, start, end
+
+    def iter_rows(
+        self,
+        *,
+        skip_local_types: tuple[int, ...] = (),
+        skip_chatrooms: bool = False,
+    ) -> Iterator[tuple[str, int, int]]:
+        """Yield (username, outgoing, ts) ordered by conversation then time."""
+
+        ts_col = self.ts
+        out_col = self.outgoing
+        lt_col = self.local_type
+        skip = set(int(x) for x in skip_local_types)
+        for username, start, end in self.iter_conversations():
+            if skip_chatrooms and username.endswith("@chatroom"):
+                continue
+            for i in range(start, end):
+                if skip and lt_col[i] in skip:
+                    continue
+                yield username, out_col[i], ts_col[i]
+
+    def conversation_slice(self, username: str) -> tuple[int, int]:
+        try:
+            idx = self.usernames.index(str(username or ""))
+        except ValueError:
+            return 0, 0
+        return self._slices[idx]
+
+
+_MEMO: "OrderedDict[tuple[str, int], YearMessageFacts]" = OrderedDict()
+_MEMO_GUARD = threading.Lock()
+
+_LOCKS: dict[tuple[str, int], threading.Lock] = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+def _get_lock(key: tuple[str, int]) -> threading.Lock:
+    with _LOCKS_GUARD:
+        lock = _LOCKS.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _LOCKS[key] = lock
+        return lock
+
+
+def _facts_path(account_dir: Path, year: int) -> Path:
+    return wrapped_facts_dir(account_dir) / f"{int(year)}_facts_v{_FACTS_VERSION}.bin"
+
+
+def _index_signature(index_path: Path) -> Optional[str]:
+    try:
+        st = index_path.stat()
+    except Exception:
+        return None
+    return f"{int(st.st_mtime_ns)}:{int(st.st_size)}"
+
+
+def _year_range_epoch_seconds(year: int) -> tuple[int, int]:
+    start = int(datetime(year, 1, 1).timestamp())
+    end = int(datetime(year + 1, 1, 1).timestamp())
+    return start, end
+
+
+def _memo_get(key: tuple[str, int], signature: str) -> Optional[YearMessageFacts]:
+    with _MEMO_GUARD:
+        facts = _MEMO.get(key)
+        if facts is None:
+            return None
+        if facts.signature != signature:
+            _MEMO.pop(key, None)
+            return None
+        _MEMO.move_to_end(key)
+        return facts
+
+
+def _memo_put(key: tuple[str, int], facts: YearMessageFacts) -> None:
+    max_entries = _env_int("WECHAT_TOOL_WRAPPED_FACTS_MEMO", 2, min_v=0, max_v=16)
+    with _MEMO_GUARD:
+        _MEMO[key] = facts
+        _MEMO.move_to_end(key)
+        while len(_MEMO) > max_entries:
+            _MEMO.popitem(last=False)
+
+
+def _write_facts(path: Path, facts: YearMessageFacts) -> None:
+    header = {
+        "version": _FACTS_VERSION,
+        "year": int(facts.year),
+        "myUsername": facts.my_username,
+        "signature": facts.signature,
+        "hasText": bool(facts.has_text),
+        "rows": len(facts),
+        "byteorder": sys.byteorder,
+        "usernames": facts.usernames,
+    }
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(json.dumps(header, ensure_ascii=False).encode("utf-8"))
+        f.write(b"\n")
+        for name, _ in _COLUMNS:
+            getattr(facts, name).tofile(f)
+    os.replace(tmp, path)
+
+
+def _read_facts(path: Path, *, signature: str, my_username: str) -> Optional[YearMessageFacts]:
+    if not path.exists():
+        return None
+    try:
+        with path.open("rb") as f:
+            header = json.loads(f.readline().decode("utf-8"))
+            if not isinstance(header, dict):
+                return None
+            if int(header.get("version") or 0) != _FACTS_VERSION:
+                return None
+            if str(header.get("signature") or "") != signature:
+                return None
+            if str(header.get("myUsername") or "") != my_username:
+                return None
+            rows = int(header.get("rows") or 0)
+            swap = str(header.get("byteorder") or sys.byteorder) != sys.byteorder
+            cols: dict[str, array] = {}
+            for name, code in _COLUMNS:
+                arr = array(code)
+                arr.fromfile(f, rows)
+                if swap:
+                    arr.byteswap()
+                cols[name] = arr
+        return YearMessageFacts(
+            year=int(header.get("year") or 0),
+            my_username=my_username,
+            signature=signature,
+            has_text=bool(header.get("hasText")),
+            usernames=[str(u) for u in (header.get("usernames") or [])],
+            **cols,
+        )
+    except Exception:
+        logger.exception("Failed to read wrapped facts: %s", path)
+        return None
+
+
+def _build_facts(*, index_path: Path, year: int, my_username: str, signature: str) -> Optional[YearMessageFacts]:
+    start_ts, end_ts = _year_range_epoch_seconds(int(year))
+    conn = sqlite3.connect(str(index_path))
+    try:
+        try:
+            fts_cols = {str(r[1]) for r in conn.execute("PRAGMA table_info(message_fts)").fetchall()}
+        except Exception:
+            fts_cols = set()
+        with_text = "text" in fts_cols and "render_type" in fts_cols
+        source = get_chat_search_index_scan_source(conn, with_text=with_text)
+        if source is None:
+            return None
+        from_sql, ts_expr = source
+
+        chars_expr = "0"
+        if with_text:
+            chars_expr = "CASE WHEN render_type = 'text' THEN COALESCE(LENGTH(REPLACE(\"text\", ' ', '')), 0) ELSE 0 END"
+        sql = (
+            "SELECT username, sender_username, ts, lt, chars FROM ("
+            f"  SELECT username, sender_username, {ts_expr} AS ts, CAST(local_type AS INTEGER) AS lt, "
+            f"  {chars_expr} AS chars, "
+            "  CAST(sort_seq AS INTEGER) AS sort_seq_i, CAST(local_id AS INTEGER) AS local_id_i "
+            f"  FROM {from_sql}"
+            f"  WHERE {ts_expr} >= ? AND {ts_expr} < ?"
+            "    AND db_stem NOT LIKE 'biz_message%'"
+            ") sub "
+            "ORDER BY username ASC, ts ASC, sort_seq_i ASC, local_id_i ASC"
+        )
+
+        usernames: list[str] = []
+        cols: dict[str, array] = {name: array(code) for name, code in _COLUMNS}
+        ts_col = cols["ts"]
+        conv_col = cols["conv"]
+        out_col = cols["outgoing"]
+        lt_col = cols["local_type"]
+        chars_col = cols["text_chars"]
+        doy_col = cols["doy"]
+        hour_col = cols["hour"]
+
+        local_cache: dict[int, tuple[int, int]] = {}
+        cur_username: Optional[str] = None
+        cur_idx = -1
+        for username, sender, ts, lt, chars in conn.execute(sql, (start_ts, end_ts)):
+            u = str(username or "").strip()
+            if not u:
+                continue
+            try:
+                ts_i = int(ts or 0)
+            except Exception:
+                continue
+            if ts_i <= 0:
+                continue
+            if u != cur_username:
+                cur_username = u
+                usernames.append(u)
+                cur_idx = len(usernames) - 1
+
+            bucket = ts_i // _LOCALTIME_BUCKET_SECONDS
+            loc = local_cache.get(bucket)
+            if loc is None:
+                tm = time.localtime(ts_i)
+                loc = (int(tm.tm_yday) - 1, int(tm.tm_hour))
+                local_cache[bucket] = loc
+
+            ts_col.append(ts_i)
+            conv_col.append(cur_idx)
+            out_col.append(1 if str(sender or "").strip() == my_username else 0)
+            try:
+                lt_col.append(int(lt or 0))
+            except Exception:
+                lt_col.append(0)
+            try:
+                chars_col.append(int(chars or 0))
+            except Exception:
+                chars_col.append(0)
+            doy_col.append(loc[0])
+            hour_col.append(loc[1])
+    finally:
+        conn.close()
+
+    return YearMessageFacts(
+        year=int(year),
+        my_username=my_username,
+        signature=signature,
+        has_text=with_text,
+        usernames=usernames,
+        **cols,
+    )
+
+
+def get_year_message_facts(*, account_dir: Path, year: int) -> Optional[YearMessageFacts]:
+    """Return the fact store for `account_dir`/`year`, building it from the search index if needed.
+
+    Returns None when the search index is missing or has no message table; callers then fall back to
+    their own scans. The store is invalidated whenever the index file changes.
+    """
+
+    index_path = get_chat_search_index_db_path(account_dir)
+    signature = _index_signature(index_path)
+    if signature is None:
+        return None
+
+    my_username = str(account_dir.name or "").strip()
+    key = (str(account_dir), int(year))
+    facts = _memo_get(key, signature)
+    if facts is not None:
+        return facts
+
+    with _get_lock(key):
+        facts = _memo_get(key, signature)
+        if facts is not None:
+            return facts
+
+        path = _facts_path(account_dir, int(year))
+        facts = _read_facts(path, signature=signature, my_username=my_username)
+        if facts is None:
+            t0 = time.time()
+            try:
+                facts = _build_facts(index_path=index_path, year=int(year), my_username=my_username, signature=signature)
+            except Exception:
+                logger.exception("Failed to build wrapped facts: account=%s year=%s", my_username, year)
+                facts = None
+            if facts is None:
+                return None
+            logger.info(
+                "Wrapped facts built: account=%s year=%s rows=%s conversations=%s elapsed=%.2fs",
+                my_username,
+                int(year),
+                len(facts),
+                len(facts.usernames),
+                time.time() - t0,
+            )
+            try:
+                _write_facts(path, facts)
+            except Exception:
+                logger.exception("Failed to write wrapped facts: %s", path)
+
+        _memo_put(key, facts)
+        return facts
@@ -4,13 +4,15 @@ import json
 import sqlite3
 import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 from ..chat_helpers import _decode_sqlite_text, _iter_message_db_paths, _quote_ident, _resolve_account_dir
-from ..chat_search_index import get_chat_search_index_db_path
+from ..chat_search_index import get_chat_search_index_db_path, get_chat_search_index_scan_source
 from ..logging_config import get_logger
+from .facts import _env_int
 from .storage import wrapped_cache_dir, wrapped_cache_path
 from .cards.card_00_global_overview import build_card_00_global_overview
 from .cards.card_01_cyber_schedule import WeekdayHourHeatmap, build_card_01_cyber_schedule, compute_weekday_hour_heatmap
@@ -93,6 +95,15 @@ _WRAPPED_CARD_MANIFEST: tuple[dict[str, Any], ...] = (
 )
 _WRAPPED_CARD_ID_SET = {int(c["id"]) for c in _WRAPPED_CARD_MANIFEST}
 
+# Build-order dependencies for the concurrent deck builder; cards not listed are independent.
+# `_HEATMAP_NODE` is the shared "sent messages" heatmap consumed by cards 0 and 1.
+_HEATMAP_NODE = -1
+_WRAPPED_CARD_DEPS: dict[int, tuple[int, ...]] = {
+    0: (_HEATMAP_NODE,),
+    1: (_HEATMAP_NODE,),
+    7: (0, 1, 2, 3, 4, 5),
+}
+
 
 # Prevent duplicated heavy computations when multiple card endpoints are hit concurrently.
 _LOCKS: dict[str, threading.Lock] = {}
@@ -193,19 +204,17 @@ def list_wrapped_available_years(*, account_dir: Path) -> list[int]:
     if index_path.exists():
         conn = sqlite3.connect(str(index_path))
         try:
-            has_fts = (
-                conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='message_fts' LIMIT 1").fetchone()
-                is not None
-            )
-            if has_fts:
+            source = get_chat_search_index_scan_source(conn)
+            if source is not None:
+                from_sql, index_ts_expr = source
                 sql = (
                     "SELECT "
                     "CAST(strftime('%Y', datetime(ts, 'unixepoch', 'localtime')) AS INTEGER) AS y, "
                     "COUNT(1) AS cnt "
                     "FROM ("
-                    f"  SELECT {ts_expr} AS ts"
-                    "  FROM message_fts"
-                    f"  WHERE {ts_expr} > 0"
+                    f"  SELECT {index_ts_expr} AS ts"
+                    f"  FROM {from_sql}"
+                    f"  WHERE {index_ts_expr} > 0"
                     "    AND db_stem NOT LIKE 'biz_message%'"
                     ") sub "
                     "GROUP BY y "
@@ -348,42 +357,22 @@ def build_wrapped_annual_response(
         except Exception:
             pass
 
-    cards: list[dict[str, Any]] = []
     # Wrapped cards default to "messages sent by me" (outgoing), to avoid mixing directions
-    # in first-person narratives like "你最常...".
-    heatmap_sent = _get_or_compute_heatmap_sent(account_dir=account_dir, scope=scope, year=y, refresh=refresh)
-    # Page 2: global overview (page 1 is the frontend cover slide).
-    card_overview = build_card_00_global_overview(account_dir=account_dir, year=y, heatmap=heatmap_sent)
-    cards.append(card_overview)
-    # Page 3: cyber schedule heatmap.
-    card_heatmap = build_card_01_cyber_schedule(account_dir=account_dir, year=y, heatmap=heatmap_sent)
-    cards.append(card_heatmap)
-    # Page 4: message char counts (sent vs received).
-    card_message_chars = build_card_02_message_chars(account_dir=account_dir, year=y)
-    cards.append(card_message_chars)
-    # Page 5: annual keywords (bubble storm -> word cloud).
-    cards.append(build_card_05_keywords_wordcloud(account_dir=account_dir, year=y))
-    # Page 6: reply speed / best chat buddy.
-    card_reply_speed = build_card_03_reply_speed(account_dir=account_dir, year=y)
-    cards.append(card_reply_speed)
-    # Page 7: monthly best friends wall (photo wall).
-    card_monthly = build_card_04_monthly_best_friends_wall(account_dir=account_dir, year=y)
-    cards.append(card_monthly)
-    # Page 8: annual emoji universe / meme almanac.
-    card_emoji = build_card_04_emoji_universe(account_dir=account_dir, year=y)
-    cards.append(card_emoji)
-    # Page 9: bento summary (prototype). Build from prior cards for consistency.
-    cards.append(
-        build_card_07_bento_summary_from_sources(
-            year=y,
-            overview=card_overview,
-            heatmap=card_heatmap,
-            message_chars=card_message_chars,
-            reply_speed=card_reply_speed,
-            monthly=card_monthly,
-            emoji=card_emoji,
-        )
-    )
+    # in first-person narratives like "你最常...". Independent cards are built concurrently; the
+    # bento summary (card 7) waits for the cards it summarises.
+    cards_by_id: dict[int, dict[str, Any]] = {}
+    for cid, card, err in _run_card_dag(
+        account_dir=account_dir,
+        scope=scope,
+        year=y,
+        card_ids=[int(c["id"]) for c in _WRAPPED_CARD_MANIFEST],
+        refresh=refresh,
+    ):
+        if err is not None:
+            raise err
+        cards_by_id[cid] = card
+    # Keep display order (page 1 is the frontend cover slide).
+    cards = [cards_by_id[int(c["id"])] for c in _WRAPPED_CARD_MANIFEST]
 
     obj: dict[str, Any] = {
         "account": account_dir.name,
@@ -526,32 +515,72 @@ def _get_or_compute_heatmap_sent(*, account_dir: Path, scope: str, year: int, re
         return heatmap
 
 
-def build_wrapped_annual_card(
+def _build_card_payload(
     *,
-    account: Optional[str],
-    year: Optional[int],
+    account_dir: Path,
+    scope: str,
+    year: int,
     card_id: int,
-    refresh: bool = False,
+    refresh: bool,
+    heatmap_sent: WeekdayHourHeatmap | None = None,
+    sources: dict[int, dict[str, Any]] | None = None,
 ) -> dict[str, Any]:
-    """Build one Wrapped card (page) on-demand.
+    """Compute one card without touching its cache file.
 
-    The result is cached per account/year/card_id to avoid recomputing when users
-    flip back and forth between pages.
+    `heatmap_sent` / `sources` let the scheduler hand over results it already has; when missing
+    they are loaded (or computed) through the usual cached helpers.
     """
 
     cid = int(card_id)
-    if cid not in _WRAPPED_CARD_ID_SET:
-        raise ValueError(f"Unknown Wrapped card id: {cid}")
-
-    account_dir = _resolve_account_dir(account)
+    y = int(year)
+    if cid in (0, 1) and heatmap_sent is None:
+        heatmap_sent = _get_or_compute_heatmap_sent(account_dir=account_dir, scope=scope, year=y, refresh=refresh)
+
+    if cid == 0:
+        return build_card_00_global_overview(account_dir=account_dir, year=y, heatmap=heatmap_sent)
+    if cid == 1:
+        return build_card_01_cyber_schedule(account_dir=account_dir, year=y, heatmap=heatmap_sent)
+    if cid == 2:
+        return build_card_02_message_chars(account_dir=account_dir, year=y)
+    if cid == 6:
+        return build_card_05_keywords_wordcloud(account_dir=account_dir, year=y)
+    if cid == 3:
+        return build_card_03_reply_speed(account_dir=account_dir, year=y)
+    if cid == 4:
+        return build_card_04_monthly_best_friends_wall(account_dir=account_dir, year=y)
+    if cid == 5:
+        return build_card_04_emoji_universe(account_dir=account_dir, year=y)
+    if cid == 7:
+        # Build from already-implemented cards so we can reuse their caches if available.
+        src = dict(sources or {})
+        for dep in _WRAPPED_CARD_DEPS[7]:
+            if dep not in src:
+                src[dep] = _get_or_build_card(account_dir=account_dir, scope=scope, year=y, card_id=dep, refresh=refresh)
+        return build_card_07_bento_summary_from_sources(
+            year=y,
+            overview=src[0],
+            heatmap=src[1],
+            message_chars=src[2],
+            reply_speed=src[3],
+            monthly=src[4],
+            emoji=src[5],
+        )
+    # Should be unreachable due to _WRAPPED_CARD_ID_SET check.
+    raise ValueError(f"Unknown Wrapped card id: {cid}")
 
-    available_years = list_wrapped_available_years(account_dir=account_dir)
-    y = int(year or _default_year())
-    if available_years and y not in available_years:
-        y = int(available_years[0])
 
-    scope = "global"
-    cache_path = _wrapped_card_cache_path(account_dir=account_dir, scope=scope, year=y, card_id=cid)
+def _get_or_build_card(
+    *,
+    account_dir: Path,
+    scope: str,
+    year: int,
+    card_id: int,
+    refresh: bool,
+    heatmap_sent: WeekdayHourHeatmap | None = None,
+    sources: dict[int, dict[str, Any]] | None = None,
+) -> dict[str, Any]:
+    cid = int(card_id)
+    cache_path = _wrapped_card_cache_path(account_dir=account_dir, scope=scope, year=year, card_id=cid)
     # Card#6 需要每次随机抽样，不使用按卡片缓存。
     cacheable = cid != 6
 
@@ -565,44 +594,15 @@ def build_wrapped_annual_card(
             except Exception:
                 pass
 
-        heatmap_sent: WeekdayHourHeatmap | None = None
-        if cid in (0, 1):
-            heatmap_sent = _get_or_compute_heatmap_sent(account_dir=account_dir, scope=scope, year=y, refresh=refresh)
-
-        if cid == 0:
-            card = build_card_00_global_overview(account_dir=account_dir, year=y, heatmap=heatmap_sent)
-        elif cid == 1:
-            card = build_card_01_cyber_schedule(account_dir=account_dir, year=y, heatmap=heatmap_sent)
-        elif cid == 2:
-            card = build_card_02_message_chars(account_dir=account_dir, year=y)
-        elif cid == 6:
-            card = build_card_05_keywords_wordcloud(account_dir=account_dir, year=y)
-        elif cid == 3:
-            card = build_card_03_reply_speed(account_dir=account_dir, year=y)
-        elif cid == 4:
-            card = build_card_04_monthly_best_friends_wall(account_dir=account_dir, year=y)
-        elif cid == 5:
-            card = build_card_04_emoji_universe(account_dir=account_dir, year=y)
-        elif cid == 7:
-            # Build from already-implemented cards so we can reuse their caches if available.
-            overview = build_wrapped_annual_card(account=account_dir.name, year=y, card_id=0, refresh=refresh)
-            heatmap = build_wrapped_annual_card(account=account_dir.name, year=y, card_id=1, refresh=refresh)
-            message_chars = build_wrapped_annual_card(account=account_dir.name, year=y, card_id=2, refresh=refresh)
-            reply_speed = build_wrapped_annual_card(account=account_dir.name, year=y, card_id=3, refresh=refresh)
-            monthly = build_wrapped_annual_card(account=account_dir.name, year=y, card_id=4, refresh=refresh)
-            emoji = build_wrapped_annual_card(account=account_dir.name, year=y, card_id=5, refresh=refresh)
-            card = build_card_07_bento_summary_from_sources(
-                year=y,
-                overview=overview,
-                heatmap=heatmap,
-                message_chars=message_chars,
-                reply_speed=reply_speed,
-                monthly=monthly,
-                emoji=emoji,
-            )
-        else:
-            # Should be unreachable due to _WRAPPED_CARD_ID_SET check.
-            raise ValueError(f"Unknown Wrapped card id: {cid}")
+        card = _build_card_payload(
+            account_dir=account_dir,
+            scope=scope,
+            year=year,
+            card_id=cid,
+            refresh=refresh,
+            heatmap_sent=heatmap_sent,
+            sources=sources,
+        )
 
         if cacheable:
             try:
@@ -611,3 +611,163 @@ def build_wrapped_annual_card(
                 logger.exception("Failed to write wrapped card cache: %s", cache_path)
 
         return card
+
+
+def build_wrapped_annual_card(
+    *,
+    account: Optional[str],
+    year: Optional[int],
+    card_id: int,
+    refresh: bool = False,
+) -> dict[str, Any]:
+    """Build one Wrapped card (page) on-demand.
+
+    The result is cached per account/year/card_id to avoid recomputing when users
+    flip back and forth between pages.
+    """
+
+    cid = int(card_id)
+    if cid not in _WRAPPED_CARD_ID_SET:
+        raise ValueError(f"Unknown Wrapped card id: {cid}")
+
+    account_dir = _resolve_account_dir(account)
+
+    available_years = list_wrapped_available_years(account_dir=account_dir)
+    y = int(year or _default_year())
+    if available_years and y not in available_years:
+        y = int(available_years[0])
+
+    return _get_or_build_card(account_dir=account_dir, scope="global", year=y, card_id=cid, refresh=refresh)
+
+
+def _wrapped_card_workers() -> int:
+    return _env_int("WECHAT_TOOL_WRAPPED_WORKERS", 4, min_v=1, max_v=16)
+
+
+def _card_dag_closure(card_ids: list[int]) -> list[int]:
+    out: list[int] = []
+    seen: set[int] = set()
+
+    def visit(cid: int) -> None:
+        if cid in seen:
+            return
+        seen.add(cid)
+        for dep in _WRAPPED_CARD_DEPS.get(cid, ()):
+            visit(dep)
+        out.append(cid)
+
+    for cid in card_ids:
+        visit(int(cid))
+    return out
+
+
+def _run_card_dag(
+    *,
+    account_dir: Path,
+    scope: str,
+    year: int,
+    card_ids: list[int],
+    refresh: bool,
+) -> Iterator[tuple[int, dict[str, Any] | None, BaseException | None]]:
+    """Build cards (plus their dependencies) concurrently; yield (card_id, card, error) as each finishes.
+
+    Nodes become runnable once all their dependencies succeeded; a failed dependency fails its
+    dependents without running them. Each card still goes through `_get_or_build_card`, so per-card
+    locks and cache files behave exactly like the lazy single-card endpoint.
+    """
+
+    nodes = _card_dag_closure(card_ids)
+    pending = list(nodes)
+    results: dict[int, Any] = {}
+    failed: set[int] = set()
+    running: dict[Future, int] = {}
+
+    def run_node(cid: int) -> Any:
+        if cid == _HEATMAP_NODE:
+            return _get_or_compute_heatmap_sent(account_dir=account_dir, scope=scope, year=year, refresh=refresh)
+        deps = _WRAPPED_CARD_DEPS.get(cid, ())
+        return _get_or_build_card(
+            account_dir=account_dir,
+            scope=scope,
+            year=year,
+            card_id=cid,
+            refresh=refresh,
+            heatmap_sent=results.get(_HEATMAP_NODE) if _HEATMAP_NODE in deps else None,
+            sources={d: results[d] for d in deps if d != _HEATMAP_NODE},
+        )
+
+    executor = ThreadPoolExecutor(max_workers=_wrapped_card_workers(), thread_name_prefix="wrapped-card")
+    try:
+        while pending or running:
+            for cid in list(pending):
+                deps = _WRAPPED_CARD_DEPS.get(cid, ())
+                if any(d in failed for d in deps):
+                    pending.remove(cid)
+                    failed.add(cid)
+                    if cid != _HEATMAP_NODE:
+                        yield cid, None, RuntimeError(f"Wrapped card {cid} skipped: a dependency failed.")
+                elif all(d in results for d in deps):
+                    pending.remove(cid)
+                    running[executor.submit(run_node, cid)] = cid
+
+            if not running:
+                if pending:
+                    raise RuntimeError(f"Unresolvable wrapped card dependencies: {sorted(pending)}")
+                break
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                cid = running.pop(fut)
+                err = fut.exception()
+                if err is not None:
+                    failed.add(cid)
+                    logger.error("Wrapped card build failed: account=%s year=%s card=%s err=%s", account_dir.name, year, cid, err)
+                    if cid != _HEATMAP_NODE:
+                        yield cid, None, err
+                    continue
+                results[cid] = fut.result()
+                if cid != _HEATMAP_NODE:
+                    yield cid, results[cid], None
+    finally:
+        # Consumer went away (e.g. SSE client disconnected): drop queued work, let running cards finish
+        # in the background so their caches still get written.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_wrapped_annual_cards(
+    *,
+    account: Optional[str],
+    year: Optional[int],
+    refresh: bool = False,
+) -> Iterator[dict[str, Any]]:
+    """Yield progress events while building the whole deck concurrently (used by the SSE endpoint).
+
+    Events: one `meta` event (same payload as `build_wrapped_annual_meta`), then a `card` (or `error`)
+    event per card in completion order, then `done`.
+    """
+
+    meta = build_wrapped_annual_meta(account=account, year=year)
+    yield {"type": "meta", **meta}
+
+    account_dir = _resolve_account_dir(account)
+    y = int(meta["year"])
+    t0 = time.time()
+    total = len(_WRAPPED_CARD_MANIFEST)
+    finished = 0
+    errors = 0
+    for cid, card, err in _run_card_dag(
+        account_dir=account_dir,
+        scope="global",
+        year=y,
+        card_ids=[int(c["id"]) for c in _WRAPPED_CARD_MANIFEST],
+        refresh=refresh,
+    ):
+        finished += 1
+        elapsed_ms = int((time.time() - t0) * 1000)
+        if err is not None:
+            errors += 1
+            yield {"type": "error", "id": cid, "message": str(err), "done": finished, "total": total, "elapsedMs": elapsed_ms}
+        else:
+            yield {"type": "card", "id": cid, "card": card, "done": finished, "total": total, "elapsedMs": elapsed_ms}
+
+    yield {"type": "done", "total": total, "errors": errors, "elapsedMs": int((time.time() - t0) * 1000)}
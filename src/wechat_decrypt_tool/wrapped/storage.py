@@ -31,3 +31,9 @@ def wrapped_cache_path(
     # add more cards later we don't accidentally serve a partial cache.
     suffix = f"_{options_tag}" if options_tag else ""
     return wrapped_cache_dir(account_dir) / f"{scope}_{year}_upto_{implemented_upto}{suffix}.json"
+
+
+def wrapped_facts_dir(account_dir: Path) -> Path:
+    d = wrapped_account_dir(account_dir) / "facts"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
@@ -1,8 +1,10 @@
 import os
 import sqlite3
 import sys
+import threading
 import unittest
 import importlib
+from unittest import mock
 from pathlib import Path
 from tempfile import TemporaryDirectory
 
@@ -167,6 +169,75 @@ class TestAvatarCacheChatMedia(unittest.TestCase):
                 else:
                     os.environ["WECHAT_TOOL_AVATAR_CACHE_ENABLED"] = prev_cache
 
+    def test_remote_avatar_download_runs_off_the_media_pool(self):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        png = bytes.fromhex(
+            "89504E470D0A1A0A"
+            "0000000D49484452000000010000000108060000001F15C489"
+            "0000000D49444154789C6360606060000000050001A5F64540"
+            "0000000049454E44AE426082"
+        )
+        fetch_threads: list[str] = []
+
+        class _Resp:
+            status_code = 200
+            headers = {"Content-Type": "image/png", "ETag": '"v1"'}
+
+            def raise_for_status(self):
+                return None
+
+            def iter_content(self, chunk_size=0):
+                yield png
+
+            def close(self):
+                return None
+
+        def fake_get(url, **kwargs):
+            fetch_threads.append(threading.current_thread().name)
+            return _Resp()
+
+        with TemporaryDirectory() as td:
+            root = Path(td)
+            account = "wxid_test"
+            username = "wxid_friend"
+            account_dir = root / "output" / "databases" / account
+            account_dir.mkdir(parents=True, exist_ok=True)
+
+            self._seed_contact_db(account_dir / "contact.db", username=username)
+            self._seed_session_db(account_dir / "session.db", username=username)
+            # head_image.db without a blob for this contact: only the remote URL can serve it.
+            self._seed_head_image_db(account_dir / "head_image.db", username="wxid_someone_else")
+
+            env = {"WECHAT_TOOL_DATA_DIR": str(root), "WECHAT_TOOL_AVATAR_CACHE_ENABLED": "1"}
+            with mock.patch.dict(os.environ, env):
+                import wechat_decrypt_tool.app_paths as app_paths
+                import wechat_decrypt_tool.chat_helpers as chat_helpers
+                import wechat_decrypt_tool.avatar_cache as avatar_cache
+                import wechat_decrypt_tool.routers.chat_media as chat_media
+
+                importlib.reload(app_paths)
+                importlib.reload(chat_helpers)
+                importlib.reload(avatar_cache)
+                importlib.reload(chat_media)
+
+                app = FastAPI()
+                app.include_router(chat_media.router)
+                client = TestClient(app)
+
+                with mock.patch.object(chat_media.http_client, "get", side_effect=fake_get):
+                    resp = client.get("/api/chat/avatar", params={"account": account, "username": username})
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(resp.content, png)
+                self.assertEqual(len(fetch_threads), 1)
+                self.assertTrue(fetch_threads[0].startswith("net-worker"), fetch_threads)
+
+                # Cached by URL now: the next request is served without touching the network.
+                with mock.patch.object(chat_media.http_client, "get", side_effect=AssertionError("refetched")):
+                    resp2 = client.get("/api/chat/avatar", params={"account": account, "username": username})
+                self.assertEqual(resp2.content, png)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,199 @@
+import hashlib
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+_SHARED_MD5 = "0123456789abcdef0123456789abcdef"
+_FRIENDS = [f"wxid_friend_{i}" for i in range(6)]
+
+
+class TestChatExportParallel(unittest.TestCase):
+    def _reload_export_modules(self):
+        import wechat_decrypt_tool.app_paths as app_paths
+        import wechat_decrypt_tool.chat_helpers as chat_helpers
+        import wechat_decrypt_tool.media_helpers as media_helpers
+        import wechat_decrypt_tool.chat_export_service as chat_export_service
+
+        importlib.reload(app_paths)
+        importlib.reload(chat_helpers)
+        importlib.reload(media_helpers)
+        importlib.reload(chat_export_service)
+        return chat_export_service
+
+    def _prepare_account(self, root: Path, *, account: str) -> Path:
+        account_dir = root / "output" / "databases" / account
+        account_dir.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(str(account_dir / "contact.db"))
+        try:
+            cols = "username TEXT, remark TEXT, nick_name TEXT, alias TEXT, local_type INTEGER, verify_flag INTEGER, big_head_url TEXT, small_head_url TEXT"
+            conn.execute(f"CREATE TABLE contact ({cols})")
+            conn.execute(f"CREATE TABLE stranger ({cols})")
+            for i, u in enumerate([account, *_FRIENDS]):
+                conn.execute("INSERT INTO contact VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (u, "", f"Name{i}", "", 1, 0, "", ""))
+            conn.commit()
+        finally:
+            conn.close()
+
+        conn = sqlite3.connect(str(account_dir / "session.db"))
+        try:
+            conn.execute("CREATE TABLE SessionTable (username TEXT, is_hidden INTEGER, sort_timestamp INTEGER)")
+            conn.executemany("INSERT INTO SessionTable VALUES (?, 0, ?)", [(u, 1735689600 + i) for i, u in enumerate(_FRIENDS)])
+            conn.commit()
+        finally:
+            conn.close()
+
+        conn = sqlite3.connect(str(account_dir / "message_0.db"))
+        try:
+            conn.execute("CREATE TABLE Name2Id (rowid INTEGER PRIMARY KEY, user_name TEXT)")
+            conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES (1, ?)", (account,))
+            for n, u in enumerate(_FRIENDS):
+                conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES (?, ?)", (n + 2, u))
+                table = f"msg_{hashlib.md5(u.encode('utf-8')).hexdigest()}"
+                conn.execute(
+                    f"CREATE TABLE {table} (local_id INTEGER, server_id INTEGER, local_type INTEGER, sort_seq INTEGER, "
+                    "real_sender_id INTEGER, create_time INTEGER, message_content TEXT, compress_content BLOB)"
+                )
+                rows = [(i, 1000 * n + i, 1, i, 2, 1735689600 + i, f"{u} MSG{i:03d}", None) for i in range(1, 41)]
+                rows.append((41, 1000 * n + 41, 3, 41, 2, 1735689641, f'<msg><img md5="{_SHARED_MD5}" /></msg>', None))
+                conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+        resource_dir = account_dir / "resource" / _SHARED_MD5[:2]
+        resource_dir.mkdir(parents=True, exist_ok=True)
+        (resource_dir / f"{_SHARED_MD5}.jpg").write_bytes(b"\xff\xd8\xff\xe0" + b"\x00" * 64 + b"\xff\xd9")
+        return account_dir
+
+    def _run_export(self, svc, *, account: str, export_format: str):
+        manager = svc.CHAT_EXPORT_MANAGER
+        job = manager.create_job(
+            account=account,
+            scope="selected",
+            usernames=list(_FRIENDS),
+            export_format=export_format,
+            start_time=None,
+            end_time=None,
+            include_hidden=False,
+            include_official=False,
+            include_media=True,
+            media_kinds=["image"],
+            message_types=[],
+            output_dir=None,
+            allow_process_key_extract=False,
+            download_remote_media=False,
+            html_page_size=0,
+            privacy_mode=False,
+            file_name=None,
+        )
+        seen_indexes: list[int] = []
+        for _ in range(600):
+            latest = manager.get_job(job.export_id)
+            if latest:
+                seen_indexes.append(latest.progress.current_conversation_index)
+            if latest and latest.status in {"done", "error", "cancelled"}:
+                # "Current conversation" follows the ordered writer, so it never moves backwards.
+                self.assertEqual(seen_indexes, sorted(seen_indexes))
+                return latest
+            time.sleep(0.01)
+        self.fail("export job did not finish in time")
+
+    def test_parallel_export_keeps_conversation_order(self):
+        with TemporaryDirectory() as td:
+            root = Path(td)
+            account = "wxid_test"
+            self._prepare_account(root, account=account)
+
+            prev_data = os.environ.get("WECHAT_TOOL_DATA_DIR")
+            prev_workers = os.environ.get("WECHAT_TOOL_EXPORT_WORKERS")
+            try:
+                os.environ["WECHAT_TOOL_DATA_DIR"] = str(root)
+                os.environ["WECHAT_TOOL_EXPORT_WORKERS"] = "3"
+                svc = self._reload_export_modules()
+
+                for export_format in ("json", "html"):
+                    job = self._run_export(svc, account=account, export_format=export_format)
+                    self.assertEqual(job.status, "done", msg=job.error)
+                    self.assertEqual(job.progress.conversations_done, len(_FRIENDS))
+                    self.assertEqual(job.progress.messages_exported, 41 * len(_FRIENDS))
+                    self.assertEqual(job.progress.current_conversation_index, len(_FRIENDS))
+                    self.assertEqual(job.progress.current_conversation_username, _FRIENDS[-1])
+                    self.assertEqual(job.progress.current_conversation_messages_exported, 41)
+
+                    with zipfile.ZipFile(job.zip_path, "r") as zf:
+                        names = zf.namelist()
+                        self.assertEqual(len(names), len(set(names)))
+                        self.assertEqual(names.count(f"media/images/{_SHARED_MD5}.jpg"), 1)
+
+                        conv_dirs = list(dict.fromkeys(n.split("/")[1] for n in names if n.startswith("conversations/")))
+                        self.assertEqual([d.split("_", 1)[0] for d in conv_dirs], [f"{i:04d}" for i in range(1, 7)])
+
+                        main_file = "messages.json" if export_format == "json" else "messages.html"
+                        for i, d in enumerate(conv_dirs):
+                            meta = json.loads(zf.read(f"conversations/{d}/meta.json"))
+                            self.assertEqual(meta["messageCount"], 41)
+                            body = zf.read(f"conversations/{d}/{main_file}").decode("utf-8")
+                            self.assertIn(f"{_FRIENDS[i]} MSG040", body)
+
+                    leftovers = [p for p in os.listdir(tempfile.gettempdir()) if job.export_id in p]
+                    self.assertEqual(leftovers, [])
+            finally:
+                logging.shutdown()
+                for key, prev in (("WECHAT_TOOL_DATA_DIR", prev_data), ("WECHAT_TOOL_EXPORT_WORKERS", prev_workers)):
+                    if prev is None:
+                        os.environ.pop(key, None)
+                    else:
+                        os.environ[key] = prev
+
+    def test_staged_zip_claims_names_and_keeps_temp_files(self):
+        from wechat_decrypt_tool import chat_export_service as svc
+
+        with TemporaryDirectory() as td:
+            root = Path(td)
+            claimed: set[str] = set()
+            lock = threading.Lock()
+            a = svc._StagedZip(root / "a", claimed=claimed, claim_lock=lock)
+            b = svc._StagedZip(root / "b", claimed=claimed, claim_lock=lock)
+
+            src = root / "shared.bin"
+            src.write_bytes(b"shared")
+            a.write(str(src), "media/shared.bin")
+            b.write(str(src), "media/shared.bin")
+            big = b"x" * (svc._STAGE_INLINE_MAX_BYTES + 1)
+            b.writestr("conversations/b/big.txt", big)
+
+            with tempfile.TemporaryDirectory(dir=svc._zip_tmp_dir(a)) as tmp:
+                rendered = Path(tmp) / "messages.json"
+                rendered.write_text("{}", encoding="utf-8")
+                a.write(str(rendered), "conversations/a/messages.json")
+
+            out = root / "out.zip"
+            with zipfile.ZipFile(out, "w") as zf:
+                for stage in (a, b):
+                    stage.replay_into(zf)
+                    stage.discard()
+            with zipfile.ZipFile(out) as zf:
+                self.assertEqual(zf.namelist(), ["media/shared.bin", "conversations/a/messages.json", "conversations/b/big.txt"])
+                self.assertEqual(zf.read("conversations/a/messages.json"), b"{}")
+                self.assertEqual(zf.read("conversations/b/big.txt"), big)
+            self.assertFalse((root / "a").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
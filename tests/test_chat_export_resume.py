@@ -0,0 +1,199 @@
+import hashlib
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+import unittest
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+_SHARED_MD5 = "0123456789abcdef0123456789abcdef"
+_FRIENDS = [f"wxid_friend_{i}" for i in range(6)]
+
+
+class TestChatExportResume(unittest.TestCase):
+    def _reload_export_modules(self):
+        import wechat_decrypt_tool.app_paths as app_paths
+        import wechat_decrypt_tool.chat_helpers as chat_helpers
+        import wechat_decrypt_tool.media_helpers as media_helpers
+        import wechat_decrypt_tool.chat_export_service as chat_export_service
+
+        importlib.reload(app_paths)
+        importlib.reload(chat_helpers)
+        importlib.reload(media_helpers)
+        importlib.reload(chat_export_service)
+        return chat_export_service
+
+    def _prepare_account(self, root: Path, *, account: str) -> Path:
+        account_dir = root / "output" / "databases" / account
+        account_dir.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(str(account_dir / "contact.db"))
+        try:
+            cols = "username TEXT, remark TEXT, nick_name TEXT, alias TEXT, local_type INTEGER, verify_flag INTEGER, big_head_url TEXT, small_head_url TEXT"
+            conn.execute(f"CREATE TABLE contact ({cols})")
+            conn.execute(f"CREATE TABLE stranger ({cols})")
+            for i, u in enumerate([account, *_FRIENDS]):
+                conn.execute("INSERT INTO contact VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (u, "", f"Name{i}", "", 1, 0, "", ""))
+            conn.commit()
+        finally:
+            conn.close()
+
+        conn = sqlite3.connect(str(account_dir / "session.db"))
+        try:
+            conn.execute("CREATE TABLE SessionTable (username TEXT, is_hidden INTEGER, sort_timestamp INTEGER)")
+            conn.executemany("INSERT INTO SessionTable VALUES (?, 0, ?)", [(u, 1735689600 + i) for i, u in enumerate(_FRIENDS)])
+            conn.commit()
+        finally:
+            conn.close()
+
+        conn = sqlite3.connect(str(account_dir / "message_0.db"))
+        try:
+            conn.execute("CREATE TABLE Name2Id (rowid INTEGER PRIMARY KEY, user_name TEXT)")
+            conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES (1, ?)", (account,))
+            for n, u in enumerate(_FRIENDS):
+                conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES (?, ?)", (n + 2, u))
+                table = f"msg_{hashlib.md5(u.encode('utf-8')).hexdigest()}"
+                conn.execute(
+                    f"CREATE TABLE {table} (local_id INTEGER, server_id INTEGER, local_type INTEGER, sort_seq INTEGER, "
+                    "real_sender_id INTEGER, create_time INTEGER, message_content TEXT, compress_content BLOB)"
+                )
+                rows = [(i, 1000 * n + i, 1, i, 2, 1735689600 + i, f"{u} MSG{i:03d}", None) for i in range(1, 41)]
+                rows.append((41, 1000 * n + 41, 3, 41, 2, 1735689641, f'<msg><img md5="{_SHARED_MD5}" /></msg>', None))
+                conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+        resource_dir = account_dir / "resource" / _SHARED_MD5[:2]
+        resource_dir.mkdir(parents=True, exist_ok=True)
+        (resource_dir / f"{_SHARED_MD5}.jpg").write_bytes(b"\xff\xd8\xff\xe0" + b"\x00" * 64 + b"\xff\xd9")
+        return account_dir
+
+    def _wait(self, manager, export_id: str):
+        for _ in range(600):
+            latest = manager.get_job(export_id)
+            if latest and latest.status in {"done", "error", "cancelled"}:
+                return latest
+            time.sleep(0.05)
+        self.fail("export job did not finish in time")
+
+    def test_interrupted_export_resumes_after_last_conversation(self):
+        with TemporaryDirectory() as td:
+            root = Path(td)
+            account = "wxid_test"
+            self._prepare_account(root, account=account)
+
+            prev_data = os.environ.get("WECHAT_TOOL_DATA_DIR")
+            prev_workers = os.environ.get("WECHAT_TOOL_EXPORT_WORKERS")
+            try:
+                os.environ["WECHAT_TOOL_DATA_DIR"] = str(root)
+                os.environ["WECHAT_TOOL_EXPORT_WORKERS"] = "2"
+                svc = self._reload_export_modules()
+                manager = svc.CHAT_EXPORT_MANAGER
+
+                replays = []
+                orig_replay = svc._StagedZip.replay_into
+
+                def failing_replay(stage, zf):
+                    replays.append(stage)
+                    if len(replays) == 4:
+                        raise OSError("disk went away")
+                    return orig_replay(stage, zf)
+
+                with patch.object(svc._StagedZip, "replay_into", failing_replay):
+                    first = manager.create_job(
+                        account=account,
+                        scope="selected",
+                        usernames=list(_FRIENDS),
+                        export_format="json",
+                        start_time=None,
+                        end_time=None,
+                        include_hidden=False,
+                        include_official=False,
+                        include_media=True,
+                        media_kinds=["image"],
+                        message_types=[],
+                        output_dir=None,
+                        allow_process_key_extract=False,
+                        download_remote_media=False,
+                        html_page_size=0,
+                        privacy_mode=False,
+                        file_name=None,
+                    )
+                    first = self._wait(manager, first.export_id)
+                self.assertEqual(first.status, "error")
+
+                resumable = manager.list_resumable_jobs()
+                self.assertEqual([r["exportId"] for r in resumable], [first.export_id])
+                self.assertEqual(resumable[0]["conversationsDone"], 3)
+                self.assertEqual(resumable[0]["conversationsTotal"], len(_FRIENDS))
+
+                rendered_after_resume = []
+                with patch.object(
+                    svc._StagedZip,
+                    "replay_into",
+                    lambda stage, zf: (rendered_after_resume.append(stage), orig_replay(stage, zf))[1],
+                ):
+                    job = manager.create_job(
+                        account=None,
+                        scope="selected",
+                        usernames=[],
+                        export_format="json",
+                        start_time=None,
+                        end_time=None,
+                        include_hidden=False,
+                        include_official=False,
+                        include_media=False,
+                        media_kinds=[],
+                        message_types=[],
+                        output_dir=None,
+                        allow_process_key_extract=False,
+                        download_remote_media=False,
+                        html_page_size=0,
+                        privacy_mode=False,
+                        file_name=None,
+                        resume_from=first.export_id,
+                    )
+                    job = self._wait(manager, job.export_id)
+                self.assertEqual(job.status, "done", msg=job.error)
+                self.assertEqual(len(rendered_after_resume), 3)
+                self.assertEqual(job.progress.conversations_done, len(_FRIENDS))
+                self.assertEqual(job.progress.messages_exported, 41 * len(_FRIENDS))
+
+                with zipfile.ZipFile(job.zip_path, "r") as zf:
+                    names = zf.namelist()
+                    self.assertEqual(len(names), len(set(names)))
+                    self.assertEqual(names.count(f"media/images/{_SHARED_MD5}.jpg"), 1)
+                    conv_dirs = list(dict.fromkeys(n.split("/")[1] for n in names if n.startswith("conversations/")))
+                    self.assertEqual([d.split("_", 1)[0] for d in conv_dirs], [f"{i:04d}" for i in range(1, 7)])
+                    for i, d in enumerate(conv_dirs):
+                        body = zf.read(f"conversations/{d}/messages.json").decode("utf-8")
+                        self.assertIn(f"{_FRIENDS[i]} MSG040", body)
+                    manifest = json.loads(zf.read("manifest.json"))
+                    self.assertTrue(manifest["options"]["includeMedia"])
+
+                self.assertEqual(manager.list_resumable_jobs(), [])
+                self.assertEqual(list((root / "output" / "export_jobs").glob("*.json")), [])
+                self.assertEqual(list(job.zip_path.parent.glob("*.part")), [])
+            finally:
+                logging.shutdown()
+                for key, prev in (("WECHAT_TOOL_DATA_DIR", prev_data), ("WECHAT_TOOL_EXPORT_WORKERS", prev_workers)):
+                    if prev is None:
+                        os.environ.pop(key, None)
+                    else:
+                        os.environ[key] = prev
+
+
+if __name__ == "__main__":
+    unittest.main()
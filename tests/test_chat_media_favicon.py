@@ -1,6 +1,7 @@
 import os
 import sqlite3
 import sys
+import threading
 import unittest
 import importlib
 from pathlib import Path
@@ -58,7 +59,10 @@ class TestChatMediaFavicon(unittest.TestCase):
                 importlib.reload(avatar_cache)
                 importlib.reload(chat_media)
 
+                fetch_threads: list[str] = []
+
                 def fake_head(url, **_kwargs):
+                    fetch_threads.append(threading.current_thread().name)
                     # Pretend short-link resolves to bilibili.
                     return _FakeResponse(
                         status_code=200,
@@ -68,6 +72,7 @@ class TestChatMediaFavicon(unittest.TestCase):
                     )
 
                 def fake_get(url, **_kwargs):
+                    fetch_threads.append(threading.current_thread().name)
                     u = str(url or "")
                     if "www.bilibili.com/favicon.ico" in u:
                         return _FakeResponse(
@@ -87,8 +92,8 @@ class TestChatMediaFavicon(unittest.TestCase):
                 app.include_router(chat_media.router)
                 client = TestClient(app)
 
-                with patch("wechat_decrypt_tool.routers.chat_media.requests.head", side_effect=fake_head) as mock_head, patch(
-                    "wechat_decrypt_tool.routers.chat_media.requests.get", side_effect=fake_get
+                with patch("wechat_decrypt_tool.routers.chat_media.http_client.head", side_effect=fake_head) as mock_head, patch(
+                    "wechat_decrypt_tool.routers.chat_media.http_client.get", side_effect=fake_get
                 ) as mock_get:
                     resp = client.get("/api/chat/media/favicon", params={"url": "https://b23.tv/au68guF"})
                     self.assertEqual(resp.status_code, 200)
@@ -102,6 +107,9 @@ class TestChatMediaFavicon(unittest.TestCase):
 
                     self.assertGreaterEqual(mock_head.call_count, 1)
                     self.assertEqual(mock_get.call_count, 1)
+                    # Remote round-trips run on the "net" pool, never on the event loop thread.
+                    self.assertTrue(fetch_threads)
+                    self.assertTrue(all(n.startswith("net-worker") for n in fetch_threads), fetch_threads)
 
                 cache_db = root / "output" / "avatar_cache" / "favicon" / "avatar_cache.db"
                 self.assertTrue(cache_db.exists())
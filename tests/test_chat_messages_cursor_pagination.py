@@ -0,0 +1,140 @@
+import hashlib
+import sqlite3
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from wechat_decrypt_tool.routers import chat as chat_router
+
+
+class _DummyRequest:
+    base_url = "http://testserver/"
+
+
+class TestChatMessagesCursorPagination(unittest.TestCase):
+    account = "wxid_me"
+    friend = "wxid_friend"
+
+    def _seed_shard(self, account_dir: Path, shard: str, rows: list[tuple[int, int, int, int, str]]) -> None:
+        table = f"Msg_{hashlib.md5(self.friend.encode('utf-8')).hexdigest()}"
+        conn = sqlite3.connect(str(account_dir / f"{shard}.db"))
+        try:
+            conn.execute("CREATE TABLE Name2Id (user_name TEXT)")
+            conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES(1, ?)", (self.account,))
+            conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES(2, ?)", (self.friend,))
+            conn.execute(
+                f"""
+                CREATE TABLE {table} (
+                    local_id INTEGER PRIMARY KEY,
+                    server_id INTEGER,
+                    local_type INTEGER,
+                    sort_seq INTEGER,
+                    real_sender_id INTEGER,
+                    create_time INTEGER,
+                    message_content TEXT,
+                    compress_content BLOB
+                )
+                """
+            )
+            conn.executemany(
+                f"INSERT INTO {table}"
+                "(local_id, server_id, local_type, sort_seq, real_sender_id, create_time, message_content, compress_content) "
+                "VALUES(?, 0, ?, ?, 2, ?, ?, NULL)",
+                rows,
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _seed(self, account_dir: Path) -> None:
+        base = 1_700_000_000
+        shard0 = []
+        shard1 = []
+        for i in range(1, 31):
+            local_type = 10000 if i % 4 == 0 else 1
+            text = f"msg {i}"
+            row = (i, local_type, (base + i) * 1000, base + i, text)
+            (shard0 if i % 3 else shard1).append(row)
+        # Same (create_time, sort_seq, local_id) in both shards: the shard name breaks the tie.
+        shard0.append((100, 1, 0, base + 15, "tie a"))
+        shard1.append((100, 1, 0, base + 15, "tie b"))
+        self._seed_shard(account_dir, "message_0", shard0)
+        self._seed_shard(account_dir, "message_1", shard1)
+
+    def _list(self, account_dir: Path, **kwargs) -> dict:
+        with (
+            patch.object(chat_router, "_resolve_account_dir", return_value=account_dir),
+            patch.object(chat_router.WCDB_REALTIME, "ensure_connected", side_effect=RuntimeError("offline")),
+            patch.object(chat_router, "_load_contact_rows", return_value={}),
+            patch.object(chat_router, "_query_head_image_usernames", return_value=set()),
+            patch.object(chat_router, "_load_group_nickname_map", return_value={}),
+        ):
+            return chat_router.list_chat_messages(
+                _DummyRequest(),
+                username=self.friend,
+                account=self.account,
+                order="desc",
+                **kwargs,
+            )
+
+    def _page_through(self, account_dir: Path, *, limit: int, render_types=None) -> list[str]:
+        ids: list[str] = []
+        cursor = ""
+        for _ in range(100):
+            resp = self._list(account_dir, limit=limit, cursor=cursor, render_types=render_types)
+            self.assertEqual(resp["status"], "success")
+            ids.extend(m["id"] for m in resp["messages"])
+            cursor = resp["nextCursor"]
+            self.assertEqual(bool(cursor), bool(resp["hasMore"]))
+            if not cursor:
+                return ids
+        self.fail("cursor pagination did not terminate")
+
+    def test_cursor_pages_match_offset_listing(self):
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+
+            full = [m["id"] for m in self._list(account_dir, limit=500)["messages"]]
+            self.assertEqual(len(full), 32)
+            for limit in (1, 4, 7, 32, 50):
+                self.assertEqual(self._page_through(account_dir, limit=limit), full, limit)
+
+            full_system = [m["id"] for m in self._list(account_dir, limit=500, render_types="system")["messages"]]
+            self.assertEqual(len(full_system), 7)
+            self.assertEqual(self._page_through(account_dir, limit=2, render_types="system"), full_system)
+
+    def test_cursor_page_reads_only_limit_rows_per_shard(self):
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+
+            first = self._list(account_dir, limit=5, cursor="")
+            takes: list[int] = []
+            real_collect = chat_router._collect_chat_messages
+
+            def spy(**kwargs):
+                takes.append(kwargs["take"])
+                return real_collect(**kwargs)
+
+            with patch.object(chat_router, "_collect_chat_messages", side_effect=spy):
+                second = self._list(account_dir, limit=5, cursor=first["nextCursor"])
+            self.assertEqual(takes, [5])
+            self.assertEqual(len(second["messages"]), 5)
+            self.assertLess(second["messages"][0]["createTime"], first["messages"][-1]["createTime"])
+
+            with self.assertRaises(chat_router.HTTPException):
+                self._list(account_dir, limit=5, cursor="not-a-cursor")
+
+
+if __name__ == "__main__":
+    unittest.main()
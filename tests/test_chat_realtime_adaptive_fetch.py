@@ -0,0 +1,125 @@
+import sys
+import threading
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from wechat_decrypt_tool.routers import chat as chat_router
+
+
+class _DummyRequest:
+    base_url = "http://testserver/"
+
+
+class _FakeWCDB:
+    """Stand-in for the realtime connection: newest-first rows served by (limit, offset)."""
+
+    def __init__(self, rows: list[dict]) -> None:
+        self.handle = 1
+        self.lock = threading.Lock()
+        self.rows = rows
+        self.calls: list[tuple[int, int]] = []
+
+    def get_messages(self, handle, username, *, limit=50, offset=0):
+        self.calls.append((int(limit), int(offset)))
+        return [dict(r) for r in self.rows[offset : offset + limit]]
+
+
+def _rows(n: int, *, image_every: int) -> list[dict]:
+    out = []
+    for i in range(n):
+        local_id = n - i
+        is_image = local_id % image_every == 0
+        out.append(
+            {
+                "localId": local_id,
+                "serverId": 10_000 + local_id,
+                "localType": 3 if is_image else 1,
+                "sortSeq": local_id,
+                "createTime": 1_700_000_000 + local_id,
+                "messageContent": f'<msg><img md5="{local_id:032x}" /></msg>' if is_image else f"hello {local_id}",
+                "senderUsername": "wxid_friend",
+            }
+        )
+    return out
+
+
+class TestChatRealtimeAdaptiveFetch(unittest.TestCase):
+    def _list(self, fake: _FakeWCDB, **kw):
+        parsed_rows: list[int] = []
+        orig_append = chat_router._append_full_messages_from_rows
+
+        def counting_append(**kwargs):
+            parsed_rows.append(len(kwargs["rows"]))
+            return orig_append(**kwargs)
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / "acc"
+            account_dir.mkdir(parents=True, exist_ok=True)
+            with (
+                patch.object(chat_router, "_resolve_account_dir", return_value=account_dir),
+                patch.object(chat_router.WCDB_REALTIME, "ensure_connected", return_value=fake),
+                patch.object(chat_router, "_wcdb_get_messages", side_effect=fake.get_messages),
+                patch.object(chat_router, "_append_full_messages_from_rows", side_effect=counting_append),
+                patch.object(chat_router, "_load_contact_rows", return_value={}),
+                patch.object(chat_router, "_query_head_image_usernames", return_value=set()),
+                patch.object(chat_router, "_wcdb_get_display_names", return_value={}),
+                patch.object(chat_router, "_wcdb_get_avatar_urls", return_value={}),
+                patch.object(chat_router, "_load_usernames_by_display_names", return_value={}),
+                patch.object(chat_router, "_load_group_nickname_map", return_value={}),
+            ):
+                resp = chat_router.list_chat_messages(
+                    _DummyRequest(),
+                    username="wxid_friend",
+                    account="acc",
+                    order="desc",
+                    source="realtime",
+                    **kw,
+                )
+        return resp, sum(parsed_rows)
+
+    def test_unfiltered_page_is_one_window(self):
+        fake = _FakeWCDB(_rows(500, image_every=10))
+        resp, _ = self._list(fake, limit=30, offset=0, render_types=None)
+        self.assertEqual(fake.calls, [(31, 0)])
+        self.assertEqual([m["localId"] for m in resp["messages"]], list(range(500, 470, -1)))
+        self.assertTrue(resp["hasMore"])
+
+    def test_filtered_scan_walks_each_row_once(self):
+        fake = _FakeWCDB(_rows(3000, image_every=25))
+        resp, parsed = self._list(fake, limit=40, offset=20, render_types="image")
+
+        ids = [m["localId"] for m in resp["messages"]]
+        self.assertEqual(ids, [3000 - 25 * i for i in range(20, 60)])
+        self.assertTrue(all(m["renderType"] == "image" for m in resp["messages"]))
+        self.assertTrue(resp["hasMore"])
+
+        # Windows are contiguous and never re-read from the top.
+        offsets = [off for _, off in fake.calls]
+        self.assertEqual(offsets[0], 0)
+        for (prev_take, prev_off), (_, off) in zip(fake.calls, fake.calls[1:]):
+            self.assertEqual(off, prev_off + prev_take)
+        self.assertLessEqual(sum(take for take, _ in fake.calls), 3000)
+        # Only image rows reached the full parser.
+        self.assertLessEqual(parsed, sum(take for take, _ in fake.calls) // 25 + 1)
+
+    def test_filtered_scan_reports_end_of_history(self):
+        fake = _FakeWCDB(_rows(400, image_every=50))
+        resp, _ = self._list(fake, limit=20, offset=0, render_types="image")
+        self.assertEqual([m["localId"] for m in resp["messages"]], [400 - 50 * i for i in range(8)])
+        self.assertFalse(resp["hasMore"])
+
+    def test_appmsg_render_types_are_not_prefiltered(self):
+        self.assertEqual(chat_router._local_types_for_render_types({"image", "video"}), frozenset({3, 43, 62}))
+        self.assertIsNone(chat_router._local_types_for_render_types({"image", "link"}))
+        self.assertIsNone(chat_router._local_types_for_render_types(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
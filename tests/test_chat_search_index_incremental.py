@@ -0,0 +1,323 @@
+import hashlib
+import os
+import sqlite3
+import unittest
+from unittest import mock
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import sys
+
+# Ensure "src/" is importable when running tests from repo root.
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+class TestChatSearchIndexIncremental(unittest.TestCase):
+    account = "wxid_me"
+    friend = "wxid_friend"
+
+    def _table_name(self) -> str:
+        return f"Msg_{hashlib.md5(self.friend.encode('utf-8')).hexdigest()}"
+
+    def _seed(self, account_dir: Path, shard: str = "message_0") -> None:
+        conn = sqlite3.connect(str(account_dir / "session.db"))
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS SessionTable (username TEXT PRIMARY KEY, is_hidden INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO SessionTable(username, is_hidden) VALUES(?, 0)", (self.friend,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        conn = sqlite3.connect(str(account_dir / f"{shard}.db"))
+        try:
+            conn.execute("CREATE TABLE Name2Id (user_name TEXT)")
+            conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES(1, ?)", (self.account,))
+            conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES(2, ?)", (self.friend,))
+            conn.execute(
+                f"""
+                CREATE TABLE {self._table_name()} (
+                    local_id INTEGER PRIMARY KEY,
+                    server_id INTEGER,
+                    local_type INTEGER,
+                    sort_seq INTEGER,
+                    real_sender_id INTEGER,
+                    create_time INTEGER,
+                    message_content TEXT,
+                    compress_content BLOB
+                )
+                """
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _insert_message(self, account_dir: Path, local_id: int, text: str, shard: str = "message_0") -> None:
+        conn = sqlite3.connect(str(account_dir / f"{shard}.db"))
+        try:
+            conn.execute(
+                f"INSERT INTO {self._table_name()}"
+                "(local_id, server_id, local_type, sort_seq, real_sender_id, create_time, message_content, compress_content) "
+                "VALUES(?, ?, 1, ?, 2, ?, ?, NULL)",
+                (local_id, 1000 + local_id, local_id * 1000, 1_700_000_000 + local_id, text),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _search_local_ids(self, account_dir: Path, token: str) -> list[int]:
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        conn = sqlite3.connect(str(csi.get_chat_search_index_db_path(account_dir)))
+        try:
+            where_sql, params = csi.build_chat_search_match(token, csi.get_chat_search_index_tokenizer(conn))
+            rows = conn.execute(
+                f"SELECT local_id FROM message_fts WHERE {where_sql} ORDER BY local_id",
+                params,
+            ).fetchall()
+            return [int(r[0]) for r in rows]
+        finally:
+            conn.close()
+
+    def _build(self, account_dir: Path) -> None:
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        csi._build_worker(account_dir, rebuild=True)
+        status = csi.get_chat_search_index_status(account_dir)
+        self.assertTrue(status["index"]["ready"], status)
+
+    def test_update_appends_messages_past_high_water_mark(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+            self._insert_message(account_dir, 1, "hello apple")
+            self._insert_message(account_dir, 2, "hello banana")
+            self._build(account_dir)
+
+            self.assertEqual(self._search_local_ids(account_dir, "hello"), [1, 2])
+            self.assertEqual(csi._read_meta(csi.get_chat_search_index_db_path(account_dir)).get(
+                csi._hwm_meta_key("message_0", self._table_name())
+            ), "2")
+
+            self._insert_message(account_dir, 3, "hello cherry")
+            out = csi.update_chat_search_index(account_dir, usernames=[self.friend])
+            self.assertEqual(out["status"], "success")
+            self.assertEqual(out["indexed"], 1)
+            self.assertEqual(self._search_local_ids(account_dir, "hello"), [1, 2, 3])
+
+            # Nothing new: no duplicate rows.
+            out = csi.update_chat_search_index(account_dir)
+            self.assertEqual(out["indexed"], 0)
+            self.assertEqual(self._search_local_ids(account_dir, "hello"), [1, 2, 3])
+
+            meta = csi._read_meta(csi.get_chat_search_index_db_path(account_dir))
+            self.assertEqual(meta.get("message_count"), "3")
+
+    def test_reindex_replaces_edited_and_drops_deleted_messages(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+            self._insert_message(account_dir, 1, "hello apple")
+            self._insert_message(account_dir, 2, "hello banana")
+            self._build(account_dir)
+
+            conn = sqlite3.connect(str(account_dir / "message_0.db"))
+            try:
+                conn.execute(f"UPDATE {self._table_name()} SET message_content = 'world kiwi' WHERE local_id = 1")
+                conn.execute(f"DELETE FROM {self._table_name()} WHERE local_id = 2")
+                conn.commit()
+            finally:
+                conn.close()
+
+            out = csi.reindex_chat_search_messages(
+                account_dir,
+                username=self.friend,
+                db_stem="message_0",
+                table_name=self._table_name().lower(),
+                local_ids=[1, 2],
+            )
+            self.assertEqual(out, {"status": "success", "deleted": 2, "inserted": 1})
+            self.assertEqual(self._search_local_ids(account_dir, "hello"), [])
+            self.assertEqual(self._search_local_ids(account_dir, "kiwi"), [1])
+
+    def test_parallel_build_matches_inline_build(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        def snapshot(account_dir: Path) -> list[tuple]:
+            conn = sqlite3.connect(str(csi.get_chat_search_index_db_path(account_dir)))
+            try:
+                fts = conn.execute(
+                    "SELECT db_stem, local_id, text FROM message_fts ORDER BY db_stem, local_id"
+                ).fetchall()
+                keys = conn.execute(
+                    "SELECT COUNT(*) FROM message_meta k JOIN message_fts f ON f.rowid = k.fts_rowid "
+                    "WHERE f.db_stem = k.db_stem AND f.local_id = k.local_id"
+                ).fetchone()[0]
+                hwms = conn.execute("SELECT key, value FROM meta WHERE key LIKE 'hwm:%' ORDER BY key").fetchall()
+                return [tuple(fts), keys, tuple(hwms)]
+            finally:
+                conn.close()
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            for shard in ("message_0", "message_1", "message_2"):
+                self._seed(account_dir, shard)
+                for i in range(1, 30):
+                    self._insert_message(account_dir, i, f"{shard} hello {i}", shard)
+
+            with mock.patch.dict(os.environ, {"WECHAT_TOOL_SEARCH_INDEX_WORKERS": "1"}):
+                self._build(account_dir)
+            inline = snapshot(account_dir)
+
+            with mock.patch.dict(os.environ, {"WECHAT_TOOL_SEARCH_INDEX_WORKERS": "3"}):
+                self._build(account_dir)
+            parallel = snapshot(account_dir)
+
+            self.assertEqual(len(inline[0]), 87)
+            self.assertEqual(inline[1], 87)
+            self.assertEqual(len(inline[2]), 3)
+            self.assertEqual(parallel, inline)
+
+    def test_large_conversation_is_split_into_bounded_tasks(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+            for i in range(1, 26):
+                self._insert_message(account_dir, i, f"hello {i}")
+
+            with mock.patch.object(csi, "_INDEX_TASK_ROWS", 10):
+                tasks = csi._plan_index_tasks(
+                    account_dir,
+                    [account_dir / "message_0.db"],
+                    {self.friend: {}},
+                    csi.TOKENIZER_CHAR,
+                )
+                windows = [c[3:] for t in tasks for c in t[2]]
+                self.assertEqual(windows, [(0, 10), (10, 20), (20, 0)])
+                for task in tasks:
+                    for _username, _table, _hwm, rows in csi._scan_index_task(*task):
+                        self.assertLessEqual(len(rows), 10)
+
+                with mock.patch.dict(os.environ, {"WECHAT_TOOL_SEARCH_INDEX_WORKERS": "1"}):
+                    self._build(account_dir)
+
+            self.assertEqual(self._search_local_ids(account_dir, "hello"), list(range(1, 26)))
+            self.assertEqual(csi._read_meta(csi.get_chat_search_index_db_path(account_dir)).get(
+                csi._hwm_meta_key("message_0", self._table_name())
+            ), "25")
+
+    def test_time_scans_use_message_meta_indexes(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+            self._insert_message(account_dir, 1, "hello apple")
+            self._insert_message(account_dir, 2, "hello banana")
+            self._build(account_dir)
+
+            conn = sqlite3.connect(str(csi.get_chat_search_index_db_path(account_dir)))
+            try:
+                from_sql, ts_expr = csi.get_chat_search_index_scan_source(conn)
+                self.assertEqual((from_sql, ts_expr), ("message_meta", "create_time"))
+                rows = conn.execute(
+                    f"SELECT local_id, {ts_expr}, sender_username FROM {from_sql} "
+                    f"WHERE {ts_expr} >= ? AND {ts_expr} < ? ORDER BY local_id",
+                    (1_700_000_002, 1_800_000_000),
+                ).fetchall()
+                self.assertEqual(rows, [(2, 1_700_000_002, self.friend)])
+
+                plan = " ".join(
+                    str(r[-1])
+                    for r in conn.execute(
+                        f"EXPLAIN QUERY PLAN SELECT COUNT(1) FROM {from_sql} "
+                        f"WHERE username = ? AND {ts_expr} >= ? AND {ts_expr} < ?",
+                        (self.friend, 0, 1),
+                    ).fetchall()
+                )
+                self.assertIn("idx_message_meta_user_time", plan)
+
+                text_from, _ = csi.get_chat_search_index_scan_source(conn, with_text=True)
+                texts = conn.execute(f'SELECT "text" FROM {text_from} WHERE local_id = 1').fetchall()
+                self.assertEqual(len(texts), 1)
+                self.assertIn("apple", texts[0][0])
+
+                # Legacy indexes without the side table still scan message_fts.
+                conn.execute("DROP TABLE message_meta")
+                self.assertEqual(csi.get_chat_search_index_scan_source(conn)[0], "message_fts")
+            finally:
+                conn.close()
+
+    def test_time_bounded_search_is_driven_by_meta_index(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+            for local_id in range(1, 6):
+                self._insert_message(account_dir, local_id, f"hello msg{local_id}")
+            self._build(account_dir)
+
+            conn = sqlite3.connect(str(csi.get_chat_search_index_db_path(account_dir)))
+            try:
+                match_sql, match_params = csi.build_chat_search_match("hello", csi.get_chat_search_index_tokenizer(conn))
+                hits_sql, count_sql, params = csi.build_chat_search_query(
+                    conn,
+                    match_sql,
+                    match_params,
+                    start_ts=1_700_000_002,
+                    end_ts=1_700_000_004,
+                    include_hidden=False,
+                    include_official=False,
+                )
+                self.assertEqual(conn.execute(count_sql, params).fetchone()[0], 3)
+                rows = conn.execute(hits_sql, params + [2, 0]).fetchall()
+                self.assertEqual([int(r[3]) for r in rows], [4, 3])
+
+                plan = " ".join(str(r[-1]) for r in conn.execute(f"EXPLAIN QUERY PLAN {hits_sql}", params + [2, 0]))
+                # message_meta is the outer loop (time range on its index); FTS is probed per rowid.
+                self.assertTrue(plan.startswith("SEARCH m USING INDEX idx_message_meta_time"), plan)
+
+                # Legacy indexes without the side table still filter message_fts directly.
+                conn.execute("DROP TABLE message_meta")
+                hits_sql, count_sql, params = csi.build_chat_search_query(
+                    conn, match_sql, match_params, start_ts=1_700_000_002, end_ts=1_700_000_004
+                )
+                self.assertEqual([int(r[3]) for r in conn.execute(hits_sql, params + [10, 0])], [4, 3, 2])
+            finally:
+                conn.close()
+
+    def test_update_is_skipped_for_index_without_high_water_marks(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+            self._insert_message(account_dir, 1, "hello apple")
+            self._build(account_dir)
+
+            conn = sqlite3.connect(str(csi.get_chat_search_index_db_path(account_dir)))
+            try:
+                conn.execute("UPDATE meta SET value = '1' WHERE key = 'schema_version'")
+                conn.commit()
+            finally:
+                conn.close()
+
+            self.assertFalse(csi.get_chat_search_index_status(account_dir)["index"]["ready"])
+            self.assertEqual(csi.update_chat_search_index(account_dir)["status"], "skipped")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import unittest
+from unittest import mock
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import sys
+
+# Ensure "src/" is importable when running tests from repo root.
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+_TEXTS = [
+    "今天晚上一起吃火锅吗",
+    "明天去公司开会",
+    "Hello World 你好世界",
+    "火锅店排队好久",
+    "[捂脸] 哈哈哈",
+]
+
+
+class TestChatSearchTokenizer(unittest.TestCase):
+    def _build_index(self, path: Path, tokenizer: str) -> sqlite3.Connection:
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        conn = sqlite3.connect(str(path))
+        conn.isolation_level = None
+        csi._init_index_db(conn, tokenizer)
+        rows = []
+        for i, text in enumerate(_TEXTS, start=1):
+            token_text = csi._to_index_token_text(text, tokenizer)
+            rows.append(
+                (
+                    token_text,
+                    "wxid_friend",
+                    "text",
+                    1_700_000_000 + i,
+                    i,
+                    i,
+                    0,
+                    1,
+                    "message_0",
+                    "Msg_x",
+                    "wxid_friend",
+                    0,
+                    0,
+                    csi._to_index_grams(token_text, tokenizer),
+                )
+            )
+        csi._insert_index_rows(conn, rows, 1)
+        return conn
+
+    def _search(self, conn: sqlite3.Connection, q: str) -> list[int]:
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        where_sql, params = csi.build_chat_search_match(q, csi.get_chat_search_index_tokenizer(conn))
+        self.assertTrue(where_sql)
+        rows = conn.execute(f"SELECT local_id FROM message_fts WHERE {where_sql} ORDER BY local_id", params)
+        return [int(r[0]) for r in rows.fetchall()]
+
+    def test_modes_return_identical_hits(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        modes = [csi.TOKENIZER_BIGRAM]
+        if csi._trigram_supported():
+            modes.append(csi.TOKENIZER_TRIGRAM)
+
+        queries = ["火锅", "吃火锅", "你好 world", "HELLO", "开", "吗", "捂脸", "哈哈哈", "不存在的词", "天 会"]
+        with TemporaryDirectory() as td:
+            conn_char = self._build_index(Path(td) / "char.db", csi.TOKENIZER_CHAR)
+            try:
+                expected = {q: self._search(conn_char, q) for q in queries}
+            finally:
+                conn_char.close()
+
+            self.assertEqual(expected["火锅"], [1, 4])
+            self.assertEqual(expected["你好 world"], [3])
+            self.assertEqual(expected["吗"], [1])
+            self.assertEqual(expected["天 会"], [2])
+
+            for mode in modes:
+                conn = self._build_index(Path(td) / f"{mode}.db", mode)
+                try:
+                    self.assertEqual(csi.get_chat_search_index_tokenizer(conn), mode)
+                    for q in queries:
+                        self.assertEqual(self._search(conn, q), expected[q], (mode, q))
+                finally:
+                    conn.close()
+
+    def test_bigram_mode_keeps_readable_text(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        token_text = csi._to_index_token_text("你好 [捂脸]", csi.TOKENIZER_BIGRAM)
+        self.assertEqual(token_text, "你好[捂脸]")
+        self.assertEqual(csi._to_index_grams(token_text, csi.TOKENIZER_BIGRAM), "你好 好 捂脸 脸")
+        self.assertEqual(csi._to_index_grams(token_text, csi.TOKENIZER_CHAR), "")
+        self.assertEqual(
+            csi.build_chat_search_match("你好世 捂", csi.TOKENIZER_BIGRAM),
+            ("message_fts MATCH ?", ['"你好 好世" AND "捂"*']),
+        )
+
+    def test_trigram_text_is_compact(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        self.assertEqual(csi._to_index_token_text(" Hello 你好 ", csi.TOKENIZER_TRIGRAM), "hello你好")
+        self.assertEqual(csi._to_index_token_text(" Hello 你好 ", csi.TOKENIZER_CHAR), "h e l l o 你 好")
+
+    def test_mode_selection_and_char_fallback(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        with mock.patch.dict(os.environ, {"WECHAT_TOOL_SEARCH_TOKENIZER": ""}):
+            self.assertEqual(csi.get_chat_search_tokenizer_mode(), csi.TOKENIZER_BIGRAM)
+        with mock.patch.object(csi, "_TRIGRAM_SUPPORTED", False), mock.patch.dict(
+            os.environ, {"WECHAT_TOOL_SEARCH_TOKENIZER": "trigram"}
+        ):
+            self.assertEqual(csi.get_chat_search_tokenizer_mode(), csi.TOKENIZER_CHAR)
+        with mock.patch.dict(os.environ, {"WECHAT_TOOL_SEARCH_TOKENIZER": "char"}):
+            self.assertEqual(csi.get_chat_search_tokenizer_mode(), csi.TOKENIZER_CHAR)
+
+    def test_tokenizer_change_marks_index_for_rebuild(self):
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        with TemporaryDirectory() as td:
+            path = Path(td) / "chat_search_index.db"
+            self._build_index(path, csi.TOKENIZER_CHAR).close()
+
+            with mock.patch.dict(os.environ, {"WECHAT_TOOL_SEARCH_TOKENIZER": "char"}):
+                self.assertTrue(csi._inspect_index(path)["ready"])
+            with mock.patch.dict(os.environ, {"WECHAT_TOOL_SEARCH_TOKENIZER": "bigram"}):
+                info = csi._inspect_index(path)
+                self.assertFalse(info["ready"])
+                self.assertEqual(info["tokenizer"], csi.TOKENIZER_CHAR)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -72,6 +72,8 @@ class TestDecryptStreamSSE(unittest.TestCase):
                 self.assertIn("start", types)
                 self.assertIn("progress", types)
                 self.assertEqual(events[-1].get("type"), "complete")
+                self.assertIn("key_cache", events[-1])
+                self.assertIn("hit_rate", events[-1]["key_cache"])
 
                 out = root / "output" / "databases" / "wxid_foo" / "MSG0.db"
                 self.assertTrue(out.exists())
@@ -86,6 +88,86 @@ class TestDecryptStreamSSE(unittest.TestCase):
                     os.environ["WECHAT_TOOL_BUILD_SESSION_LAST_MESSAGE"] = prev_build_cache
 
 
+    def test_decrypt_stream_runs_shards_concurrently_with_per_file_events(self):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        from wechat_decrypt_tool.wechat_decrypt import SQLITE_HEADER, order_shards_largest_first
+
+        with TemporaryDirectory() as td:
+            root = Path(td)
+
+            prev_data_dir = os.environ.get("WECHAT_TOOL_DATA_DIR")
+            prev_build_cache = os.environ.get("WECHAT_TOOL_BUILD_SESSION_LAST_MESSAGE")
+            try:
+                os.environ["WECHAT_TOOL_DATA_DIR"] = str(root)
+                os.environ["WECHAT_TOOL_BUILD_SESSION_LAST_MESSAGE"] = "0"
+
+                import wechat_decrypt_tool.app_paths as app_paths
+                import wechat_decrypt_tool.routers.decrypt as decrypt_router
+
+                importlib.reload(app_paths)
+                importlib.reload(decrypt_router)
+
+                db_storage = root / "xwechat_files" / "wxid_foo_bar" / "db_storage"
+                (db_storage / "message").mkdir(parents=True, exist_ok=True)
+                sizes = {"message_0.db": 2, "message_1.db": 8, "contact.db": 4}
+                for name, pages in sizes.items():
+                    (db_storage / "message" / name).write_bytes(
+                        SQLITE_HEADER + b"\x00" * (4096 * pages - len(SQLITE_HEADER))
+                    )
+
+                dbs = [{"path": str(db_storage / "message" / n), "name": n} for n in sizes]
+                self.assertEqual([dbs[i]["name"] for i in order_shards_largest_first(dbs)], ["message_1.db", "contact.db", "message_0.db"])
+
+                app = FastAPI()
+                app.include_router(decrypt_router.router)
+                client = TestClient(app)
+
+                events: list[dict] = []
+                with client.stream(
+                    "GET",
+                    "/api/decrypt_stream",
+                    params={"key": "00" * 32, "db_storage_path": str(db_storage), "workers": 3},
+                ) as resp:
+                    for line in resp.iter_lines():
+                        if isinstance(line, bytes):
+                            line = line.decode("utf-8", errors="ignore")
+                        if not str(line).startswith("data: "):
+                            continue
+                        payload = json.loads(str(line)[len("data: ") :])
+                        events.append(payload)
+                        if payload.get("type") in {"complete", "error"}:
+                            break
+
+                done = [e for e in events if e.get("type") == "progress" and e.get("status") == "success"]
+                self.assertEqual(sorted(e["current_file"].split("/")[-1] for e in done), sorted(sizes))
+                self.assertEqual([e["current"] for e in done], [1, 2, 3])
+                processing = [e for e in events if e.get("type") == "progress" and e.get("status") == "processing"]
+                self.assertEqual(len(processing), 3)
+                self.assertTrue(all("current" not in e for e in processing))
+
+                complete = events[-1]
+                self.assertEqual(complete.get("type"), "complete")
+                self.assertEqual(complete["success_count"], 3)
+                account = complete["account_results"]["wxid_foo"]
+                self.assertEqual(account["success"], 3)
+                scan_names = [Path(p).name for p in account["processed_files"]]
+                self.assertEqual(len(scan_names), 3)
+                for name, pages in sizes.items():
+                    out = root / "output" / "databases" / "wxid_foo" / name
+                    self.assertEqual(out.stat().st_size, 4096 * pages)
+            finally:
+                if prev_data_dir is None:
+                    os.environ.pop("WECHAT_TOOL_DATA_DIR", None)
+                else:
+                    os.environ["WECHAT_TOOL_DATA_DIR"] = prev_data_dir
+                if prev_build_cache is None:
+                    os.environ.pop("WECHAT_TOOL_BUILD_SESSION_LAST_MESSAGE", None)
+                else:
+                    os.environ["WECHAT_TOOL_BUILD_SESSION_LAST_MESSAGE"] = prev_build_cache
+
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -0,0 +1,95 @@
+import asyncio
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from wechat_decrypt_tool import executors
+
+
+class TestExecutors(unittest.TestCase):
+    def test_bounded_concurrency_results_and_errors(self):
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def work(i: int) -> int:
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.02)
+            with lock:
+                state["running"] -= 1
+            if i == 3:
+                raise ValueError("boom")
+            return i * 2
+
+        async def main():
+            return await asyncio.gather(
+                *[executors.run_blocking("test-bounded", work, i) for i in range(12)],
+                return_exceptions=True,
+            )
+
+        out = asyncio.run(main())
+        self.assertIsInstance(out[3], ValueError)
+        self.assertEqual([v for i, v in enumerate(out) if i != 3], [i * 2 for i in range(12) if i != 3])
+        self.assertEqual(state["peak"], 4)
+
+        stats = executors.get_executor_stats()["test-bounded"]
+        self.assertEqual((stats["completed"], stats["failed"], stats["queued"], stats["running"]), (11, 1, 0, 0))
+        self.assertEqual(stats["threads"], 4)
+        self.assertGreaterEqual(stats["maxQueued"], 8)
+        self.assertIn("db", executors.get_executor_stats())
+
+    def test_cancelled_while_queued_never_runs(self):
+        release = threading.Event()
+        ran: list[int] = []
+
+        def block() -> None:
+            release.wait(5)
+
+        def record(i: int) -> None:
+            ran.append(i)
+
+        async def main():
+            blockers = [asyncio.ensure_future(executors.run_blocking("test-cancel", block)) for _ in range(4)]
+            await asyncio.sleep(0.05)
+            queued = asyncio.ensure_future(executors.run_blocking("test-cancel", record, 1))
+            await asyncio.sleep(0.01)
+            queued.cancel()
+            await asyncio.sleep(0.01)
+            release.set()
+            await asyncio.gather(*blockers)
+            self.assertEqual(await executors.run_blocking("test-cancel", lambda: "after"), "after")
+
+        asyncio.run(main())
+        self.assertEqual(ran, [])
+        self.assertEqual(executors.get_executor_stats()["test-cancel"]["cancelled"], 1)
+
+    def test_sns_decode_is_not_queued_behind_busy_media_and_jobs(self):
+        release = threading.Event()
+        busy = {"media": executors._get_pool("media").max_workers, "jobs": executors._get_pool("jobs").max_workers}
+
+        async def main():
+            blockers = [
+                asyncio.ensure_future(executors.run_blocking(category, release.wait, 5))
+                for category, n in busy.items()
+                for _ in range(n)
+            ]
+            await asyncio.sleep(0.05)
+            try:
+                return await asyncio.wait_for(executors.run_blocking("sns", lambda: "decoded"), timeout=2)
+            finally:
+                release.set()
+                await asyncio.gather(*blockers)
+
+        self.assertEqual(asyncio.run(main()), "decoded")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import sys
+import unittest
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from wechat_decrypt_tool import export_zip
+
+
+_JPEG = b"\xff\xd8\xff\xe0" + os.urandom(20_000) + b"\xff\xd9"
+_MP4 = b"\x00\x00\x00\x18ftypmp42" + os.urandom(20_000)
+_SILK = b"\x02#!SILK_V3" + os.urandom(8_000)
+_HTML = "<div class='m'>hello</div>\n" * 2000
+
+
+class TestExportZip(unittest.TestCase):
+    def _build(self, td: Path, profile: str):
+        src = td / "clip.mp4"
+        src.write_bytes(_MP4)
+        noise = td / "blob.bin"
+        noise.write_bytes(os.urandom(32_000))
+        out = td / f"{profile}.zip"
+        with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as raw:
+            zf = export_zip.ExportZip(raw, profile=profile)
+            zf.writestr("media/images/a.jpg", _JPEG)
+            zf.writestr("media/voices/voice_1", _SILK)
+            zf.write(str(src), "media/videos/clip.mp4")
+            zf.write(str(noise), arcname="media/files/blob.bin")
+            zf.writestr("conversations/a/messages.html", _HTML)
+            zf.writestr("conversations/a/repeat.dat", b"abc" * 10_000)
+            stats = zf.stats()
+        with zipfile.ZipFile(out) as z:
+            types = {i.filename: i.compress_type for i in z.infolist()}
+            self.assertEqual(z.read("media/images/a.jpg"), _JPEG)
+        return types, stats
+
+    def test_auto_stores_media_and_deflates_text(self):
+        with TemporaryDirectory() as td:
+            types, stats = self._build(Path(td), "auto")
+        self.assertEqual(types["media/images/a.jpg"], zipfile.ZIP_STORED)
+        self.assertEqual(types["media/voices/voice_1"], zipfile.ZIP_STORED)  # sniffed: no extension
+        self.assertEqual(types["media/videos/clip.mp4"], zipfile.ZIP_STORED)
+        self.assertEqual(types["media/files/blob.bin"], zipfile.ZIP_STORED)  # probed as incompressible
+        self.assertEqual(types["conversations/a/messages.html"], zipfile.ZIP_DEFLATED)
+        self.assertEqual(types["conversations/a/repeat.dat"], zipfile.ZIP_DEFLATED)
+
+        self.assertEqual(stats["profile"], "auto")
+        self.assertEqual(set(stats["classes"]), {"image", "audio", "video", "other", "text"})
+        image = stats["classes"]["image"]
+        self.assertEqual((image["members"], image["bytesIn"], image["bytesOut"]), (1, len(_JPEG), len(_JPEG)))
+        self.assertLess(stats["classes"]["text"]["bytesOut"], stats["classes"]["text"]["bytesIn"] // 10)
+        self.assertEqual(stats["bytesIn"], sum(c["bytesIn"] for c in stats["classes"].values()))
+
+    def test_deflate_profile_keeps_old_behaviour(self):
+        with TemporaryDirectory() as td:
+            types, _ = self._build(Path(td), "deflate")
+        self.assertEqual(set(types.values()), {zipfile.ZIP_DEFLATED})
+
+    def test_fast_and_zstd_fallback(self):
+        with TemporaryDirectory() as td:
+            types, stats = self._build(Path(td), "fast")
+        self.assertEqual(types["media/files/blob.bin"], zipfile.ZIP_STORED)
+        self.assertEqual(types["conversations/a/repeat.dat"], zipfile.ZIP_STORED)
+        self.assertEqual(types["conversations/a/messages.html"], zipfile.ZIP_DEFLATED)
+
+        with TemporaryDirectory() as td, zipfile.ZipFile(Path(td) / "z.zip", "w") as raw:
+            if hasattr(zipfile, "ZIP_ZSTANDARD"):
+                self.assertEqual(export_zip.ExportZip(raw, profile="zstd").profile, "zstd")
+            else:
+                self.assertEqual(export_zip.ExportZip(raw, profile="zstd").profile, "fast")
+
+    def test_copy_entries_from_unfinished_part(self):
+        with TemporaryDirectory() as td:
+            td = Path(td)
+            part = td / "crashed.part"
+            raw = zipfile.ZipFile(part, "w", compression=zipfile.ZIP_DEFLATED)
+            zf = export_zip.ExportZip(raw, profile="auto")
+            zf.writestr("media/images/a.jpg", _JPEG)
+            zf.writestr("conversations/a/messages.html", _HTML)
+            zf.writestr("conversations/b/messages.html", "half written")
+            zf.flush()
+            snapshot = part.read_bytes()  # no central directory yet, as after a crash
+            raw.close()
+            part.write_bytes(snapshot)
+
+            out = td / "resumed.zip"
+            with zipfile.ZipFile(out, "w") as raw2:
+                resumed = export_zip.ExportZip(raw2, profile="auto")
+                self.assertEqual(
+                    resumed.copy_entries_from(part, 2), ["media/images/a.jpg", "conversations/a/messages.html"]
+                )
+                resumed.writestr("media/images/a.jpg", b"duplicate is ignored")
+                self.assertEqual(resumed.entry_count, 2)
+                self.assertIsNone(export_zip.ExportZip(raw2).copy_entries_from(part, 4))
+            with zipfile.ZipFile(out) as z:
+                self.assertIsNone(z.testzip())
+                self.assertEqual(z.read("media/images/a.jpg"), _JPEG)
+                self.assertEqual(z.read("conversations/a/messages.html").decode("utf-8"), _HTML)
+                self.assertEqual(z.getinfo("media/images/a.jpg").compress_type, zipfile.ZIP_STORED)
+
+    def test_copy_entries_from_accepts_zstd_members(self):
+        with TemporaryDirectory() as td:
+            td = Path(td)
+            part = td / "zstd.part"
+            with zipfile.ZipFile(part, "w", compression=zipfile.ZIP_STORED) as raw:
+                raw.writestr("conversations/a/messages.html", _HTML)
+            # Relabel the member as method 93, as a "zstd" profile writes it on Python 3.14+.
+            data = bytearray(part.read_bytes())
+            data[8:10] = (93).to_bytes(2, "little")
+            part.write_bytes(bytes(data))
+
+            class _Identity:
+                def decompress(self, raw: bytes) -> bytes:
+                    return raw
+
+            out = td / "resumed.zip"
+            with zipfile.ZipFile(out, "w") as raw2:
+                resumed = export_zip.ExportZip(raw2, profile="fast")
+                with patch.object(export_zip, "_ZIP_ZSTANDARD", None):
+                    self.assertIsNone(resumed.copy_entries_from(part, 1))
+                with patch.object(export_zip, "_ZIP_ZSTANDARD", 93), patch.object(
+                    export_zip, "_zstd_decompressor", _Identity
+                ):
+                    self.assertEqual(resumed.copy_entries_from(part, 1), ["conversations/a/messages.html"])
+            with zipfile.ZipFile(out) as z:
+                self.assertEqual(z.read("conversations/a/messages.html").decode("utf-8"), _HTML)
+
+    @unittest.skipUnless(hasattr(zipfile, "ZIP_ZSTANDARD"), "zipfile without ZIP_ZSTANDARD (Python < 3.14)")
+    def test_zstd_profile_part_can_be_resumed(self):
+        with TemporaryDirectory() as td:
+            td = Path(td)
+            part = td / "zstd.part"
+            with zipfile.ZipFile(part, "w") as raw:
+                zf = export_zip.ExportZip(raw, profile="zstd")
+                zf.writestr("conversations/a/messages.html", _HTML)
+            out = td / "resumed.zip"
+            with zipfile.ZipFile(out, "w") as raw2:
+                resumed = export_zip.ExportZip(raw2, profile="zstd")
+                self.assertEqual(resumed.copy_entries_from(part, 1), ["conversations/a/messages.html"])
+            with zipfile.ZipFile(out) as z:
+                self.assertEqual(z.read("conversations/a/messages.html").decode("utf-8"), _HTML)
+
+    def test_profile_defaults_from_env(self):
+        with patch.dict(os.environ, {"WECHAT_TOOL_EXPORT_ZIP_PROFILE": "deflate"}):
+            self.assertEqual(export_zip.default_zip_profile(), "deflate")
+        with patch.dict(os.environ, {"WECHAT_TOOL_EXPORT_ZIP_PROFILE": "bogus"}):
+            self.assertEqual(export_zip.default_zip_profile(), "auto")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import asyncio
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from wechat_decrypt_tool import http_client
+
+
+class _Server:
+    """Local stand-in for the CDN: records hits, peers and peak concurrency."""
+
+    def __init__(self, *, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.hits: list[str] = []
+        self.peers: set[tuple] = set()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with outer.lock:
+                    outer.hits.append(self.path)
+                    outer.peers.add(self.client_address)
+                    outer.active += 1
+                    outer.max_active = max(outer.max_active, outer.active)
+                try:
+                    time.sleep(outer.delay)
+                    body = (b"x" * 4096) if self.path.startswith("/big") else f"body:{self.path}".encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with outer.lock:
+                        outer.active -= 1
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self) -> "_Server":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        http_client.reset_http_client_stats()
+        patcher = patch.object(http_client, "_PER_HOST", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Fresh session so the pool picks up the patched per-host limit.
+        http_client._SESSION = None
+        self.addCleanup(setattr, http_client, "_SESSION", None)
+
+    def test_sync_keep_alive_and_coalescing(self):
+        with _Server(delay=0.2) as srv:
+            url = f"{srv.base}/thumb/a"
+            with ThreadPoolExecutor(max_workers=5) as pool:
+                results = list(pool.map(lambda _: http_client.fetch_bytes(url, max_bytes=1024), range(5)))
+            self.assertEqual({r.content for r in results}, {b"body:/thumb/a"})
+            self.assertEqual(srv.hits, ["/thumb/a"])
+
+            srv.delay = 0.0
+            for i in range(3):
+                with http_client.get(f"{srv.base}/seq/{i}") as r:
+                    self.assertEqual(r.status_code, 200)
+                    self.assertEqual(b"".join(r.iter_content()), f"body:/seq/{i}".encode())
+            # The coalesced download and the sequential requests all ride one kept-alive connection.
+            self.assertEqual(len(srv.peers), 1)
+
+        stats = http_client.get_http_client_stats()["hosts"]["127.0.0.1"]
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(stats["coalesced"], 4)
+        self.assertEqual(stats["inflight"], 0)
+        self.assertEqual(stats["status"], {"200": 4})
+        self.assertGreater(stats["avgTtfbMs"], 0)
+
+    def test_sync_per_host_limit_and_size_cap(self):
+        with _Server(delay=0.1) as srv:
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                list(pool.map(lambda i: http_client.fetch_bytes(f"{srv.base}/p/{i}"), range(6)))
+            self.assertEqual(len(srv.hits), 6)
+            self.assertLessEqual(srv.max_active, 2)
+
+            with self.assertRaises(http_client.ResponseTooLarge):
+                http_client.fetch_bytes(f"{srv.base}/big", max_bytes=1000)
+
+    def test_sync_slot_wait_is_bounded(self):
+        with _Server(delay=0.0) as srv:
+            held = [http_client.get(f"{srv.base}/held/{i}") for i in range(2)]
+            try:
+                started = time.perf_counter()
+                with self.assertRaises(http_client.requests.exceptions.ConnectTimeout):
+                    http_client.get(f"{srv.base}/blocked", timeout=(0.2, 5))
+                self.assertLess(time.perf_counter() - started, 2.0)
+                self.assertNotIn("/blocked", srv.hits)
+            finally:
+                for r in held:
+                    r.close()
+
+            # Closing the held responses frees their slots.
+            with http_client.get(f"{srv.base}/after", timeout=(0.2, 5)) as r:
+                self.assertEqual(r.status_code, 200)
+
+        stats = http_client.get_http_client_stats()["hosts"]["127.0.0.1"]
+        self.assertEqual(stats["inflight"], 0)
+
+    def test_async_client_limits_and_coalescing(self):
+        with _Server(delay=0.1) as srv:
+
+            async def main():
+                try:
+                    same = [http_client.async_fetch_bytes(f"{srv.base}/sns/same") for _ in range(4)]
+                    distinct = [http_client.async_fetch_bytes(f"{srv.base}/sns/{i}") for i in range(6)]
+                    results = await asyncio.gather(*same, *distinct)
+                    self.assertIs(http_client.async_client(), http_client.async_client())
+                    return results
+                finally:
+                    await http_client.aclose_async_client()
+
+            results = asyncio.run(main())
+            self.assertEqual([r.content for r in results[:4]], [b"body:/sns/same"] * 4)
+            self.assertEqual(sorted(srv.hits), sorted(["/sns/same", *[f"/sns/{i}" for i in range(6)]]))
+            self.assertLessEqual(srv.max_active, 2)
+            self.assertLessEqual(len(srv.peers), 2)
+
+        stats = http_client.get_http_client_stats()["hosts"]["127.0.0.1"]
+        self.assertEqual((stats["requests"], stats["coalesced"], stats["maxInflight"]), (7, 3, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import sys
+import threading
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from wechat_decrypt_tool import media_bulk_decrypt as mbd
+
+
+_XOR = 0x5A
+
+
+def _png(seed: int) -> bytes:
+    return b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + bytes([seed % 256]) * 512 + b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+
+def _write_dat(p: Path, plain: bytes) -> Path:
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_bytes(bytes(b ^ _XOR for b in plain))
+    return p
+
+
+class TestBulkDecrypt(unittest.TestCase):
+    def setUp(self):
+        self._td = TemporaryDirectory()
+        base = Path(self._td.name)
+        self.account_dir = base / "output" / "wxid_test"
+        self.account_dir.mkdir(parents=True)
+        self.wxid_dir = base / "xwechat_files" / "wxid_test_ab12"
+        img_dir = self.wxid_dir / "msg" / "attach" / hashlib.md5(b"friend").hexdigest() / "2024-01" / "Img"
+        self.md5s = [hashlib.md5(str(i).encode()).hexdigest() for i in range(6)]
+        self.srcs = [_write_dat(img_dir / f"{m}.dat", _png(i)) for i, m in enumerate(self.md5s)]
+        # A thumbnail variant of the first image: decrypting the original is enough.
+        self.thumb = _write_dat(img_dir / f"{self.md5s[0]}_t.dat", _png(99))
+        # Not a media name; ignored by the scan.
+        _write_dat(img_dir / "notes.dat", _png(1))
+
+    def tearDown(self):
+        self._td.cleanup()
+
+    def _run(self, **kw):
+        return mbd.run_bulk_decrypt(self.account_dir, self.wxid_dir, _XOR, None, workers=kw.pop("workers", 1), **kw)
+
+    def _out(self, md5: str) -> Path:
+        return self.account_dir / "resource" / md5[:2] / f"{md5}.png"
+
+    def test_decrypts_all_and_resumes_from_manifest(self):
+        events = []
+        res = self._run(on_progress=events.append)
+        self.assertEqual((res["total"], res["success_count"], res["skip_count"], res["fail_count"]), (7, 6, 1, 0))
+        self.assertFalse(res["cancelled"])
+        for i, md5 in enumerate(self.md5s):
+            self.assertEqual(self._out(md5).read_bytes(), _png(i))
+        self.assertTrue(events and events[-1]["scan_done"])
+        self.assertEqual(events[-1]["current"], 7)
+
+        again = self._run()
+        self.assertEqual((again["success_count"], again["skip_count"], again["manifest_skip"]), (0, 7, 7))
+
+        # A source that changed and lost its output is decrypted again.
+        self._out(self.md5s[2]).unlink()
+        st = self.srcs[2].stat()
+        os.utime(self.srcs[2], ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+        third = self._run()
+        self.assertEqual(third["success_count"], 1)
+        self.assertEqual(self._out(self.md5s[2]).read_bytes(), _png(2))
+
+    def test_failed_worker_task_counts_all_its_files(self):
+        events = []
+        with mock.patch.object(mbd, "_decrypt_task", side_effect=RuntimeError("worker died")):
+            res = self._run(on_progress=events.append)
+        self.assertEqual((res["total"], res["success_count"], res["fail_count"]), (7, 0, 7))
+        self.assertEqual(events[-1]["current"], events[-1]["total"])
+        self.assertIn("worker died", res["failed_files"][0]["error"])
+
+    def test_cancelled_run_reports_and_next_run_finishes(self):
+        cancel = threading.Event()
+        cancel.set()
+        res = self._run(cancel=cancel)
+        self.assertTrue(res["cancelled"])
+        self.assertEqual(res["success_count"], 0)
+
+        res = self._run()
+        self.assertFalse(res["cancelled"])
+        self.assertEqual(res["success_count"], 6)
+
+    def test_process_pool_matches_inline(self):
+        res = self._run(workers=2)
+        self.assertEqual((res["success_count"], res["skip_count"], res["fail_count"]), (6, 1, 0))
+        self.assertEqual(self._out(self.md5s[5]).read_bytes(), _png(5))
+
+    def test_one_active_job_per_account(self):
+        ev = mbd.begin_bulk_decrypt("wxid_test")
+        try:
+            self.assertIsNotNone(ev)
+            self.assertIsNone(mbd.begin_bulk_decrypt("wxid_test"))
+            self.assertTrue(mbd.cancel_bulk_decrypt("wxid_test"))
+            self.assertTrue(ev.is_set())
+        finally:
+            mbd.end_bulk_decrypt("wxid_test", ev)
+        self.assertFalse(mbd.cancel_bulk_decrypt("wxid_test"))
+
+
+if __name__ == "__main__":
+    unittest.main()
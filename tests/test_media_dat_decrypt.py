@@ -0,0 +1,69 @@
+import os
+import struct
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from Crypto.Cipher import AES
+from Crypto.Util import Padding
+
+from wechat_decrypt_tool import media_helpers as mh
+
+
+_AES_KEY = b"cfcd208495d565ef"
+_PNG = b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + os.urandom(4096) + b"IEND\xaeB`\x82"
+
+
+def _make_v4(plain: bytes, *, aes_size: int, xor_size: int, xor_key: int) -> bytes:
+    head, tail = plain[:aes_size], plain[aes_size:]
+    enc = AES.new(_AES_KEY, AES.MODE_ECB).encrypt(Padding.pad(head, AES.block_size))
+    body = tail[: len(tail) - xor_size] + bytes(b ^ xor_key for b in tail[len(tail) - xor_size :])
+    return struct.pack("<6sLLx", b"\x07\x08V1\x08\x07", aes_size, xor_size) + enc + body
+
+
+class TestDatDecrypt(unittest.TestCase):
+    def test_xor_matches_bytewise_loop(self):
+        data = os.urandom(10_000)
+        for key in (0, 1, 0x5A, 0xFF):
+            self.assertEqual(mh._decrypt_wechat_dat_v3(data, key), bytes(b ^ key for b in data))
+        self.assertEqual(mh._xor_bytes(memoryview(data)[10:20], 7), bytes(b ^ 7 for b in data[10:20]))
+
+    def test_v4_roundtrip_bytes_and_memoryview(self):
+        for xor_size in (0, 100, len(_PNG) - 1024):
+            blob = _make_v4(_PNG, aes_size=1024, xor_size=xor_size, xor_key=0x37)
+            self.assertEqual(mh._decrypt_wechat_dat_v4(blob, 0x37, _AES_KEY), _PNG)
+            self.assertEqual(mh._decrypt_wechat_dat_v4(memoryview(blob), 0x37, _AES_KEY), _PNG)
+
+    def test_magic_guess_recovers_key(self):
+        with patch.object(mh, "_is_probably_valid_image", return_value=True):
+            dec, mt = mh._try_xor_decrypt_by_magic(bytes(b ^ 0x9C for b in _PNG))
+            self.assertEqual((dec, mt), (_PNG, "image/png"))
+            self.assertEqual(mh._try_xor_decrypt_by_magic(memoryview(bytes(b ^ 0x9C for b in _PNG)))[0], _PNG)
+
+    def test_save_resource_from_memory_mapped_file(self):
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / "wxid_a"
+            account_dir.mkdir()
+            dat = Path(td) / "big.dat"
+            dat.write_bytes(_make_v4(_PNG, aes_size=1024, xor_size=200, xor_key=0x11))
+
+            with patch.object(mh, "_MMAP_MIN_BYTES", 1), patch.object(
+                mh, "_is_probably_valid_image", return_value=True
+            ):
+                ok, out = mh._decrypt_and_save_resource(dat, "a" * 32, account_dir, 0x11, None)
+
+            self.assertTrue(ok, out)
+            self.assertEqual(Path(out).read_bytes(), _PNG)
+            # The map is closed again: the source can be removed / replaced right away.
+            dat.unlink()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import sys
+import time
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from wechat_decrypt_tool import media_helpers, media_locator
+
+
+def _touch(p: Path, data: bytes = b"x") -> Path:
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_bytes(data)
+    return p
+
+
+def _bump_mtime(d: Path) -> None:
+    st = d.stat()
+    os.utime(d, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+
+
+class TestMediaLocator(unittest.TestCase):
+    def setUp(self):
+        self._td = TemporaryDirectory()
+        self.base = Path(self._td.name)
+        self._prev_data = os.environ.get("WECHAT_TOOL_DATA_DIR")
+        os.environ["WECHAT_TOOL_DATA_DIR"] = str(self.base / "data")
+        self.wxid_dir = self.base / "xwechat_files" / "wxid_test_ab12"
+        self.md5 = "0123456789abcdef0123456789abcdef"
+        self.img_dir = self.wxid_dir / "msg" / "attach" / hashlib.md5(b"wxid_friend").hexdigest() / "2024-01" / "Img"
+        _touch(self.img_dir / f"{self.md5}_t.dat")
+        _touch(self.img_dir / f"{self.md5}_h.dat")
+        _touch(self.wxid_dir / "msg" / "file" / "2024-01" / "report.pdf", b"pdf-bytes")
+        media_locator._STATES.clear()
+
+    def tearDown(self):
+        media_locator._STATES.clear()
+        if self._prev_data is None:
+            os.environ.pop("WECHAT_TOOL_DATA_DIR", None)
+        else:
+            os.environ["WECHAT_TOOL_DATA_DIR"] = self._prev_data
+        self._td.cleanup()
+
+    def _locate(self, dirs, patterns, key, limit=1):
+        return media_locator.locate_media_files(self.wxid_dir, dirs, patterns, key=key, limit=limit)
+
+    def test_build_and_pattern_order(self):
+        out = media_locator.build_media_locator(self.wxid_dir)
+        self.assertEqual(out["files"], 3)
+
+        attach = self.wxid_dir / "msg" / "attach"
+        hits = self._locate([attach], [f"{self.md5}_h.dat", f"{self.md5}_t.dat"], self.md5, limit=5)
+        self.assertEqual([p.name for p in hits], [f"{self.md5}_h.dat", f"{self.md5}_t.dat"])
+
+        hits = self._locate([self.wxid_dir / "msg" / "file"], ["report.pdf"], "report.pdf")
+        self.assertEqual(hits, [self.wxid_dir / "msg" / "file" / "2024-01" / "report.pdf"])
+
+        # Substring patterns, and directories outside the indexed trees are left to the caller.
+        self.assertEqual(len(self._locate([attach], [f"*{self.md5[4:]}*"], self.md5[4:], limit=5)), 2)
+        self.assertIsNone(self._locate([self.wxid_dir / "db_storage"], ["x"], "x"))
+
+    def test_md5_substring_lookup_uses_token_index(self):
+        emoji_dir = self.wxid_dir / "msg" / "emoji" / "ab"
+        _touch(emoji_dir / f"emoji_{self.md5}_big.gif")
+        _touch(emoji_dir / f"{self.md5}.gif")
+        _touch(emoji_dir / "ffffffff0123456789abcdef0123456789abcdef.bin")
+        media_locator.build_media_locator(self.wxid_dir)
+
+        hits = self._locate([self.wxid_dir / "msg" / "emoji"], [f"*{self.md5}*"], self.md5, limit=5)
+        self.assertEqual(sorted(p.name for p in hits), sorted([f"emoji_{self.md5}_big.gif", f"{self.md5}.gif"]))
+
+        state = media_locator._get_state(self.wxid_dir)
+        conn = media_locator.sqlite3.connect(str(state.db_path))
+        try:
+            plan = " ".join(
+                str(r[-1]) for r in conn.execute("EXPLAIN QUERY PLAN SELECT name FROM files WHERE token = ?", (self.md5,))
+            )
+        finally:
+            conn.close()
+        self.assertIn("idx_files_token", plan)
+
+    def test_incremental_refresh_by_directory_mtime(self):
+        media_locator.build_media_locator(self.wxid_dir)
+        month = self.wxid_dir / "msg" / "file" / "2024-02"
+        _touch(month / "later.zip")
+        (self.img_dir / f"{self.md5}_t.dat").unlink()
+        _bump_mtime(self.img_dir)
+
+        out = media_locator.build_media_locator(self.wxid_dir)
+        # msg/file (new month dir) + the month dir itself + the Img dir.
+        self.assertEqual(out["rescannedDirs"], 3)
+        self.assertEqual(len(self._locate([self.wxid_dir / "msg" / "file"], ["later.zip"], "later.zip")), 1)
+        hits = self._locate([self.wxid_dir / "msg" / "attach"], [f"{self.md5}*"], self.md5, limit=5)
+        self.assertEqual([p.name for p in hits], [f"{self.md5}_h.dat"])
+
+    def test_miss_triggers_throttled_refresh(self):
+        media_locator.build_media_locator(self.wxid_dir)
+        fid = "3057020100044b30490201000204a1b2c3d4"
+        _touch(self.wxid_dir / "cache" / "2024-01" / "Message" / f"{fid}_t.dat")
+
+        with patch.object(media_locator, "_REFRESH_INTERVAL_SEC", 3600):
+            self.assertEqual(self._locate([self.wxid_dir / "cache"], [f"{fid}_t.dat"], fid), [])
+        with patch.object(media_locator, "_REFRESH_INTERVAL_SEC", 0):
+            hits = self._locate([self.wxid_dir / "cache"], [f"{fid}_t.dat"], fid)
+        self.assertEqual([p.name for p in hits], [f"{fid}_t.dat"])
+
+    def test_not_ready_falls_back(self):
+        with patch.object(media_locator, "_run_in_background", lambda state, fn: None):
+            self.assertIsNone(self._locate([self.wxid_dir / "msg" / "attach"], [f"{self.md5}*"], self.md5))
+
+    def test_fallback_search_uses_index_instead_of_rglob(self):
+        media_locator.build_media_locator(self.wxid_dir)
+        search = media_helpers._fallback_search_media_by_md5.__wrapped__
+        with patch.object(Path, "rglob", side_effect=AssertionError("rglob should not run")):
+            hit = search(str(self.wxid_dir), self.md5, "image")
+            miss = search(str(self.wxid_dir), "f" * 32, "image")
+        self.assertEqual(Path(hit).name, f"{self.md5}_h.dat")
+        self.assertIsNone(miss)
+
+
+if __name__ == "__main__":
+    unittest.main()
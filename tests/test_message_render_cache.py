@@ -0,0 +1,124 @@
+import hashlib
+import sqlite3
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from wechat_decrypt_tool.message_render_cache import RENDERED_MESSAGE_CACHE
+from wechat_decrypt_tool.routers import chat as chat_router
+
+
+class _DummyRequest:
+    base_url = "http://testserver/"
+
+
+class TestMessageRenderCache(unittest.TestCase):
+    account = "wxid_me"
+    friend = "wxid_friend"
+
+    @property
+    def table(self) -> str:
+        return f"Msg_{hashlib.md5(self.friend.encode('utf-8')).hexdigest()}"
+
+    def setUp(self):
+        RENDERED_MESSAGE_CACHE.invalidate_account()
+
+    def _seed(self, account_dir: Path) -> None:
+        conn = sqlite3.connect(str(account_dir / "message_0.db"))
+        try:
+            conn.execute("CREATE TABLE Name2Id (user_name TEXT)")
+            conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES(1, ?)", (self.account,))
+            conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES(2, ?)", (self.friend,))
+            conn.execute(
+                f"""
+                CREATE TABLE {self.table} (
+                    local_id INTEGER PRIMARY KEY,
+                    server_id INTEGER,
+                    local_type INTEGER,
+                    sort_seq INTEGER,
+                    real_sender_id INTEGER,
+                    create_time INTEGER,
+                    message_content TEXT,
+                    compress_content BLOB
+                )
+                """
+            )
+            conn.executemany(
+                f"INSERT INTO {self.table}"
+                "(local_id, server_id, local_type, sort_seq, real_sender_id, create_time, message_content, compress_content) "
+                "VALUES(?, 0, 1, ?, ?, ?, ?, NULL)",
+                [(i, i * 1000, 1 if i % 2 else 2, 1_700_000_000 + i, f"msg {i}") for i in range(1, 11)],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _update(self, account_dir: Path, local_id: int, text: str) -> None:
+        conn = sqlite3.connect(str(account_dir / "message_0.db"))
+        try:
+            conn.execute(f"UPDATE {self.table} SET message_content = ? WHERE local_id = ?", (text, local_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _list(self, account_dir: Path) -> dict:
+        with (
+            patch.object(chat_router, "_resolve_account_dir", return_value=account_dir),
+            patch.object(chat_router.WCDB_REALTIME, "ensure_connected", side_effect=RuntimeError("offline")),
+            patch.object(chat_router, "_load_contact_rows", return_value={}),
+            patch.object(chat_router, "_query_head_image_usernames", return_value=set()),
+            patch.object(chat_router, "_load_group_nickname_map", return_value={}),
+        ):
+            return chat_router.list_chat_messages(
+                _DummyRequest(),
+                username=self.friend,
+                account=self.account,
+                limit=50,
+                order="asc",
+            )
+
+    def test_repeat_listing_skips_parsing(self):
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+
+            first = self._list(account_dir)
+            with patch.object(chat_router, "_decode_message_content", side_effect=AssertionError("parsed again")):
+                second = self._list(account_dir)
+            self.assertEqual(first["messages"], second["messages"])
+            self.assertEqual(len(second["messages"]), 10)
+            # Post-processing decorates the returned dicts, never the cached copies.
+            self.assertIn("senderAvatar", second["messages"][0])
+            self.assertGreaterEqual(RENDERED_MESSAGE_CACHE.stats()["hits"], 10)
+
+    def test_rewritten_rows_are_parsed_again(self):
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+            self._list(account_dir)
+
+            # Edited through the app: the table version is bumped.
+            self._update(account_dir, 3, "edited 3")
+            chat_router._note_message_table_write(
+                account_dir, db_path=account_dir / "message_0.db", table_name=self.table
+            )
+            # Changed behind our back (same length as before): the row fingerprint no longer matches.
+            self._update(account_dir, 5, "MSG 5")
+
+            by_id = {m["localId"]: m["content"] for m in self._list(account_dir)["messages"]}
+            self.assertEqual(by_id[3], "edited 3")
+            self.assertEqual(by_id[5], "MSG 5")
+            self.assertEqual(by_id[4], "msg 4")
+
+
+if __name__ == "__main__":
+    unittest.main()
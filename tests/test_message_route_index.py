@@ -0,0 +1,182 @@
+import hashlib
+import os
+import sqlite3
+import unittest
+from unittest import mock
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import sys
+
+# Ensure "src/" is importable when running tests from repo root.
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+def _md5(s: str) -> str:
+    return hashlib.md5(s.encode("utf-8")).hexdigest()
+
+
+class TestMessageRouteIndex(unittest.TestCase):
+    def _create_table(self, db_path: Path, table_name: str, create_times: list[int]) -> None:
+        conn = sqlite3.connect(str(db_path))
+        try:
+            conn.execute(f'CREATE TABLE "{table_name}" (local_id INTEGER PRIMARY KEY, create_time INTEGER)')
+            conn.executemany(f'INSERT INTO "{table_name}"(create_time) VALUES(?)', [(t,) for t in create_times])
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _bump_mtime(self, db_path: Path) -> None:
+        st = db_path.stat()
+        os.utime(db_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    def _seed(self, account_dir: Path) -> None:
+        self._create_table(account_dir / "message_0.db", f"Msg_{_md5('wxid_a')}", [100, 200])
+        self._create_table(account_dir / "message_0.db", "Name2Id", [])
+        self._create_table(account_dir / "message_1.db", f"Msg_{_md5('wxid_a')}", [300])
+        self._create_table(account_dir / "message_1.db", f"Chat_{_md5('wxid_b')}", [50, 60, 70])
+        self._create_table(account_dir / "biz_message_0.db", f"Msg_{_md5('gh_x')}", [1])
+
+    def test_routes_and_invalidation(self):
+        from wechat_decrypt_tool import message_route_index as mri
+        from wechat_decrypt_tool.chat_helpers import _iter_message_db_paths
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / "wxid_me"
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+
+            out = mri.build_message_route_index(account_dir)
+            self.assertEqual(out["status"], "success")
+            self.assertEqual(out["rescanned"], 3)
+            self.assertEqual(out["conversations"], 3)
+            # The routing index never shows up as a message shard.
+            self.assertNotIn(
+                mri.get_message_route_index_db_path(account_dir),
+                _iter_message_db_paths(account_dir),
+            )
+
+            routes = mri.get_message_routes(account_dir, "wxid_a")
+            self.assertEqual([r.db_path.name for r in routes], ["message_0.db", "message_1.db"])
+            self.assertEqual([(r.min_create_time, r.max_create_time, r.row_count) for r in routes], [(100, 200, 2), (300, 300, 1)])
+            self.assertEqual(
+                mri.resolve_conversation_tables(account_dir, "wxid_b"),
+                [(account_dir / "message_1.db", f"Chat_{_md5('wxid_b')}")],
+            )
+            self.assertEqual(mri.resolve_conversation_tables(account_dir, "wxid_missing"), [])
+            self.assertEqual(
+                mri.resolve_conversation_tables(account_dir, "wxid_a", db_paths=[account_dir / "message_1.db"]),
+                [(account_dir / "message_1.db", f"Msg_{_md5('wxid_a')}")],
+            )
+
+            # Unchanged shards: answered from memory, and from the persisted index in a fresh process.
+            with mock.patch.object(mri, "_scan_shard", side_effect=AssertionError("rescanned")):
+                self.assertEqual(len(mri.get_message_routes(account_dir, "wxid_a")), 2)
+                mri._MEMO.clear()
+                self.assertEqual(len(mri.get_message_routes(account_dir, "wxid_a")), 2)
+
+            # A shard changed behind our back is rescanned on the next lookup.
+            self._create_table(account_dir / "message_0.db", f"Msg_{_md5('wxid_c')}", [400])
+            self._bump_mtime(account_dir / "message_0.db")
+            self.assertEqual(
+                [r.db_path.name for r in mri.get_message_routes(account_dir, "wxid_c")],
+                ["message_0.db"],
+            )
+
+            # A removed shard drops out of the routes.
+            (account_dir / "message_1.db").unlink()
+            self.assertEqual([r.db_path.name for r in mri.get_message_routes(account_dir, "wxid_a")], ["message_0.db"])
+            self.assertEqual(mri.get_message_routes(account_dir, "wxid_b"), [])
+
+    def test_post_decrypt_path_rebuilds_routes(self):
+        from wechat_decrypt_tool import message_route_index as mri
+        from wechat_decrypt_tool import wechat_decrypt as wd
+
+        with TemporaryDirectory() as td:
+            root = Path(td)
+            db_storage = root / "xwechat_files" / "wxid_me_1a2b" / "db_storage"
+            (db_storage / "message").mkdir(parents=True)
+            self._create_table(db_storage / "message" / "message_0.db", f"Msg_{_md5('wxid_a')}", [100, 200])
+
+            with mock.patch.dict(
+                os.environ,
+                {"WECHAT_TOOL_DATA_DIR": str(root), "WECHAT_TOOL_BUILD_SESSION_LAST_MESSAGE": "0"},
+            ), mock.patch.object(wd, "get_output_databases_dir", return_value=root / "output" / "databases"):
+                result = wd.decrypt_wechat_databases(str(db_storage), "00" * 32)
+
+            self.assertEqual(result["status"], "success")
+            (info,) = result["account_results"].values()
+            self.assertEqual(info["message_routes"]["status"], "success")
+            account_dir = Path(info["output_dir"])
+            with mock.patch.object(mri, "_scan_shard", side_effect=AssertionError("rescanned")):
+                mri._MEMO.clear()
+                routes = mri.get_message_routes(account_dir, "wxid_a")
+            self.assertEqual([(r.db_path.name, r.row_count) for r in routes], [("message_0.db", 2)])
+
+    def test_truncated_md5_table_falls_back_to_partial_match(self):
+        from wechat_decrypt_tool import message_route_index as mri
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / "wxid_me"
+            account_dir.mkdir(parents=True)
+            self._create_table(account_dir / "message_0.db", f"Msg_{_md5('wxid_c')[:24]}", [10, 20])
+            self._create_table(account_dir / "message_1.db", f"Msg_{_md5('wxid_c')}", [30])
+            self._create_table(account_dir / "message_1.db", f"Msg_{_md5('wxid_c')[:24]}", [40])
+
+            out = mri.build_message_route_index(account_dir)
+            self.assertEqual(out["conversations"], 1)
+
+            routes = mri.get_message_routes(account_dir, "wxid_c")
+            # Partial match only where the shard has no full-md5 table, like `_resolve_msg_table_name`.
+            self.assertEqual(
+                [(r.db_path.name, r.table_name, r.row_count) for r in routes],
+                [
+                    ("message_0.db", f"Msg_{_md5('wxid_c')[:24]}", 2),
+                    ("message_1.db", f"Msg_{_md5('wxid_c')}", 1),
+                ],
+            )
+            self.assertEqual(mri.get_message_routes(account_dir, "wxid_other"), [])
+
+    def test_refresh_after_write_updates_stats_without_rescan(self):
+        from wechat_decrypt_tool import message_route_index as mri
+        from wechat_decrypt_tool.chat_export_service import _estimate_conversation_message_count
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / "wxid_me"
+            account_dir.mkdir(parents=True)
+            self._seed(account_dir)
+            mri.build_message_route_index(account_dir)
+
+            db_path = account_dir / "message_0.db"
+            table_name = f"Msg_{_md5('wxid_a')}"
+            conn = sqlite3.connect(str(db_path))
+            try:
+                conn.execute(f'INSERT INTO "{table_name}"(create_time) VALUES(900)')
+                conn.commit()
+            finally:
+                conn.close()
+            self._bump_mtime(db_path)
+            mri.refresh_message_route(account_dir, db_path=db_path, table_name=table_name)
+
+            real_scan = mri._scan_shard
+            with mock.patch.object(mri, "_scan_shard", side_effect=real_scan) as scan:
+                routes = mri.get_message_routes(account_dir, "wxid_a")
+            scan.assert_not_called()
+            self.assertEqual((routes[0].max_create_time, routes[0].row_count), (900, 3))
+
+            self.assertEqual(
+                _estimate_conversation_message_count(
+                    account_dir=account_dir, conv_username="wxid_a", start_time=None, end_time=None
+                ),
+                4,
+            )
+            self.assertEqual(
+                _estimate_conversation_message_count(
+                    account_dir=account_dir, conv_username="wxid_a", start_time=250, end_time=None
+                ),
+                2,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import asyncio
+import importlib
+import logging
+import os
+import re
+import sys
+import time
+import unittest
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+def _jpeg(tag: str) -> bytes:
+    return b"\xff\xd8\xff\xe0" + tag.encode("utf-8") + b"\x00" * 32 + b"\xff\xd9"
+
+
+def _posts(n: int) -> list[dict]:
+    out = []
+    for i in range(n):
+        media = [
+            {"id": f"m{i}_{j}", "type": 2, "url": f"https://szmmsns.qpic.cn/img/{i}/{j}", "key": "1"}
+            for j in range(3)
+        ]
+        if i % 4 == 0:
+            media.append(
+                {"id": f"v{i}", "type": 6, "url": f"https://szmmsns.qpic.cn/vid/{i}", "thumb": f"https://szmmsns.qpic.cn/vthumb/{i}", "videoKey": "7"}
+            )
+        out.append({"id": f"p{i:03d}", "username": "wxid_friend", "type": 1, "createTime": 1735689600 + i, "media": media})
+    return out
+
+
+class TestSnsExportPrefetch(unittest.TestCase):
+    def test_batch_prefetch_is_concurrent_and_pages_keep_post_order(self):
+        with TemporaryDirectory() as td:
+            root = Path(td)
+            account = "wxid_test"
+            account_dir = root / "output" / "databases" / account
+            account_dir.mkdir(parents=True, exist_ok=True)
+
+            prev_data = os.environ.get("WECHAT_TOOL_DATA_DIR")
+            try:
+                os.environ["WECHAT_TOOL_DATA_DIR"] = str(root)
+                import wechat_decrypt_tool.app_paths as app_paths
+                import wechat_decrypt_tool.sns_export_service as svc
+                from wechat_decrypt_tool.sns_media import SnsRemoteImageResult
+
+                importlib.reload(app_paths)
+                svc = importlib.reload(svc)
+
+                posts = _posts(12)
+                state = {"active": 0, "max_active": 0, "calls": 0}
+                video_tmp = root / "video_tmp"
+                video_tmp.mkdir()
+
+                async def fake_image(*, account_dir, url, key, token, use_cache):
+                    state["calls"] += 1
+                    state["active"] += 1
+                    state["max_active"] = max(state["max_active"], state["active"])
+                    try:
+                        await asyncio.sleep(0.02)
+                    finally:
+                        state["active"] -= 1
+                    return SnsRemoteImageResult(payload=_jpeg(url), media_type="image/jpeg", source="remote")
+
+                async def fake_video(*, account_dir, url, key, token, use_cache):
+                    await asyncio.sleep(0.02)
+                    p = video_tmp / f"{abs(hash(url))}.mp4.tmp"
+                    p.write_bytes(b"\x00\x00\x00\x18ftypmp42" + url.encode("utf-8"))
+                    return p
+
+                def fake_timeline(*, account, limit, offset, usernames, keyword):
+                    return {"timeline": posts[offset : offset + limit], "hasMore": offset + limit < len(posts)}
+
+                with (
+                    mock.patch.object(svc, "_resolve_account_dir", return_value=account_dir),
+                    mock.patch.object(svc, "_try_fetch_and_decrypt_sns_image_remote", side_effect=fake_image),
+                    mock.patch.object(svc, "_materialize_sns_remote_video", side_effect=fake_video),
+                    mock.patch.object(svc, "list_sns_timeline", side_effect=fake_timeline),
+                    mock.patch.object(
+                        svc,
+                        "_load_sns_users",
+                        return_value=[{"username": "wxid_friend", "displayName": "Friend", "postCount": len(posts)}],
+                    ),
+                    mock.patch.object(svc, "_PREFETCH_CONCURRENCY", 4),
+                    mock.patch.object(svc, "_PREFETCH_BATCH_POSTS", 5),
+                ):
+                    manager = svc.SNS_EXPORT_MANAGER
+                    job = manager.create_job(
+                        account=account,
+                        scope="selected",
+                        usernames=["wxid_friend"],
+                        use_cache=False,
+                        output_dir=None,
+                        file_name=None,
+                    )
+                    for _ in range(600):
+                        job = manager.get_job(job.export_id)
+                        if job.status in {"done", "error", "cancelled"}:
+                            break
+                        time.sleep(0.05)
+
+                self.assertEqual(job.status, "done", msg=job.error)
+                # 12 posts x 3 images + 3 video posters; every image fetched once, up to 4 at a time.
+                self.assertEqual(state["calls"], 39)
+                self.assertGreater(state["max_active"], 1)
+                self.assertLessEqual(state["max_active"], 4)
+
+                progress = job.to_public_dict()["progress"]
+                self.assertEqual(progress["postsExported"], 12)
+                self.assertEqual(progress["mediaCopied"], 42)
+                self.assertEqual(progress["mediaMissing"], 0)
+                self.assertGreater(progress["mediaBytes"], 0)
+                self.assertGreater(progress["mediaKBps"], 0)
+
+                with zipfile.ZipFile(job.zip_path) as zf:
+                    page = zf.read("sns_wxid_friend.html").decode("utf-8")
+                    names = set(zf.namelist())
+                ids = re.findall(r'id="(p\d{3})"', page)
+                self.assertEqual(ids, [p["id"] for p in posts])
+                self.assertEqual(len([n for n in names if n.startswith("media/videos/")]), 3)
+                # Uncached video downloads are temp files; none may survive the export.
+                self.assertEqual(list(video_tmp.iterdir()), [])
+            finally:
+                logging.shutdown()
+                if prev_data is None:
+                    os.environ.pop("WECHAT_TOOL_DATA_DIR", None)
+                else:
+                    os.environ["WECHAT_TOOL_DATA_DIR"] = prev_data
+
+
+if __name__ == "__main__":
+    unittest.main()
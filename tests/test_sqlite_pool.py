@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from wechat_decrypt_tool import sqlite_pool
+
+
+def _write_db(db_path: Path, values: list[int], *, extra_column: bool = False) -> None:
+    conn = sqlite3.connect(str(db_path))
+    try:
+        cols = "x INTEGER, y TEXT" if extra_column else "x INTEGER"
+        conn.execute(f"CREATE TABLE t ({cols})")
+        conn.executemany("INSERT INTO t(x) VALUES(?)", [(v,) for v in values])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _bump_mtime(db_path: Path) -> None:
+    st = db_path.stat()
+    os.utime(db_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+class TestSqlitePool(unittest.TestCase):
+    def setUp(self):
+        sqlite_pool.invalidate_sqlite_pool()
+
+    def _stats(self) -> dict:
+        return sqlite_pool.get_sqlite_pool_stats()
+
+    def test_reuse_readonly_and_factory_reset(self):
+        with TemporaryDirectory() as td:
+            db_path = Path(td) / "contact.db"
+            _write_db(db_path, [1, 2])
+            before = self._stats()
+
+            conn = sqlite_pool.connect_readonly(db_path)
+            conn.row_factory = sqlite3.Row
+            conn.text_factory = bytes
+            self.assertEqual(conn.execute("SELECT COUNT(*) AS n FROM t").fetchone()["n"], 2)
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO t(x) VALUES(3)")
+            conn.close()
+            conn.close()  # double close must not hand the connection out twice
+
+            with sqlite_pool.readonly_connection(db_path) as c1, sqlite_pool.readonly_connection(db_path) as c2:
+                self.assertIs(c1, conn)
+                self.assertIsNot(c1, c2)
+                self.assertIsNone(c1.row_factory)
+                self.assertIs(c1.text_factory, str)
+
+            after = self._stats()
+            self.assertEqual(after["misses"] - before["misses"], 2)
+            self.assertEqual(after["hits"] - before["hits"], 1)
+
+            with self.assertRaises(sqlite3.OperationalError):
+                sqlite_pool.connect_readonly(Path(td) / "missing.db")
+            self.assertFalse((Path(td) / "missing.db").exists())
+
+    def test_file_changes_invalidate_connections_and_table_info(self):
+        with TemporaryDirectory() as td:
+            db_path = Path(td) / "message_0.db"
+            _write_db(db_path, [1])
+
+            with sqlite_pool.readonly_connection(db_path) as conn:
+                first = conn
+                self.assertEqual([c[1] for c in sqlite_pool.cached_table_info(conn, "t")], ["x"])
+            with sqlite_pool.readonly_connection(db_path) as conn:
+                self.assertIs(conn, first)
+                hits = self._stats()["tableInfoHits"]
+                sqlite_pool.cached_table_info(conn, "T")
+                self.assertEqual(self._stats()["tableInfoHits"], hits + 1)
+
+            # Replaced file (new inode, like decrypt's tmp + os.replace): new connection, fresh schema.
+            tmp_path = Path(td) / "message_0.db.tmp"
+            _write_db(tmp_path, [1, 2, 3], extra_column=True)
+            os.replace(tmp_path, db_path)
+            _bump_mtime(db_path)
+            with sqlite_pool.readonly_connection(db_path) as conn:
+                self.assertIsNot(conn, first)
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM t").fetchone()[0], 3)
+                self.assertEqual([c[1] for c in sqlite_pool.cached_table_info(conn, "t")], ["x", "y"])
+                second = conn
+
+            # Explicit invalidation by directory.
+            self.assertEqual(sqlite_pool.invalidate_sqlite_pool(Path(td)), 1)
+            with sqlite_pool.readonly_connection(db_path) as conn:
+                self.assertIsNot(conn, second)
+
+            # A connection borrowed across an invalidation is closed, not returned to the pool.
+            held = sqlite_pool.connect_readonly(db_path)
+            sqlite_pool.invalidate_sqlite_pool(db_path)
+            held.close()
+            self.assertEqual(self._stats()["idle"], 0)
+
+    def test_invalidation_waits_for_borrowed_connections(self):
+        with TemporaryDirectory() as td:
+            db_path = Path(td) / "message_1.db"
+            _write_db(db_path, [1])
+
+            held = sqlite_pool.connect_readonly(db_path)
+            self.assertEqual(self._stats()["borrowed"], 1)
+            timer = threading.Timer(0.2, held.close)
+            timer.start()
+            started = time.monotonic()
+            self.assertEqual(sqlite_pool.invalidate_sqlite_pool(db_path, wait_s=5.0), 1)
+            self.assertGreaterEqual(time.monotonic() - started, 0.15)
+            self.assertEqual(self._stats()["borrowed"], 0)
+            timer.join()
+
+            # A borrower that never returns only delays the caller up to `wait_s`.
+            stuck = sqlite_pool.connect_readonly(db_path)
+            started = time.monotonic()
+            sqlite_pool.invalidate_sqlite_pool(db_path, wait_s=0.1)
+            self.assertLess(time.monotonic() - started, 2.0)
+            stuck.close()
+
+    def test_exclusive_hold_keeps_new_borrowers_waiting(self):
+        with TemporaryDirectory() as td:
+            db_path = Path(td) / "message_2.db"
+            _write_db(db_path, [1, 2])
+
+            held = sqlite_pool.connect_readonly(db_path)
+            with sqlite_pool.exclusive_sqlite_file(db_path, wait_s=0.05) as drained:
+                self.assertFalse(drained)
+            held.close()
+
+            got: list[int] = []
+
+            def borrow() -> None:
+                conn = sqlite_pool.connect_readonly(db_path)
+                try:
+                    got.append(conn.execute("SELECT COUNT(*) FROM t").fetchone()[0])
+                finally:
+                    conn.close()
+
+            with sqlite_pool.exclusive_sqlite_file(db_path, wait_s=1.0) as drained:
+                self.assertTrue(drained)
+                reader = threading.Thread(target=borrow)
+                reader.start()
+                time.sleep(0.1)
+                # The reader is parked until the rewrite is done, then sees the new contents.
+                self.assertEqual(got, [])
+                conn = sqlite3.connect(str(db_path))
+                conn.execute("INSERT INTO t(x) VALUES(3)")
+                conn.commit()
+                conn.close()
+            reader.join(5)
+            self.assertEqual(got, [3])
+
+
+if __name__ == "__main__":
+    unittest.main()
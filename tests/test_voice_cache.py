@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+from wechat_decrypt_tool import voice_cache
+
+
+class TestVoiceCache(unittest.TestCase):
+    def setUp(self):
+        self._td = TemporaryDirectory()
+        self._prev_data = os.environ.get("WECHAT_TOOL_DATA_DIR")
+        os.environ["WECHAT_TOOL_DATA_DIR"] = self._td.name
+        self.calls: list[bytes] = []
+
+        def fake_convert(data: bytes, preferred_format: str = "mp3"):
+            self.calls.append(bytes(data))
+            if data.startswith(b"bad"):
+                return bytes(data), "silk", "audio/silk"
+            return b"ID3" + bytes(data), "mp3", "audio/mpeg"
+
+        self._patches = [
+            patch.object(voice_cache, "_convert_silk_to_browser_audio", side_effect=fake_convert),
+            patch.object(voice_cache, "_SIZE_ESTIMATE", None),
+        ]
+        for p in self._patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self._patches):
+            p.stop()
+        if self._prev_data is None:
+            os.environ.pop("WECHAT_TOOL_DATA_DIR", None)
+        else:
+            os.environ["WECHAT_TOOL_DATA_DIR"] = self._prev_data
+        self._td.cleanup()
+
+    def test_second_request_is_served_from_disk(self):
+        first = voice_cache.transcode_voice_cached("wxid_a", 7, b"silk-1")
+        second = voice_cache.transcode_voice_cached("wxid_a", 7, b"silk-1")
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertIsNotNone(second.path)
+        self.assertEqual(second.path, first.path)
+        self.assertEqual(second.path.read_bytes(), b"ID3silk-1")
+        self.assertEqual((second.ext, second.media_type), ("mp3", "audio/mpeg"))
+        self.assertTrue(second.etag.startswith('"7_') and second.etag.endswith('.mp3"'))
+
+    def test_changed_blob_gets_a_new_entry(self):
+        a = voice_cache.transcode_voice_cached("wxid_a", 7, b"silk-1")
+        b = voice_cache.transcode_voice_cached("wxid_a", 7, b"silk-2")
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertNotEqual(a.etag, b.etag)
+        self.assertEqual(b.path.read_bytes(), b"ID3silk-2")
+
+    def test_failed_transcode_is_not_cached(self):
+        out = voice_cache.transcode_voice_cached("wxid_a", 9, b"bad-silk")
+        voice_cache.transcode_voice_cached("wxid_a", 9, b"bad-silk")
+
+        self.assertIsNone(out.path)
+        self.assertEqual(out.ext, "silk")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_lru_eviction_keeps_cache_under_cap(self):
+        with patch.object(voice_cache, "_MAX_BYTES", 1000):
+            for i in range(10):
+                voice_cache.transcode_voice_cached("wxid_a", i, bytes([i]) * 197)
+
+        files = [p for p in voice_cache.get_voice_cache_root_dir().rglob("*.mp3")]
+        self.assertLessEqual(sum(p.stat().st_size for p in files), 1000)
+        names = {p.name.split("_")[0] for p in files}
+        self.assertIn("9", names)
+        self.assertNotIn("0", names)
+
+    def test_key_locks_are_a_fixed_set_of_stripes(self):
+        for i in range(500):
+            voice_cache.transcode_voice_cached("wxid_a", i, bytes([i % 251]) * 8)
+
+        self.assertEqual(len(voice_cache._KEY_LOCKS), voice_cache._KEY_LOCK_STRIPES)
+        self.assertIs(voice_cache._key_lock("12_abc"), voice_cache._key_lock("12_abc"))
+
+    def test_prefetch_reads_media_db(self):
+        account_dir = Path(self._td.name) / "output" / "databases" / "wxid_a"
+        account_dir.mkdir(parents=True)
+        conn = sqlite3.connect(str(account_dir / "media_0.db"))
+        conn.execute("CREATE TABLE VoiceInfo (svr_id INTEGER, create_time INTEGER, voice_data BLOB)")
+        conn.executemany(
+            "INSERT INTO VoiceInfo VALUES(?, ?, ?)",
+            [(1, 1, b"silk-a"), (2, 2, b"bad-b"), (3, 3, b"silk-c")],
+        )
+        conn.commit()
+        conn.close()
+
+        out = voice_cache.prefetch_voices(account_dir, [1, 2, 3, 3, 4])
+        self.assertEqual(out, {"requested": 4, "cached": 2, "failed": 1})
+
+        self.calls.clear()
+        data = voice_cache.load_voice_data(account_dir / "media_0.db", 3)
+        hit = voice_cache.transcode_voice_cached("wxid_a", 3, data)
+        self.assertEqual(self.calls, [])
+        self.assertIsNotNone(hit.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
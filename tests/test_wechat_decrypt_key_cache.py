@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from wechat_decrypt_tool import wechat_decrypt as wd  # noqa: E402
+
+
+KEY_HEX = "ab" * 32
+
+
+class TestDerivedKeyCache(unittest.TestCase):
+    def setUp(self):
+        self._td = TemporaryDirectory()
+        self._prev_data_dir = os.environ.get("WECHAT_TOOL_DATA_DIR")
+        os.environ["WECHAT_TOOL_DATA_DIR"] = self._td.name
+        self._prev_cache = wd._KDF_CACHE
+        wd._KDF_CACHE = wd._DerivedKeyCache(max_entries=4, disk_enabled=True)
+
+    def tearDown(self):
+        wd._KDF_CACHE = self._prev_cache
+        if self._prev_data_dir is None:
+            os.environ.pop("WECHAT_TOOL_DATA_DIR", None)
+        else:
+            os.environ["WECHAT_TOOL_DATA_DIR"] = self._prev_data_dir
+        self._td.cleanup()
+
+    def test_second_derivation_hits_cache(self):
+        salt = b"\x01" * 16
+        dec = wd.WeChatDatabaseDecryptor(KEY_HEX)
+        first = dec.derive_keys(salt)
+        second = dec.derive_keys(salt)
+        self.assertEqual(first, second)
+        self.assertEqual(first, dec._derive_keys_uncached(salt))
+        self.assertEqual(dec.key_cache_stats(), {"hits": 1, "misses": 1, "hit_rate": 0.5})
+
+    def test_disk_store_survives_new_process_and_is_key_bound(self):
+        salt = b"\x02" * 16
+        keys = wd.WeChatDatabaseDecryptor(KEY_HEX).derive_keys(salt)
+        files = list((Path(self._td.name) / "output" / "kdf_cache").glob("*.bin"))
+        self.assertEqual(len(files), 1)
+        self.assertNotIn(keys[0], files[0].read_bytes())
+
+        # Simulate a restart: fresh in-memory cache loads the encrypted store.
+        wd._KDF_CACHE = wd._DerivedKeyCache(max_entries=4, disk_enabled=True)
+        self.assertEqual(wd._KDF_CACHE.get(bytes.fromhex(KEY_HEX), salt), keys)
+        # A different key never sees those entries.
+        self.assertIsNone(wd._KDF_CACHE.get(bytes.fromhex("cd" * 32), salt))
+
+    def test_size_bound_and_invalidation(self):
+        key = bytes.fromhex(KEY_HEX)
+        cache = wd._KDF_CACHE
+        for i in range(6):
+            cache.put(key, bytes([i]) * 16, (b"k" * 32, b"m" * 32))
+        self.assertEqual(cache.stats()["size"], 4)
+        self.assertIsNone(cache.get(key, b"\x00" * 16))
+        self.assertIsNotNone(cache.get(key, b"\x05" * 16))
+
+        self.assertEqual(cache.invalidate(key, b"\x05" * 16), 1)
+        self.assertIsNone(cache.get(key, b"\x05" * 16))
+        self.assertEqual(wd.invalidate_derived_key_cache(KEY_HEX), 3)
+        self.assertEqual(cache.stats()["size"], 0)
+        self.assertFalse(any((Path(self._td.name) / "output" / "kdf_cache").glob("*.bin")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,287 @@
+import hashlib
+import hmac
+import os
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from wechat_decrypt_tool import sqlite_pool  # noqa: E402
+from wechat_decrypt_tool import wechat_decrypt as wd  # noqa: E402
+
+
+KEY_HEX = "11" * 32
+
+
+def _encrypt_pages(plain_pages: list[bytes], key_hex: str, salt: bytes) -> bytes:
+    """Build a SQLCipher-4 style file from plaintext page bodies (test-only encryptor)."""
+    enc_key, mac_key = wd.WeChatDatabaseDecryptor(key_hex).derive_keys(salt)
+    out = bytearray()
+    reserve_start = wd.PAGE_SIZE - wd.RESERVE_SIZE
+    for idx, body in enumerate(plain_pages):
+        page_num = idx + 1
+        offset = wd.SALT_SIZE if page_num == 1 else 0
+        assert len(body) == reserve_start - offset
+        iv = os.urandom(wd.IV_SIZE)
+        enc = Cipher(algorithms.AES(enc_key), modes.CBC(iv)).encryptor()
+        ciphertext = enc.update(body) + enc.finalize()
+        mac = hmac.new(mac_key, digestmod=hashlib.sha512)
+        mac.update(ciphertext + iv)
+        mac.update(page_num.to_bytes(4, "little"))
+        page = (salt if page_num == 1 else b"") + ciphertext + iv + mac.digest()
+        page += b"\x00" * (wd.PAGE_SIZE - len(page))
+        out += page
+    return bytes(out)
+
+
+def _make_plain_pages(n: int) -> list[bytes]:
+    reserve_start = wd.PAGE_SIZE - wd.RESERVE_SIZE
+    pages = []
+    for i in range(n):
+        size = reserve_start - (wd.SALT_SIZE if i == 0 else 0)
+        pages.append(bytes([(i * 7 + j) % 251 for j in range(16)]) * (size // 16))
+    return pages
+
+
+class TestWeChatDecryptStreaming(unittest.TestCase):
+    def setUp(self):
+        self._td = TemporaryDirectory()
+        self._prev_data_dir = os.environ.get("WECHAT_TOOL_DATA_DIR")
+        os.environ["WECHAT_TOOL_DATA_DIR"] = self._td.name
+
+    def tearDown(self):
+        if self._prev_data_dir is None:
+            os.environ.pop("WECHAT_TOOL_DATA_DIR", None)
+        else:
+            os.environ["WECHAT_TOOL_DATA_DIR"] = self._prev_data_dir
+        self._td.cleanup()
+
+    def test_parallel_output_matches_single_thread(self):
+        salt = bytes(range(16))
+        n_pages = wd.DECRYPT_BATCH_PAGES * 2 + 37
+        plain = _make_plain_pages(n_pages)
+        encrypted = _encrypt_pages(plain, KEY_HEX, salt)
+
+        with TemporaryDirectory() as td:
+            src = Path(td) / "message_0.db"
+            # Trailing partial page should be ignored.
+            src.write_bytes(encrypted + b"\x01" * 100)
+
+            out_single = Path(td) / "single.db"
+            out_multi = Path(td) / "multi.db"
+            stats_single = wd.WeChatDatabaseDecryptor(KEY_HEX, page_workers=1).decrypt_database_with_stats(
+                str(src), str(out_single)
+            )
+            stats_multi = wd.WeChatDatabaseDecryptor(KEY_HEX, page_workers=4).decrypt_database_with_stats(
+                str(src), str(out_multi)
+            )
+
+            self.assertTrue(stats_single.ok)
+            self.assertTrue(stats_multi.ok)
+            self.assertEqual(stats_multi.total_pages, n_pages)
+            self.assertEqual(stats_multi.successful_pages, n_pages)
+            self.assertEqual(stats_multi.failed_pages, 0)
+            self.assertGreater(stats_multi.pages_per_sec, 0)
+
+            data = out_multi.read_bytes()
+            self.assertEqual(data, out_single.read_bytes())
+            self.assertEqual(len(data), n_pages * wd.PAGE_SIZE)
+            self.assertTrue(data.startswith(wd.SQLITE_HEADER))
+            self.assertEqual(data[16 : 16 + len(plain[0])], plain[0])
+            page_5 = data[5 * wd.PAGE_SIZE : 6 * wd.PAGE_SIZE]
+            self.assertEqual(page_5[: len(plain[5])], plain[5])
+            self.assertEqual(stats_multi.bytes_written, len(data))
+
+    def test_tampered_page_is_counted_as_failed(self):
+        salt = b"\x42" * 16
+        plain = _make_plain_pages(3)
+        encrypted = bytearray(_encrypt_pages(plain, KEY_HEX, salt))
+        encrypted[wd.PAGE_SIZE + 10] ^= 0xFF
+
+        with TemporaryDirectory() as td:
+            src = Path(td) / "contact.db"
+            src.write_bytes(bytes(encrypted))
+            out = Path(td) / "out.db"
+            stats = wd.WeChatDatabaseDecryptor(KEY_HEX).decrypt_database_with_stats(str(src), str(out))
+
+            self.assertTrue(stats.ok)
+            self.assertEqual(stats.failed_pages, 1)
+            self.assertEqual(stats.successful_pages, 2)
+            self.assertEqual(out.stat().st_size, 2 * wd.PAGE_SIZE)
+
+    def test_failed_run_keeps_previous_output(self):
+        salt = b"\x24" * 16
+        with TemporaryDirectory() as td:
+            src = Path(td) / "message_1.db"
+            src.write_bytes(_encrypt_pages(_make_plain_pages(8), KEY_HEX, salt))
+            out = Path(td) / "out.db"
+            dec = wd.WeChatDatabaseDecryptor(KEY_HEX, page_workers=1)
+            self.assertTrue(dec.decrypt_database(str(src), str(out)))
+            previous = out.read_bytes()
+
+            with mock.patch.object(wd, "_decrypt_page_batch", side_effect=OSError("disk gone")):
+                stats = dec.decrypt_database_with_stats(str(src), str(out))
+
+            self.assertFalse(stats.ok)
+            self.assertEqual(out.read_bytes(), previous)
+            self.assertFalse(Path(str(out) + ".tmp").exists())
+
+    def test_plain_sqlite_is_copied(self):
+        with TemporaryDirectory() as td:
+            src = Path(td) / "plain.db"
+            payload = wd.SQLITE_HEADER + b"\x07" * (wd.PAGE_SIZE * 3 - len(wd.SQLITE_HEADER))
+            src.write_bytes(payload)
+            out = Path(td) / "out.db"
+            stats = wd.WeChatDatabaseDecryptor(KEY_HEX).decrypt_database_with_stats(str(src), str(out))
+            self.assertTrue(stats.ok)
+            self.assertTrue(stats.copied)
+            self.assertEqual(out.read_bytes(), payload)
+
+
+class TestWeChatDecryptIncremental(unittest.TestCase):
+    def setUp(self):
+        self._td = TemporaryDirectory()
+        self._prev_data_dir = os.environ.get("WECHAT_TOOL_DATA_DIR")
+        os.environ["WECHAT_TOOL_DATA_DIR"] = self._td.name
+        self.root = Path(self._td.name)
+        self.salt = b"\x33" * 16
+        self.plain = _make_plain_pages(20)
+
+    def tearDown(self):
+        if self._prev_data_dir is None:
+            os.environ.pop("WECHAT_TOOL_DATA_DIR", None)
+        else:
+            os.environ["WECHAT_TOOL_DATA_DIR"] = self._prev_data_dir
+        self._td.cleanup()
+
+    def _full(self, src: Path) -> bytes:
+        out = self.root / "reference.db"
+        self.assertTrue(wd.WeChatDatabaseDecryptor(KEY_HEX).decrypt_database(str(src), str(out)))
+        return out.read_bytes()
+
+    def test_only_changed_and_appended_pages_are_rewritten(self):
+        src = self.root / "message_0.db"
+        out = self.root / "out" / "message_0.db"
+        out.parent.mkdir()
+        encrypted = _encrypt_pages(self.plain, KEY_HEX, self.salt)
+        src.write_bytes(encrypted)
+
+        dec = wd.WeChatDatabaseDecryptor(KEY_HEX)
+        first = dec.decrypt_database_with_stats(str(src), str(out), incremental=True)
+        self.assertTrue(first.ok)
+        self.assertFalse(first.incremental)
+        self.assertTrue(Path(str(out) + ".pages").exists())
+
+        # Unchanged source (same size + mtime): nothing is rewritten.
+        again = dec.decrypt_database_with_stats(str(src), str(out), incremental=True)
+        self.assertTrue(again.incremental)
+        self.assertEqual(again.unchanged_pages, 20)
+        self.assertEqual(again.successful_pages, 0)
+
+        # Rewrite page 1 and page 8, append two pages.
+        new_plain = list(self.plain)
+        new_plain[0] = bytes(len(new_plain[0]))
+        new_plain[7] = b"\x5a" * len(new_plain[7])
+        new_plain += _make_plain_pages(22)[20:]
+        reencrypted = _encrypt_pages(new_plain, KEY_HEX, self.salt)
+        pages = [encrypted[i * wd.PAGE_SIZE : (i + 1) * wd.PAGE_SIZE] for i in range(20)]
+        for idx in (0, 7):
+            pages[idx] = reencrypted[idx * wd.PAGE_SIZE : (idx + 1) * wd.PAGE_SIZE]
+        src.write_bytes(b"".join(pages) + reencrypted[20 * wd.PAGE_SIZE :])
+
+        inode = out.stat().st_ino
+        stats = dec.decrypt_database_with_stats(str(src), str(out), incremental=True)
+        self.assertTrue(stats.ok)
+        self.assertTrue(stats.incremental)
+        # Patched in place (no whole-file copy); pooled readers are held off for the duration.
+        self.assertEqual(out.stat().st_ino, inode)
+        self.assertFalse(Path(str(out) + ".tmp").exists())
+        self.assertEqual(stats.successful_pages, 4)
+        self.assertEqual(stats.unchanged_pages, 18)
+        self.assertEqual(out.read_bytes(), self._full(src))
+
+        # Shrink: the output is truncated to the new page count.
+        src.write_bytes(b"".join(pages[:10]))
+        stats = dec.decrypt_database_with_stats(str(src), str(out), incremental=True)
+        self.assertTrue(stats.incremental)
+        self.assertEqual(stats.successful_pages, 0)
+        self.assertEqual(out.read_bytes(), self._full(src))
+
+    def test_borrowed_output_falls_back_to_full_decrypt(self):
+        src = self.root / "message_3.db"
+        out = self.root / "message_3_out.db"
+        encrypted = _encrypt_pages(self.plain, KEY_HEX, self.salt)
+        src.write_bytes(encrypted)
+        dec = wd.WeChatDatabaseDecryptor(KEY_HEX)
+        self.assertTrue(dec.decrypt_database(str(src), str(out), incremental=True))
+
+        new_plain = list(self.plain)
+        new_plain[4] = b"\x4d" * len(new_plain[4])
+        reencrypted = _encrypt_pages(new_plain, KEY_HEX, self.salt)
+        src.write_bytes(encrypted[: 4 * wd.PAGE_SIZE] + reencrypted[4 * wd.PAGE_SIZE : 5 * wd.PAGE_SIZE] + encrypted[5 * wd.PAGE_SIZE :])
+
+        # A reader that never hands its connection back: the file is not patched under it.
+        held = sqlite_pool.connect_readonly(out)
+        try:
+            with mock.patch.object(wd, "_POOL_RELEASE_WAIT_S", 0.05):
+                stats = dec.decrypt_database_with_stats(str(src), str(out), incremental=True)
+        finally:
+            held.close()
+        self.assertTrue(stats.ok)
+        self.assertFalse(stats.incremental)
+        self.assertEqual(out.read_bytes(), self._full(src))
+
+    def test_locally_modified_output_falls_back_to_full_decrypt(self):
+        src = self.root / "message_2.db"
+        out = self.root / "message_2_out.db"
+        encrypted = _encrypt_pages(self.plain, KEY_HEX, self.salt)
+        src.write_bytes(encrypted)
+        dec = wd.WeChatDatabaseDecryptor(KEY_HEX)
+        self.assertTrue(dec.decrypt_database(str(src), str(out), incremental=True))
+
+        # Realtime sync writes into the decrypted db in place (same size, new mtime).
+        with open(out, "r+b") as f:
+            f.seek(3 * wd.PAGE_SIZE + 100)
+            f.write(b"local-row")
+        st = out.stat()
+        os.utime(out, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+        new_plain = list(self.plain)
+        new_plain[5] = b"\x6b" * len(new_plain[5])
+        reencrypted = _encrypt_pages(new_plain, KEY_HEX, self.salt)
+        src.write_bytes(encrypted[: 5 * wd.PAGE_SIZE] + reencrypted[5 * wd.PAGE_SIZE : 6 * wd.PAGE_SIZE] + encrypted[6 * wd.PAGE_SIZE :])
+
+        stats = dec.decrypt_database_with_stats(str(src), str(out), incremental=True)
+        self.assertTrue(stats.ok)
+        self.assertFalse(stats.incremental)
+        self.assertEqual(out.read_bytes(), self._full(src))
+
+        # Uncheckpointed WAL frames next to the output count as a local modification too.
+        Path(str(out) + "-wal").write_bytes(b"\x00" * 32)
+        stats = dec.decrypt_database_with_stats(str(src), str(out), incremental=True)
+        self.assertFalse(stats.incremental)
+
+    def test_new_salt_falls_back_to_full_decrypt(self):
+        src = self.root / "contact.db"
+        out = self.root / "contact_out.db"
+        src.write_bytes(_encrypt_pages(self.plain, KEY_HEX, self.salt))
+        dec = wd.WeChatDatabaseDecryptor(KEY_HEX)
+        self.assertTrue(dec.decrypt_database(str(src), str(out), incremental=True))
+
+        src.write_bytes(_encrypt_pages(self.plain, KEY_HEX, b"\x44" * 16))
+        stats = dec.decrypt_database_with_stats(str(src), str(out), incremental=True)
+        self.assertTrue(stats.ok)
+        self.assertFalse(stats.incremental)
+        self.assertEqual(stats.successful_pages, 20)
+        self.assertEqual(out.read_bytes(), self._full(src))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+from unittest import mock
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import sys
+
+# Ensure "src/" is importable when running tests from repo root.
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+class TestWrappedCardScheduler(unittest.TestCase):
+    def _run(self, account_dir: Path, *, fail: set[int] = frozenset()):
+        from wechat_decrypt_tool.wrapped import service
+
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0, "heatmap": 0}
+        finished: list[int] = []
+
+        def fake_heatmap(**kwargs):
+            with lock:
+                state["heatmap"] += 1
+            return "heatmap"
+
+        def fake_payload(*, card_id, heatmap_sent=None, sources=None, **kwargs):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            try:
+                time.sleep(0.05)
+                if card_id in fail:
+                    raise RuntimeError(f"boom {card_id}")
+                if card_id in (0, 1):
+                    self.assertEqual(heatmap_sent, "heatmap")
+                if card_id == 7:
+                    self.assertEqual(sorted(sources), [0, 1, 2, 3, 4, 5])
+                    with lock:
+                        self.assertTrue({0, 1, 2, 3, 4, 5}.issubset(finished))
+                with lock:
+                    finished.append(card_id)
+                return {"id": card_id}
+            finally:
+                with lock:
+                    state["active"] -= 1
+
+        with mock.patch.object(service, "_get_or_compute_heatmap_sent", side_effect=fake_heatmap), mock.patch.object(
+            service, "_build_card_payload", side_effect=fake_payload
+        ), mock.patch.dict("os.environ", {"WECHAT_TOOL_WRAPPED_WORKERS": "4"}):
+            events = list(
+                service._run_card_dag(
+                    account_dir=account_dir,
+                    scope="global",
+                    year=2025,
+                    card_ids=[int(c["id"]) for c in service._WRAPPED_CARD_MANIFEST],
+                    refresh=True,
+                )
+            )
+        return events, state
+
+    def test_independent_cards_run_concurrently_and_bento_waits(self):
+        from wechat_decrypt_tool.wrapped import service
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / "wxid_me"
+            account_dir.mkdir(parents=True)
+            events, state = self._run(account_dir)
+
+            ids = [cid for cid, _, _ in events]
+            self.assertEqual(sorted(ids), [0, 1, 2, 3, 4, 5, 6, 7])
+            self.assertEqual(ids[-1], 7)
+            self.assertTrue(all(err is None for _, _, err in events))
+            self.assertGreater(state["peak"], 1)
+            self.assertEqual(state["heatmap"], 1)
+
+            # Each cacheable card is written as it completes; card 6 is never cached.
+            for cid in (0, 1, 2, 3, 4, 5, 7):
+                path = service._wrapped_card_cache_path(account_dir=account_dir, scope="global", year=2025, card_id=cid)
+                self.assertTrue(path.exists(), cid)
+            path6 = service._wrapped_card_cache_path(account_dir=account_dir, scope="global", year=2025, card_id=6)
+            self.assertFalse(path6.exists())
+
+    def test_failed_dependency_skips_bento(self):
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / "wxid_me"
+            account_dir.mkdir(parents=True)
+            events, _ = self._run(account_dir, fail={3})
+
+            errors = {cid: err for cid, _, err in events if err is not None}
+            self.assertEqual(sorted(errors), [3, 7])
+            ok = sorted(cid for cid, card, err in events if err is None)
+            self.assertEqual(ok, [0, 1, 2, 4, 5, 6])
+
+
+if __name__ == "__main__":
+    unittest.main()
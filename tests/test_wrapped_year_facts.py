@@ -0,0 +1,154 @@
+import sqlite3
+import unittest
+from datetime import datetime
+from unittest import mock
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import sys
+
+# Ensure "src/" is importable when running tests from repo root.
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+class TestWrappedYearFacts(unittest.TestCase):
+    account = "wxid_me"
+
+    def _seed_index(self, account_dir: Path) -> None:
+        from wechat_decrypt_tool import chat_search_index as csi
+
+        base = int(datetime(2025, 3, 1, 9, 0, 0).timestamp())
+        msgs = [
+            # (username, sender, ts, local_type, render_type, text, db_stem)
+            ("wxid_a", "wxid_a", base, 1, "text", "早上好", "message_0"),
+            ("wxid_a", self.account, base + 30, 1, "text", "早 呀", "message_0"),
+            ("wxid_a", "wxid_a", base + 3600, 47, "emoji", "", "message_0"),
+            ("wxid_a", self.account, (base + 7200) * 1000, 47, "emoji", "", "message_0"),
+            ("wxid_b", "wxid_b", base + 86400, 1, "text", "hello", "message_1"),
+            ("wxid_b", self.account, base + 86400 + 600, 1, "text", "hi there", "message_1"),
+            ("wxid_b", "", base + 86400 + 700, 10000, "system", "你已添加了b", "message_1"),
+            ("room@chatroom", self.account, base + 172800, 1, "text", "大家好", "message_0"),
+            ("gh_biz", "gh_biz", base + 5, 49, "link", "推送", "biz_message_0"),
+            ("wxid_a", self.account, int(datetime(2024, 12, 31, 23, 0).timestamp()), 1, "text", "去年", "message_0"),
+        ]
+
+        conn = sqlite3.connect(str(account_dir / "contact.db"))
+        try:
+            for table in ("contact", "stranger"):
+                conn.execute(
+                    f"CREATE TABLE {table} (username TEXT PRIMARY KEY, remark TEXT, nick_name TEXT, "
+                    "alias TEXT, big_head_url TEXT, small_head_url TEXT)"
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+        conn = sqlite3.connect(str(csi.get_chat_search_index_db_path(account_dir)))
+        conn.isolation_level = None
+        try:
+            tokenizer = csi.TOKENIZER_CHAR
+            csi._init_index_db(conn, tokenizer)
+            rows = []
+            for i, (username, sender, ts, lt, rt, text, db_stem) in enumerate(msgs, start=1):
+                token_text = csi._to_index_token_text(text, tokenizer)
+                rows.append(
+                    (
+                        token_text,
+                        username,
+                        rt,
+                        ts,
+                        i,
+                        i,
+                        0,
+                        lt,
+                        db_stem,
+                        "Msg_x",
+                        sender,
+                        0,
+                        0,
+                        csi._to_index_grams(token_text, tokenizer),
+                    )
+                )
+            conn.execute("BEGIN")
+            csi._insert_index_rows(conn, rows, 1)
+            conn.execute("COMMIT")
+            csi._create_meta_indexes(conn)
+        finally:
+            conn.close()
+
+    def test_facts_columns_and_persistence(self):
+        from wechat_decrypt_tool.wrapped import facts as facts_mod
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed_index(account_dir)
+
+            facts = facts_mod.get_year_message_facts(account_dir=account_dir, year=2025)
+            self.assertIsNotNone(facts)
+            self.assertEqual(facts.usernames, ["room@chatroom", "wxid_a", "wxid_b"])
+            self.assertEqual(len(facts), 8)
+            self.assertTrue(facts.has_text)
+            self.assertEqual(list(facts.conv), [0, 1, 1, 1, 1, 2, 2, 2])
+            self.assertEqual(list(facts.outgoing), [1, 0, 1, 0, 1, 0, 1, 0])
+            # Millisecond timestamps are normalised to seconds.
+            self.assertTrue(all(v < 10_000_000_000 for v in facts.ts))
+            self.assertEqual(facts.day(facts.doy[1]).isoformat(), "2025-03-01")
+            self.assertEqual(facts.hour[1], 9)
+            self.assertEqual(sum(facts.text_chars), len("大家好早上好早呀hellohithere"))
+            self.assertEqual(
+                list(facts.iter_rows(skip_local_types=(10000,), skip_chatrooms=True))[-1][0:2],
+                ("wxid_b", 1),
+            )
+
+            # A second process reloads the persisted columns instead of rescanning the index.
+            facts_mod._MEMO.clear()
+            with mock.patch.object(facts_mod, "_build_facts", side_effect=AssertionError("rebuilt")):
+                reloaded = facts_mod.get_year_message_facts(account_dir=account_dir, year=2025)
+            self.assertEqual(reloaded.usernames, facts.usernames)
+            self.assertEqual(list(reloaded.ts), list(facts.ts))
+            self.assertEqual(list(reloaded.doy), list(facts.doy))
+            facts_mod._MEMO.clear()
+
+    def test_cards_match_index_queries(self):
+        from wechat_decrypt_tool.wrapped import facts as facts_mod
+        from wechat_decrypt_tool.wrapped.cards import (
+            card_00_global_overview as c0,
+            card_01_cyber_schedule as c1,
+            card_02_message_chars as c2,
+            card_03_reply_speed as c3,
+        )
+
+        def compute(account_dir: Path) -> list:
+            return [
+                c1.compute_weekday_hour_heatmap(account_dir=account_dir, year=2025, sender_username=self.account),
+                c0.compute_annual_daily_counts(account_dir=account_dir, year=2025, sender_username=self.account),
+                c0.compute_global_overview_stats(account_dir=account_dir, year=2025, sender_username=self.account),
+                c2.compute_text_message_char_counts(account_dir=account_dir, year=2025),
+                c3.compute_reply_speed_stats(account_dir=account_dir, year=2025),
+            ]
+
+        with TemporaryDirectory() as td:
+            account_dir = Path(td) / self.account
+            account_dir.mkdir(parents=True)
+            self._seed_index(account_dir)
+
+            with_facts = compute(account_dir)
+            facts_mod._MEMO.clear()
+            patches = [
+                mock.patch.object(mod, "get_year_message_facts", return_value=None) for mod in (c0, c1, c2, c3)
+            ]
+            for p in patches:
+                p.start()
+            try:
+                without_facts = compute(account_dir)
+            finally:
+                for p in patches:
+                    p.stop()
+
+            self.assertEqual(with_facts, without_facts)
+            self.assertEqual(with_facts[3], (len("早呀hithere大家好"), len("早上好hello")))
+
+
+if __name__ == "__main__":
+    unittest.main()
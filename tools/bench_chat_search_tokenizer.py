@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""对比聊天搜索索引分词模式（char / bigram / trigram）的索引体积与查询延迟（合成语料）
+
+使用方法:
+    uv run tools/bench_chat_search_tokenizer.py --messages 200000 --queries 300
+"""
+
+import argparse
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from wechat_decrypt_tool import chat_search_index as csi  # noqa: E402
+
+# 常用汉字 + 少量英文/数字/表情码，近似真实聊天文本的字符分布。
+_HAN = (
+    "的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得里后自以会家可下而过天去能对小多然于心学么之都好看起发当没成只如事把还用第样道想作种开美总从无情己面最女但现前些所同日手又行意动方期它头经长儿回位分爱老因很给名法间斯知世什两次使身者被高已亲其进此话常与活正感"
+    "吃饭喝茶火锅明今晚周末公司开会下班加班回家电影游戏快递红包转账哈呵嗯哦吧呢啊嘛"
+)
+_WORDS = ["ok", "hello", "wechat", "meeting", "2024", "lol", "[捂脸]", "[微笑]", "[强]", "http://t.cn/abc"]
+
+
+def _make_corpus(n: int, seed: int) -> list[str]:
+    rnd = random.Random(seed)
+    out: list[str] = []
+    for _ in range(n):
+        parts: list[str] = []
+        for _ in range(rnd.randint(1, 4)):
+            if rnd.random() < 0.2:
+                parts.append(rnd.choice(_WORDS))
+            else:
+                parts.append("".join(rnd.choice(_HAN) for _ in range(rnd.randint(2, 14))))
+        out.append(" ".join(parts))
+    return out
+
+
+def _make_queries(corpus: list[str], n: int, seed: int) -> list[str]:
+    rnd = random.Random(seed)
+    out: list[str] = []
+    while len(out) < n:
+        text = "".join(rnd.choice(corpus).split())
+        if len(text) < 2:
+            continue
+        size = rnd.choice([2, 2, 3, 4, 6])
+        start = rnd.randint(0, max(0, len(text) - size))
+        out.append(text[start : start + size])
+    return out
+
+
+def _build(path: Path, tokenizer: str, corpus: list[str]) -> float:
+    started = time.perf_counter()
+    conn = sqlite3.connect(str(path))
+    conn.isolation_level = None
+    try:
+        csi._init_index_db(conn, tokenizer)
+        conn.execute("BEGIN")
+        next_rowid = 1
+        batch = []
+        for i, text in enumerate(corpus, start=1):
+            token_text = csi._to_index_token_text(text, tokenizer)
+            batch.append(
+                (
+                    token_text,
+                    f"wxid_{i % 500}",
+                    "text",
+                    1_600_000_000 + i,
+                    i,
+                    i,
+                    0,
+                    1,
+                    "message_0",
+                    "Msg_bench",
+                    f"wxid_{i % 500}",
+                    0,
+                    0,
+                    csi._to_index_grams(token_text, tokenizer),
+                )
+            )
+            if len(batch) >= 1000:
+                next_rowid = csi._insert_index_rows(conn, batch, next_rowid)
+                batch.clear()
+        csi._insert_index_rows(conn, batch, next_rowid)
+        conn.execute("COMMIT")
+        conn.execute("INSERT INTO message_fts(message_fts) VALUES('optimize')")
+    finally:
+        conn.close()
+    return time.perf_counter() - started
+
+
+def _run_queries(path: Path, queries: list[str]) -> tuple[list[float], int]:
+    conn = sqlite3.connect(str(path))
+    try:
+        tokenizer = csi.get_chat_search_index_tokenizer(conn)
+        latencies: list[float] = []
+        total_hits = 0
+        for q in queries:
+            where_sql, params = csi.build_chat_search_match(q, tokenizer)
+            started = time.perf_counter()
+            total = conn.execute(f"SELECT COUNT(*) FROM message_fts WHERE {where_sql}", params).fetchone()[0]
+            conn.execute(
+                f"SELECT username, db_stem, table_name, local_id FROM message_fts WHERE {where_sql} "
+                "ORDER BY CAST(create_time AS INTEGER) DESC LIMIT 50",
+                params,
+            ).fetchall()
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            total_hits += int(total or 0)
+        return latencies, total_hits
+    finally:
+        conn.close()
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    modes = [csi.TOKENIZER_CHAR, csi.TOKENIZER_BIGRAM]
+    if csi._trigram_supported():
+        modes.append(csi.TOKENIZER_TRIGRAM)
+    else:
+        print("当前 SQLite 不支持 FTS5 trigram 分词器，跳过 trigram 模式")
+
+    corpus = _make_corpus(args.messages, args.seed)
+    queries = _make_queries(corpus, args.queries, args.seed + 1)
+    raw_bytes = sum(len(t.encode("utf-8")) for t in corpus)
+    print(f"语料: {len(corpus)} 条消息, 原文 {raw_bytes / 1024 / 1024:.1f} MiB, 查询 {len(queries)} 条")
+
+    with tempfile.TemporaryDirectory() as td:
+        hits_by_mode: dict[str, int] = {}
+        for mode in modes:
+            path = Path(td) / f"bench_{mode}.db"
+            build_s = _build(path, mode, corpus)
+            latencies, hits = _run_queries(path, queries)
+            hits_by_mode[mode] = hits
+            size_mib = path.stat().st_size / 1024 / 1024
+            print(
+                f"[{mode:>7}] 索引 {size_mib:7.1f} MiB  构建 {build_s:6.1f}s  "
+                f"p50 {statistics.median(latencies):7.2f}ms  p99 {_percentile(latencies, 99):7.2f}ms  命中 {hits}"
+            )
+
+        if len(set(hits_by_mode.values())) > 1:
+            print("注意: 各模式对标点的处理不同（trigram 按原样子串匹配），命中数存在少量差异属预期")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""微基准：.dat 图片解密（逐字节生成器 XOR vs bytes.translate / memoryview 切片 / mmap）
+
+覆盖三条路径：
+- V3:        整文件单字节 XOR
+- V4:        AES-ECB 头 + 原样中段 + XOR 尾（xor_size 取整文件，最坏情况）
+- magic 猜测: 无密钥时按 256 个候选 key 预览 8KB（随机数据，全部落空的最坏情况）
+
+使用方法:
+    uv run tools/bench_dat_decrypt.py --size-mb 5 --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from wechat_decrypt_tool import media_helpers as mh  # noqa: E402
+
+_XOR_KEY = 0x5A
+_AES_KEY = b"cfcd208495d565ef"
+
+
+def _legacy_v3(data: bytes, xor_key: int) -> bytes:
+    return bytes(b ^ xor_key for b in data)
+
+
+def _legacy_v4(data: bytes, xor_key: int, aes_key: bytes) -> bytes:
+    from Crypto.Cipher import AES
+    from Crypto.Util import Padding
+
+    header, rest = data[:0xF], data[0xF:]
+    _signature, aes_size, xor_size = struct.unpack("<6sLLx", header)
+    aes_size += AES.block_size - aes_size % AES.block_size
+    aes_data = rest[:aes_size]
+    raw_data = rest[aes_size:]
+    cipher = AES.new(aes_key[:16], AES.MODE_ECB)
+    decrypted_data = Padding.unpad(cipher.decrypt(aes_data), AES.block_size)
+    if xor_size > 0:
+        raw_data = rest[aes_size:-xor_size]
+        xored_data = bytes(b ^ xor_key for b in rest[-xor_size:])
+    else:
+        xored_data = b""
+    return decrypted_data + raw_data + xored_data
+
+
+def _legacy_magic_preview(data: bytes) -> None:
+    pv_len = min(8192, len(data))
+    for key in range(256):
+        pv = bytes(b ^ key for b in data[:pv_len])
+        pv.find(b"wxgf")
+
+
+def _fast_magic_preview(data: bytes) -> None:
+    preview = bytes(data[:8192])
+    for key in range(256):
+        mh._xor_bytes(preview, key).find(b"wxgf")
+
+
+def _make_v3(plain: bytes) -> bytes:
+    return mh._xor_bytes(plain, _XOR_KEY)
+
+
+def _make_v4(plain: bytes, *, xor_size: int) -> bytes:
+    from Crypto.Cipher import AES
+    from Crypto.Util import Padding
+
+    aes_size = 1024
+    head, tail = plain[:aes_size], plain[aes_size:]
+    enc = AES.new(_AES_KEY, AES.MODE_ECB).encrypt(Padding.pad(head, AES.block_size))
+    xor_size = min(xor_size, len(tail))
+    body = tail[: len(tail) - xor_size] + mh._xor_bytes(tail[len(tail) - xor_size :], _XOR_KEY)
+    header = struct.pack("<6sLLx", b"\x07\x08V1\x08\x07", aes_size, xor_size)
+    return header + enc + body
+
+
+def _time(fn, repeat: int) -> float:
+    samples: list[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    plain = b"\xff\xd8\xff\xe0" + os.urandom(size - 4)
+    v3 = _make_v3(plain)
+    v4 = _make_v4(plain, xor_size=size)
+    noise = os.urandom(size)
+
+    assert mh._decrypt_wechat_dat_v3(v3, _XOR_KEY) == _legacy_v3(v3, _XOR_KEY) == plain
+    assert mh._decrypt_wechat_dat_v4(v4, _XOR_KEY, _AES_KEY) == _legacy_v4(v4, _XOR_KEY, _AES_KEY) == plain
+
+    with tempfile.TemporaryDirectory() as td:
+        v4_path = Path(td) / "sample_v4.dat"
+        v4_path.write_bytes(v4)
+
+        def v4_mmap() -> None:
+            with mh._open_media_view(v4_path) as view:
+                mh._decrypt_wechat_dat_v4(view, _XOR_KEY, _AES_KEY)
+
+        def v4_read() -> None:
+            _legacy_v4(v4_path.read_bytes(), _XOR_KEY, _AES_KEY)
+
+        rows = [
+            ("v3 xor", _time(lambda: _legacy_v3(v3, _XOR_KEY), args.repeat), _time(lambda: mh._decrypt_wechat_dat_v3(v3, _XOR_KEY), args.repeat)),
+            ("v4 aes+xor", _time(lambda: _legacy_v4(v4, _XOR_KEY, _AES_KEY), args.repeat), _time(lambda: mh._decrypt_wechat_dat_v4(v4, _XOR_KEY, _AES_KEY), args.repeat)),
+            ("v4 from file", _time(v4_read, args.repeat), _time(v4_mmap, args.repeat)),
+            ("magic guess", _time(lambda: _legacy_magic_preview(noise), args.repeat), _time(lambda: _fast_magic_preview(noise), args.repeat)),
+        ]
+
+    print(f"size={args.size_mb:g}MB repeat={args.repeat} (median ms)")
+    print(f"{'case':<14} {'legacy':>10} {'fast':>10} {'speedup':>9}")
+    for name, legacy_ms, fast_ms in rows:
+        speedup = legacy_ms / fast_ms if fast_ms > 0 else float("inf")
+        print(f"{name:<14} {legacy_ms:>10.2f} {fast_ms:>10.2f} {speedup:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
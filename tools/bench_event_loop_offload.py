@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""压测：媒体请求（语音转码）打满时 /api/chat/messages 的延迟（合成账号数据）
+
+对比两种模式：
+- inline:    媒体端点在事件循环里同步执行（旧行为）
+- offloaded: 媒体端点走 executors.run_blocking 的有界线程池
+
+使用方法:
+    uv run tools/bench_event_loop_offload.py --media-concurrency 8 --decode-ms 40 --requests 50
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+_ACCOUNT = "wxid_bench"
+_FRIEND = "wxid_friend"
+
+
+def _seed(account_dir: Path, messages: int) -> None:
+    table = f"Msg_{hashlib.md5(_FRIEND.encode('utf-8')).hexdigest()}"
+    conn = sqlite3.connect(str(account_dir / "message_0.db"))
+    try:
+        conn.execute("CREATE TABLE Name2Id (user_name TEXT)")
+        conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES(1, ?)", (_ACCOUNT,))
+        conn.execute("INSERT INTO Name2Id(rowid, user_name) VALUES(2, ?)", (_FRIEND,))
+        conn.execute(
+            f"CREATE TABLE {table} (local_id INTEGER PRIMARY KEY, server_id INTEGER, local_type INTEGER, "
+            "sort_seq INTEGER, real_sender_id INTEGER, create_time INTEGER, message_content TEXT, compress_content BLOB)"
+        )
+        conn.executemany(
+            f"INSERT INTO {table} VALUES(?, ?, 1, ?, ?, ?, ?, NULL)",
+            [(i, i, i * 1000, 1 + (i % 2), 1_700_000_000 + i, f"bench message {i}") for i in range(1, messages + 1)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    conn = sqlite3.connect(str(account_dir / "media_0.db"))
+    try:
+        conn.execute("CREATE TABLE VoiceInfo (svr_id INTEGER, create_time INTEGER, voice_data BLOB)")
+        conn.executemany(
+            "INSERT INTO VoiceInfo VALUES(?, ?, ?)",
+            [(i, 1_700_000_000 + i, os.urandom(4096)) for i in range(1, 101)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[idx]
+
+
+async def _run_mode(app, *, media_concurrency: int, requests: int) -> dict[str, float]:
+    import httpx
+
+    stop = asyncio.Event()
+    media_done = 0
+
+    async def media_loop(client: httpx.AsyncClient, worker: int) -> None:
+        nonlocal media_done
+        i = worker
+        while not stop.is_set():
+            await client.get("/api/chat/media/voice", params={"server_id": 1 + (i % 100), "account": _ACCOUNT})
+            media_done += 1
+            i += media_concurrency
+            # In-process transport never touches a socket; yield like a real client connection would.
+            await asyncio.sleep(0)
+
+    latencies: list[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        media_tasks = [asyncio.create_task(media_loop(client, w)) for w in range(media_concurrency)]
+        await asyncio.sleep(0.2)
+        started = time.perf_counter()
+        for i in range(requests):
+            t0 = time.perf_counter()
+            resp = await client.get(
+                "/api/chat/messages",
+                params={"username": _FRIEND, "account": _ACCOUNT, "limit": 50, "offset": (i * 50) % 1000},
+            )
+            resp.raise_for_status()
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*media_tasks, return_exceptions=True)
+
+    return {
+        "p50": statistics.median(latencies),
+        "p99": _pct(latencies, 99),
+        "max": max(latencies),
+        "media_rps": media_done / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--media-concurrency", type=int, default=8)
+    parser.add_argument("--decode-ms", type=float, default=40.0, help="模拟单次语音转码耗时（阻塞）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        os.environ["WECHAT_TOOL_DATA_DIR"] = td
+        # Measure the transcode itself, not voice_cache hits.
+        os.environ["WECHAT_TOOL_VOICE_CACHE_ENABLED"] = "0"
+        account_dir = Path(td) / "output" / "databases" / _ACCOUNT
+        account_dir.mkdir(parents=True)
+        _seed(account_dir, args.messages)
+
+        from fastapi import FastAPI
+
+        from wechat_decrypt_tool.routers import chat as chat_router
+        from wechat_decrypt_tool.routers import chat_media as chat_media_router
+
+        # Only the two routers under test (the full app pulls in Windows-only modules and startup jobs).
+        app = FastAPI()
+        app.include_router(chat_router.router)
+        app.include_router(chat_media_router.router)
+
+        def slow_transcode(data: bytes, preferred_format: str = "mp3"):
+            time.sleep(args.decode_ms / 1000.0)
+            return b"ID3" + data[:64], "mp3", "audio/mpeg"
+
+        async def inline(category, fn, /, *a, **kw):
+            return fn(*a, **kw)
+
+        results: dict[str, dict[str, float]] = {}
+        for mode in ("inline", "offloaded"):
+            with ExitStack() as stack:
+                for mod in (chat_router, chat_media_router):
+                    stack.enter_context(patch.object(mod, "_resolve_account_dir", return_value=account_dir))
+                stack.enter_context(
+                    patch.object(chat_router.WCDB_REALTIME, "ensure_connected", side_effect=RuntimeError("offline"))
+                )
+                stack.enter_context(patch.object(chat_router, "_load_contact_rows", return_value={}))
+                stack.enter_context(patch.object(chat_router, "_query_head_image_usernames", return_value=set()))
+                stack.enter_context(patch.object(chat_router, "_load_group_nickname_map", return_value={}))
+                stack.enter_context(
+                    patch.object(chat_media_router, "_convert_silk_to_browser_audio", side_effect=slow_transcode)
+                )
+                if mode == "inline":
+                    stack.enter_context(patch.object(chat_media_router, "run_blocking", side_effect=inline))
+                results[mode] = asyncio.run(
+                    _run_mode(app, media_concurrency=args.media_concurrency, requests=args.requests)
+                )
+
+    print(
+        f"messages={args.messages} requests={args.requests} "
+        f"media_concurrency={args.media_concurrency} decode_ms={args.decode_ms:g}"
+    )
+    print(f"{'mode':<10} {'p50(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9} {'media req/s':>12}")
+    for mode, r in results.items():
+        print(f"{mode:<10} {r['p50']:>9.1f} {r['p99']:>9.1f} {r['max']:>9.1f} {r['media_rps']:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())